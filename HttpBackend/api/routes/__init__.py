@@ -9,4 +9,5 @@ from .tasks import tasks_bp
 from .workflows import workflows_bp
 from .executions import executions_bp
 from .logs import logs_bp
-from .downloads import downloads_bp
\ No newline at end of file
+from .downloads import downloads_bp
+from .metrics import metrics_bp
\ No newline at end of file
@@ -7,6 +7,9 @@
 from flask import request, jsonify
 from flask import Blueprint
 
+import log_follow
+from local_executor import create_executor
+
 # 创建蓝图
 logs_bp = Blueprint('logs', __name__)
 
@@ -23,4 +26,80 @@ def get_task_logs(task_id):
             'total': 0
         })
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def _remote_paths():
+    """读取并校验查询参数中的远程路径（必须是绝对路径，不能包含 ..）"""
+    paths = request.args.getlist('path') or (request.get_json(silent=True) or {}).get('paths', [])
+    for path in paths:
+        if not path.startswith('/') or '..' in path.split('/'):
+            raise ValueError(f'Invalid remote path: {path}')
+    return paths
+
+
+@logs_bp.route('/remote', methods=['GET'])
+def follow_remote_logs():
+    """
+    增量读取远程日志文件（.bosslog、.bosserr、.err.{node} 等）
+    GET /api/logs/remote?path=/path/a.bosslog&path=/path/b.bosserr
+
+    只返回该客户端上次读取之后新增的完整行，偏移按 consumer 记录在服务器上。
+
+    支持的查询参数:
+    - path: 远程文件路径，可指定多个
+    - consumer: 可选，跟踪者名称（默认 http），不同客户端使用不同名称互不影响
+    - from: 可选，首次读取已存在的文件时从 start（默认）还是 end 开始
+    - final: 可选，true 时返回末尾不完整的行（作业已结束时使用）
+    """
+    try:
+        paths = _remote_paths()
+        if not paths:
+            return jsonify({'success': False, 'error': 'Missing path parameter'}), 400
+
+        ssh = create_executor()
+        if not ssh.connect():
+            return jsonify({'success': False, 'error': 'Failed to connect to SSH server'}), 503
+        try:
+            result = ssh.follow(
+                paths,
+                consumer=request.args.get('consumer', 'http'),
+                from_start=request.args.get('from', 'start') != 'end',
+                final=request.args.get('final', 'false').lower() == 'true'
+            )
+        finally:
+            ssh.close()
+
+        if not result['success']:
+            return jsonify({'success': False, 'error': result['error'], 'files': result['files']}), 502
+        return jsonify({
+            'success': True,
+            'files': result['files'],
+            'lines': result['lines'],
+            'total': result['line_count']
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@logs_bp.route('/remote/reset', methods=['POST'])
+def reset_remote_logs():
+    """
+    清除远程日志的读取偏移，之后从头读取
+    POST /api/logs/remote/reset
+
+    请求体（JSON，可选）:
+    - paths: 要清除的路径列表，默认清除该跟踪者的全部偏移
+    - consumer: 跟踪者名称（默认 http）
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        paths = _remote_paths() or None
+        log_follow.offset_store.reset(data.get('consumer', 'http'), paths)
+        return jsonify({'success': True})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSH远程操作统计API路由
+"""
+
+from flask import request, jsonify
+from flask import Blueprint
+
+from ssh_metrics import command_metrics
+
+# 创建蓝图
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/ssh', methods=['GET'])
+def get_ssh_metrics():
+    """
+    获取按步骤汇总的SSH远程操作统计
+    GET /api/metrics/ssh
+
+    支持的查询参数:
+    - step: 可选，只返回该步骤的汇总
+    """
+    try:
+        summary = command_metrics.summary()
+        step = request.args.get('step')
+        if step:
+            if step not in summary['steps']:
+                return jsonify({'success': False, 'error': f'No metrics for step {step}'}), 404
+            summary['steps'] = {step: summary['steps'][step]}
+        return jsonify({'success': True, 'metrics': summary})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@metrics_bp.route('/ssh/samples', methods=['GET'])
+def get_ssh_samples():
+    """
+    获取最近的SSH远程操作明细
+    GET /api/metrics/ssh/samples
+
+    支持的查询参数:
+    - step: 可选，只返回该步骤的操作
+    - limit: 可选，最多返回的条数（默认100）
+    """
+    try:
+        limit = request.args.get('limit', 100, type=int)
+        samples = command_metrics.samples(step=request.args.get('step'), limit=limit)
+        return jsonify({'success': True, 'samples': samples, 'total': len(samples)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@metrics_bp.route('/ssh/dump', methods=['POST'])
+def dump_ssh_metrics():
+    """
+    把SSH远程操作统计导出为服务器上的JSON文件
+    POST /api/metrics/ssh/dump
+    """
+    try:
+        return jsonify({'success': True, 'path': command_metrics.dump()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@metrics_bp.route('/ssh/reset', methods=['POST'])
+def reset_ssh_metrics():
+    """
+    清空SSH远程操作统计
+    POST /api/metrics/ssh/reset
+    """
+    try:
+        command_metrics.reset()
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -13,7 +13,7 @@ from pathlib import Path
 
 from config import FLASK_CONFIG, LOGGING_CONFIG, DATABASE_URL, NOTIFICATION_CONFIG
 from models.database import db
-from api.routes import tasks_bp, workflows_bp, executions_bp, logs_bp, downloads_bp
+from api.routes import tasks_bp, workflows_bp, executions_bp, logs_bp, downloads_bp, metrics_bp
 from api.middleware import setup_middleware
 
 # 创建应用实例
@@ -49,6 +49,7 @@ app.register_blueprint(workflows_bp, url_prefix='/api/workflows')
 app.register_blueprint(executions_bp, url_prefix='/api/executions')
 app.register_blueprint(logs_bp, url_prefix='/api/logs')
 app.register_blueprint(downloads_bp, url_prefix='/api/downloads')
+app.register_blueprint(metrics_bp, url_prefix='/api/metrics')
 
 @app.route('/api/health')
 def health_check():
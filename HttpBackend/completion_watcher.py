@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+作业完成检查模块
+根据文件模板在本地计算所有run号的文件齐全情况。每次检查先获取相关目录的修改时间和条目数，
+目录未变化时沿用上次结果，否则用一条 find 命令重新遍历作业目录。
+可选由远程监视进程推送文件事件（file_events.py），文件生成后立即更新结果
+"""
+
+import time
+import fnmatch
+import posixpath
+from typing import Dict, Any, List, Optional, Callable, Iterable
+
+from poll_schedule import PollSchedule
+from file_events import FileEventStream, events_config
+
+
+class _Wildcard(dict):
+    """模板中 {run} 以外的占位符（如 {node}）按通配符 * 处理"""
+
+    def __missing__(self, key):
+        return '*'
+
+
+class CompletionWatcher:
+    """作业完成检查器（模板为相对作业目录的文件名，可以包含子目录）"""
+
+    def __init__(self, ssh, directory: str, runs: List[str], templates: Dict[str, str],
+                 keys: Optional[Iterable[str]] = None, log: Callable[[str], None] = print,
+                 step: Optional[str] = None):
+        """
+        Args:
+            ssh: TopupSSH 实例
+            directory: 作业目录
+            runs: run号列表
+            templates: 文件模板字典（键 -> 文件名模板）
+            keys: 需要检查的模板键，默认检查全部
+            log: 进度输出函数（步骤中传入 console_logs.append）
+            step: 步骤标识，用于按历史等待时长预测剩余时间
+        """
+        self.ssh = ssh
+        self.directory = directory.rstrip('/') or '/'
+        self.runs = list(runs)
+        self.templates = templates
+        self.keys = list(keys) if keys is not None else list(templates)
+        self.log = log
+        self.step = step
+        self.depth = max(templates[key].count('/') for key in self.keys) + 1
+        self.names = set()  # 最近一次遍历得到的全部相对路径
+        self._signatures: Optional[Dict[str, Any]] = None  # 目录路径 -> [修改时间, 条目数]
+        self._event_dirs: Dict[str, str] = {}              # 监视的目录路径 -> 相对目录
+
+    def pattern(self, key: str, run: str) -> str:
+        """某个run号的文件名（或通配符）"""
+        return self.templates[key].format_map(_Wildcard(run=run))
+
+    def exists(self, name: str) -> bool:
+        """最近一次遍历时作业目录中是否存在该文件（相对路径）"""
+        return name in self.names
+
+    def scan(self, runs: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        检查run号的文件是否齐全（目录未变化时不重新遍历）
+
+        Returns:
+            dict: complete_runs, incomplete_runs, missing（run号 -> 缺少的文件列表），
+                  changed（目录是否发生变化）
+        """
+        runs = runs if runs is not None else self.runs
+        paths = [posixpath.join(self.directory, parent) if parent else self.directory for parent in self._parents(runs)]
+        signatures = self.ssh.dir_signatures(paths)
+        changed = signatures != self._signatures
+        if changed:
+            entries = self.ssh.scan_tree(self.directory, self.depth)
+            self.names = {posixpath.relpath(entry['path'], self.directory) for entry in entries}
+            self._signatures = signatures
+        return dict(self._evaluate(runs), changed=changed)
+
+    def _parents(self, runs: List[str]) -> List[str]:
+        """模板所在的相对目录（'' 为作业目录本身）"""
+        return sorted({posixpath.dirname(self.pattern(key, run)) for key in self.keys for run in runs})
+
+    def _evaluate(self, runs: List[str]) -> Dict[str, Any]:
+        """按最近的目录内容计算run号的文件齐全情况（不访问远程）"""
+        complete_runs, incomplete_runs, missing = [], [], {}
+        for run in runs:
+            lacking = [self.pattern(key, run) for key in self.keys
+                       if not fnmatch.filter(self.names, self.pattern(key, run))]
+            if lacking:
+                incomplete_runs.append(run)
+                missing[run] = lacking
+            else:
+                complete_runs.append(run)
+        return {'complete_runs': complete_runs, 'incomplete_runs': incomplete_runs, 'missing': missing}
+
+    def _open_events(self) -> Optional[FileEventStream]:
+        """启动远程文件事件流，不可用时返回None（改用定期检查）"""
+        parents = self._parents(self.runs)
+        if any(char in parent for parent in parents for char in '*?['):
+            return None
+        self._event_dirs = {posixpath.join(self.directory, parent) if parent else self.directory: parent
+                            for parent in parents}
+        try:
+            stream = self.ssh.file_events(list(self._event_dirs))
+        except Exception as e:
+            self.log(f"[WARN] 文件事件不可用，使用定期检查: {str(e)}")
+            return None
+        self.log(f"[OK] 远程文件监视进程已启动（{len(self._event_dirs)} 个目录）")
+        return stream
+
+    def _apply_events(self, events: List[Dict[str, Any]]) -> int:
+        """按文件事件更新文件列表，返回新增和删除的文件数"""
+        files = 0
+        for event in events:
+            parent = self._event_dirs.get(event['dir'])
+            if parent is None:
+                continue
+            self.names.update(posixpath.join(parent, name) for name in event.get('created', []))
+            self.names.difference_update(posixpath.join(parent, name) for name in event.get('removed', []))
+            files += len(event.get('created', [])) + len(event.get('removed', []))
+        # 文件列表已不对应上次获取的目录状态，下一次完整检查时重新遍历
+        self._signatures = None
+        return files
+
+    def wait(self, max_wait_minutes: int, check_interval: Optional[int] = None,
+             abort: Optional[Callable[['CompletionWatcher'], Optional[str]]] = None,
+             events: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        定期检查，直到所有run号的文件都已生成或超时（检查间隔按进展调整，超时按单调时钟计算）
+
+        使用文件事件时，第一次检查后改为等待远程推送的事件，每隔 verify_interval 秒和到截止时间时
+        仍做一次完整检查；事件流无法启动或中途断开时改用定期检查。
+
+        Args:
+            max_wait_minutes: 最大等待时间（分钟）
+            check_interval: 基础检查间隔（秒），默认使用 COMPLETION_CHECK_CONFIG
+            abort: 每次检查后调用，返回非空字符串时立即停止等待（如检测到数据异常文件）
+            events: 是否使用文件事件，默认使用 FILE_EVENTS_CONFIG
+
+        Returns:
+            dict: complete_runs, incomplete_runs, missing, elapsed_time,
+                  eta_seconds（预计剩余秒数，无法预测时为None）, aborted（停止原因，未停止为None）
+        """
+        settings = events_config()
+        max_wait_seconds = int(max_wait_minutes) * 60
+        schedule = PollSchedule(max_wait_seconds, len(self.runs), step=self.step, base_interval=check_interval)
+
+        incomplete_runs = self.runs.copy()
+        missing: Dict[str, List[str]] = {}
+        aborted = None
+        stream = self._open_events() if (settings['enabled'] if events is None else events) else None
+        last_scan: Optional[float] = None
+
+        try:
+            while True:
+                result = None
+                if stream is not None and last_scan is not None:
+                    until = min(schedule.deadline, last_scan + settings['verify_interval'])
+                    try:
+                        received = stream.wait(max(0.0, until - time.monotonic()))
+                    except ConnectionError as e:
+                        self.log(f"[WARN] 文件事件流中断，改用定期检查: {str(e)}")
+                        stream.close()
+                        stream = None
+                        received = []
+                    if received:
+                        files = self._apply_events(received)
+                        result = dict(self._evaluate(incomplete_runs), changed=True)
+                        incomplete_runs = result['incomplete_runs']
+                        missing = result['missing']
+                        self.log(f"\n文件事件: {files} 个文件变化，已完成 "
+                                 f"{len(self.runs) - len(incomplete_runs)}/{len(self.runs)}")
+
+                if result is None:
+                    self.log(f"\n检查进度: {int(schedule.elapsed())}/{max_wait_seconds}秒")
+                    self.log(f"未完成的run号: {incomplete_runs}")
+
+                    try:
+                        result = self.scan(incomplete_runs)
+                        last_scan = time.monotonic()
+                    except Exception as e:
+                        self.log(f"  检查失败: {str(e)}")
+
+                    if result is not None and not result['changed']:
+                        self.log("  目录未变化，沿用上次检查结果")
+                    elif result is not None:
+                        incomplete_runs = result['incomplete_runs']
+                        missing = result['missing']
+                        for run in incomplete_runs:
+                            self.log(f"  Run {run}: 缺少 {', '.join(missing[run])}")
+                schedule.observe(len(self.runs) - len(incomplete_runs),
+                                 changed=result is not None and result['changed'])
+
+                if not incomplete_runs:
+                    self.log(f"\n[OK] 所有 {len(self.runs)} 个run号的文件都已生成")
+                    schedule.finish()
+                    break
+
+                if result is not None and abort is not None:
+                    aborted = abort(self)
+                    if aborted:
+                        break
+
+                if schedule.expired():
+                    break
+
+                if stream is not None and result is not None:
+                    continue
+
+                interval = schedule.next_interval()
+                prediction = schedule.eta()
+                if prediction is not None:
+                    self.log(f"  预计剩余: {int(prediction[0])}秒（依据{prediction[1]}），{int(interval)}秒后再次检查")
+                time.sleep(interval)
+        finally:
+            if stream is not None:
+                stream.close()
+
+        prediction = schedule.eta()
+        return {
+            'complete_runs': [run for run in self.runs if run not in incomplete_runs],
+            'incomplete_runs': incomplete_runs,
+            'missing': {run: missing[run] for run in incomplete_runs if run in missing},
+            'elapsed_time': int(schedule.elapsed()),
+            'eta_seconds': int(prediction[0]) if prediction is not None else None,
+            'aborted': aborted
+        }
@@ -74,6 +74,41 @@ TASK_CONFIG = {
     'step_check_interval': int(os.getenv('STEP_CHECK_INTERVAL', '5')),
 }
 
+# 作业完成检查配置（completion_watcher.py）
+COMPLETION_CHECK_CONFIG = {
+    'check_interval': int(os.getenv('COMPLETION_CHECK_INTERVAL', '30')),  # 检查间隔（秒），有进展时使用的基础间隔
+}
+
+# 轮询调度配置（poll_schedule.py，按进展调整检查间隔并预测剩余时间）
+POLL_SCHEDULE_CONFIG = {
+    'min_interval': int(os.getenv('POLL_MIN_INTERVAL', '5')),           # 接近预计完成时间时的最短间隔（秒）
+    'max_interval': int(os.getenv('POLL_MAX_INTERVAL', '120')),         # 长时间没有进展时退避到的最长间隔（秒）
+    'backoff_factor': float(os.getenv('POLL_BACKOFF_FACTOR', '1.5')),   # 没有进展时间隔的增长倍数
+    'history_file': str(BASE_DIR / '.step_durations'),                  # 各步骤历史等待时长记录
+    'history_size': 20,
+}
+
+# 文件事件配置（file_events.py，等待作业结果时由远程监视进程推送文件事件，失败时自动改用定期检查）
+FILE_EVENTS_CONFIG = {
+    'enabled': os.getenv('FILE_EVENTS_ENABLED', 'false').lower() == 'true',
+    'backend': os.getenv('FILE_EVENTS_BACKEND', 'poll'),   # poll: 服务器本地定期列目录；inotify: inotifywait（共享文件系统上可能收不到计算节点写入的事件）
+    'scan_interval': 2,            # poll方式在服务器本地列目录的间隔（秒）
+    'verify_interval': 300,        # 使用文件事件时完整检查的间隔（秒）
+    'coalesce': 1.0,               # 收到事件后继续收集的时间（秒）
+    'python': None,
+    'start_timeout': 15,
+}
+
+# 作业结果文件模板（相对作业目录，{run} 为run号）
+REQUIRED_FILES_STEP1 = {
+    'job_file': 'rec{run}_1.txt',
+    'error_file': 'rec{run}_1.txt.bosserr',
+    'log_file': 'rec{run}_1.txt.bosslog',
+    'root_file': 'InjSigTime_00{run}_720.root',
+    'png_file': 'Interval_run{run}.png',
+    'txt_file': 'Interval_run{run}.txt',
+}
+
 # 工作流配置路径
 WORKFLOW_CONFIG_DIR = BASE_DIR / 'workflows'
 
@@ -95,7 +130,118 @@ SSH_CONFIG = {
             "username": "topup",
             "env_password": "SSH_PASS_BESLOGIN"
         }
-    }
+    },
+    # 其他候选跳板机和目标登录节点，格式: 主机[:端口],主机[:端口]（如 SSH_JUMP_HOSTS=lxlogin02.ihep.ac.cn,lxlogin03.ihep.ac.cn）
+    "jump_hosts": [
+        {"host": item.split(':')[0], "port": int(item.split(':')[1]) if ':' in item else 22}
+        for item in os.getenv('SSH_JUMP_HOSTS', '').split(',') if item.strip()
+    ],
+    "targets": [
+        {"host": item.split(':')[0], "port": int(item.split(':')[1]) if ':' in item else 22}
+        for item in os.getenv('SSH_TARGETS', '').split(',') if item.strip()
+    ]
+}
+
+# 执行方式配置（local_executor.py）
+# ssh: 经 lxlogin → beslogin 双跳SSH执行；local: 服务直接部署在 beslogin 上时，用本地子进程和文件操作执行
+EXECUTOR_CONFIG = {
+    'mode': os.getenv('TOPUP_EXECUTOR', 'ssh'),
+    'shell': os.getenv('EXECUTOR_SHELL', '/bin/bash'),
+    'workdir': os.getenv('EXECUTOR_WORKDIR') or None,  # 命令的工作目录和相对路径的基准，默认用户主目录
+}
+
+# 连接路径选择配置（多个跳板机/目标节点时按握手和通道往返耗时选择最快的健康路径）
+SSH_PATH_CONFIG = {
+    'state_file': os.getenv('SSH_PATH_STATE_FILE', str(BASE_DIR / '.ssh_path_health')),
+    'ewma_alpha': float(os.getenv('SSH_PATH_EWMA_ALPHA', '0.3')),
+    'handshake_weight': float(os.getenv('SSH_PATH_HANDSHAKE_WEIGHT', '0.1')),
+    'failure_cooldown': int(os.getenv('SSH_PATH_FAILURE_COOLDOWN', '60')),
+    'max_cooldown': int(os.getenv('SSH_PATH_MAX_COOLDOWN', '1800')),
+    'slow_threshold_ms': float(os.getenv('SSH_PATH_SLOW_THRESHOLD_MS', '2000')),
+    'switch_when_slow': os.getenv('SSH_PATH_SWITCH_WHEN_SLOW', 'true').lower() == 'true',
+    'spread_tolerance': float(os.getenv('SSH_PATH_SPREAD_TOLERANCE', '0.2')),
+    'stale_hours': float(os.getenv('SSH_PATH_STALE_HOURS', '24')),
+}
+
+# SSH连接池配置（所有任务共享一条双跳连接，按需租用通道）
+SSH_POOL_CONFIG = {
+    'max_channels': int(os.getenv('SSH_POOL_MAX_CHANNELS', '8')),
+    'idle_linger_seconds': int(os.getenv('SSH_POOL_IDLE_LINGER', '600')),  # 暂停/空闲时保留连接的秒数
+    'channel_wait_timeout': int(os.getenv('SSH_POOL_CHANNEL_WAIT', '300')),
+    'keepalive_interval': int(os.getenv('SSH_KEEPALIVE_INTERVAL', '30')),
+    'probe_after_idle_seconds': int(os.getenv('SSH_PROBE_AFTER_IDLE', '60')),
+    'probe_timeout': int(os.getenv('SSH_PROBE_TIMEOUT', '10')),
+    'reconnect_attempts': int(os.getenv('SSH_RECONNECT_ATTEMPTS', '5')),
+    'reconnect_backoff_max': int(os.getenv('SSH_RECONNECT_BACKOFF_MAX', '30')),
+    'replay_attempts': int(os.getenv('SSH_REPLAY_ATTEMPTS', '2')),
+}
+
+# SSH远程操作统计配置（按步骤统计往返次数、耗时分位数和收发字节数，GET /api/metrics/ssh 查看）
+SSH_METRICS_CONFIG = {
+    'enabled': os.getenv('SSH_METRICS_ENABLED', 'true').lower() == 'true',
+    'max_samples': int(os.getenv('SSH_METRICS_MAX_SAMPLES', '5000')),
+    'max_step_samples': int(os.getenv('SSH_METRICS_MAX_STEP_SAMPLES', '2000')),
+    'dump_dir': os.getenv('SSH_METRICS_DUMP_DIR', 'logs'),
+    'dump_on_exit': False,
+}
+
+# 远程日志跟踪配置（只读取远程日志新增的内容，GET /api/logs/remote 查看）
+LOG_FOLLOW_CONFIG = {
+    'state_file': os.getenv('LOG_FOLLOW_STATE_FILE', str(BASE_DIR / '.follow_offsets')),
+    'read_limit': int(os.getenv('LOG_FOLLOW_READ_LIMIT', str(1024 * 1024))),
+    'poll_interval': float(os.getenv('LOG_FOLLOW_POLL_INTERVAL', '2')),
+    'encoding': os.getenv('LOG_FOLLOW_ENCODING', 'utf-8'),
+}
+
+# 交互式shell预热配置（genJob.sh 等交互式命令复用已初始化的shell）
+SHELL_POOL_CONFIG = {
+    'size': int(os.getenv('SHELL_POOL_SIZE', '2')),
+    'init_commands': [cmd for cmd in os.getenv('SHELL_INIT_COMMANDS', 'source ~/w720').split(';') if cmd.strip()],
+    'ready_timeout': int(os.getenv('SHELL_READY_TIMEOUT', '60')),
+    'settle_timeout': int(os.getenv('SHELL_SETTLE_TIMEOUT', '0')),
+    'error_patterns': [],
+}
+
+# 传输参数方案（连接级：压缩、加密算法；通道级：流控窗口、最大包长）
+DEFAULT_TRANSPORT_PROFILE = os.getenv('SSH_TRANSPORT_PROFILE', 'latency')
+TRANSPORT_PROFILES = {
+    'latency': {
+        'compress': False,
+        'ciphers': ['aes128-gcm@openssh.com', 'aes128-ctr'],
+        'window_size': None,
+        'max_packet_size': None,
+    },
+    'bulk': {
+        'compress': True,
+        'ciphers': ['aes128-gcm@openssh.com', 'aes128-ctr'],
+        'window_size': int(os.getenv('SSH_BULK_WINDOW_SIZE', str(16 * 1024 * 1024))),
+        'max_packet_size': 32768,
+    },
+}
+
+# 命令输出缓冲配置（超过内存上限的输出写入临时文件）
+OUTPUT_BUFFER_CONFIG = {
+    'max_memory_chars': int(os.getenv('OUTPUT_MAX_MEMORY_CHARS', '1000000')),
+    'spill_to_disk': os.getenv('OUTPUT_SPILL_TO_DISK', 'true').lower() == 'true',
+    'spill_dir': os.getenv('OUTPUT_SPILL_DIR') or None,
+    'preview_chars': int(os.getenv('OUTPUT_PREVIEW_CHARS', '4096')),
+}
+
+# 只读查询缓存配置（ls 等只读命令，写命令自动使相关路径失效）
+# QUERY_CACHE_PATH_TTLS 格式: 路径通配符=秒数;路径通配符=秒数（*可跨越/）
+QUERY_CACHE_CONFIG = {
+    'enabled': os.getenv('QUERY_CACHE_ENABLED', 'true').lower() == 'true',
+    'default_ttl': float(os.getenv('QUERY_CACHE_DEFAULT_TTL', '0')),
+    'path_ttls': {
+        pattern.strip(): float(ttl)
+        for pattern, ttl in (
+            item.rsplit('=', 1) for item in os.getenv(
+                'QUERY_CACHE_PATH_TTLS',
+                '/bes3fs/offline/data/cal/round[0-9]*=600;/besfs5/groups/cal/topup/round[0-9]*/DataValid/InjSigTimeCal=300'
+            ).split(';') if '=' in item
+        )
+    },
+    'max_entries': int(os.getenv('QUERY_CACHE_MAX_ENTRIES', '512')),
 }
 
 # 通知配置
@@ -17,6 +17,8 @@ from typing import Dict, Any, Optional, List
 from datetime import datetime
 
 from topup_ssh import TopupSSH
+from output_stream import OutputBuffer
+from ssh_metrics import command_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -98,24 +100,33 @@ class StepExecutor:
 
                 # 执行步骤
                 logger.info(f"Executing {module_name}.{function_name}")
-                execution_result = step_function(**valid_params)
+                with command_metrics.step_scope(step_name, execution_id):
+                    execution_result = step_function(**valid_params)
 
             except Exception as e:
                 logger.error(f"Parameter validation failed for {function_name}: {str(e)}")
                 raise ValueError(f"参数验证失败: {str(e)}")
 
-            # 提取console_logs并保存到console_output
+            # 提取console_logs并保存到console_output（超过内存上限时只保留首尾预览，完整内容写入临时文件）
             console_logs = execution_result.get('console_logs', [])
+            console_buffer = OutputBuffer()
             if isinstance(console_logs, list):
-                result['console_output'] = '\n'.join(console_logs)
-            else:
-                result['console_output'] = str(console_logs) if console_logs else ''
+                for index, line in enumerate(console_logs):
+                    console_buffer.write(('\n' if index else '') + str(line))
+            elif console_logs:
+                console_buffer.write(str(console_logs))
+            console_fields = console_buffer.to_result('console_output')
+            result['console_output'] = console_fields.pop('console_output')
 
             # 保存完整的返回值JSON（排除已经单独存储的字段）
             result['step_result_json'] = {
                 k: v for k, v in execution_result.items()
                 if k not in ['success', 'message', 'error', 'console_logs']
             }
+            if console_buffer.spill_path:
+                result['step_result_json']['console_output_file'] = console_buffer.spill_path
+            # 本次执行该步骤的连接路径（跳板机→目标节点 -> 操作数，按 execution_id 统计，不含并发任务的同名步骤）
+            result['step_result_json']['ssh_paths'] = command_metrics.execution_paths(execution_id)
 
             # 处理执行结果
             result.update(self._process_execution_result(execution_result))
@@ -16,7 +16,7 @@ from models.task import Task, TaskExecution, StepOutput, TaskLog
 from core.workflow_parser import workflow_parser
 from core.step_executor import StepExecutor
 from core.state_manager import state_manager, TaskStatus, StepStatus
-from topup_ssh import TopupSSH
+from local_executor import create_executor
 from services.notification_service import emit_progress_update, emit_status_update
 
 logger = logging.getLogger(__name__)
@@ -36,7 +36,7 @@ class TaskEngine:
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
         self.active_tasks = {}  # task_id -> future
         self.running_locks = {}  # task_id -> threading.Lock
-        self.ssh_clients = {}  # task_id -> TopupSSH
+        self.ssh_clients = {}  # task_id -> 执行器（create_executor 返回的 TopupSSH 或 LocalExecutor）
 
     def start_task(self, task_id: int) -> Dict[str, Any]:
         """
@@ -64,8 +64,8 @@ class TaskEngine:
             # 创建任务锁
             self.running_locks[task_id] = threading.Lock()
 
-            # 创建SSH连接
-            ssh_client = TopupSSH()
+            # 从共享连接池租用SSH连接（已有可用连接时不再重复双跳握手）
+            ssh_client = create_executor()
             if not ssh_client.connect():
                 return {'success': False, 'error': 'Failed to connect to SSH server, please retry later or contact support'}
 
@@ -112,7 +112,7 @@ class TaskEngine:
             task.status = 'paused'
             db.session.commit()
 
-            # 关闭SSH连接，避免长时间暂停后连接超时
+            # 归还SSH连接租约，连接池在空闲保留期后自动断开，避免长时间暂停后连接超时
             self._close_ssh(task_id)
 
             emit_status_update(task_id, 'paused', 'Task paused')
@@ -164,8 +164,8 @@ class TaskEngine:
             resume_step = retry_from_step or task.pause_at_step
             task.resume_from_step = resume_step
 
-            # 重新建立SSH连接
-            ssh_client = TopupSSH()
+            # 重新租用SSH连接（连接池中的连接失效时自动重新握手）
+            ssh_client = create_executor()
             if not ssh_client.connect():
                 return {'success': False, 'error': 'Failed to reconnect SSH, please retry later'}
             self.ssh_clients[task_id] = ssh_client
@@ -462,7 +462,7 @@ class TaskEngine:
             logger.error(f"Task {task_id} failed: {error_message}")
 
     def _close_ssh(self, task_id: int):
-        """关闭并移除SSH连接"""
+        """归还并移除任务的SSH连接租约"""
         if task_id in self.ssh_clients:
             try:
                 self.ssh_clients[task_id].close()
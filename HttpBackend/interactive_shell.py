@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+交互式shell模块
+封装一个预先初始化（关闭回显、清空提示符、加载环境）的交互式shell，
+通过输出中的随机标记判断shell就绪和命令结束，可在多次调用之间复用
+"""
+
+import re
+import time
+import codecs
+import uuid
+import selectors
+from typing import Optional, List, Dict, Any, Callable
+
+import paramiko
+
+from output_stream import OutputBuffer, StreamMatcher
+
+# 每次从通道读取的最大字节数
+_RECV_CHUNK_SIZE = 32768
+
+
+class InteractiveShell:
+    """
+    可复用的交互式shell
+
+    初始化时关闭终端回显并清空PS1/PS2，随后发送一条打印随机标记的命令，
+    读到该标记即表示shell已就绪（不再固定等待2秒）；
+    每条命令后追加一条打印“结束标记:退出码”的命令，读到结束标记即表示命令执行完毕，
+    shell回到可用状态，可以归还给连接池供下一次调用使用。
+    命令的标准输入重定向到 /dev/null，读取输入的命令（如脚本中的提示）不会吞掉结束标记命令。
+    """
+
+    def __init__(self, channel: paramiko.Channel, generation: int):
+        """
+        初始化交互式shell
+
+        Args:
+            channel: 已打开的会话通道（尚未 invoke_shell）
+            generation: 打开通道时连接池的连接代数，重连后旧shell不再复用
+        """
+        self.channel = channel
+        self.generation = generation
+        self.commands_run = 0
+        # 增量解码，多字节字符被拆在两次读取之间时不会丢失
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+
+    def initialize(self, init_commands: Optional[List[str]] = None, timeout: float = 60):
+        """
+        启动shell并完成初始化
+
+        Args:
+            init_commands: 初始化时执行的命令（如 source 环境脚本）
+            timeout: 等待shell就绪的超时时间（秒）
+
+        Raises:
+            TimeoutError: 超时仍未就绪
+        """
+        self.channel.get_pty(term='dumb', width=1000)
+        self.channel.invoke_shell()
+        setup = [
+            "stty -echo",
+            "bind 'set enable-bracketed-paste off' 2>/dev/null",
+            "export PS1='' PS2=''",
+            "unset PROMPT_COMMAND"
+        ]
+        self.channel.send('\n'.join(setup + list(init_commands or [])) + '\n')
+        if not self.sync(timeout):
+            raise TimeoutError(f'交互式shell初始化超时（{timeout}秒）')
+
+    def sync(self, timeout: float = 30) -> bool:
+        """
+        发送同步标记并丢弃标记之前的全部输出（登录信息、提示符等）
+
+        Args:
+            timeout: 超时时间（秒）
+
+        Returns:
+            bool: 是否在超时前读到同步标记
+        """
+        token = uuid.uuid4().hex
+        # 标记由printf拼接输出，命令文本本身不包含完整标记，回显时也不会误匹配
+        self.channel.send(f"printf '%s_%s\\n' __TOPUP_SYNC {token}\n")
+        pattern = re.compile(f"__TOPUP_SYNC_{token}")
+        return self._read_until(pattern, time.monotonic() + timeout) is not None
+
+    def run(self, command: str, patterns: Dict[str, str], timeout: Optional[float] = None,
+            settle_timeout: float = 0, on_chunk: Optional[Callable[[str], None]] = None,
+            output: Optional[OutputBuffer] = None) -> Dict[str, Any]:
+        """
+        在shell中执行命令，直到命令结束或任一模式出现
+
+        Args:
+            command: 要执行的命令
+            patterns: 模式名 -> 正则表达式（如 {'success': 'DONE', 'error': 'Error|failed'}），
+                      第一个出现的模式决定结果
+            timeout: 总超时时间（秒），None表示不限时
+            settle_timeout: 匹配到模式后继续等待结束标记的时间（秒），默认0即只读取已到达的输出后立即返回；
+                            未读到结束标记时 finished 为False，该shell不再复用
+            on_chunk: 每收到一段输出时调用的回调
+            output: 输出缓冲，默认新建 OutputBuffer（有界内存）
+
+        Returns:
+            dict: 包含matched（模式名或None）, match_text, finished, timed_out, exit_code,
+                  output（OutputBuffer）
+        """
+        token = uuid.uuid4().hex
+        sentinel = f"__TOPUP_END_{token}:"
+        end_pattern = re.compile(re.escape(sentinel) + r"(\d+)\r?\n")
+        # 命令放在 { } 中执行（仍在当前shell，cd/export 等照常生效），stdin 指向 /dev/null
+        self.channel.send(
+            f"{{ {command}\n}} </dev/null\n"
+            f"__topup_rc=$?; cd; printf '%s_%s:%d\\n' __TOPUP_END {token} $__topup_rc\n"
+        )
+        self.commands_run += 1
+
+        output = output if output is not None else OutputBuffer()
+        matcher = StreamMatcher(patterns)
+        matched = None
+        match_text = None
+        pending = ''
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        settle_deadline = None
+
+        while True:
+            limits = [d for d in (deadline, settle_deadline) if d is not None]
+            chunk = self._recv(min(limits) if limits else None)
+            if chunk is None:
+                output.write(pending)
+                return {
+                    'matched': matched,
+                    'match_text': match_text,
+                    'finished': False,
+                    'timed_out': matched is None,
+                    'exit_code': None,
+                    'output': output
+                }
+
+            pending += chunk
+            end_match = end_pattern.search(pending)
+            if end_match:
+                emit, pending = pending[:end_match.start()], ''
+            else:
+                # 末尾可能是被拆开的结束标记，暂不输出，等下一段数据
+                hold = self._partial_length(pending, sentinel)
+                emit, pending = pending[:len(pending) - hold], pending[len(pending) - hold:]
+
+            if emit:
+                output.write(emit)
+                if on_chunk:
+                    on_chunk(emit)
+
+                # 滚动窗口匹配，标记跨两次读取时也能识别
+                hits = matcher.feed(emit)
+                if matched is None and hits:
+                    matched, match_text = hits[0]
+                    settle_deadline = time.monotonic() + settle_timeout
+
+            if end_match:
+                return {
+                    'matched': matched,
+                    'match_text': match_text,
+                    'finished': True,
+                    'timed_out': False,
+                    'exit_code': int(end_match.group(1)),
+                    'output': output
+                }
+
+    @staticmethod
+    def _partial_length(text: str, sentinel: str) -> int:
+        """text 末尾可能属于结束标记的字符数"""
+        index = text.find(sentinel)
+        if index >= 0:
+            return len(text) - index
+        for length in range(min(len(sentinel) - 1, len(text)), 0, -1):
+            if text.endswith(sentinel[:length]):
+                return length
+        return 0
+
+    def is_usable(self, generation: int) -> bool:
+        """shell是否仍可复用（通道未关闭且属于当前连接）"""
+        return not self.channel.closed and self.generation == generation
+
+    def _read_until(self, pattern: 're.Pattern', deadline: float) -> Optional['re.Match']:
+        """读取输出直到匹配 pattern，超时返回None"""
+        buffer = ''
+        while True:
+            chunk = self._recv(deadline)
+            if chunk is None:
+                return None
+            buffer = (buffer + chunk)[-65536:]
+            match = pattern.search(buffer)
+            if match:
+                return match
+
+    def _recv(self, deadline: Optional[float]) -> Optional[str]:
+        """
+        阻塞等待下一段输出（不按固定间隔轮询）
+
+        Returns:
+            str: 输出文本，超时返回None
+
+        Raises:
+            ConnectionError: 通道已关闭
+        """
+        selector = selectors.DefaultSelector()
+        selector.register(self.channel, selectors.EVENT_READ)
+        try:
+            while not self.channel.recv_ready():
+                if self.channel.closed or self.channel.eof_received:
+                    raise ConnectionError('交互式shell通道已关闭')
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                selector.select(remaining)
+        finally:
+            selector.close()
+        data = self.channel.recv(_RECV_CHUNK_SIZE)
+        if not data:
+            raise ConnectionError('交互式shell通道已关闭')
+        return self._decoder.decode(data)
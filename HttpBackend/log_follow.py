@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+远程日志跟踪模块
+按文件记录已读取的字节偏移，每次只读取远程文件（.bosslog、.bosserr、.err.{node} 等）新增的内容并按行拆分，
+偏移保存在本地状态文件中，多次调用（或进程重启）之间不会重复读取整个文件
+"""
+
+import os
+import json
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+
+import paramiko
+
+import config
+
+
+def follow_config() -> Dict[str, Any]:
+    """读取日志跟踪配置（缺省项使用默认值）"""
+    defaults = {
+        'state_file': os.path.join(os.path.dirname(os.path.abspath(__file__)), '.follow_offsets'),
+        'read_limit': 1024 * 1024,
+        'poll_interval': 2,
+        'encoding': 'utf-8'
+    }
+    defaults.update(getattr(config, 'LOG_FOLLOW_CONFIG', {}))
+    return defaults
+
+
+def split_lines(data: bytes, final: bool = False, limit_reached: bool = False,
+                encoding: str = 'utf-8') -> Tuple[List[str], int]:
+    """
+    把新增字节拆分为完整的行
+
+    末尾不完整的行不返回，也不计入已消费字节，下次读取时从该行开头重新读取；
+    final 为True（文件不会再增长）时末尾不完整的行也作为一行返回。
+    一次读取达到上限且其中没有换行符时（单行超过读取上限），整块作为一行返回，避免偏移停滞。
+
+    Args:
+        data: 新增字节
+        final: 是否返回末尾不完整的行
+        limit_reached: 本次读取是否达到读取上限
+        encoding: 文本编码（无法解码的字节替换为占位符）
+
+    Returns:
+        tuple: (行列表（不含换行符）, 已消费的字节数)
+    """
+    end = data.rfind(b'\n') + 1
+    if final or (end == 0 and limit_reached):
+        end = len(data)
+    if end == 0:
+        return [], 0
+    text = data[:end].decode(encoding, errors='replace')
+    return text.splitlines(), end
+
+
+def read_appended(sftp: paramiko.SFTPClient, positions: Dict[str, int], read_limit: Optional[int] = None,
+                  final: bool = False, encoding: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    在一个SFTP会话上读取多个远程文件从指定偏移开始新增的完整行
+
+    Args:
+        sftp: SFTP客户端
+        positions: 路径 -> 已读取的字节偏移（-1 表示从文件当前末尾开始，不读取已有内容）
+        read_limit: 每个文件本次最多读取的字节数，默认使用 config.LOG_FOLLOW_CONFIG['read_limit']
+        final: 是否返回末尾不完整的行（见 split_lines）
+        encoding: 文本编码
+
+    Returns:
+        dict: 路径 -> {exists, size, offset（本次读取的起始偏移）, next_offset（下次读取的偏移）,
+              lines（新增的行）, truncated（文件变短，视为被截断或替换，从头读取）,
+              remaining（达到读取上限后尚未读取的字节数）, requests（SFTP请求数）}
+    """
+    settings = follow_config()
+    read_limit = read_limit or settings['read_limit']
+    encoding = encoding or settings['encoding']
+
+    results = {}
+    for path, offset in positions.items():
+        entry = {'exists': False, 'size': 0, 'offset': 0, 'next_offset': 0, 'lines': [],
+                 'truncated': False, 'remaining': 0, 'requests': 1}
+        results[path] = entry
+        try:
+            with sftp.open(path, 'rb') as f:
+                size = f.stat().st_size
+                entry['requests'] += 1
+                entry.update(exists=True, size=size)
+                if offset < 0:
+                    entry.update(offset=size, next_offset=size)
+                    continue
+                if size < offset:
+                    entry['truncated'] = True
+                    offset = 0
+                entry.update(offset=offset, next_offset=offset)
+                if size == offset:
+                    continue
+                f.seek(offset)
+                length = min(read_limit, size - offset)
+                data = f.read(length)
+                entry['requests'] += 1
+        except IOError:
+            continue
+
+        limit_reached = len(data) >= read_limit
+        lines, consumed = split_lines(data, final=final, limit_reached=limit_reached, encoding=encoding)
+        entry.update(lines=lines, next_offset=offset + consumed, remaining=size - offset - len(data))
+    return results
+
+
+class FollowOffsetStore:
+    """
+    跟踪偏移存储（JSON状态文件，跟踪者 -> 路径 -> {offset, size}）
+
+    不同的跟踪者（轮询循环、HTTP客户端等）各自记录偏移，互不影响。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化存储
+
+        Args:
+            path: 状态文件路径，默认使用 config.LOG_FOLLOW_CONFIG['state_file']
+        """
+        self.path = path or follow_config()['state_file']
+        self._lock = threading.Lock()
+
+    def get(self, consumer: str) -> Dict[str, Dict[str, int]]:
+        """获取跟踪者的全部偏移"""
+        with self._lock:
+            return self._load().get(consumer, {})
+
+    def update(self, consumer: str, positions: Dict[str, Dict[str, int]]):
+        """更新跟踪者的偏移（只覆盖给出的路径）"""
+        with self._lock:
+            state = self._load()
+            state.setdefault(consumer, {}).update(positions)
+            self._save(state)
+
+    def reset(self, consumer: str, paths: Optional[List[str]] = None):
+        """清除跟踪者的偏移（paths 为空时清除全部），之后从头读取"""
+        with self._lock:
+            state = self._load()
+            if consumer not in state:
+                return
+            if paths is None:
+                del state[consumer]
+            else:
+                for path in paths:
+                    state[consumer].pop(path, None)
+            self._save(state)
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, state: Dict[str, Dict[str, Dict[str, int]]]):
+        # 先写临时文件再改名，进程中途退出不会留下损坏的状态文件
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+
+# 进程内共用的偏移存储
+offset_store = FollowOffsetStore()
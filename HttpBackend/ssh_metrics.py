@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSH命令统计模块
+记录每次远程操作的排队等待、执行耗时、收发字节数、退出码和所属步骤，
+按步骤汇总分位数和往返次数，运行结束时可导出为JSON，用于定位往返最多、最慢的步骤
+"""
+
+import os
+import re
+import json
+import math
+import time
+import threading
+import contextvars
+from collections import deque, Counter, OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+import config
+
+# 未标记步骤的操作归入该分组
+UNTAGGED_STEP = '-'
+
+# 按执行ID统计连接路径时最多保留的执行数（超出时丢弃最早的）
+_MAX_EXECUTIONS = 1000
+
+
+def _metrics_config() -> Dict[str, Any]:
+    """读取统计配置（缺省项使用默认值）"""
+    defaults = {
+        'enabled': True,
+        'max_samples': 5000,
+        'max_step_samples': 2000,
+        'dump_dir': 'logs',
+        'dump_on_exit': True
+    }
+    defaults.update(getattr(config, 'SSH_METRICS_CONFIG', {}))
+    return defaults
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """按最近秩法计算分位数（values 为空时返回0）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _distribution(values: List[float]) -> Dict[str, float]:
+    """耗时分布（毫秒）"""
+    return {
+        'p50': percentile(values, 0.50) * 1000,
+        'p90': percentile(values, 0.90) * 1000,
+        'p99': percentile(values, 0.99) * 1000,
+        'max': max(values) * 1000 if values else 0.0
+    }
+
+
+def _program(command: str, default: str) -> str:
+    """命令的主程序名（跳过开头的 cd/source 等准备命令）"""
+    for segment in re.split(r'&&|\|\||[;|\n]', command):
+        words = segment.split()
+        if words and words[0] not in ('cd', 'source', '.', 'export'):
+            return words[0].rsplit('/', 1)[-1]
+    return default
+
+
+class _StepStats:
+    """单个步骤的累计统计（耗时只保留最近 max_step_samples 个样本用于分位数）"""
+
+    def __init__(self, max_samples: int):
+        self.operations = 0
+        self.round_trips = 0
+        self.failures = 0
+        self.cached = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.busy_seconds = 0.0
+        self.queue_seconds = 0.0
+        self.kinds: Counter = Counter()
+        self.programs: Counter = Counter()
+        self.paths: Counter = Counter()
+        self.latencies: deque = deque(maxlen=max_samples)
+        self.queue_waits: deque = deque(maxlen=max_samples)
+
+    def add(self, sample: Dict[str, Any]):
+        self.operations += 1
+        self.round_trips += sample['round_trips']
+        self.cached += 1 if sample['cached'] else 0
+        self.failures += 1 if sample['exit_code'] not in (0, None) or sample['error'] else 0
+        self.bytes_in += sample['bytes_in']
+        self.bytes_out += sample['bytes_out']
+        self.busy_seconds += sample['latency']
+        self.queue_seconds += sample['queue_wait']
+        self.kinds[sample['kind']] += 1
+        self.programs[sample['program']] += sample['round_trips']
+        if sample.get('path'):
+            self.paths[sample['path']] += 1
+        self.latencies.append(sample['latency'])
+        self.queue_waits.append(sample['queue_wait'])
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'operations': self.operations,
+            'round_trips': self.round_trips,
+            'failures': self.failures,
+            'cached': self.cached,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'busy_seconds': self.busy_seconds,
+            'queue_seconds': self.queue_seconds,
+            'kinds': dict(self.kinds),
+            'top_programs': self.programs.most_common(5),
+            'paths': dict(self.paths),
+            'latency_ms': _distribution(list(self.latencies)),
+            'queue_wait_ms': _distribution(list(self.queue_waits))
+        }
+
+
+class CommandMetrics:
+    """
+    远程操作统计
+
+    每次远程操作（命令、批量命令、交互式命令、SFTP查询、下载）记录一个样本：
+    排队等待（等待通道名额/shell）、执行耗时（不含排队）、收发字节数、退出码、使用的通道号，
+    以及当前上下文所在的步骤（见 step_scope）。样本只保留最近 max_samples 个，
+    各步骤的计数和字节数是完整累计值。
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, max_samples: Optional[int] = None,
+                 max_step_samples: Optional[int] = None):
+        """
+        初始化统计（未指定的参数使用 config.SSH_METRICS_CONFIG）
+
+        Args:
+            enabled: 是否记录
+            max_samples: 保留的最近样本数（用于导出明细）
+            max_step_samples: 每个步骤用于计算分位数的最近样本数
+        """
+        settings = _metrics_config()
+        self.enabled = settings['enabled'] if enabled is None else enabled
+        self.max_step_samples = settings['max_step_samples'] if max_step_samples is None else max_step_samples
+        self.started_at = time.time()
+
+        self._samples: deque = deque(maxlen=settings['max_samples'] if max_samples is None else max_samples)
+        self._steps: Dict[str, _StepStats] = {}
+        self._total = _StepStats(self._samples.maxlen)
+        # 步骤标记保存在上下文变量中，每个线程/协程独立，并发执行的步骤互不覆盖
+        self._step: contextvars.ContextVar = contextvars.ContextVar(f'ssh_metrics_step_{id(self)}', default=None)
+        self._execution: contextvars.ContextVar = contextvars.ContextVar(f'ssh_metrics_execution_{id(self)}',
+                                                                         default=None)
+        # 执行ID -> 各连接路径的操作数
+        self._executions: 'OrderedDict[str, Counter]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def current_step(self) -> str:
+        """当前上下文所在的步骤（未标记时为 UNTAGGED_STEP）"""
+        return self._step.get() or UNTAGGED_STEP
+
+    def current_execution(self) -> Optional[str]:
+        """当前上下文所在的执行ID（未指定时为None）"""
+        return self._execution.get()
+
+    @contextmanager
+    def step_scope(self, step: str, execution_id: Optional[str] = None):
+        """
+        把当前上下文（线程或协程）之后的远程操作标记为属于指定步骤
+
+        新建的工作线程不继承标记，需通过 contextvars.copy_context() 在调用方的上下文中执行
+        （见 AsyncTopupSSH）。
+
+        Args:
+            step: 步骤标识（如 '2.1'）
+            execution_id: 本次执行的标识，指定时另外按执行统计连接路径（见 execution_paths），
+                          进入时清空该执行之前的计数；未指定时沿用外层的执行ID
+        """
+        if execution_id is not None and execution_id != self._execution.get():
+            with self._lock:
+                self._executions.pop(execution_id, None)
+        step_token = self._step.set(step)
+        execution_token = self._execution.set(execution_id or self._execution.get())
+        try:
+            yield
+        finally:
+            self._execution.reset(execution_token)
+            self._step.reset(step_token)
+
+    @contextmanager
+    def measure(self, kind: str, command: str = '', queue_wait: float = 0.0, path: Optional[str] = None):
+        """
+        测量一次远程操作，退出时记录样本
+
+        用法：
+            with command_metrics.measure('command', command) as sample:
+                ...
+                sample['exit_code'] = exit_code
+
+        调用方可以在块内设置 sample 的 queue_wait、bytes_in、bytes_out、exit_code、channel、
+        round_trips（默认1）、cached；块内抛出异常时记录 error。记录的耗时不含 queue_wait。
+
+        Args:
+            kind: 操作类型（command/batch/interactive/sftp/agent/download/daemon）
+            command: 命令或查询描述
+            queue_wait: 已知的排队等待时间（秒）
+            path: 执行操作的连接路径（跳板机→目标节点，见 ssh_paths.path_key）
+
+        Yields:
+            dict: 样本
+        """
+        sample = {
+            'kind': kind,
+            'command': command,
+            'queue_wait': queue_wait,
+            'bytes_in': 0,
+            'bytes_out': len(command.encode('utf-8')),
+            'exit_code': None,
+            'channel': None,
+            'round_trips': 1,
+            'cached': False,
+            'path': path,
+            'error': None
+        }
+        start = time.monotonic()
+        try:
+            yield sample
+        except BaseException as e:
+            sample['error'] = f"{type(e).__name__}: {str(e)}"
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            sample['latency'] = max(0.0, elapsed - sample['queue_wait'])
+            self.record(sample)
+
+    def record(self, sample: Dict[str, Any]):
+        """记录一个样本（通常由 measure 调用）"""
+        if not self.enabled:
+            return
+        sample.setdefault('step', self.current_step())
+        sample.setdefault('execution_id', self.current_execution())
+        sample.setdefault('time', time.time())
+        sample['program'] = _program(sample['command'], sample['kind'])
+        if len(sample['command']) > 500:
+            sample['command'] = sample['command'][:500] + '...'
+        with self._lock:
+            self._samples.append(sample)
+            stats = self._steps.get(sample['step'])
+            if stats is None:
+                stats = self._steps[sample['step']] = _StepStats(self.max_step_samples)
+            stats.add(sample)
+            self._total.add(sample)
+            if sample['execution_id'] is not None and sample.get('path'):
+                paths = self._executions.get(sample['execution_id'])
+                if paths is None:
+                    paths = self._executions[sample['execution_id']] = Counter()
+                    if len(self._executions) > _MAX_EXECUTIONS:
+                        self._executions.popitem(last=False)
+                paths[sample['path']] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        按步骤汇总
+
+        Returns:
+            dict: 包含 started_at, steps（步骤 -> 操作数、往返次数、失败数、缓存命中数、收发字节数、
+                  累计执行/排队秒数、各类型操作数、往返最多的程序、各连接路径的操作数、
+                  耗时和排队等待的 p50/p90/p99/max 毫秒），
+                  以及全部步骤的合计 total
+        """
+        with self._lock:
+            return {
+                'started_at': datetime.fromtimestamp(self.started_at).isoformat(),
+                'steps': {step: stats.summary() for step, stats in self._steps.items()},
+                'total': self._total.summary()
+            }
+
+    def step_paths(self, step: str) -> Dict[str, int]:
+        """
+        步骤的操作由哪些连接路径执行
+
+        Args:
+            step: 步骤标识
+
+        Returns:
+            dict: 路径 -> 操作数
+        """
+        with self._lock:
+            stats = self._steps.get(step)
+            return dict(stats.paths) if stats else {}
+
+    def execution_paths(self, execution_id: str) -> Dict[str, int]:
+        """
+        一次执行（见 step_scope 的 execution_id）的操作由哪些连接路径执行
+
+        与 step_paths 不同，同名步骤的其他执行（包括并发执行的任务）不计入
+
+        Args:
+            execution_id: 执行ID
+
+        Returns:
+            dict: 路径 -> 操作数
+        """
+        with self._lock:
+            paths = self._executions.get(execution_id)
+            return dict(paths) if paths else {}
+
+    def samples(self, step: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        获取最近的样本明细
+
+        Args:
+            step: 只返回该步骤的样本
+            limit: 最多返回的条数（取最近的）
+
+        Returns:
+            list: 样本列表（按时间顺序）
+        """
+        with self._lock:
+            items = [dict(sample) for sample in self._samples if step is None or sample['step'] == step]
+        return items[-limit:] if limit else items
+
+    def dump(self, path: Optional[str] = None) -> str:
+        """
+        把汇总和样本明细写入JSON文件
+
+        Args:
+            path: 文件路径，默认 <dump_dir>/ssh_metrics_<时间>.json
+
+        Returns:
+            str: 文件路径
+        """
+        if path is None:
+            dump_dir = _metrics_config()['dump_dir']
+            os.makedirs(dump_dir, exist_ok=True)
+            path = os.path.join(dump_dir, f"ssh_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': self.summary(), 'samples': self.samples()}, f, ensure_ascii=False, indent=2)
+        return path
+
+    def reset(self):
+        """清空全部样本和统计"""
+        with self._lock:
+            self._samples.clear()
+            self._steps.clear()
+            self._total = _StepStats(self._samples.maxlen)
+            self._executions.clear()
+            self.started_at = time.time()
+
+    def print_summary(self):
+        """打印各步骤的往返次数和耗时（按往返次数从多到少）"""
+        summary = self.summary()
+        if not summary['steps']:
+            return
+        print("\n" + "=" * 78)
+        print("SSH远程操作统计（按往返次数排序）")
+        print("=" * 78)
+        print(f"{'步骤':<10}{'往返':>7}{'失败':>6}{'缓存':>6}{'p50(ms)':>10}{'p99(ms)':>10}"
+              f"{'排队p90(ms)':>13}{'总耗时(s)':>11}{'接收(KB)':>10}")
+        ordered = sorted(summary['steps'].items(), key=lambda item: item[1]['round_trips'], reverse=True)
+        for step, stats in ordered:
+            print(f"{step:<10}{stats['round_trips']:>7}{stats['failures']:>6}{stats['cached']:>6}"
+                  f"{stats['latency_ms']['p50']:>10.1f}{stats['latency_ms']['p99']:>10.1f}"
+                  f"{stats['queue_wait_ms']['p90']:>13.1f}{stats['busy_seconds']:>11.1f}"
+                  f"{stats['bytes_in'] / 1024:>10.1f}")
+            if stats['top_programs']:
+                print(f"{'':<10}  往返最多: " + ', '.join(f"{name}×{count}" for name, count in stats['top_programs']))
+            if stats['paths']:
+                print(f"{'':<10}  连接路径: " + ', '.join(f"{path}×{count}" for path, count in stats['paths'].items()))
+
+
+# 全局统计实例（同一进程内的 TopupSSH 实例共用）
+command_metrics = CommandMetrics()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSH连接路径健康度模块
+跳板机（lxlogin）和目标登录节点（beslogin）可以各配置多个候选，每条路径（跳板机 → 目标节点）
+按双跳握手耗时和通道往返耗时计算健康分；新连接优先使用最快的健康路径，
+失败的路径冷却一段时间后再尝试，耗时相近的路径按当前连接数分摊
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+
+import config
+
+
+def paths_config() -> Dict[str, Any]:
+    """读取路径选择配置（缺省项使用默认值）"""
+    defaults = {
+        'state_file': os.path.join(os.path.dirname(os.path.abspath(__file__)), '.ssh_path_health'),
+        'ewma_alpha': 0.3,
+        'handshake_weight': 0.1,
+        'failure_cooldown': 60,
+        'max_cooldown': 1800,
+        'slow_threshold_ms': 2000,
+        'switch_when_slow': True,
+        'spread_tolerance': 0.2,
+        'stale_hours': 24
+    }
+    defaults.update(getattr(config, 'SSH_PATH_CONFIG', {}))
+    return defaults
+
+
+def _server_key(server: Dict[str, Any]) -> Tuple:
+    return (server['host'], server['port'], server['username'])
+
+
+def path_key(server1: Dict[str, Any], server2: Dict[str, Any]) -> str:
+    """路径标识（跳板机:端口→目标节点:端口），也用于统计中记录服务的路径"""
+    return f"{server1['host']}:{server1['port']}→{server2['host']}:{server2['port']}"
+
+
+def candidate_paths(server1: Dict[str, Any], server2: Dict[str, Any]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    列出全部候选路径
+
+    给定的跳板机和目标节点排在最前，其后是 config.SSH_CONFIG 中 jump_hosts / targets 列出的其他候选，
+    每个跳板机与每个目标节点组合为一条路径。
+
+    Args:
+        server1: 首选跳板机配置
+        server2: 首选目标服务器配置
+
+    Returns:
+        list: (跳板机配置, 目标服务器配置) 列表
+    """
+    def candidates(primary, extra):
+        servers = [primary]
+        for server in extra:
+            merged = dict(primary)
+            merged.update(server)
+            if _server_key(merged) not in {_server_key(item) for item in servers}:
+                servers.append(merged)
+        return servers
+
+    ssh_config = getattr(config, 'SSH_CONFIG', {})
+    jump_hosts = candidates(server1, ssh_config.get('jump_hosts', []))
+    targets = candidates(server2, ssh_config.get('targets', []))
+    return [(jump, target) for jump in jump_hosts for target in targets]
+
+
+class PathHealth:
+    """
+    路径健康度记录
+
+    每条路径记录握手耗时和通道往返耗时的指数滑动平均、连续失败次数和冷却截止时间，
+    保存在本地状态文件中，下次运行时沿用；当前使用每条路径的连接数只保存在内存中。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化健康度记录
+
+        Args:
+            path: 状态文件路径，默认使用 config.SSH_PATH_CONFIG['state_file']
+        """
+        self.path = path or paths_config()['state_file']
+        self._lock = threading.Lock()
+        self._paths: Dict[str, Dict[str, Any]] = self._load()
+        self._in_use: Dict[str, int] = {}
+        self._saved_at = 0.0
+
+    def record_handshake(self, key: str, seconds: float):
+        """记录一次成功的双跳握手（清除连续失败次数）"""
+        with self._lock:
+            entry = self._entry(key)
+            entry['handshake_ms'] = self._smooth(entry['handshake_ms'], seconds * 1000)
+            entry['successes'] += 1
+            entry['consecutive_failures'] = 0
+            entry['cooldown_until'] = 0.0
+            self._save()
+
+    def record_latency(self, key: Optional[str], seconds: float):
+        """记录一次通道往返耗时（打开会话通道或存活探测）"""
+        if key is None:
+            return
+        with self._lock:
+            entry = self._entry(key)
+            entry['latency_ms'] = self._smooth(entry['latency_ms'], seconds * 1000)
+            # 往返耗时记录频繁，状态文件最多每30秒写一次
+            if time.time() - self._saved_at >= 30:
+                self._save()
+
+    def record_failure(self, key: str, error: str = ''):
+        """记录一次连接失败或断线，按连续失败次数指数延长冷却时间"""
+        settings = paths_config()
+        with self._lock:
+            entry = self._entry(key)
+            entry['failures'] += 1
+            entry['consecutive_failures'] += 1
+            cooldown = min(settings['failure_cooldown'] * 2 ** (entry['consecutive_failures'] - 1),
+                           settings['max_cooldown'])
+            entry['cooldown_until'] = time.time() + cooldown
+            entry['last_error'] = error[:200]
+            self._save()
+
+    def acquire(self, key: str):
+        """记录一条连接开始使用该路径"""
+        with self._lock:
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+
+    def release(self, key: Optional[str]):
+        """记录一条连接不再使用该路径"""
+        if key is None:
+            return
+        with self._lock:
+            if self._in_use.get(key, 0) > 0:
+                self._in_use[key] -= 1
+
+    def score(self, key: str) -> Optional[float]:
+        """健康分（毫秒，越小越好）：通道往返耗时 + 握手耗时 × handshake_weight；没有记录时返回None"""
+        with self._lock:
+            entry = self._fresh(key)
+        if entry is None or entry['handshake_ms'] is None:
+            return None
+        latency = entry['latency_ms'] if entry['latency_ms'] is not None else entry['handshake_ms']
+        return latency + entry['handshake_ms'] * paths_config()['handshake_weight']
+
+    def is_slow(self, key: Optional[str]) -> bool:
+        """路径的通道往返耗时是否超过 slow_threshold_ms"""
+        if key is None:
+            return False
+        with self._lock:
+            entry = self._fresh(key)
+        return bool(entry and entry['latency_ms'] is not None
+                    and entry['latency_ms'] > paths_config()['slow_threshold_ms'])
+
+    def rank(self, keys: List[str]) -> List[str]:
+        """
+        按优先顺序排列路径
+
+        顺序：不在冷却期且不慢的已知路径（按健康分，与最快路径相差不超过 spread_tolerance 的按当前连接数分摊），
+        没有记录的路径（按配置顺序），慢路径，冷却中的路径（按冷却截止时间）。
+
+        Args:
+            keys: 路径标识列表（按配置顺序）
+
+        Returns:
+            list: 排序后的路径标识
+        """
+        settings = paths_config()
+        now = time.time()
+        scores = {key: self.score(key) for key in keys}
+        with self._lock:
+            cooldowns = {key: (self._fresh(key) or {}).get('cooldown_until', 0.0) for key in keys}
+            in_use = dict(self._in_use)
+
+        cooling = sorted((key for key in keys if cooldowns[key] > now), key=lambda key: cooldowns[key])
+        available = [key for key in keys if key not in cooling]
+        slow = [key for key in available if scores[key] is not None and self.is_slow(key)]
+        unknown = [key for key in available if scores[key] is None]
+        known = sorted((key for key in available if scores[key] is not None and key not in slow),
+                       key=lambda key: scores[key])
+
+        if known:
+            limit = scores[known[0]] * (1 + settings['spread_tolerance'])
+            close = [key for key in known if scores[key] <= limit]
+            close.sort(key=lambda key: (in_use.get(key, 0), scores[key]))
+            known = close + [key for key in known if key not in close]
+        return known + unknown + sorted(slow, key=lambda key: scores[key]) + cooling
+
+    def snapshot(self, keys: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        路径健康度快照
+
+        Args:
+            keys: 只返回这些路径，默认全部
+
+        Returns:
+            dict: 路径 -> handshake_ms, latency_ms, score, successes, failures, consecutive_failures,
+                  cooling_down, slow, in_use, last_error
+        """
+        with self._lock:
+            selected = list(self._paths) if keys is None else keys
+            entries = {key: dict(self._paths.get(key) or self._new_entry()) for key in selected}
+            in_use = dict(self._in_use)
+        now = time.time()
+        return {
+            key: {
+                'handshake_ms': entry['handshake_ms'],
+                'latency_ms': entry['latency_ms'],
+                'score': self.score(key),
+                'successes': entry['successes'],
+                'failures': entry['failures'],
+                'consecutive_failures': entry['consecutive_failures'],
+                'cooling_down': entry['cooldown_until'] > now,
+                'slow': self.is_slow(key),
+                'in_use': in_use.get(key, 0),
+                'last_error': entry.get('last_error', '')
+            }
+            for key, entry in entries.items()
+        }
+
+    @staticmethod
+    def _new_entry() -> Dict[str, Any]:
+        return {'handshake_ms': None, 'latency_ms': None, 'successes': 0, 'failures': 0,
+                'consecutive_failures': 0, 'cooldown_until': 0.0, 'last_error': '', 'updated_at': 0.0}
+
+    def _entry(self, key: str) -> Dict[str, Any]:
+        entry = self._fresh(key)
+        if entry is None:
+            entry = self._paths[key] = self._new_entry()
+        entry['updated_at'] = time.time()
+        return entry
+
+    def _fresh(self, key: str) -> Optional[Dict[str, Any]]:
+        """路径记录（超过 stale_hours 未更新的耗时记录视为过期，网络状况可能已经变化）"""
+        entry = self._paths.get(key)
+        if entry is not None and time.time() - entry['updated_at'] > paths_config()['stale_hours'] * 3600:
+            entry.update(handshake_ms=None, latency_ms=None, consecutive_failures=0)
+        return entry
+
+    @staticmethod
+    def _smooth(previous: Optional[float], value: float) -> float:
+        if previous is None:
+            return value
+        alpha = paths_config()['ewma_alpha']
+        return alpha * value + (1 - alpha) * previous
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                paths = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        for key, entry in paths.items():
+            paths[key] = dict(self._new_entry(), **entry)
+        return paths
+
+    def _save(self):
+        # 先写临时文件再改名，进程中途退出不会留下损坏的状态文件；写入失败不影响连接
+        self._saved_at = time.time()
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._paths, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+
+
+# 进程内共用的路径健康度记录
+path_health = PathHealth()
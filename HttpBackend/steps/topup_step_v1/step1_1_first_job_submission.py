@@ -5,10 +5,11 @@
 提交第一次作业，并等待检查结果文件生成
 """
 
-import time
 import re
 from typing import Dict, Any
 from topup_ssh import TopupSSH
+from completion_watcher import CompletionWatcher
+import config
 
 
 def step1_1_first_job_submission(
@@ -38,6 +39,7 @@ def step1_1_first_job_submission(
             - complete_runs (list): 已完成的run号列表
             - incomplete_runs (list): 未完成的run号列表
             - elapsed_time (int): 已等待秒数
+            - eta_seconds (int, 可选): 预计还需等待的秒数，无法预测时为None
     """
     console_logs = []
     console_logs.append("=" * 60)
@@ -171,69 +173,31 @@ def step1_1_first_job_submission(
         if list_result['success']:
             console_logs.append(f"目录内容:\n{list_result['output']}")
 
-        # 定期检查文件
-        max_wait_seconds = int(max_wait_minutes) * 60
-        check_interval = 30
-        elapsed_time = 0
-        incomplete_runs = run_numbers.copy()
-
-
-        while elapsed_time < max_wait_seconds and incomplete_runs:
-            console_logs.append(f"\n检查进度: {elapsed_time}/{max_wait_seconds}秒")
-            console_logs.append(f"未完成的run号: {incomplete_runs}")
-
-            still_incomplete = []
-
-            for run_num in incomplete_runs:
-                # 根据 config.py 中的 REQUIRED_FILES_STEP1 定义文件列表
-                files_to_check = [
-                    f"rec{run_num}_1.txt",
-                    f"rec{run_num}_1.txt.bosserr",
-                    f"rec{run_num}_1.txt.bosslog",
-                    f"InjSigTime_00{run_num}_720.root",
-                    f"Interval_run{run_num}.png",
-                    f"Interval_run{run_num}.txt",
-                ]
-
-                check_cmd = f"cd {date_dir} && ls {' '.join(files_to_check)} 2>/dev/null | wc -l"
-                check_result = ssh.execute_command(check_cmd)
-
-                if check_result['success']:
-                    file_count = int(check_result['output'].strip())
-                    if file_count == len(files_to_check):
-                        console_logs.append(f"  ✓ Run {run_num}: 所有文件已生成")
-                    else:
-                        still_incomplete.append(run_num)
-                        console_logs.append(f"  Run {run_num}: {file_count}/{len(files_to_check)} 文件已生成")
-                else:
-                    still_incomplete.append(run_num)
-                    console_logs.append(f"  Run {run_num}: 检查失败")
-
-            incomplete_runs = still_incomplete
-
-            if not incomplete_runs:
-                console_logs.append(f"\n[OK] 所有 {len(run_numbers)} 个run号的文件都已生成")
-                break
-
-            # 检查数据异常文件（Interval_run0.png）
-            anomaly_result = ssh.execute_command(f"cd {date_dir} && ls Interval_run0.png 2>/dev/null")
-            if anomaly_result['success'] and anomaly_result['output'].strip():
-                console_logs.append(f"✗ 出现了Interval_run0.png，该日期数据不正常")
-                return {
-                    'success': False,
-                    'message': '出现了Interval_run0.png的文件，该日期数据不正常',
-                    'error': '数据异常，需要人工干预',
-                    'console_logs': console_logs,
-                    'step_name': 'step1_1_first_job_submission',
-                    'date': date,
-                    'anomaly_file': 'Interval_run0.png',
-                    'requires_manual_intervention': True,
-                }
-
-            time.sleep(check_interval)
-            elapsed_time += check_interval
-
-        complete_runs = [r for r in run_numbers if r not in incomplete_runs]
+        # 定期检查6个必需文件（每次检查只遍历一次日期目录），同时检查异常文件
+        watcher = CompletionWatcher(ssh, date_dir, run_numbers, config.REQUIRED_FILES_STEP1,
+                                    log=console_logs.append, step='step1_1_first_job_submission')
+        anomaly_file = 'Interval_run0.png'
+        wait_result = watcher.wait(
+            max_wait_minutes,
+            abort=lambda w: anomaly_file if w.exists(anomaly_file) else None
+        )
+        incomplete_runs = wait_result['incomplete_runs']
+        complete_runs = wait_result['complete_runs']
+        elapsed_time = wait_result['elapsed_time']
+
+        # 检查数据异常文件（Interval_run0.png）
+        if wait_result['aborted']:
+            console_logs.append(f"✗ 出现了Interval_run0.png，该日期数据不正常")
+            return {
+                'success': False,
+                'message': '出现了Interval_run0.png的文件，该日期数据不正常',
+                'error': '数据异常，需要人工干预',
+                'console_logs': console_logs,
+                'step_name': 'step1_1_first_job_submission',
+                'date': date,
+                'anomaly_file': anomaly_file,
+                'requires_manual_intervention': True,
+            }
 
         if incomplete_runs:
             console_logs.append(f"✗ 超时: 等待超过 {max_wait_minutes} 分钟")
@@ -246,7 +210,9 @@ def step1_1_first_job_submission(
                 'total_runs': len(run_numbers),
                 'complete_runs': complete_runs,
                 'incomplete_runs': incomplete_runs,
+                'missing_files': wait_result['missing'],
                 'elapsed_time': elapsed_time,
+                'eta_seconds': wait_result['eta_seconds'],
             }
 
         return {
@@ -259,6 +225,7 @@ def step1_1_first_job_submission(
             'complete_runs': complete_runs,
             'incomplete_runs': [],
             'elapsed_time': elapsed_time,
+            'eta_seconds': wait_result['eta_seconds'],
         }
 
     except Exception as e:
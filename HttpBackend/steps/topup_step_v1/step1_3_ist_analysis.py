@@ -6,6 +6,7 @@
 """
 
 import re
+import shlex
 from typing import Dict, Any
 from topup_ssh import TopupSSH
 
@@ -145,7 +146,9 @@ def step1_3_ist_analysis(
         sorted_runs = sorted(run_numbers, key=int)
         content_to_append = '\n'.join([f"{run} 15000000" for run in sorted_runs])
 
-        result_append = ssh.execute_command(f"echo '{content_to_append}' >> {global_interval_file}")
+        # 追加写入（O_APPEND），多个任务同时更新全局interval.txt时不会互相覆盖；内容经 shlex.quote 转义
+        result_append = ssh.execute_command(
+            f"printf '%s\\n' {shlex.quote(content_to_append)} >> {shlex.quote(global_interval_file)}")
 
         if not result_append['success']:
             console_logs.append(f"✗ 追加到interval.txt文件失败")
@@ -159,13 +162,12 @@ def step1_3_ist_analysis(
                 'ist_results': ist_results,
             }
 
-        # 验证追加内容
+        # 本次追加的内容（其他任务可能同时追加，不再用 tail 读取文件末尾）
         tail_lines = len(sorted_runs)
-        result_verify = ssh.execute_command(f"tail -{tail_lines} {global_interval_file}")
-        interval_file_content = result_verify['output'] if result_verify['success'] else ''
+        interval_file_content = f"{content_to_append}\n"
 
         console_logs.append(f"\n[OK] IST分析完成")
-        console_logs.append(f"全局interval.txt文件最后{tail_lines}行:\n{interval_file_content}")
+        console_logs.append(f"追加到全局interval.txt文件的{tail_lines}行:\n{interval_file_content}")
 
         return {
             'success': True,
@@ -135,9 +135,9 @@ def step1_4_merge_images(
 
 if __name__ == "__main__":
     # 测试步骤1.4
-    from topup_ssh import TopupSSH
+    from local_executor import create_executor
 
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             result = step1_4_merge_images(
                 ssh=ssh,
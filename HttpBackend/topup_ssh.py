@@ -8,25 +8,104 @@ Topup SSH连接管理模块
 import paramiko
 import os
 import time
-from typing import Optional, Tuple, Dict, Any
+import selectors
+import re
+import shlex
+import uuid
+import stat as stat_module
+import posixpath
+from typing import Optional, Tuple, Dict, Any, List, Callable, Union
 import config
 import logging
-import socket
+from ssh_pool import SSHConnectionPool, get_pool
+from output_stream import OutputBuffer
+from query_cache import QueryCache, get_query_cache, command_paths
+from file_events import FileEventStream
+from ssh_metrics import command_metrics
+import log_follow
 
 # 创建logger
 logger = logging.getLogger(__name__)
 
+# 每次从通道读取的最大字节数
+_RECV_CHUNK_SIZE = 32768
+
+# 只读命令：连接中断后可以安全地重新执行
+# （awk、sed 可在脚本内写文件或执行命令，如 system()、print > file、sed 的 w/e 命令，不列入）
+_READ_ONLY_COMMANDS = {
+    'ls', 'cat', 'head', 'tail', 'grep', 'egrep', 'fgrep', 'wc', 'find', 'stat', 'test', '[',
+    'echo', 'printf', 'pwd', 'cd', 'du', 'df', 'md5sum', 'sha1sum', 'sha256sum', 'file', 'date',
+    'whoami', 'hostname', 'readlink', 'realpath', 'basename', 'dirname', 'sort', 'uniq', 'cut',
+    'tr', 'diff', 'cmp', 'true', 'which'
+}
+
+# find 的写操作（删除、执行命令、把结果写入文件）
+_FIND_WRITE_ACTIONS = {'-delete', '-exec', '-execdir', '-ok', '-okdir', '-fprint', '-fprint0', '-fprintf', '-fls'}
+
+
+def is_read_only_command(command: str) -> bool:
+    """
+    判断命令是否只读（不修改远程文件，重复执行无副作用）
+
+    命令按 && || ; | 拆分后，每一段的程序都必须在只读白名单中，
+    且不能包含输出重定向（>/dev/null 和 2>&1 除外）、命令替换，
+    以及 sort -o、uniq 输入 输出、find -delete/-exec/-fprint 等写操作。
+
+    Args:
+        command: shell命令
+
+    Returns:
+        bool: 是否只读
+    """
+    if '`' in command or '$(' in command or '<<' in command:
+        return False
+    stripped = re.sub(r'\d?>\s*/dev/null(?![\w./-])|\d?>&\d', '', command)
+    if '>' in stripped:
+        return False
+
+    for segment in re.split(r'&&|\|\||[;|\n]', stripped):
+        try:
+            tokens = shlex.split(segment)
+        except ValueError:
+            return False
+        if not tokens:
+            continue
+        program = tokens[0].rsplit('/', 1)[-1]
+        if program not in _READ_ONLY_COMMANDS:
+            return False
+        # sort 的 -o 可与其他短选项合写（如 -uo、-no）
+        if program == 'sort' and any(token.startswith('--output') or (re.match(r'-[^-]', token) and 'o' in token)
+                                     for token in tokens[1:]):
+            return False
+        # uniq 的第二个操作数是输出文件（-f/-s/-w 的数字参数不计）
+        if program == 'uniq' and len([token for token in tokens[1:]
+                                      if not token.startswith('-') and not token.isdigit()]) > 1:
+            return False
+        if program == 'find' and any(token in _FIND_WRITE_ACTIONS for token in tokens):
+            return False
+    return True
+
 
 class TopupSSH:
     """SSH双跳连接管理类"""
 
-    def __init__(self):
+    def __init__(self, pool: Optional[SSHConnectionPool] = None, transport_profile: Optional[str] = None):
         """
         初始化SSH连接管理器
+
+        Args:
+            pool: 共享连接池，默认使用 config.SSH_CONFIG 对应的进程级连接池
+            transport_profile: 连接的传输参数方案（'latency'/'bulk'），默认使用 config.DEFAULT_TRANSPORT_PROFILE
         """
         # 服务器配置（从config.py导入）
         self.server1_config = config.SSH_CONFIG['servers']['server1']
         self.server2_config = config.SSH_CONFIG['servers']['server2']
+
+        # 共享连接池（多个任务复用一条双跳连接）
+        self.pool = pool or get_pool(self.server1_config, self.server2_config, transport_profile)
+
+        # 只读查询结果缓存（与连接池一样在进程内共享）
+        self.cache: QueryCache = get_query_cache(self.pool)
         
         # SSH连接
         self.ssh1: Optional[paramiko.SSHClient] = None
@@ -41,87 +120,50 @@ class TopupSSH:
     def connect(self) -> bool:
         """
         建立SSH双跳连接
+
+        从连接池租用共享的第二跳传输，只有池中没有可用连接时才执行完整的双跳握手
         
         Returns:
             bool: 连接是否成功
         """
-        try:
-            # 创建第一个SSH客户端（连接到跳板机）
-            self.ssh1 = paramiko.SSHClient()
-            self.ssh1.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            # 跳板机密码
-            password1 = os.getenv(self.server1_config['env_password'])
-            
-            # 连接到跳板机
-            print(f"正在连接到跳板机 {self.server1_config['host']}...")
-
-            # 使用socket连接，避免IPv6连接问题
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.connect((self.server1_config['host'], self.server1_config['port']))
-
-            self.ssh1.connect(
-                hostname=self.server1_config['host'],
-                port=self.server1_config['port'],
-                username=self.server1_config['username'],
-                sock=sock,
-                password=password1,
-                timeout=30,
-                auth_timeout=30,
-                banner_timeout=30
-            )
-            print(f"✓ 成功连接到跳板机 {self.server1_config['host']}")
-            
-            # 创建传输通道到目标服务器
-            self.transport = self.ssh1.get_transport()
-            dest_addr = (self.server2_config['host'], self.server2_config['port'])
-            local_addr = ('localhost', 22)
-            print("正在创建SSH通道...")
-            # 默认超时60秒，避免长时间卡在这里
-            channel = self.transport.open_channel("direct-tcpip", dest_addr, local_addr , timeout=60)
-            print(f"正在通过跳板机连接到目标服务器 {self.server2_config['host']}...")
-            
-            # 创建第二个SSH客户端（连接到目标服务器）
-            self.ssh2 = paramiko.SSHClient()
-            self.ssh2.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            # 目标服务器密码
-            password2 = os.getenv(self.server2_config['env_password'])
-            
-            # 通过通道连接到目标服务器
-            self.ssh2.connect(
-                hostname=self.server2_config['host'],
-                port=self.server2_config['port'],
-                username=self.server2_config['username'],
-                password=password2,
-                sock=channel,
-                timeout=30,
-                auth_timeout=30,
-                banner_timeout=30
-            )
-            print(f"✓ 成功连接到目标服务器 {self.server2_config['host']}")
-            
-            self.connected = True
-            return True
-            
-        except Exception as e:
-            print(f"✗ SSH连接失败: {str(e)}")
+        if self.connected:
+            if self.pool.is_active():
+                return True
             self.close()
+
+        if not self.pool.acquire():
             return False
+
+        self._refresh_connection()
+        self.connected = True
+
+        # 后台预热交互式shell，首次提交作业时无需等待shell初始化
+        self.pool.warm_shells()
+        return True
     
-    def execute_command(self, command: str, timeout: int = 600, use_pty: bool = False) -> Dict[str, Any]:
+    def execute_command(self, command: str, timeout: int = 600, use_pty: bool = False,
+                        idempotent: Optional[bool] = None, use_cache: bool = True) -> Dict[str, Any]:
         """
         在远程服务器上执行命令
 
+        执行前确认共享连接存活（必要时自动重连）；执行中连接断开时，
+        只读或标记为幂等的命令在重连后自动重新执行，其他命令返回失败。
+        只读命令的成功结果按 QUERY_CACHE_CONFIG 的路径有效期缓存，
+        非只读命令执行前后使其涉及路径下的缓存失效。
+
         Args:
             command: 要执行的命令
             timeout: 超时时间（秒），默认600秒
             use_pty: 是否使用PTY伪终端，默认False。对于简单命令（如reset.sh）不需要PTY
+            idempotent: 命令是否可安全重放，默认按 is_read_only_command 自动判断
+            use_cache: 是否使用只读查询缓存（仅对只读且路径配置了有效期的命令生效）
 
         Returns:
-            dict: 执行结果，包含success, message, exit_code, output, error
+            dict: 执行结果，包含success, message, exit_code, output, error；
+                  输出超过 OUTPUT_BUFFER_CONFIG 上限时 output/error 为首尾预览，
+                  并附带 output_file/error_file（完整输出的本地临时文件）、*_chars、*_head、*_tail
         """
-        if not self.connected or self.ssh2 is None:
+        if not self._ready():
             return {
                 'success': False,
                 'message': 'SSH未连接',
@@ -130,6 +172,19 @@ class TopupSSH:
                 'error': 'SSH连接未建立'
             }
 
+        read_only = is_read_only_command(command)
+        cache_key = ('command', command, use_pty)
+        cache_ttl = self.cache.ttl_for(command_paths(command)) if read_only and use_cache else 0
+        if cache_ttl > 0:
+            hit, cached = self.cache.get(cache_key)
+            if hit:
+                print(f"\n执行命令: {command}（使用缓存结果）")
+                with command_metrics.measure('command', command, path=self.pool.path_label) as sample:
+                    sample.update(round_trips=0, cached=True, exit_code=cached['exit_code'])
+                return dict(cached)
+        elif not read_only:
+            self.cache.invalidate_command(command)
+
         try:
             print(f"\n执行命令: {command}")
 
@@ -137,57 +192,43 @@ class TopupSSH:
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug(f"执行命令: {command}")
 
-            stdin, stdout, stderr = self.ssh2.exec_command(command, get_pty=use_pty)
-
-            # 等待命令完成，带超时
-            import time
-            start_time = time.time()
-            while not stdout.channel.exit_status_ready():
-                if time.time() - start_time > timeout:
-                    # 超时，关闭连接
-                    stdout.channel.close()
-
-                    # 记录超时到日志
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(f"命令执行超时（{timeout}秒）")
-
-                    return {
-                        'success': False,
-                        'message': f'命令执行超时（{timeout}秒）',
-                        'exit_code': -1,
-                        'output': '',
-                        'error': '命令执行超时'
-                    }
-                time.sleep(0.1)
-
-            # 获取退出码
-            exit_code = stdout.channel.recv_exit_status()
-
-            # 读取输出（设置读取超时，避免阻塞）
-            import select
-            output = ""
-            error = ""
-
-            # 非阻塞读取stdout
-            if use_pty:
-                # 使用PTY时，需要特殊处理
-                import socket
-                stdout.channel.setblocking(0)
-                while True:
-                    if stdout.channel.recv_ready():
-                        data = stdout.channel.recv(1024)
-                        if len(data) == 0:
-                            break
-                        output += data.decode('utf-8', errors='ignore')
-                    else:
-                        time.sleep(0.01)
-                        break
-            else:
-                # 不使用PTY时，直接读取
-                output = stdout.read().decode('utf-8', errors='ignore')
-
-            # 读取stderr
-            error = stderr.read().decode('utf-8', errors='ignore')
+            with command_metrics.measure('command', command, path=self.pool.path_label) as sample:
+                sample['round_trips'] = 0
+
+                def run_once():
+                    return self._exec_channel(command, timeout, sample, use_pty=use_pty)
+
+                replayable = read_only if idempotent is None else idempotent
+                try:
+                    exit_code, stdout, stderr = self._with_reconnect(run_once, replayable)
+                finally:
+                    if not read_only:
+                        # 命令执行期间可能有并发查询写入了旧结果
+                        self.cache.invalidate_command(command)
+                sample.update(exit_code=exit_code, bytes_in=stdout.total_bytes + stderr.total_bytes)
+                if exit_code is None:
+                    sample['error'] = '命令执行超时'
+            # 超过内存上限时 output/error 只保留首尾预览，完整内容见 output_file/error_file
+            output_fields = stdout.to_result('output')
+            error_fields = stderr.to_result('error')
+            output = output_fields['output']
+            error = error_fields['error']
+
+            if exit_code is None:
+                # 记录超时到日志
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"命令执行超时（{timeout}秒）")
+
+                result = {
+                    'success': False,
+                    'message': f'命令执行超时（{timeout}秒）',
+                    'exit_code': -1,
+                    **output_fields,
+                    'error': '命令执行超时'
+                }
+                if stderr.overflowed:
+                    result.update(error_fields, error='命令执行超时')
+                return result
 
             # 记录输出到日志
             if logger.isEnabledFor(logging.DEBUG):
@@ -202,9 +243,16 @@ class TopupSSH:
                 'success': exit_code == 0,
                 'message': '命令执行成功' if exit_code == 0 else '命令执行失败',
                 'exit_code': exit_code,
-                'output': output,
-                'error': error
+                **output_fields,
+                **error_fields
             }
+            if stdout.overflowed or stderr.overflowed:
+                print(f"  输出过长，仅保留首尾预览（stdout {stdout.total_chars} 字符，stderr {stderr.total_chars} 字符）")
+                for buffer in (stdout, stderr):
+                    if buffer.spill_path:
+                        print(f"  完整输出: {buffer.spill_path}")
+            elif exit_code == 0 and cache_ttl > 0:
+                self.cache.put(cache_key, dict(result), command_paths(command), cache_ttl)
 
             if exit_code == 0:
                 print(f"✓ 命令执行成功 (退出码: {exit_code})")
@@ -232,19 +280,157 @@ class TopupSSH:
                 'error': str(e)
             }
     
-    def execute_interactive_command(self, command: str, completion_marker: str, timeout: int = 3600) -> Dict[str, Any]:
+    def _with_reconnect(self, operation, replayable: bool = True):
+        """
+        执行远程操作，连接中断时自动重连
+
+        Args:
+            operation: 无参数的可调用对象，执行一次远程操作
+            replayable: 连接中断后是否重新执行该操作
+
+        Returns:
+            operation 的返回值
+        """
+        replay_attempts = getattr(config, 'SSH_POOL_CONFIG', {}).get('replay_attempts', 2)
+        attempts = 0
+        while True:
+            if not self.pool.ensure_alive():
+                raise ConnectionError('SSH连接不可用，重连失败')
+            self._refresh_connection()
+            generation = self.pool.generation
+            try:
+                return operation()
+            except Exception as e:
+                if not self._is_connection_error(e):
+                    raise
+                print(f"✗ SSH连接中断: {str(e)}")
+                if not self.pool.probe():
+                    self.pool.reconnect(generation)
+                    self._refresh_connection()
+                if not replayable or attempts >= replay_attempts:
+                    raise
+                attempts += 1
+                print(f"重新执行（第 {attempts}/{replay_attempts} 次）")
+
+    def _exec_channel(self, command: str, timeout: float, sample: Dict[str, Any], use_pty: bool = False
+                      ) -> Tuple[Optional[int], OutputBuffer, OutputBuffer]:
+        """
+        在新通道中执行一条命令并读取全部输出（一次往返，计入统计样本）
+
+        Args:
+            command: 要执行的命令
+            timeout: 超时时间（秒）
+            sample: 统计样本
+            use_pty: 是否使用PTY伪终端
+
+        Returns:
+            tuple: (退出码, stdout缓冲, stderr缓冲)，超时时退出码为None
+        """
+        with self.pool.lease_channel() as channel:
+            self._note_channel(sample, channel)
+            if use_pty:
+                channel.get_pty()
+            channel.exec_command(command)
+
+            # 边执行边读取stdout/stderr，收到退出码后立即返回
+            return self._drain_channel(channel, timeout)
+
+    def _note_channel(self, sample: Dict[str, Any], channel: paramiko.Channel):
+        """把一次通道往返（排队等待、通道号）计入统计样本"""
+        sample['queue_wait'] += self.pool.last_queue_wait()
+        sample['channel'] = channel.get_id()
+        sample['round_trips'] += 1
+
+    def _is_connection_error(self, error: Exception) -> bool:
+        """判断异常是否由连接中断引起（等待通道名额超时不算）"""
+        if isinstance(error, TimeoutError):
+            return False
+        return isinstance(error, (paramiko.SSHException, EOFError, ConnectionError)) or not self.pool.is_active()
+
+    def _refresh_connection(self):
+        """重连后同步连接池中的最新连接对象"""
+        self.ssh1 = self.pool.ssh1
+        self.ssh2 = self.pool.ssh2
+        self.transport = self.pool.transport
+
+    def _drain_channel(self, channel: paramiko.Channel, timeout: float
+                       ) -> Tuple[Optional[int], OutputBuffer, OutputBuffer]:
+        """
+        事件驱动地等待命令结束，同时持续读取stdout和stderr
+
+        通过 selectors 等待通道可读事件，命令运行期间就把输出读走，
+        避免输出填满通道窗口后远端阻塞（如对大目录 ls -la、cat 大文件）；
+        收到退出码后立即返回，不再按固定间隔轮询。
+        输出写入有界内存的 OutputBuffer，超过 OUTPUT_BUFFER_CONFIG 上限的部分写入本地临时文件。
+
+        Args:
+            channel: 已执行 exec_command 的会话通道
+            timeout: 超时时间（秒）
+
+        Returns:
+            tuple: (退出码, stdout缓冲, stderr缓冲)，超时时退出码为None
+        """
+        stdout = OutputBuffer()
+        stderr = OutputBuffer()
+        deadline = time.monotonic() + timeout
+
+        selector = selectors.DefaultSelector()
+        selector.register(channel, selectors.EVENT_READ)
+        try:
+            while True:
+                while channel.recv_ready():
+                    stdout.write_bytes(channel.recv(_RECV_CHUNK_SIZE))
+                while channel.recv_stderr_ready():
+                    stderr.write_bytes(channel.recv_stderr(_RECV_CHUNK_SIZE))
+
+                if channel.exit_status_ready():
+                    # SSH协议保证退出码在全部数据之后到达，此时缓冲区中的数据即为完整输出
+                    while channel.recv_ready():
+                        stdout.write_bytes(channel.recv(_RECV_CHUNK_SIZE))
+                    while channel.recv_stderr_ready():
+                        stderr.write_bytes(channel.recv_stderr(_RECV_CHUNK_SIZE))
+                    if channel.exit_status == -1 and not channel.get_transport().is_active():
+                        # 传输断开时通道被关闭，没有收到真正的退出码
+                        raise ConnectionError('SSH连接已断开')
+                    return channel.recv_exit_status(), stdout, stderr
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # 超时，关闭通道
+                    channel.close()
+                    return None, stdout, stderr
+
+                if channel.eof_received:
+                    # EOF之后通道一直处于可读状态，改为直接等待退出码事件
+                    channel.status_event.wait(remaining)
+                else:
+                    selector.select(remaining)
+        finally:
+            selector.close()
+
+    def execute_interactive_command(self, command: str, completion_marker: str, timeout: int = 3600,
+                                    error_patterns: Optional[List[str]] = None,
+                                    on_chunk: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """
         使用交互式shell执行命令
 
+        从连接池取得预热好的交互式shell（环境已加载，通过就绪标记确认可用，不再固定等待），
+        阻塞读取输出直到完成标记或错误标记出现且命令结束；命令正常结束的shell归还连接池供下次复用。
+        标记在滚动窗口上匹配，跨两次读取也能识别；输出保存在有界内存缓冲中，过长时写入临时文件。
+
         Args:
             command: 要执行的命令
-            completion_marker: 完成标记字符串，检测到此字符串时关闭shell（必选）
+            completion_marker: 完成标记字符串，检测到此字符串时视为命令完成（必选）
             timeout: 超时时间（秒），默认3600秒（1小时）
+            error_patterns: 错误标记正则表达式列表，先于完成标记出现时视为失败，
+                            默认使用 config.SHELL_POOL_CONFIG['error_patterns']
+            on_chunk: 每收到一段输出时调用的回调（用于实时显示进度）
 
         Returns:
-            dict: 执行结果，包含success, message, output, error
+            dict: 执行结果，包含success, message, output, error，
+                  以及 matched_pattern（匹配到的标记文本）；输出写入临时文件时包含 output_file
         """
-        if not self.connected or self.ssh2 is None:
+        if not self._ready():
             return {
                 'success': False,
                 'message': 'SSH未连接',
@@ -252,73 +438,103 @@ class TopupSSH:
                 'error': 'SSH连接未建立'
             }
         
+        # 交互式命令（genJob.sh 等）视为写操作
+        self.cache.invalidate_command(command)
+
         try:
-            # 创建交互式shell
-            shell = self.ssh2.invoke_shell()
-            time.sleep(2)  # 等待shell初始化
-            
-            # 清空初始输出
-            while shell.recv_ready():
-                shell.recv(4096)
-            
+            # 提交类命令不自动重放，但执行前先确认连接存活，避免在已断开的连接上提交
+            if not self.pool.ensure_alive():
+                raise ConnectionError('SSH连接不可用，重连失败')
+            self._refresh_connection()
+
+            shell_config = getattr(config, 'SHELL_POOL_CONFIG', {})
+            if error_patterns is None:
+                error_patterns = shell_config.get('error_patterns', [])
+            patterns = {'success': re.escape(completion_marker)}
+            if error_patterns:
+                patterns['error'] = '|'.join(f"(?:{pattern})" for pattern in error_patterns)
+
             # 发送命令
             print(f"\n执行命令: {command}")
             print(f"完成标记: {completion_marker}")
-            
+
             # 记录命令到日志
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug(f"{command} (交互式)")
                 logger.debug(f"完成标记: {completion_marker}")
-            
-            shell.send(f"{command}\n")
 
-            # 读取输出（带时间限制）
-            full_output = ""
-            start_time = time.time()
+            def show_chunk(chunk: str):
+                print(chunk, end='', flush=True)
+                if on_chunk:
+                    on_chunk(chunk)
+
+            # 取得交互式shell（占用连接池中的一个通道），执行完毕后归还
+            with command_metrics.measure('interactive', command, path=self.pool.path_label) as sample:
+                wait_start = time.monotonic()
+                shell = self.pool.acquire_shell()
+                sample['queue_wait'] = time.monotonic() - wait_start
+                sample['channel'] = shell.channel.get_id()
+                reusable = False
+                try:
+                    run = shell.run(
+                        command,
+                        patterns,
+                        timeout=timeout,
+                        settle_timeout=shell_config.get('settle_timeout', 0),
+                        on_chunk=show_chunk
+                    )
+                    reusable = run['finished']
+                finally:
+                    self.pool.release_shell(shell, reusable)
+                # 交互式shell的输出已解码，按字符数统计
+                sample.update(exit_code=run['exit_code'], bytes_in=run['output'].total_chars)
+                if run['matched'] != 'success':
+                    sample['error'] = run['match_text'] or ('输出读取超时' if run['timed_out'] else '未检测到完成标记')
+            self.pool.warm_shells()
+
+            buffer = run['output']
+            buffer.close()
+            full_output = buffer.getvalue()
 
-            while True:
-                # 检查是否超时
-                elapsed_time = time.time() - start_time
-                if elapsed_time > timeout:
-                    print(f"\n✗ 输出读取超时（{timeout}秒）")
-                    shell.close()
-
-                    # 记录超时到日志
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(f"输出读取超时（{timeout}秒）")
-
-                    return {
-                        'success': False,
-                        'message': f'输出读取超时（{timeout}秒）',
-                        'output': full_output,
-                        'error': '输出读取超时'
-                    }
-
-                if shell.recv_ready():
-                    chunk = shell.recv(4096).decode('utf-8', errors='ignore')
-                    full_output += chunk
-                    print(chunk, end='', flush=True)
-
-                    # 检查是否在输出中检测到完成标记
-                    if completion_marker in chunk:
-                        print(f"\n✓ 检测到完成标记: {completion_marker}")
-                        break
-                time.sleep(0.1)
-            
-            # 关闭shell
-            shell.close()
-            
             # 记录输出到日志
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug(f"输出:\n{full_output}")
-            
+
             result = {
-                'success': True,
-                'message': '命令执行完成',
-                'output': full_output
+                'output': full_output,
+                'matched_pattern': run['match_text']
             }
-            
-            print(f"\n✓ 命令执行完成")
+            if buffer.spill_path:
+                result['output_file'] = buffer.spill_path
+
+            if run['matched'] == 'success':
+                print(f"\n✓ 检测到完成标记: {completion_marker}")
+                print(f"\n✓ 命令执行完成")
+                result.update({
+                    'success': True,
+                    'message': '命令执行完成'
+                })
+            elif run['matched'] == 'error':
+                print(f"\n✗ 检测到错误标记: {run['match_text']}")
+                result.update({
+                    'success': False,
+                    'message': f"检测到错误标记: {run['match_text']}",
+                    'error': run['match_text']
+                })
+            elif run['timed_out']:
+                print(f"\n✗ 输出读取超时（{timeout}秒）")
+                result.update({
+                    'success': False,
+                    'message': f'输出读取超时（{timeout}秒）',
+                    'error': '输出读取超时'
+                })
+            else:
+                print(f"\n✗ 命令已结束（退出码: {run['exit_code']}），未检测到完成标记: {completion_marker}")
+                result.update({
+                    'success': False,
+                    'message': f"命令已结束（退出码: {run['exit_code']}），未检测到完成标记",
+                    'error': '未检测到完成标记'
+                })
             return result
             
         except Exception as e:
@@ -336,18 +552,13 @@ class TopupSSH:
             }
     
     def close(self):
-        """关闭SSH连接"""
-        if self.ssh2:
-            self.ssh2.close()
-            self.ssh2 = None
-        
-        if self.ssh1:
-            self.ssh1.close()
-            self.ssh1 = None
-        
-        if self.transport:
-            self.transport.close()
-            self.transport = None
+        """关闭SSH连接（归还连接池租约，最后一个租约归还时才真正断开）"""
+        if self.connected:
+            self.pool.release()
+
+        self.ssh2 = None
+        self.ssh1 = None
+        self.transport = None
         
         self.connected = False
         print("SSH连接已关闭")
@@ -363,7 +574,7 @@ class TopupSSH:
         Returns:
             dict: 下载结果，包含success, message, error
         """
-        if not self.connected or self.ssh2 is None:
+        if not self._ready():
             return {
                 'success': False,
                 'message': 'SSH未连接',
@@ -371,18 +582,16 @@ class TopupSSH:
             }
         
         try:
-            # 创建SFTP客户端
-            sftp = self.ssh2.open_sftp()
-            
             print(f"\n使用SFTP下载文件:")
             print(f"  远程路径: {remote_path}")
             print(f"  本地路径: {local_path}")
             
-            # 下载文件
-            sftp.get(remote_path, local_path)
-            
-            # 关闭SFTP
-            sftp.close()
+            # 租用SFTP会话并下载文件（退出时自动关闭）
+            with command_metrics.measure('download', f"sftp {remote_path}", path=self.pool.path_label) as sample:
+                with self.pool.lease_sftp() as sftp:
+                    sample['queue_wait'] = self.pool.last_queue_wait()
+                    sftp.get(remote_path, local_path)
+                sample['bytes_in'] = os.path.getsize(local_path)
             
             print(f"✓ 文件下载成功")
             
@@ -401,6 +610,343 @@ class TopupSSH:
                 'error': str(e)
             }
     
+    def read_text(self, remote_path: str, encoding: str = 'utf-8', max_bytes: Optional[int] = None) -> str:
+        """
+        通过SFTP读取远程文本文件
+
+        Args:
+            remote_path: 远程文件路径
+            encoding: 文本编码（无法解码的字节被忽略）
+            max_bytes: 最多读取的字节数，默认读取整个文件
+
+        Returns:
+            str: 文件内容
+
+        Raises:
+            FileNotFoundError: 文件不存在
+        """
+        if not self._ready():
+            raise ConnectionError('SSH连接未建立')
+
+        def read_once():
+            with self.pool.lease_sftp() as sftp:
+                sample['queue_wait'] = self.pool.last_queue_wait()
+                with sftp.open(remote_path, 'rb') as remote_file:
+                    remote_file.prefetch()
+                    return remote_file.read(max_bytes) if max_bytes else remote_file.read()
+
+        with command_metrics.measure('sftp', f"read {remote_path}", path=self.pool.path_label) as sample:
+            data = self._with_reconnect(read_once)
+            sample['bytes_in'] = len(data)
+        return data.decode(encoding, errors='ignore')
+
+    def scan_tree(self, remote_dir: str, depth: int = 1) -> List[Dict[str, Any]]:
+        """
+        用一条 find 命令遍历远程目录树（一次往返）
+
+        Args:
+            remote_dir: 远程目录路径
+            depth: 遍历深度，1 表示只列出目录本身的内容
+
+        Returns:
+            list: 条目字典列表（path, size, mtime, is_dir），按路径排序
+
+        Raises:
+            IOError: 目录不存在或无法遍历
+        """
+        if not self._ready():
+            raise ConnectionError('SSH连接未建立')
+
+        root = remote_dir.rstrip('/') or '/'
+        command = f"find {shlex.quote(root)} -mindepth 1 -maxdepth {int(depth)} -printf '%p\\t%s\\t%T@\\t%y\\n'"
+        with command_metrics.measure('command', command, path=self.pool.path_label) as sample:
+            exit_code, stdout, stderr = self._with_reconnect(lambda: self._exec_channel(command, 120, sample))
+            sample.update(exit_code=exit_code, bytes_in=stdout.total_bytes + stderr.total_bytes)
+        lines = stdout.getvalue().splitlines()
+        # 遍历过程中有文件被删除时 find 也返回非零退出码，只有没有任何输出时才视为失败
+        if exit_code != 0 and not lines:
+            raise IOError(stderr.getvalue().strip() or f"无法遍历目录: {remote_dir}")
+        entries = []
+        for line in lines:
+            parts = line.rsplit('\t', 3)
+            if len(parts) == 4:
+                entries.append({'path': parts[0], 'size': int(parts[1]), 'mtime': int(float(parts[2])),
+                                'is_dir': parts[3] == 'd'})
+        return sorted(entries, key=lambda entry: entry['path'])
+
+    def dir_signatures(self, remote_dirs: List[str]) -> Dict[str, Optional[List]]:
+        """
+        用一条命令获取多个目录的修改时间和条目数（判断目录内容是否变化）
+
+        Args:
+            remote_dirs: 远程目录路径列表
+
+        Returns:
+            dict: 路径 -> [修改时间, 条目数]，目录不存在为None
+        """
+        if not self._ready():
+            raise ConnectionError('SSH连接未建立')
+
+        paths = ' '.join(shlex.quote(path) for path in remote_dirs)
+        command = (f"for d in {paths}; do printf '%s\\t%s\\t%s\\n' \"$d\" "
+                   f"\"$(find \"$d\" -maxdepth 0 -type d -printf '%T@' 2>/dev/null)\" \"$(ls -A \"$d\" 2>/dev/null | wc -l)\"; done")
+        with command_metrics.measure('command', command, path=self.pool.path_label) as sample:
+            exit_code, stdout, stderr = self._with_reconnect(lambda: self._exec_channel(command, 60, sample))
+            sample.update(exit_code=exit_code, bytes_in=stdout.total_bytes + stderr.total_bytes)
+        if exit_code != 0:
+            raise IOError(stderr.getvalue().strip() or '获取目录状态失败')
+        result: Dict[str, Optional[List]] = {path: None for path in remote_dirs}
+        for line in stdout.getvalue().splitlines():
+            parts = line.rsplit('\t', 2)
+            if len(parts) == 3 and parts[0] in result and parts[1]:
+                result[parts[0]] = [float(parts[1]), int(parts[2])]
+        return result
+
+    def file_events(self, directories: List[str]) -> FileEventStream:
+        """
+        启动远程文件事件流（见 file_events.py），调用方用完后需要 close()
+
+        Args:
+            directories: 要监视的远程目录列表
+
+        Returns:
+            FileEventStream: 已启动的事件流
+
+        Raises:
+            ConnectionError: 未连接或监视进程启动失败
+        """
+        if not self._ready():
+            raise ConnectionError('SSH连接未建立')
+        stream = FileEventStream(self.pool, directories)
+        stream.start()
+        return stream
+
+    def upload_many(self, files: Dict[str, Union[str, bytes]], encoding: str = 'utf-8',
+                    mode: Optional[int] = None) -> Dict[str, Any]:
+        """
+        通过一个SFTP会话批量上传文件内容（每个文件写入临时文件后原子改名）
+
+        替代 echo ... >> 文件、sed/sort 改写等shell命令：在本地修改好内容后一次调用写回，
+        内容不经过shell引号转义，读取方不会看到写了一半的文件。
+
+        Args:
+            files: 远程路径 -> 文件内容（str 按 encoding 编码，bytes 原样写入）
+            encoding: 文本内容的编码
+            mode: 新建文件的权限（如 0o644），已存在的文件保留原权限
+
+        Returns:
+            dict: 上传结果，包含success, message, files（远程路径 -> 写入的字节数）, bytes, error
+        """
+        if not self._ready():
+            return {
+                'success': False,
+                'message': 'SSH未连接',
+                'error': 'SSH连接未建立'
+            }
+
+        payload = {path: data.encode(encoding) if isinstance(data, str) else data for path, data in files.items()}
+        print(f"\n上传 {len(payload)} 个文件（临时文件 + 原子改名）:")
+        for path, data in payload.items():
+            print(f"  {path} ({len(data)} 字节)")
+
+        def upload_once():
+            with self.pool.lease_sftp() as sftp:
+                sample['queue_wait'] = self.pool.last_queue_wait()
+                return {path: self._write_atomic(sftp, path, data, mode) for path, data in payload.items()}
+
+        try:
+            with command_metrics.measure('upload', f"sftp {' '.join(payload)}", path=self.pool.path_label) as sample:
+                # 写入同样的内容可以安全地重复执行
+                written = self._with_reconnect(upload_once)
+                sample['bytes_out'] += sum(written.values())
+        except Exception as e:
+            print(f"✗ 文件上传失败: {str(e)}")
+            return {
+                'success': False,
+                'message': f'文件上传失败: {str(e)}',
+                'error': str(e)
+            }
+        finally:
+            self.cache.invalidate(list(payload))
+
+        print("✓ 文件上传成功")
+        return {
+            'success': True,
+            'message': f'成功上传 {len(written)} 个文件',
+            'files': written,
+            'bytes': sum(written.values())
+        }
+
+    def write_text_atomic(self, remote_path: str, text: str, encoding: str = 'utf-8',
+                          mode: Optional[int] = None) -> Dict[str, Any]:
+        """
+        原子地写入远程文本文件（写入临时文件后改名覆盖）
+
+        Args:
+            remote_path: 远程文件路径
+            text: 文件内容
+            encoding: 文本编码
+            mode: 新建文件的权限，已存在的文件保留原权限
+
+        Returns:
+            dict: 上传结果，包含success, message, files, bytes, error（见 upload_many）
+        """
+        return self.upload_many({remote_path: text}, encoding=encoding, mode=mode)
+
+    @staticmethod
+    def _write_atomic(sftp: paramiko.SFTPClient, path: str, data: bytes, mode: Optional[int]) -> int:
+        """写入同目录下的临时文件后改名覆盖目标文件（保留已存在文件的权限），返回写入的字节数"""
+        directory, name = posixpath.split(path)
+        temp_path = posixpath.join(directory, f".{name}.tmp-{uuid.uuid4().hex[:8]}")
+        try:
+            existing_mode = sftp.stat(path).st_mode
+        except FileNotFoundError:
+            existing_mode = None
+        try:
+            with sftp.open(temp_path, 'wb') as remote_file:
+                remote_file.set_pipelined(True)
+                remote_file.write(data)
+            if existing_mode is not None or mode is not None:
+                sftp.chmod(temp_path, stat_module.S_IMODE(existing_mode) if existing_mode is not None else mode)
+            try:
+                sftp.posix_rename(temp_path, path)
+            except IOError as e:
+                # 服务器不支持 posix-rename 扩展时先删除目标再改名
+                if 'unsupported' not in str(e).lower():
+                    raise
+                try:
+                    sftp.remove(path)
+                except IOError:
+                    pass
+                sftp.rename(temp_path, path)
+        except Exception:
+            try:
+                sftp.remove(temp_path)
+            except IOError:
+                pass
+            raise
+        return len(data)
+
+    def read_appended(self, positions: Dict[str, int], max_bytes: Optional[int] = None,
+                      final: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        读取多个远程文件从指定偏移开始新增的完整行（共用一个SFTP会话）
+
+        Args:
+            positions: 路径 -> 已读取的字节偏移（-1 表示从文件当前末尾开始）
+            max_bytes: 每个文件本次最多读取的字节数，默认使用 config.LOG_FOLLOW_CONFIG['read_limit']
+            final: 是否返回末尾不完整的行
+
+        Returns:
+            dict: 路径 -> {exists, size, offset, next_offset, lines, truncated, remaining}（见 log_follow.read_appended）
+        """
+        if not self._ready():
+            raise ConnectionError('SSH连接未建立')
+
+        def read_once():
+            with self.pool.lease_sftp() as sftp:
+                sample['queue_wait'] = self.pool.last_queue_wait()
+                return log_follow.read_appended(sftp, positions, read_limit=max_bytes, final=final)
+
+        with command_metrics.measure('sftp', f"tail {' '.join(positions)}", path=self.pool.path_label) as sample:
+            results = self._with_reconnect(read_once)
+            sample['round_trips'] = sum(entry.pop('requests') for entry in results.values())
+            sample['bytes_in'] = sum(entry['next_offset'] - entry['offset'] for entry in results.values())
+        return results
+
+    def follow(self, paths: List[str], on_line: Optional[Callable[[str, str], None]] = None,
+               consumer: str = 'default', from_start: bool = True, duration: float = 0,
+               interval: Optional[float] = None, until: Optional[Callable[[], bool]] = None,
+               final: bool = False) -> Dict[str, Any]:
+        """
+        跟踪一个或多个远程文件，只读取上次调用之后新增的内容并逐行交给回调
+
+        每个跟踪者（consumer）的偏移保存在本地状态文件中（config.LOG_FOLLOW_CONFIG['state_file']），
+        下次调用（或进程重启后）从上次的位置继续；文件变短时视为被截断或替换，从头读取。
+        尚不存在的文件记为偏移0，出现后从头读取。
+
+        Args:
+            paths: 远程文件路径列表
+            on_line: 行回调 on_line(路径, 行)，不指定时新增的行在结果的 lines 中返回
+            consumer: 跟踪者名称（不同跟踪者的偏移互不影响）
+            from_start: 首次跟踪已存在的文件时是否从头读取，False 表示只读取之后新增的内容
+            duration: 持续跟踪的秒数，0 表示只读取一次当前新增的内容
+            interval: 持续跟踪时的读取间隔（秒），默认使用 config.LOG_FOLLOW_CONFIG['poll_interval']
+            until: 持续跟踪时每次读取后调用，返回True时提前结束
+            final: 是否返回末尾不完整的行（确认文件不会再增长时使用）
+
+        Returns:
+            dict: 包含success, message, files（路径 -> exists, size, offset, new_lines, truncated）,
+                  line_count，以及未指定 on_line 时的 lines（路径 -> 新增的行）
+        """
+        settings = log_follow.follow_config()
+        interval = settings['poll_interval'] if interval is None else interval
+        stored = log_follow.offset_store.get(consumer)
+        positions = {path: stored[path]['offset'] if path in stored else (0 if from_start else -1) for path in paths}
+        files = {path: {'exists': False, 'size': 0, 'offset': max(0, position), 'new_lines': 0, 'truncated': False}
+                 for path, position in positions.items()}
+        collected: Dict[str, List[str]] = {path: [] for path in paths}
+        deadline = time.monotonic() + duration
+
+        try:
+            while True:
+                results = self.read_appended(positions, final=final)
+                for path, entry in results.items():
+                    if entry['truncated']:
+                        print(f"⚠ {path} 变短（被截断或替换），从头读取")
+                    for line in entry['lines']:
+                        if on_line is None:
+                            collected[path].append(line)
+                        else:
+                            on_line(path, line)
+                    positions[path] = entry['next_offset']
+                    files[path].update(exists=entry['exists'], size=entry['size'], offset=entry['next_offset'],
+                                       new_lines=files[path]['new_lines'] + len(entry['lines']),
+                                       truncated=files[path]['truncated'] or entry['truncated'])
+                log_follow.offset_store.update(consumer, {
+                    path: {'offset': positions[path], 'size': results[path]['size']} for path in paths
+                })
+
+                # 达到单次读取上限的文件立即继续读取
+                if any(entry['remaining'] > 0 for entry in results.values()):
+                    continue
+                if time.monotonic() >= deadline or (until is not None and until()):
+                    break
+                time.sleep(max(0.0, min(interval, deadline - time.monotonic())))
+        except Exception as e:
+            print(f"✗ 跟踪远程文件失败: {str(e)}")
+            return {
+                'success': False,
+                'message': f'跟踪远程文件失败: {str(e)}',
+                'files': files,
+                'error': str(e)
+            }
+
+        line_count = sum(item['new_lines'] for item in files.values())
+        result = {
+            'success': True,
+            'message': f'读取到 {line_count} 行新内容',
+            'files': files,
+            'line_count': line_count
+        }
+        if on_line is None:
+            result['lines'] = collected
+        return result
+
+    def reset_follow(self, paths: Optional[List[str]] = None, consumer: str = 'default'):
+        """
+        清除跟踪偏移，之后从头读取
+
+        Args:
+            paths: 要清除的路径，默认清除该跟踪者的全部偏移
+            consumer: 跟踪者名称
+        """
+        log_follow.offset_store.reset(consumer, paths)
+
+    def _ready(self) -> bool:
+        """是否已建立连接（可以执行远程操作）"""
+        return self.connected and self.ssh2 is not None
+
     def __enter__(self):
         """上下文管理器入口"""
         self.connect()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步SSH模块
+在 TopupSSH 之上提供 asyncio 接口，多条互不依赖的远程命令/查询可以并发执行，
+共用连接池中的同一条双跳传输（每条命令占用一个通道）
+
+示例:
+    async with AsyncTopupSSH() as ssh:
+        results = await asyncio.gather(*(ssh.run(f"ls {path}") for path in paths))
+"""
+
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List
+
+import config
+from topup_ssh import TopupSSH
+from local_executor import create_executor
+from remote_fs import RemoteFileEntry
+
+
+class AsyncTopupSSH:
+    """
+    TopupSSH 的 asyncio 包装
+
+    每个远程操作在专用线程池中调用同步的 TopupSSH 方法，线程数即并发上限，
+    因此可以放心地对任意多个协程使用 asyncio.gather，同时在执行的远程操作不会超过上限，
+    其余操作排队等待。并发上限不超过连接池的 max_channels。
+    """
+
+    def __init__(self, ssh: Optional[TopupSSH] = None, max_concurrency: Optional[int] = None):
+        """
+        初始化异步SSH
+
+        Args:
+            ssh: 已有的 TopupSSH 实例，默认新建（共用进程级连接池）
+            max_concurrency: 同时执行的远程操作上限，默认使用 config.ASYNC_SSH_CONFIG
+        """
+        self.ssh = ssh or create_executor()
+        if max_concurrency is None:
+            max_concurrency = getattr(config, 'ASYNC_SSH_CONFIG', {}).get('max_concurrency', 4)
+        self.max_concurrency = max(1, min(max_concurrency, self.ssh.pool.max_channels))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                            thread_name_prefix='async-ssh')
+
+    @property
+    def connected(self) -> bool:
+        """是否已连接"""
+        return self.ssh.connected
+
+    async def _call(self, function, *args, **kwargs):
+        """在线程池中执行同步方法（在调用方的上下文中执行，沿用其步骤标记，见 ssh_metrics）"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, functools.partial(context.run, function, *args, **kwargs))
+
+    async def connect(self) -> bool:
+        """
+        建立SSH双跳连接
+
+        Returns:
+            bool: 连接是否成功
+        """
+        return await self._call(self.ssh.connect)
+
+    async def run(self, command: str, timeout: int = 600, use_pty: bool = False,
+                  idempotent: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        执行远程命令（参数和返回值同 TopupSSH.execute_command，失败时不抛异常）
+
+        Args:
+            command: 要执行的命令
+            timeout: 超时时间（秒）
+            use_pty: 是否使用PTY伪终端
+            idempotent: 命令是否可安全重放，默认自动判断
+
+        Returns:
+            dict: 执行结果，包含success, message, exit_code, output, error
+        """
+        return await self._call(self.ssh.execute_command, command, timeout=timeout,
+                                use_pty=use_pty, idempotent=idempotent)
+
+    async def run_many(self, commands: List[str], timeout: int = 600) -> List[Dict[str, Any]]:
+        """
+        并发执行多条互不依赖的命令
+
+        Args:
+            commands: 命令列表
+            timeout: 每条命令的超时时间（秒）
+
+        Returns:
+            list: 与commands一一对应的结果列表
+        """
+        return list(await asyncio.gather(*(self.run(command, timeout=timeout) for command in commands)))
+
+    async def run_interactive(self, command: str, completion_marker: str, timeout: Optional[int] = None,
+                              error_patterns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """执行交互式命令（参数和返回值同 TopupSSH.execute_interactive_command）"""
+        return await self._call(self.ssh.execute_interactive_command, command, completion_marker,
+                                timeout=timeout, error_patterns=error_patterns)
+
+    async def stat(self, remote_path: str) -> Optional[RemoteFileEntry]:
+        """获取远程文件属性，文件不存在时返回None"""
+        return await self._call(self.ssh.stat, remote_path)
+
+    async def listdir_attr(self, remote_dir: str) -> List[RemoteFileEntry]:
+        """列出远程目录内容"""
+        return await self._call(self.ssh.listdir_attr, remote_dir)
+
+    async def exists_many(self, remote_paths: List[str]) -> Dict[str, bool]:
+        """批量检查远程文件是否存在"""
+        return await self._call(self.ssh.exists_many, remote_paths)
+
+    async def glob(self, pattern: str) -> List[RemoteFileEntry]:
+        """按shell通配符匹配远程文件"""
+        return await self._call(self.ssh.glob, pattern)
+
+    async def read_text(self, remote_path: str, encoding: str = 'utf-8',
+                        max_bytes: Optional[int] = None) -> str:
+        """读取远程文本文件"""
+        return await self._call(self.ssh.read_text, remote_path, encoding=encoding, max_bytes=max_bytes)
+
+    async def download_file(self, remote_path: str, local_path: str) -> Dict[str, Any]:
+        """下载远程文件（返回值同 TopupSSH.download_file）"""
+        return await self._call(self.ssh.download_file, remote_path, local_path)
+
+    async def close(self):
+        """关闭连接并停止线程池（等待正在执行的操作结束）"""
+        await self._call(self.ssh.close)
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        """异步上下文管理器入口"""
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """异步上下文管理器出口"""
+        await self.close()
+        return False
+
+
+if __name__ == "__main__":
+    # 测试并发执行
+    async def main():
+        async with AsyncTopupSSH() as ssh:
+            if ssh.connected:
+                results = await ssh.run_many(["hostname", "whoami", "date"])
+                print("\n" + "=" * 60)
+                for result in results:
+                    print(result['output'].strip() if result['success'] else result['error'])
+
+    asyncio.run(main())
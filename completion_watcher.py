@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+作业完成检查模块
+根据 config.REQUIRED_FILES_STEP* 中的文件模板，在本地计算所有run号的文件齐全情况，
+供各步骤的等待循环共用。每次检查先获取相关目录的修改时间和条目数，
+目录未变化时沿用上次结果，否则只重新列出变化的目录（辅助进程的 scan 查询，不可用时为 find 命令）。
+可选由远程监视进程推送文件事件（file_events.py），文件生成后立即更新结果
+"""
+
+import time
+import fnmatch
+import posixpath
+from typing import Dict, Any, List, Optional, Callable, Iterable
+
+from poll_schedule import PollSchedule
+from file_events import FileEventStream, events_config
+
+
+_UNSEEN = object()  # 尚未获取过状态的目录
+
+
+def _has_magic(name: str) -> bool:
+    """是否包含通配符"""
+    return any(char in name for char in '*?[')
+
+
+class _Wildcard(dict):
+    """模板中 {run} 以外的占位符（如 {node}）按通配符 * 处理"""
+
+    def __missing__(self, key):
+        return '*'
+
+
+class CompletionWatcher:
+    """
+    作业完成检查器
+
+    模板为相对作业目录的文件名，可以包含子目录（如 '{run}/hist*.root'），
+    遍历深度按模板自动确定。
+    """
+
+    def __init__(self, ssh, directory: str, runs: List[str], templates: Dict[str, str],
+                 keys: Optional[Iterable[str]] = None, count_match: Optional[Dict[str, str]] = None,
+                 step: Optional[str] = None):
+        """
+        Args:
+            ssh: TopupSSH 实例
+            directory: 作业目录
+            runs: run号列表
+            templates: 文件模板字典（键 -> 文件名模板）
+            keys: 需要检查的模板键，默认检查全部
+            count_match: 数量要求 {键: 参照键}，该键匹配的文件数不少于参照键的文件数（且至少一个），
+                         如 {'hist_file': 'job_file'}；其余键至少匹配一个文件
+            step: 步骤标识（如 '1.1'），用于按历史等待时长预测剩余时间
+        """
+        self.ssh = ssh
+        self.directory = directory.rstrip('/') or '/'
+        self.runs = list(runs)
+        self.templates = templates
+        self.keys = list(keys) if keys is not None else list(templates)
+        self.count_match = count_match or {}
+        self.step = step
+        self.depth = max(templates[key].count('/') for key in self._used_keys()) + 1
+        self._signatures: Dict[str, Any] = {}            # 相对目录 -> [修改时间, 条目数]
+        self._files_by_dir: Dict[str, List[str]] = {}    # 相对目录 -> 文件名列表
+        self._event_dirs: Dict[str, str] = {}            # 监视的目录路径 -> 相对目录
+
+    def _used_keys(self) -> List[str]:
+        """需要统计匹配数的模板键（检查的键和数量参照键）"""
+        return self.keys + [key for key in self.count_match.values() if key not in self.keys]
+
+    def pattern(self, key: str, run: str) -> str:
+        """某个run号的文件名（或通配符）"""
+        return self.templates[key].format_map(_Wildcard(run=run))
+
+    def exists(self, name: str) -> bool:
+        """最近一次检查时作业目录中是否存在该文件（相对路径）"""
+        parent, base = posixpath.split(name)
+        return base in self._files_by_dir.get(parent, [])
+
+    def count(self, pattern: str) -> int:
+        """最近一次检查时匹配该模板的文件数（相对路径）"""
+        return self._count(self._files_by_dir, pattern)
+
+    def scan(self, runs: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        检查run号的文件是否齐全
+
+        先获取相关目录的修改时间和条目数（一次查询），只重新列出发生变化的目录，
+        全部未变化时沿用上次的目录内容。
+
+        Args:
+            runs: 要检查的run号，默认检查全部
+
+        Returns:
+            dict: complete_runs, incomplete_runs, missing（run号 -> 缺少的文件列表），
+                  changed（是否有目录发生变化）
+        """
+        runs = runs if runs is not None else self.runs
+        changed = self._refresh(runs)
+        return dict(self._evaluate(runs), changed=changed)
+
+    def _evaluate(self, runs: List[str]) -> Dict[str, Any]:
+        """按当前目录内容快照计算run号的文件齐全情况（不访问远程）"""
+        complete_runs, incomplete_runs, missing = [], [], {}
+        for run in runs:
+            counts = {key: self._count(self._files_by_dir, self.pattern(key, run)) for key in self._used_keys()}
+            lacking = []
+            for key in self.keys:
+                reference = self.count_match.get(key)
+                if reference is not None:
+                    if counts[key] == 0 or counts[key] < counts[reference]:
+                        lacking.append(f"{self.pattern(key, run)} ({counts[key]}/{counts[reference]})")
+                elif counts[key] == 0:
+                    lacking.append(self.pattern(key, run))
+            if lacking:
+                incomplete_runs.append(run)
+                missing[run] = lacking
+            else:
+                complete_runs.append(run)
+
+        return {'complete_runs': complete_runs, 'incomplete_runs': incomplete_runs, 'missing': missing}
+
+    def _parents(self, runs: List[str]) -> List[str]:
+        """模板所在的相对目录（'' 为作业目录本身）"""
+        return sorted({posixpath.dirname(self.pattern(key, run)) for key in self._used_keys() for run in runs})
+
+    def _refresh(self, runs: List[str]) -> bool:
+        """
+        更新目录内容快照
+
+        Returns:
+            bool: 是否重新列出了目录
+        """
+        parents = self._parents(runs)
+        if any(_has_magic(parent) for parent in parents):
+            # 子目录名含通配符时无法逐个比较，每次遍历整个目录树
+            self._files_by_dir = self._list_tree()
+            return True
+
+        paths = {parent: posixpath.join(self.directory, parent) if parent else self.directory for parent in parents}
+        answer = self.ssh.query_many([{'op': 'dirstat', 'paths': list(paths.values())}])[0]
+        if not answer['success']:
+            raise IOError(answer['error'] or '获取目录状态失败')
+        signatures = {parent: answer['value'].get(path) for parent, path in paths.items()}
+        changed = [parent for parent in parents if signatures[parent] != self._signatures.get(parent, _UNSEEN)]
+        if not changed:
+            return False
+
+        if len(changed) == len(parents) and len(parents) > 1:
+            # 全部变化（如第一次检查）时一次遍历整个目录树
+            self._files_by_dir = self._list_tree()
+        else:
+            existing = [parent for parent in changed if signatures[parent] is not None]
+            answers = self.ssh.query_many([{'op': 'scan', 'path': paths[parent], 'depth': 1} for parent in existing])
+            for parent, answer in zip(existing, answers):
+                if not answer['success']:
+                    raise IOError(answer['error'] or f"无法列出目录: {paths[parent]}")
+                self._files_by_dir[parent] = [entry.name for entry in answer['value']]
+            for parent in changed:
+                if signatures[parent] is None:
+                    self._files_by_dir[parent] = []
+        self._signatures.update(signatures)
+        return True
+
+    def _list_tree(self) -> Dict[str, List[str]]:
+        """遍历整个作业目录树，返回 相对目录 -> 文件名列表"""
+        files_by_dir: Dict[str, List[str]] = {}
+        for entry in self.ssh.scan_tree(self.directory, self.depth):
+            parent, name = posixpath.split(posixpath.relpath(entry.path, self.directory))
+            files_by_dir.setdefault(parent, []).append(name)
+        return files_by_dir
+
+    @staticmethod
+    def _count(files_by_dir: Dict[str, List[str]], pattern: str) -> int:
+        """统计匹配模板的文件数"""
+        parent, name = posixpath.split(pattern)
+        candidates = files_by_dir.get(parent, [])
+        if not _has_magic(name):
+            return 1 if name in candidates else 0
+        return len(fnmatch.filter(candidates, name))
+
+    def _open_events(self) -> Optional[FileEventStream]:
+        """启动远程文件事件流，不可用时返回None（改用定期检查）"""
+        parents = self._parents(self.runs)
+        if any(_has_magic(parent) for parent in parents):
+            print("⚠ 子目录名含通配符，无法监视文件事件，使用定期检查")
+            return None
+        self._event_dirs = {posixpath.join(self.directory, parent) if parent else self.directory: parent
+                            for parent in parents}
+        try:
+            return self.ssh.file_events(list(self._event_dirs))
+        except Exception as e:
+            print(f"⚠ 文件事件不可用，使用定期检查: {str(e)}")
+            return None
+
+    def _apply_events(self, events: List[Dict[str, Any]]) -> int:
+        """
+        按文件事件更新目录内容快照
+
+        Returns:
+            int: 新增和删除的文件数
+        """
+        files = 0
+        for event in events:
+            parent = self._event_dirs.get(event['dir'])
+            if parent is None:
+                continue
+            names = self._files_by_dir.setdefault(parent, [])
+            for name in event.get('created', []):
+                if name not in names:
+                    names.append(name)
+            for name in event.get('removed', []):
+                if name in names:
+                    names.remove(name)
+            files += len(event.get('created', [])) + len(event.get('removed', []))
+            # 快照已不对应上次获取的目录状态，下一次完整检查时重新列出该目录
+            self._signatures.pop(parent, None)
+        return files
+
+    @staticmethod
+    def _receive(stream: FileEventStream, until: float) -> Optional[List[Dict[str, Any]]]:
+        """等待文件事件直到指定时刻（单调时钟），事件流中断时关闭并返回None"""
+        try:
+            return stream.wait(max(0.0, until - time.monotonic()))
+        except ConnectionError as e:
+            print(f"⚠ 文件事件流中断，改用定期检查: {str(e)}")
+            stream.close()
+            return None
+
+    def wait(self, max_wait_minutes: int, check_interval: Optional[int] = None,
+             abort: Optional[Callable[['CompletionWatcher'], Optional[str]]] = None,
+             events: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        定期检查，直到所有run号的文件都已生成或超时
+
+        检查间隔按进展调整（见 poll_schedule.PollSchedule），超时按单调时钟计算，包含检查本身的耗时。
+        使用文件事件时，第一次检查后改为等待远程监视进程推送的事件，在本地更新目录内容，
+        最后一个文件生成后立即返回；每隔 verify_interval 秒和到截止时间时仍做一次完整检查。
+        事件流无法启动或中途断开时自动改用定期检查。
+
+        Args:
+            max_wait_minutes: 最大等待时间（分钟）
+            check_interval: 基础检查间隔（秒），默认使用配置文件中的值
+            abort: 每次检查后调用，返回非空字符串时立即停止等待（如检测到数据异常文件）
+            events: 是否使用文件事件，默认使用 config.FILE_EVENTS_CONFIG['enabled']
+
+        Returns:
+            dict: complete_runs, incomplete_runs, missing, elapsed_time,
+                  eta_seconds（预计剩余秒数，无法预测时为None）, aborted（停止原因，未停止为None）
+        """
+        settings = events_config()
+        max_wait_seconds = max_wait_minutes * 60
+        schedule = PollSchedule(max_wait_seconds, len(self.runs), step=self.step, base_interval=check_interval)
+        if schedule.expected is not None:
+            print(f"历史等待时长（中位数）: {int(schedule.expected)}秒")
+
+        incomplete_runs = self.runs.copy()
+        missing: Dict[str, List[str]] = {}
+        aborted = None
+        stream = self._open_events() if (settings['enabled'] if events is None else events) else None
+        last_scan: Optional[float] = None  # 最近一次完整检查成功的时刻
+
+        try:
+            while True:
+                result = None
+                if stream is not None and last_scan is not None:
+                    # 等待文件事件，到完整检查时间或截止时间时转为完整检查
+                    received = self._receive(stream, min(schedule.deadline, last_scan + settings['verify_interval']))
+                    if received is None:
+                        stream = None
+                    elif received:
+                        files = self._apply_events(received)
+                        result = dict(self._evaluate(incomplete_runs), changed=True)
+                        newly_complete = [run for run in incomplete_runs if run in result['complete_runs']]
+                        incomplete_runs = result['incomplete_runs']
+                        missing = result['missing']
+                        print(f"\n文件事件: {files} 个文件变化，已等待 {int(schedule.elapsed())}/{max_wait_seconds}秒")
+                        if newly_complete:
+                            print(f"  新完成的run号: {newly_complete}")
+                        print(f"  已完成 {len(self.runs) - len(incomplete_runs)}/{len(self.runs)}")
+
+                if result is None:
+                    print(f"\n检查进度: {int(schedule.elapsed())}/{max_wait_seconds}秒")
+                    print(f"未完成的run号: {incomplete_runs}")
+
+                    try:
+                        result = self.scan(incomplete_runs)
+                        last_scan = time.monotonic()
+                    except Exception as e:
+                        print(f"  检查失败: {str(e)}")
+
+                    if result is not None and not result['changed']:
+                        print("  目录未变化，沿用上次检查结果")
+                    elif result is not None:
+                        incomplete_runs = result['incomplete_runs']
+                        missing = result['missing']
+                        for run in incomplete_runs:
+                            print(f"  Run {run}: 缺少 {', '.join(missing[run])}")
+                schedule.observe(len(self.runs) - len(incomplete_runs),
+                                 changed=result is not None and result['changed'])
+
+                if not incomplete_runs:
+                    print(f"\n✓ 所有 {len(self.runs)} 个run号的文件都已生成")
+                    schedule.finish()
+                    break
+
+                if result is not None and abort is not None:
+                    aborted = abort(self)
+                    if aborted:
+                        break
+
+                if schedule.expired():
+                    break
+
+                prediction = schedule.eta()
+                if stream is not None and result is not None:
+                    # 等待下一批文件事件（检查失败时仍按下面的间隔重试）
+                    if prediction is not None:
+                        print(f"  预计剩余: {int(prediction[0])}秒（依据{prediction[1]}），等待文件事件")
+                    continue
+
+                # 等待到下一次检查（没有进展时逐步退避，接近预计完成时间时加快）
+                interval = schedule.next_interval()
+                if prediction is not None:
+                    print(f"  预计剩余: {int(prediction[0])}秒（依据{prediction[1]}），{int(interval)}秒后再次检查")
+                else:
+                    print(f"  {int(interval)}秒后再次检查")
+                time.sleep(interval)
+        finally:
+            if stream is not None:
+                stream.close()
+
+        prediction = schedule.eta()
+        return {
+            'complete_runs': [run for run in self.runs if run not in incomplete_runs],
+            'incomplete_runs': incomplete_runs,
+            'missing': {run: missing[run] for run in incomplete_runs if run in missing},
+            'elapsed_time': int(schedule.elapsed()),
+            'eta_seconds': int(prediction[0]) if prediction is not None else None,
+            'aborted': aborted
+        }
@@ -80,12 +80,185 @@ SSH_CONFIG = {
             "username": "topup",
             "env_password": "SSH_PASS_BESLOGIN"
         }
+    },
+    # 其他候选跳板机和目标登录节点（只需写出与 server1/server2 不同的字段，如 {"host": "lxlogin02.ihep.ac.cn"}），
+    # 每个跳板机与每个目标节点组合为一条路径，按健康度选择（见 SSH_PATH_CONFIG）；为空时只使用 server1 → server2
+    "jump_hosts": [],
+    "targets": []
+}
+
+# 执行方式配置（local_executor.py）
+# ssh: 经 lxlogin → beslogin 双跳SSH执行；local: 编排程序直接运行在 beslogin 上时，用本地子进程和文件操作执行
+# 环境变量 TOPUP_EXECUTOR=ssh/local 或 run.py --executor 优先于 mode
+EXECUTOR_CONFIG = {
+    "mode": "ssh",
+    "shell": "/bin/bash",     # 本地执行命令和交互式shell使用的shell
+    "workdir": None,          # 命令的工作目录和相对路径的基准，None表示用户主目录（与SSH登录后一致）
+    "max_concurrency": 8      # 本地执行时 AsyncTopupSSH 的并发上限
+}
+
+# SSH连接池配置（同一进程内的TopupSSH实例共享一条双跳连接）
+SSH_POOL_CONFIG = {
+    "max_channels": 8,            # 同时租用的通道上限（beslogin sshd 默认 MaxSessions 为 10）
+    "idle_linger_seconds": 0,     # 最后一个租约归还后保留连接的秒数，0表示立即断开
+    "channel_wait_timeout": 300,  # 等待空闲通道的最长时间（秒）
+    "keepalive_interval": 30,     # SSH保活包间隔（秒），0表示关闭
+    "probe_after_idle_seconds": 60,  # 空闲超过该时间后，使用前先探测连接
+    "probe_timeout": 10,          # 连接探测超时（秒）
+    "reconnect_attempts": 5,      # 断线重连最大尝试次数
+    "reconnect_backoff_max": 30,  # 重连退避等待上限（秒）
+    "sftp_timeout": 120,          # 持久SFTP会话单个请求的响应超时（秒），0表示不限制
+    "replay_attempts": 2          # 只读/幂等命令因断线失败后的最大重放次数
+}
+
+# 连接路径选择配置（ssh_paths.py，多个跳板机/目标节点时按握手和通道往返耗时选择最快的健康路径）
+SSH_PATH_CONFIG = {
+    "state_file": os.path.join(os.path.dirname(__file__), ".ssh_path_health"),  # 路径健康度状态文件（下次运行沿用）
+    "ewma_alpha": 0.3,           # 耗时滑动平均中新样本的权重
+    "handshake_weight": 0.1,     # 健康分 = 通道往返耗时 + 握手耗时 × 该权重（毫秒）
+    "failure_cooldown": 60,      # 路径连接失败后的冷却时间（秒），连续失败时加倍
+    "max_cooldown": 1800,        # 冷却时间上限（秒）
+    "slow_threshold_ms": 2000,   # 通道往返耗时超过该值的路径视为慢路径，排在其他健康路径之后
+    "switch_when_slow": True,    # 当前路径变慢且有更快的路径时，在没有进行中的命令时切换
+    "spread_tolerance": 0.2,     # 健康分与最快路径相差不超过该比例的路径按当前连接数分摊
+    "stale_hours": 24            # 超过该时间未更新的耗时记录视为过期
+}
+
+# 传输参数方案（连接级：压缩、加密算法；通道级：流控窗口、最大包长）
+# latency 适合轮询等小命令，bulk 适合大输出和文件下载；可用 ssh_bench.py profiles 对比
+DEFAULT_TRANSPORT_PROFILE = "latency"
+TRANSPORT_PROFILES = {
+    "latency": {
+        "compress": False,
+        "ciphers": ["aes128-gcm@openssh.com", "aes128-ctr"],
+        "window_size": None,           # None表示paramiko默认值（2MB）
+        "max_packet_size": None
+    },
+    "bulk": {
+        "compress": True,
+        "ciphers": ["aes128-gcm@openssh.com", "aes128-ctr"],
+        "window_size": 16 * 1024 * 1024,
+        "max_packet_size": 32768
     }
 }
 
+# 异步SSH配置（AsyncTopupSSH）
+ASYNC_SSH_CONFIG = {
+    "max_concurrency": 6   # 同时执行的远程操作上限（不超过 SSH_POOL_CONFIG 的 max_channels）
+}
+
+# 只读查询缓存配置（ls 等只读命令和SFTP目录查询，写命令自动使相关路径失效）
+QUERY_CACHE_CONFIG = {
+    "enabled": True,
+    "default_ttl": 0,      # 未配置路径的缓存有效期（秒），0表示不缓存
+    "path_ttls": {         # 路径通配符模式 -> 有效期（秒），按查询路径匹配（*可跨越/）
+        DATA_DIR: 600,                               # 原始数据日期目录列表
+        INJ_SIG_TIME_CAL_DIR: 300,                   # 已处理日期目录列表
+        f"{SEARCH_PEAK_DIR}/run_*_3.txt": 300        # 步骤3.1生成的作业文件列表
+    },
+    "max_entries": 512     # 最多缓存的查询条数
+}
+
+# 远程辅助进程配置（批量文件系统查询，TopupSSH.query_many）
+REMOTE_AGENT_CONFIG = {
+    "enabled": True,              # False 时 query_many 直接使用普通命令
+    "remote_dir": ".topup_agent", # 辅助脚本的上传目录（相对路径相对于远程用户主目录）
+    "python": None,               # 远程python解释器，None表示优先python3，否则python
+    "start_timeout": 15,          # 等待辅助进程就绪的超时时间（秒）
+    "request_timeout": 60         # 单次批量查询的超时时间（秒）
+}
+
+# 本地SSH守护进程配置（ssh_daemon.py，类似 OpenSSH ControlMaster）
+SSH_DAEMON_CONFIG = {
+    "auto_attach": True,       # 守护进程运行时 TopupSSH().connect() 自动通过它执行（环境变量 TOPUP_SSH_NO_DAEMON=1 可临时关闭）
+    "socket_path": os.path.expanduser("~/.topup_ssh/daemon.sock"),  # Unix套接字路径
+    "connect_timeout": 2,      # 连接守护进程的超时时间（秒）
+    "idle_timeout": 8 * 3600,  # 超过该时间（秒）没有请求时守护进程自动退出，0表示不退出
+    "log_file": os.path.expanduser("~/.topup_ssh/daemon.log")  # 后台运行时的日志文件
+}
+
+# 远程后台作业配置（mergeHist.sh、01go.sh、reset.sh、数据库提交以 nohup 在远程后台运行，中断后可重新附着）
+DETACHED_JOB_CONFIG = {
+    "remote_dir": ".topup_jobs",   # 远程作业目录（相对路径表示位于远程主目录下），存放pid、日志和退出码
+    "state_file": os.path.join(os.path.dirname(__file__), ".detached_jobs"),  # 本地作业句柄状态文件
+    "poll_interval": 0.5,          # 读取新输出的初始间隔（秒），没有新输出时逐步加倍
+    "max_poll_interval": 5,        # 读取新输出的最大间隔（秒）
+    "liveness_interval": 30,       # 检查作业进程是否仍存在的间隔（秒）
+    "reattach_hours": 24,          # 同名同命令的作业在该时间内视为同一次执行，重新附着而不是重新执行
+    "keep_failed_logs": True       # 失败作业保留远程日志目录（成功的作业取回结果后删除）
+}
+
+# 远程日志跟踪配置（TopupSSH.follow，只读取 .bosslog/.bosserr/.err.{node} 等文件新增的内容）
+LOG_FOLLOW_CONFIG = {
+    "state_file": os.path.join(os.path.dirname(__file__), ".follow_offsets"),  # 本地偏移状态文件（按跟踪者和路径记录已读取的字节数）
+    "read_limit": 1024 * 1024,  # 每个文件单次最多读取的字节数，超过时立即继续读取
+    "poll_interval": 2,         # 持续跟踪时的读取间隔（秒）
+    "encoding": "utf-8"         # 日志文本编码（无法解码的字节替换为占位符）
+}
+
+# SSH远程操作统计配置（ssh_metrics.py，按步骤统计往返次数、耗时分位数和收发字节数）
+SSH_METRICS_CONFIG = {
+    "enabled": True,            # 是否记录每次远程操作
+    "max_samples": 5000,        # 保留的最近操作明细条数（导出JSON时包含）
+    "max_step_samples": 2000,   # 每个步骤用于计算耗时分位数的最近样本数
+    "dump_dir": "logs",         # 导出JSON的目录
+    "dump_on_exit": True        # run.py 结束时打印统计并导出JSON
+}
+
+# 交互式shell预热配置（genJob.sh 等交互式命令复用已初始化的shell）
+SHELL_POOL_CONFIG = {
+    "size": 2,                               # 保持预热的空闲shell数量，0表示不预热
+    "init_commands": [f"source {ENV_SCRIPT}"],  # shell初始化时执行的命令
+    "ready_timeout": 60,                     # 等待shell就绪的超时时间（秒）
+    "settle_timeout": 0,                     # 检测到完成/错误标记后继续等待结束标记的时间（秒），0表示立即返回
+    "error_patterns": []                     # 错误标记正则表达式，先于完成标记出现时视为失败
+}
+
+# 命令输出缓冲配置（超过内存上限的输出写入临时文件）
+OUTPUT_BUFFER_CONFIG = {
+    "max_memory_chars": 1000000,  # 单条命令在内存中保留的最大字符数
+    "spill_to_disk": True,        # 超过上限后写入临时文件（False则丢弃中间部分）
+    "spill_dir": None,            # 临时文件目录，None表示系统临时目录
+    "preview_chars": 4096         # 超过上限后保留的首尾预览字符数
+}
+
+# SFTP下载配置
+SFTP_TRANSFER_CONFIG = {
+    "chunk_size": 32768,           # 每个读请求的字节数
+    "requests_in_flight": 64,      # 每个通道同时保持的读请求数
+    "parallel_threshold_mb": 8,    # 超过该大小（MB）的文件分区间并行下载
+    "max_ranges": 4,               # 单个文件最多使用的并行通道数
+    "verify_checksum": True,       # 下载完成后比较远程和本地校验和
+    "checksum_algorithm": "md5",   # 校验算法（远程使用 <算法>sum 命令）
+    "transport_profile": "bulk"    # 并行区间和tar流通道使用的传输参数方案（大窗口）
+}
+
 # 定时检查配置
 DEFAULT_MAX_WAIT_MINUTES = 25  # 默认最大等待时间（分钟）
-CHECK_INTERVAL_SECONDS = 30    # 检查间隔（秒）
+CHECK_INTERVAL_SECONDS = 30    # 检查间隔（秒），有进展时使用的基础间隔
+
+# 轮询调度配置（poll_schedule.py，等待作业结果文件时按进展调整检查间隔并预测剩余时间）
+POLL_SCHEDULE_CONFIG = {
+    "min_interval": 5,              # 最短检查间隔（秒），接近预计完成时间时使用
+    "max_interval": 120,            # 最长检查间隔（秒），长时间没有进展时逐步退避到该值
+    "backoff_factor": 1.5,          # 没有进展时检查间隔的增长倍数
+    "history_file": os.path.join(os.path.dirname(__file__), ".step_durations"),  # 各步骤历史等待时长记录
+    "history_size": 20              # 每个步骤保留的历史记录条数
+}
+
+# 文件事件配置（file_events.py）：等待作业结果时由远程监视进程通过长期保持的通道推送文件创建事件，
+# 最后一个文件生成后立即继续，不必等到下一次检查；启动失败或事件流中断时自动改用定期检查
+FILE_EVENTS_CONFIG = {
+    "enabled": False,               # 是否使用文件事件（run.py --file-events 可覆盖）
+    "backend": "poll",              # poll: 监视进程在服务器本地定期列目录（不产生SSH往返）；
+                                    # inotify: 使用 inotifywait，不可用时自动改用poll。共享文件系统上
+                                    # 计算节点写入的文件在登录节点可能收不到inotify事件，默认不用
+    "scan_interval": 2,             # poll方式在服务器本地列目录的间隔（秒）
+    "verify_interval": 300,         # 使用文件事件时完整检查一次目录的间隔（秒），防止漏掉事件
+    "coalesce": 1.0,                # 收到事件后继续收集的时间（秒），同一批生成的文件合并处理
+    "python": None,                 # 远程Python解释器，None 时优先使用 python3
+    "start_timeout": 15             # 启动监视进程的超时时间（秒）
+}
 
 # 文件名配置
 REQUIRED_FILES_STEP1 = {
@@ -97,6 +270,18 @@ REQUIRED_FILES_STEP1 = {
     "txt_file": "Interval_run{run}.txt"
 }
 
+# 步骤2.1：每个run号一个子目录，hist文件数不少于作业文件数时完成
+REQUIRED_FILES_STEP2 = {
+    "job_file": "{run}/*.txt",
+    "hist_file": "{run}/hist*.root"
+}
+
+# 步骤2.4：hist目录中每个hist文件对应一个png文件
+REQUIRED_FILES_STEP2_4 = {
+    "hist_file": "hist*.root",
+    "png_file": "check*.png"
+}
+
 REQUIRED_FILES_STEP3 = {
     "job_file": "run_{run}_3.txt",
     "error_file": "run_{run}_3.txt.err.{node}",
@@ -104,6 +289,14 @@ REQUIRED_FILES_STEP3 = {
     "shield_file": "shield_run{run}.txt"
 }
 
+REQUIRED_FILES_STEP4 = {
+    "job_file": "run_{run}_4.txt",
+    "cut_detail_file": "run{run}_cut_detail.png",   # 滤波窗口详细图
+    "after_cut_file": "run{run}_after_cut.png",     # 应用滤波后的结果图
+    "before_cut_file": "run{run}_before_cut.png",   # 应用滤波前的对比图
+    "check_file": "run{run}_check.png"              # 整体检查图
+}
+
 REQUIRED_FILES_STEP5 = {
     "job_file": "plot_ETS_{run}.txt",
     "error_file": "plot_ETS_{run}.txt.err.{node}",
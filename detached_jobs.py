@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+远程后台作业模块
+长时间运行的脚本（mergeHist.sh、01go.sh、reset.sh、数据库提交等）以 nohup 在远程后台运行，
+pid、stdout/stderr 日志和退出码写入远程作业目录，不依赖SSH通道存活；
+本地把作业句柄保存在状态文件中，连接中断或步骤重新执行时重新附着到仍在运行（或已结束未取回）的作业，
+继续读取剩余输出和退出码，而不是重新执行脚本
+"""
+
+import os
+import json
+import time
+import uuid
+import shlex
+import posixpath
+import threading
+from typing import Dict, Any, Optional
+
+import config
+
+
+def jobs_config() -> Dict[str, Any]:
+    """读取后台作业配置（缺省项使用默认值）"""
+    defaults = {
+        'remote_dir': '.topup_jobs',
+        'state_file': os.path.join(os.path.dirname(os.path.abspath(__file__)), '.detached_jobs'),
+        'poll_interval': 0.5,
+        'max_poll_interval': 5,
+        'liveness_interval': 30,
+        'reattach_hours': 24,
+        'keep_failed_logs': True
+    }
+    defaults.update(getattr(config, 'DETACHED_JOB_CONFIG', {}))
+    return defaults
+
+
+def new_handle(command: str, remote_root: str, name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    创建作业句柄（尚未启动）
+
+    Args:
+        command: 远程执行的命令
+        remote_root: 远程作业根目录（绝对路径）
+        name: 作业名（用于重新附着，如 '2.2_250624'），默认使用作业ID
+
+    Returns:
+        dict: 作业句柄，包含 job_id, name, command, job_dir（远程作业目录）, pid, host, started_at,
+              stdout_offset（已显示给调用方的stdout字节数，重新附着时不重复显示）
+    """
+    job_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    return {
+        'job_id': job_id,
+        'name': name or job_id,
+        'command': command,
+        'job_dir': posixpath.join(remote_root, job_id),
+        'pid': None,
+        'host': None,
+        'started_at': time.time(),
+        'stdout_offset': 0
+    }
+
+
+def launch_command(handle: Dict[str, Any]) -> str:
+    """
+    生成在远程后台启动作业的shell命令
+
+    作业在新会话（setsid，可用时）中以 nohup 运行，stdin 重定向到 /dev/null，
+    stdout/stderr 分别写入作业目录下的 stdout.log/stderr.log，结束时先写 exit.tmp 再改名为 exit，
+    读到 exit 文件即说明退出码和日志都已完整。整体由 bash 执行（不依赖登录shell的类型），输出 "pid 主机名"。
+
+    Args:
+        handle: 作业句柄
+
+    Returns:
+        str: shell命令
+    """
+    wrapper = (f"( {handle['command']}\n) < /dev/null; __topup_rc=$?; "
+               f'printf "%d\\n" $__topup_rc > "$1/exit.tmp" && mv "$1/exit.tmp" "$1/exit"')
+    script = (
+        f"d={shlex.quote(handle['job_dir'])}; mkdir -p \"$d\" && "
+        f"printf '%s\\n' {shlex.quote(handle['command'])} > \"$d/command\" && "
+        f"if command -v setsid >/dev/null 2>&1; then s=setsid; else s=; fi; "
+        f"nohup $s bash -c {shlex.quote(wrapper)} topup_job \"$d\" "
+        f"> \"$d/stdout.log\" 2> \"$d/stderr.log\" < /dev/null & "
+        f"p=$!; echo $p > \"$d/pid\"; printf '%s %s\\n' \"$p\" \"$(hostname)\""
+    )
+    return f"bash -c {shlex.quote(script)}"
+
+
+def cancel_command(handle: Dict[str, Any]) -> str:
+    """生成终止作业（整个进程组）的shell命令"""
+    pid = int(handle['pid'])
+    return f"bash -c 'kill -TERM -{pid} 2>/dev/null || kill -TERM {pid} 2>/dev/null; true'"
+
+
+class DetachedJobStore:
+    """
+    本地作业句柄存储（JSON状态文件，作业名 -> 句柄）
+
+    作业结束并取回结果后删除对应句柄；状态文件中残留的句柄表示作业仍在运行或结果尚未取回。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化存储
+
+        Args:
+            path: 状态文件路径，默认使用 config.DETACHED_JOB_CONFIG['state_file']
+        """
+        self.path = path or jobs_config()['state_file']
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """按作业名获取句柄"""
+        with self._lock:
+            return self._load().get(name)
+
+    def put(self, handle: Dict[str, Any]):
+        """保存（或更新）句柄"""
+        with self._lock:
+            jobs = self._load()
+            jobs[handle['name']] = handle
+            self._save(jobs)
+
+    def remove(self, name: str):
+        """删除句柄"""
+        with self._lock:
+            jobs = self._load()
+            if jobs.pop(name, None) is not None:
+                self._save(jobs)
+
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        """全部句柄"""
+        with self._lock:
+            return self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, jobs: Dict[str, Dict[str, Any]]):
+        # 先写临时文件再改名，进程中途退出不会留下损坏的状态文件
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(jobs, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+
+# 进程内共用的句柄存储
+job_store = DetachedJobStore()
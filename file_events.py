@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+远程文件事件模块
+在目标服务器上启动一个常驻的文件监视进程，通过一个长期保持的exec通道逐行推送
+文件创建/删除事件，等待作业结果文件时不必每隔一段时间通过SSH重新检查目录
+"""
+
+import json
+import time
+import shlex
+import selectors
+from typing import Dict, Any, List, Optional
+
+import paramiko
+
+import config
+
+# 远程执行的监视脚本（兼容 Python 2.6+ 和 Python 3）
+# 参数：目录列表(JSON)、列目录间隔（秒）、方式(poll/inotify)；通道关闭（stdin EOF）时退出
+_WATCHER_SOURCE = r'''
+import os, sys, json, select, subprocess
+
+def emit(message):
+    sys.stdout.write(json.dumps(message) + '\n')
+    sys.stdout.flush()
+
+def listing(d):
+    try:
+        return set(os.listdir(d))
+    except OSError:
+        return set()
+
+def closed():
+    return not sys.stdin.readline()
+
+def run_inotify(dirs):
+    try:
+        proc = subprocess.Popen(['inotifywait', '-m', '-e', 'create', '-e', 'moved_to', '-e', 'delete',
+                                 '-e', 'moved_from', '--format', '%e\t%w\t%f'] + dirs,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError:
+        return False
+    while True:
+        line = proc.stderr.readline()
+        if not line:
+            return False
+        if b'Watches established' in line:
+            break
+    emit({'ready': True, 'backend': 'inotify'})
+    try:
+        while True:
+            readable = select.select([sys.stdin, proc.stdout], [], [])[0]
+            if sys.stdin in readable and closed():
+                return True
+            if proc.stdout in readable:
+                line = proc.stdout.readline()
+                if not line:
+                    return True
+                parts = line.decode('utf-8', 'ignore').rstrip('\n').split('\t', 2)
+                if len(parts) != 3:
+                    continue
+                key = 'removed' if ('DELETE' in parts[0] or 'MOVED_FROM' in parts[0]) else 'created'
+                emit({'dir': parts[1].rstrip('/') or '/', key: [parts[2]]})
+    finally:
+        proc.kill()
+
+def run_poll(dirs, interval):
+    known = dict((d, listing(d)) for d in dirs)
+    emit({'ready': True, 'backend': 'poll'})
+    while True:
+        if select.select([sys.stdin], [], [], interval)[0] and closed():
+            return
+        for d in dirs:
+            current = listing(d)
+            if current != known[d]:
+                emit({'dir': d, 'created': sorted(current - known[d]), 'removed': sorted(known[d] - current)})
+                known[d] = current
+
+def main():
+    dirs = json.loads(sys.argv[1])
+    if sys.argv[3] == 'inotify' and run_inotify(dirs):
+        return
+    run_poll(dirs, float(sys.argv[2]))
+
+main()
+'''
+
+
+def events_config() -> Dict[str, Any]:
+    """读取文件事件配置（缺省项使用默认值）"""
+    defaults = {
+        'enabled': False,
+        'backend': 'poll',
+        'scan_interval': 2,
+        'verify_interval': 300,
+        'coalesce': 1.0,
+        'python': None,
+        'start_timeout': 15
+    }
+    defaults.update(getattr(config, 'FILE_EVENTS_CONFIG', {}))
+    return defaults
+
+
+class FileEventStream:
+    """
+    远程文件事件流
+
+    占用连接池的一个通道运行监视脚本。inotify 方式直接接收内核事件；
+    poll 方式由脚本在服务器本地定期列目录，只有目录内容变化时才发送消息。
+    事件格式：{'dir': 目录路径, 'created': [文件名, ...], 'removed': [文件名, ...]}
+    """
+
+    def __init__(self, pool, directories: List[str]):
+        """
+        初始化事件流（调用 start() 后才启动远程进程）
+
+        Args:
+            pool: SSHConnectionPool 实例
+            directories: 要监视的目录列表
+        """
+        settings = events_config()
+        self.pool = pool
+        self.directories = [directory.rstrip('/') or '/' for directory in directories]
+        self.backend = settings['backend']
+        self.scan_interval = settings['scan_interval']
+        self.coalesce = settings['coalesce']
+        self.python = settings['python']
+        self.start_timeout = settings['start_timeout']
+        self.events = 0
+
+        self._channel: Optional[paramiko.Channel] = None
+        self._buffer = b''
+
+    def start(self) -> str:
+        """
+        启动远程监视进程，等待其就绪
+
+        Returns:
+            str: 实际使用的方式（inotify 或 poll；inotifywait 不可用时自动改用 poll）
+
+        Raises:
+            ConnectionError: 启动失败
+        """
+        self.close()
+        try:
+            self._channel = self.pool.open_channel(timeout=self.start_timeout)
+            args = ' '.join(shlex.quote(arg) for arg in (
+                _WATCHER_SOURCE, json.dumps(self.directories), str(self.scan_interval), self.backend))
+            if self.python:
+                launcher = f"exec {self.python} -u -c {args}"
+            else:
+                launcher = (f"if command -v python3 >/dev/null 2>&1; then exec python3 -u -c {args}; "
+                            f"else exec python -u -c {args}; fi")
+            self._channel.exec_command(launcher)
+            ready = json.loads(self._read_line(time.monotonic() + self.start_timeout))
+            if not ready.get('ready'):
+                raise ConnectionError(f'监视进程响应无效: {ready}')
+        except Exception as e:
+            self.close()
+            raise ConnectionError(f'远程文件监视进程启动失败: {str(e)}')
+        return ready.get('backend', self.backend)
+
+    @property
+    def running(self) -> bool:
+        """监视进程是否仍在运行"""
+        return self._channel is not None and not self._channel.closed
+
+    def wait(self, timeout: float) -> List[Dict[str, Any]]:
+        """
+        等待文件事件
+
+        收到第一个事件后再继续收集 coalesce 秒，同一批生成的文件合并返回。
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            list: 事件列表，超时没有事件时为空列表
+
+        Raises:
+            ConnectionError: 监视进程已退出或通道中断
+        """
+        if not self.running:
+            raise ConnectionError('远程文件监视进程未运行')
+        deadline = time.monotonic() + timeout
+        events = []
+        while True:
+            try:
+                line = self._read_line(deadline)
+            except TimeoutError:
+                return events
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if 'dir' not in event:
+                continue
+            if not events:
+                deadline = min(deadline, time.monotonic() + self.coalesce)
+            events.append(event)
+            self.events += 1
+
+    def close(self):
+        """关闭监视进程通道（远程进程读到stdin结束后退出）"""
+        channel, self._channel = self._channel, None
+        self._buffer = b''
+        if channel is not None:
+            self.pool.close_channel(channel)
+
+    def _read_line(self, deadline: float) -> str:
+        """读取一行输出（超时抛出 TimeoutError，通道关闭时抛出 ConnectionError）"""
+        selector = selectors.DefaultSelector()
+        selector.register(self._channel, selectors.EVENT_READ)
+        try:
+            while b'\n' not in self._buffer:
+                if self._channel.recv_ready():
+                    data = self._channel.recv(65536)
+                    if not data:
+                        raise ConnectionError('远程文件监视进程已退出')
+                    self._buffer += data
+                    continue
+                if self._channel.closed or self._channel.eof_received:
+                    raise ConnectionError('远程文件监视进程已退出')
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError('等待文件事件超时')
+                selector.select(remaining)
+        finally:
+            selector.close()
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return line.decode('utf-8', errors='ignore')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
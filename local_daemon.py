@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地SSH守护进程客户端模块
+守护进程（ssh_daemon.py）在本机保持一条已认证的双跳连接，通过Unix套接字提供命令执行和文件查询，
+短生命周期的命令行工具连接到守护进程即可使用，不必每次重新完成两跳认证
+
+协议：每条消息一行JSON
+    请求:   {"method": 方法名, "args": [...], "kwargs": {...}, "stream_chunks": bool, "step": 步骤标记}
+    事件:   {"log": 文本}（守护进程中该调用的print输出）、{"chunk": 文本}（交互式命令输出片段）
+    响应:   {"result": 结果} 或 {"error": 错误信息, "type": 异常类名}
+"""
+
+import os
+import sys
+import json
+import base64
+import socket
+import threading
+from typing import Dict, Any, Optional, Callable, List
+
+import config
+from remote_fs import RemoteFileEntry
+from ssh_metrics import command_metrics
+
+# 守护进程对外提供的 TopupSSH 方法
+DAEMON_METHODS = (
+    'execute_command', 'execute_batch', 'execute_interactive_command',
+    'stat', 'listdir_attr', 'exists_many', 'glob', 'scan_tree', 'read_text', 'read_appended', 'query_many',
+    'upload_many', 'write_text_atomic',
+    'download_file', 'download_tree', 'download_many',
+    'start_detached', 'attach_detached', 'run_detached', 'run_detached_batch', 'cancel_detached'
+)
+
+# 可以在客户端原样重新抛出的异常类型
+_BUILTIN_ERRORS = {
+    error.__name__: error for error in (
+        FileNotFoundError, PermissionError, ConnectionError, TimeoutError,
+        ValueError, KeyError, IOError, OSError
+    )
+}
+
+
+class DaemonConnectionError(ConnectionError):
+    """与本地SSH守护进程的通信中断（区别于守护进程中方法本身抛出的 ConnectionError）"""
+
+
+def daemon_config() -> Dict[str, Any]:
+    """读取守护进程配置（缺省项使用默认值）"""
+    defaults = {
+        'auto_attach': True,
+        'socket_path': os.path.expanduser('~/.topup_ssh/daemon.sock'),
+        'connect_timeout': 2,
+        'idle_timeout': 8 * 3600,
+        'log_file': os.path.expanduser('~/.topup_ssh/daemon.log')
+    }
+    defaults.update(getattr(config, 'SSH_DAEMON_CONFIG', {}))
+    return defaults
+
+
+def encode_value(value: Any) -> Any:
+    """把参数和结果转换为可JSON序列化的形式（RemoteFileEntry、bytes 带类型标记）"""
+    if isinstance(value, RemoteFileEntry):
+        return {'__entry__': list(value)}
+    if isinstance(value, bytes):
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    if isinstance(value, dict):
+        return {key: encode_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(item) for item in value]
+    return value
+
+
+def decode_value(value: Any) -> Any:
+    """encode_value 的逆操作"""
+    if isinstance(value, dict):
+        if set(value) == {'__entry__'}:
+            return RemoteFileEntry(*value['__entry__'])
+        if set(value) == {'__bytes__'}:
+            return base64.b64decode(value['__bytes__'])
+        return {key: decode_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_value(item) for item in value]
+    return value
+
+
+def send_message(sock: socket.socket, message: Dict[str, Any]):
+    """发送一行JSON消息"""
+    sock.sendall((json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8'))
+
+
+class LineReader:
+    """从套接字按行读取JSON消息"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self._buffer = b''
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        """
+        读取下一条消息
+
+        Returns:
+            dict: 消息，对端关闭连接时返回None
+        """
+        while b'\n' not in self._buffer:
+            data = self.sock.recv(65536)
+            if not data:
+                return None
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return json.loads(line.decode('utf-8'))
+
+
+class DaemonClient:
+    """
+    本地SSH守护进程客户端
+
+    每个进行中的调用使用一条Unix套接字连接，调用结束后连接留给下一次调用复用，
+    因此多个线程（如 AsyncTopupSSH）可以并发调用，守护进程在各自的通道上并发执行；
+    守护进程中该调用产生的print输出实时转发到本进程的标准输出，与直接连接时的显示一致。
+    """
+
+    def __init__(self, socket_path: Optional[str] = None):
+        """
+        初始化客户端
+
+        Args:
+            socket_path: 守护进程套接字路径，默认使用 config.SSH_DAEMON_CONFIG
+        """
+        settings = daemon_config()
+        self.socket_path = socket_path or settings['socket_path']
+        self.connect_timeout = settings['connect_timeout']
+        self.info: Dict[str, Any] = {}
+        self.connected = False
+        self._idle: List[LineReader] = []
+        self._lock = threading.Lock()
+
+    def connect(self) -> bool:
+        """
+        连接守护进程并确认其可用
+
+        Returns:
+            bool: 守护进程是否在运行且SSH连接可用
+        """
+        if not os.path.exists(self.socket_path):
+            return False
+        self.connected = True
+        try:
+            self.info = self.call('ping')
+        except ConnectionError:
+            self.info = {}
+        if not self.info.get('connected'):
+            self.close()
+        return self.connected
+
+    def call(self, method: str, *args, on_chunk: Optional[Callable[[str], None]] = None, **kwargs) -> Any:
+        """
+        调用守护进程中 TopupSSH 的方法
+
+        Args:
+            method: 方法名（DAEMON_METHODS 之一，或 ping/shutdown）
+            *args, **kwargs: 方法参数
+            on_chunk: 交互式命令的输出片段回调
+
+        Returns:
+            方法返回值
+
+        Raises:
+            DaemonConnectionError: 与守护进程的连接中断
+            其他异常: 守护进程中方法抛出的异常
+        """
+        if not self.connected:
+            raise DaemonConnectionError('未连接本地SSH守护进程')
+        reader = self._checkout()
+        try:
+            send_message(reader.sock, {
+                'method': method, 'args': encode_value(list(args)), 'kwargs': encode_value(kwargs),
+                'stream_chunks': on_chunk is not None,
+                'step': command_metrics.current_step()
+            })
+            while True:
+                message = reader.read()
+                if message is None:
+                    raise DaemonConnectionError('本地SSH守护进程已断开')
+                if 'log' in message:
+                    sys.stdout.write(message['log'])
+                    sys.stdout.flush()
+                elif 'chunk' in message:
+                    on_chunk(message['chunk'])
+                else:
+                    break
+        except (OSError, ValueError) as e:
+            reader.sock.close()
+            raise DaemonConnectionError(f'与本地SSH守护进程通信失败: {str(e)}')
+        except BaseException:
+            reader.sock.close()
+            raise
+        with self._lock:
+            self._idle.append(reader)
+
+        if 'error' in message:
+            error_type = _BUILTIN_ERRORS.get(message.get('type'), RuntimeError)
+            raise error_type(message['error'])
+        return decode_value(message.get('result'))
+
+    def close(self):
+        """关闭与守护进程的连接（不影响守护进程本身）"""
+        self.connected = False
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for reader in idle:
+            try:
+                reader.sock.close()
+            except OSError:
+                pass
+
+    def _checkout(self) -> LineReader:
+        """取得一条空闲的套接字连接，没有时新建"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.connect_timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise DaemonConnectionError(f'无法连接本地SSH守护进程: {str(e)}')
+        sock.settimeout(None)
+        return LineReader(sock)
+
+
+def attach(socket_path: Optional[str] = None) -> Optional[DaemonClient]:
+    """
+    尝试连接正在运行的本地SSH守护进程
+
+    设置环境变量 TOPUP_SSH_NO_DAEMON=1 或 config.SSH_DAEMON_CONFIG['auto_attach']=False 时不连接。
+
+    Returns:
+        DaemonClient: 已连接的客户端，守护进程未运行时返回None
+    """
+    if os.environ.get('TOPUP_SSH_NO_DAEMON') or not daemon_config()['auto_attach']:
+        return None
+    client = DaemonClient(socket_path)
+    return client if client.connect() else None
@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地执行模块
+编排程序直接运行在集群登录节点（beslogin）上时，不再经过 lxlogin → beslogin 双跳SSH：
+命令用本地子进程执行，文件操作直接访问本地文件系统，交互式命令在本地伪终端shell中执行。
+LocalExecutor 与 TopupSSH 接口相同，各步骤模块无需修改；执行方式由 config.EXECUTOR_CONFIG['mode']
+或环境变量 TOPUP_EXECUTOR（ssh/local）选择，见 create_executor
+"""
+
+import os
+import pty
+import time
+import fcntl
+import shutil
+import struct
+import socket
+import termios
+import fnmatch
+import selectors
+import threading
+import subprocess
+import contextlib
+from typing import Optional, Tuple, Dict, Any, List
+
+import paramiko
+
+import config
+from topup_ssh import TopupSSH
+from output_stream import OutputBuffer
+from interactive_shell import InteractiveShell
+from ssh_metrics import command_metrics
+
+# 每次从管道读取的最大字节数
+_READ_CHUNK_SIZE = 32768
+
+# 本地执行时统计和日志中使用的路径标识（对应SSH模式下的 跳板机→目标节点）
+LOCAL_PATH_LABEL = 'local'
+
+
+def executor_config() -> Dict[str, Any]:
+    """读取执行方式配置（缺省项使用默认值，环境变量 TOPUP_EXECUTOR 优先于配置中的 mode）"""
+    defaults = {
+        'mode': 'ssh',
+        'shell': '/bin/bash',
+        'workdir': None,
+        'max_concurrency': 8
+    }
+    defaults.update(getattr(config, 'EXECUTOR_CONFIG', {}))
+    if os.environ.get('TOPUP_EXECUTOR'):
+        defaults['mode'] = os.environ['TOPUP_EXECUTOR']
+    return defaults
+
+
+def _workdir() -> str:
+    """命令和相对路径的工作目录（默认为用户主目录，与SSH登录后的目录一致）"""
+    return os.path.expanduser(executor_config()['workdir'] or '~')
+
+
+class _LocalFile:
+    """本地文件，提供 LocalSFTP.open 返回对象所需的 paramiko.SFTPFile 接口（读写均为字节）"""
+
+    def __init__(self, path: str, mode: str):
+        self._file = open(path, mode.replace('b', '') + 'b')
+
+    def stat(self) -> paramiko.SFTPAttributes:
+        return paramiko.SFTPAttributes.from_stat(os.fstat(self._file.fileno()))
+
+    def prefetch(self, *args, **kwargs):
+        """本地文件无需预取"""
+
+    def set_pipelined(self, pipelined: bool = True):
+        """本地写入无需流水线"""
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._file.close()
+        return False
+
+
+class LocalSFTP:
+    """
+    本地文件系统，提供 paramiko.SFTPClient 的常用接口
+
+    RemoteFileSystem、日志跟踪、后台作业和原子写入通过它直接读写本地文件；
+    与SFTP会话一样，相对路径相对于用户主目录（EXECUTOR_CONFIG['workdir']）。
+    """
+
+    def _path(self, path: str) -> str:
+        return os.path.join(_workdir(), path)
+
+    def stat(self, path: str) -> paramiko.SFTPAttributes:
+        return paramiko.SFTPAttributes.from_stat(os.stat(self._path(path)), os.path.basename(path))
+
+    def lstat(self, path: str) -> paramiko.SFTPAttributes:
+        return paramiko.SFTPAttributes.from_stat(os.lstat(self._path(path)), os.path.basename(path))
+
+    def listdir(self, path: str = '.') -> List[str]:
+        return os.listdir(self._path(path))
+
+    def listdir_attr(self, path: str = '.') -> List[paramiko.SFTPAttributes]:
+        attrs = []
+        with os.scandir(self._path(path)) as entries:
+            for entry in entries:
+                try:
+                    attrs.append(paramiko.SFTPAttributes.from_stat(entry.stat(), entry.name))
+                except FileNotFoundError:
+                    # 列出目录后被删除的文件
+                    continue
+        return attrs
+
+    def open(self, path: str, mode: str = 'r', bufsize: int = -1) -> _LocalFile:
+        return _LocalFile(self._path(path), mode)
+
+    def normalize(self, path: str) -> str:
+        return os.path.realpath(self._path(path))
+
+    def get(self, remote_path: str, local_path: str):
+        shutil.copyfile(self._path(remote_path), local_path)
+
+    def put(self, local_path: str, remote_path: str):
+        shutil.copyfile(local_path, self._path(remote_path))
+
+    def mkdir(self, path: str, mode: int = 0o777):
+        os.mkdir(self._path(path), mode)
+
+    def remove(self, path: str):
+        os.remove(self._path(path))
+
+    def rename(self, old_path: str, new_path: str):
+        os.rename(self._path(old_path), self._path(new_path))
+
+    def posix_rename(self, old_path: str, new_path: str):
+        os.replace(self._path(old_path), self._path(new_path))
+
+    def chmod(self, path: str, mode: int):
+        os.chmod(self._path(path), mode)
+
+
+class LocalShellChannel:
+    """
+    本地伪终端中的登录shell，提供 InteractiveShell 所需的通道接口
+
+    shell在新会话中运行并以伪终端为控制终端，与SSH交互式shell的环境（登录配置、作业控制）一致；
+    关闭时终止整个进程组。
+    """
+
+    def __init__(self, shell: str, workdir: str):
+        self.shell = shell
+        self.workdir = workdir
+        self.eof_received = False
+        self._term = 'dumb'
+        self._width = 80
+        self._process: Optional[subprocess.Popen] = None
+        self._master: Optional[int] = None
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed or self._process is None or self._process.poll() is not None
+
+    def get_id(self) -> int:
+        return self._process.pid if self._process is not None else -1
+
+    def get_pty(self, term: str = 'vt100', width: int = 80, height: int = 24, **kwargs):
+        self._term = term
+        self._width = width
+
+    def invoke_shell(self):
+        master, slave = pty.openpty()
+        fcntl.ioctl(slave, termios.TIOCSWINSZ, struct.pack('HHHH', 24, self._width, 0, 0))
+        try:
+            self._process = subprocess.Popen(
+                [self.shell, '-l'],
+                stdin=slave, stdout=slave, stderr=slave,
+                cwd=self.workdir,
+                env=dict(os.environ, TERM=self._term),
+                start_new_session=True,
+                preexec_fn=lambda: fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+            )
+        except Exception:
+            os.close(master)
+            raise
+        finally:
+            os.close(slave)
+        self._master = master
+
+    def fileno(self) -> int:
+        return self._master
+
+    def send(self, data: str) -> int:
+        payload = data.encode('utf-8')
+        view = memoryview(payload)
+        while view:
+            written = os.write(self._master, view)
+            view = view[written:]
+        return len(payload)
+
+    def recv_ready(self) -> bool:
+        if self._master is None or self._closed:
+            return False
+        selector = selectors.DefaultSelector()
+        selector.register(self._master, selectors.EVENT_READ)
+        try:
+            return bool(selector.select(0))
+        finally:
+            selector.close()
+
+    def recv(self, size: int) -> bytes:
+        try:
+            data = os.read(self._master, size)
+        except OSError:
+            # shell退出后读取伪终端返回EIO
+            data = b''
+        if not data:
+            self.eof_received = True
+        return data
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._process is not None and self._process.poll() is None:
+            try:
+                os.killpg(self._process.pid, 9)
+            except OSError:
+                pass
+            self._process.wait()
+        if self._master is not None:
+            os.close(self._master)
+
+
+class LocalPool:
+    """
+    本地执行时的“连接池”：提供 TopupSSH 用到的连接池接口
+
+    连接始终可用，SFTP会话为 LocalSFTP；交互式shell为本地伪终端shell，
+    与SSH连接池一样预热 SHELL_POOL_CONFIG['size'] 个已初始化的shell供交互式命令复用。
+    """
+
+    def __init__(self):
+        settings = executor_config()
+        shell_config = getattr(config, 'SHELL_POOL_CONFIG', {})
+        self.shell = settings['shell']
+        self.max_channels = settings['max_concurrency']
+        self.shell_pool_size = shell_config.get('size', 0)
+        self.shell_init_commands = list(shell_config.get('init_commands', []))
+        self.shell_ready_timeout = shell_config.get('ready_timeout', 60)
+
+        # 与 SSHConnectionPool 相同的属性（本地执行时没有SSH连接）
+        self.generation = 0
+        self.ssh1 = None
+        self.ssh2 = None
+        self.transport = None
+
+        self.sftp = LocalSFTP()
+        self._idle_shells: List[InteractiveShell] = []
+        self._shells_lock = threading.Lock()
+        self._warming = False
+        self.shells_opened = 0
+        self.shells_reused = 0
+
+    @property
+    def path_label(self) -> str:
+        return LOCAL_PATH_LABEL
+
+    def is_active(self) -> bool:
+        return True
+
+    def acquire(self) -> bool:
+        return True
+
+    def release(self):
+        pass
+
+    def ensure_alive(self) -> bool:
+        return True
+
+    def probe(self, timeout: Optional[float] = None) -> bool:
+        return True
+
+    def reconnect(self, failed_generation: Optional[int] = None) -> bool:
+        return True
+
+    def last_queue_wait(self) -> float:
+        return 0.0
+
+    @contextlib.contextmanager
+    def shared_sftp(self):
+        yield self.sftp
+
+    @contextlib.contextmanager
+    def lease_sftp(self, timeout: Optional[float] = None, profile: Optional[str] = None):
+        yield self.sftp
+
+    def acquire_shell(self, timeout: Optional[float] = None) -> InteractiveShell:
+        """取得一个已就绪的本地交互式shell：优先复用预热的空闲shell，没有时新建"""
+        with self._shells_lock:
+            while self._idle_shells:
+                shell = self._idle_shells.pop()
+                if shell.is_usable(self.generation):
+                    self.shells_reused += 1
+                    return shell
+                shell.channel.close()
+        return self._open_shell()
+
+    def release_shell(self, shell: InteractiveShell, reusable: bool = True):
+        """归还交互式shell，可复用且空闲shell未满时保留，否则关闭"""
+        with self._shells_lock:
+            if reusable and shell.is_usable(self.generation) and len(self._idle_shells) < self.shell_pool_size:
+                self._idle_shells.append(shell)
+                return
+        shell.channel.close()
+
+    def warm_shells(self):
+        """在后台把空闲的预热shell补足到 shell_pool_size 个"""
+        with self._shells_lock:
+            if self._warming or len(self._idle_shells) >= self.shell_pool_size:
+                return
+            self._warming = True
+
+        def warm():
+            try:
+                while True:
+                    with self._shells_lock:
+                        if len(self._idle_shells) >= self.shell_pool_size:
+                            return
+                    self.release_shell(self._open_shell())
+            except Exception as e:
+                print(f"⚠ 预热本地交互式shell失败: {str(e)}")
+            finally:
+                with self._shells_lock:
+                    self._warming = False
+
+        threading.Thread(target=warm, daemon=True).start()
+
+    def close(self):
+        """关闭全部空闲的预热shell"""
+        with self._shells_lock:
+            shells, self._idle_shells = self._idle_shells, []
+        for shell in shells:
+            shell.channel.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池状态（格式同 SSHConnectionPool.stats 的主要字段）"""
+        with self._shells_lock:
+            return {
+                'active': True,
+                'path': LOCAL_PATH_LABEL,
+                'idle_shells': len(self._idle_shells),
+                'shells_opened': self.shells_opened,
+                'shells_reused': self.shells_reused
+            }
+
+    def _open_shell(self) -> InteractiveShell:
+        """启动并初始化一个新的本地交互式shell"""
+        channel = LocalShellChannel(self.shell, _workdir())
+        shell = InteractiveShell(channel, self.generation)
+        try:
+            shell.initialize(self.shell_init_commands, self.shell_ready_timeout)
+        except Exception:
+            channel.close()
+            raise
+        with self._shells_lock:
+            self.shells_opened += 1
+        return shell
+
+
+class LocalExecutor(TopupSSH):
+    """
+    本地执行器（编排程序运行在 beslogin 登录节点上时使用）
+
+    接口与 TopupSSH 相同：execute_command/execute_batch 用本地子进程执行，
+    execute_interactive_command 使用本地伪终端shell，下载即本地复制，
+    文件系统查询、原子写入、日志跟踪、后台作业沿用 TopupSSH 的实现（通过 LocalPool/LocalSFTP 访问本地文件）。
+    不使用本地SSH守护进程和远程辅助进程。
+    """
+
+    def __init__(self, pool: Optional[LocalPool] = None):
+        """
+        初始化本地执行器
+
+        Args:
+            pool: 本地连接池，默认使用进程级共享的 LocalPool（共享预热shell和查询缓存）
+        """
+        super().__init__(pool=pool or get_local_pool(), use_daemon=False)
+
+        # 本地文件系统查询直接执行，不需要远程辅助进程
+        self.agent = None
+
+    def connect(self) -> bool:
+        """进入本地执行模式（无需建立连接），后台预热交互式shell"""
+        if not self.connected:
+            self.connected = True
+            print(f"✓ 本地执行模式（主机 {socket.gethostname()}，不使用SSH）")
+            self.pool.warm_shells()
+        return True
+
+    def close(self):
+        """退出本地执行模式（预热的shell保留在进程级连接池中）"""
+        self.connected = False
+        print("本地执行器已关闭")
+
+    def _ready(self) -> bool:
+        return self.connected
+
+    def file_events(self, directories: List[str]):
+        """本地执行时直接检查目录的开销很小，不启动文件监视进程（调用方改用定期检查）"""
+        raise ConnectionError("本地执行模式不使用文件事件")
+
+    def _exec_channel(self, command: str, timeout: float, sample: Dict[str, Any], use_pty: bool = False
+                      ) -> Tuple[Optional[int], OutputBuffer, OutputBuffer]:
+        """
+        用本地子进程执行一条命令并读取全部输出
+
+        命令由 EXECUTOR_CONFIG['shell'] 在用户主目录下执行，在新会话中运行，超时时终止整个进程组；
+        本地执行时 use_pty 不起作用。
+
+        Returns:
+            tuple: (退出码, stdout缓冲, stderr缓冲)，超时时退出码为None
+        """
+        stdout = OutputBuffer()
+        stderr = OutputBuffer()
+        deadline = time.monotonic() + timeout
+
+        process = subprocess.Popen(
+            [executor_config()['shell'], '-c', command],
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            cwd=_workdir(), start_new_session=True
+        )
+        sample['channel'] = process.pid
+
+        selector = selectors.DefaultSelector()
+        selector.register(process.stdout, selectors.EVENT_READ, stdout)
+        selector.register(process.stderr, selectors.EVENT_READ, stderr)
+        try:
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    os.killpg(process.pid, 9)
+                    process.wait()
+                    return None, stdout, stderr
+                for key, _ in selector.select(remaining):
+                    data = os.read(key.fd, _READ_CHUNK_SIZE)
+                    if data:
+                        key.data.write_bytes(data)
+                    else:
+                        selector.unregister(key.fileobj)
+            try:
+                return process.wait(max(deadline - time.monotonic(), 0)), stdout, stderr
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, 9)
+                process.wait()
+                return None, stdout, stderr
+        finally:
+            selector.close()
+            process.stdout.close()
+            process.stderr.close()
+
+    def download_file(self, remote_path: str, local_path: str, verify: Optional[bool] = None,
+                      resume: bool = True) -> Dict[str, Any]:
+        """
+        复制本地文件（参数和返回值同 TopupSSH.download_file；本地复制不需要续传和校验）
+        """
+        if not self._ready():
+            return {'success': False, 'message': '本地执行器未连接', 'error': '本地执行器未连接'}
+
+        try:
+            print("\n复制文件:")
+            print(f"  源路径: {remote_path}")
+            print(f"  目标路径: {local_path}")
+            start_time = time.time()
+            part_path = local_path + '.part'
+            with command_metrics.measure('download', f"copy {remote_path}", path=LOCAL_PATH_LABEL) as sample:
+                sample['round_trips'] = 0
+                shutil.copyfile(self.pool.sftp.normalize(remote_path), part_path)
+                os.replace(part_path, local_path)
+                size = os.path.getsize(local_path)
+                sample['bytes_in'] = size
+            elapsed = time.time() - start_time
+            print(f"✓ 文件复制成功（{size} 字节）")
+            return {
+                'success': True,
+                'message': f'文件下载成功: {local_path}',
+                'remote_path': remote_path,
+                'local_path': local_path,
+                'size': size,
+                'transferred_bytes': size,
+                'resumed_bytes': 0,
+                'ranges': 1,
+                'elapsed': elapsed,
+                'throughput_mbps': size / elapsed / (1024 * 1024) if elapsed > 0 else 0.0,
+                'checksum': None
+            }
+        except Exception as e:
+            print(f"✗ 文件复制失败: {str(e)}")
+            return {'success': False, 'message': f'文件下载失败: {str(e)}', 'error': str(e)}
+
+    def download_tree(self, remote_dir: str, local_dir: str, patterns: Optional[List[str]] = None,
+                      changed_since: Optional[float] = None, compression: Optional[str] = None) -> Dict[str, Any]:
+        """
+        复制目录树（参数和返回值同 TopupSSH.download_tree，本地复制时 compression 不起作用）
+
+        patterns 的匹配方式与 find -path 相同（* 也匹配子目录中的 /）。
+        """
+        if not self._ready():
+            return {'success': False, 'message': '本地执行器未连接', 'error': '本地执行器未连接'}
+
+        root = self.pool.sftp.normalize(remote_dir)
+        selected = []
+        for directory, _, names in os.walk(root):
+            for name in names:
+                source = os.path.join(directory, name)
+                relative = os.path.relpath(source, root)
+                if patterns and not any(fnmatch.fnmatchcase(f"./{relative}", f"./{pattern}") for pattern in patterns):
+                    continue
+                selected.append((source, os.path.join(local_dir, relative)))
+        print(f"\n复制目录: {remote_dir} -> {local_dir}")
+        return self._copy_files(selected, local_dir, changed_since, f"copy {remote_dir}")
+
+    def download_many(self, remote_patterns: List[str], local_dir: str, changed_since: Optional[float] = None,
+                      compression: Optional[str] = None) -> Dict[str, Any]:
+        """
+        把多个文件（支持通配符）复制到同一本地目录（参数和返回值同 TopupSSH.download_many）
+        """
+        if not self._ready():
+            return {'success': False, 'message': '本地执行器未连接', 'error': '本地执行器未连接'}
+
+        selected = []
+        for pattern in remote_patterns:
+            for entry in self.fs.glob(pattern):
+                if not entry.is_dir:
+                    selected.append((self.pool.sftp.normalize(entry.path), os.path.join(local_dir, entry.name)))
+        print(f"\n复制 {len(remote_patterns)} 个路径到: {local_dir}")
+        return self._copy_files(selected, local_dir, changed_since, f"copy {' '.join(remote_patterns)}")
+
+    @staticmethod
+    def _copy_files(selected: List[Tuple[str, str]], local_dir: str, changed_since: Optional[float],
+                    description: str) -> Dict[str, Any]:
+        """复制选中的文件（保留修改时间），返回与tar流下载相同格式的结果"""
+        start_time = time.time()
+        files = []
+        total_bytes = 0
+        try:
+            with command_metrics.measure('download', description, path=LOCAL_PATH_LABEL) as sample:
+                sample['round_trips'] = 0
+                os.makedirs(local_dir, exist_ok=True)
+                for source, target in selected:
+                    stat = os.stat(source)
+                    if changed_since is not None and stat.st_mtime <= changed_since:
+                        continue
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copy2(source, target)
+                    files.append(target)
+                    total_bytes += stat.st_size
+                sample['bytes_in'] = total_bytes
+        except Exception as e:
+            print(f"✗ 文件复制失败: {str(e)}")
+            return {'success': False, 'message': f'文件复制失败: {str(e)}', 'error': str(e)}
+
+        elapsed = time.time() - start_time
+        throughput = total_bytes / elapsed / (1024 * 1024) if elapsed > 0 else 0.0
+        print(f"  复制 {len(files)} 个文件（{total_bytes} 字节），耗时 {elapsed:.2f} 秒")
+        return {
+            'success': True,
+            'message': f'成功下载 {len(files)} 个文件到 {local_dir}',
+            'local_dir': local_dir,
+            'files': files,
+            'count': len(files),
+            'bytes': total_bytes,
+            'transferred_bytes': total_bytes,
+            'elapsed': elapsed,
+            'throughput_mbps': throughput
+        }
+
+
+# 进程级共享的本地连接池（预热shell和查询缓存在同一进程内的 LocalExecutor 之间共享）
+_local_pool: Optional[LocalPool] = None
+_local_pool_lock = threading.Lock()
+
+
+def get_local_pool() -> LocalPool:
+    """获取（或创建）进程级共享的本地连接池"""
+    global _local_pool
+    with _local_pool_lock:
+        if _local_pool is None:
+            _local_pool = LocalPool()
+        return _local_pool
+
+
+def create_executor(mode: Optional[str] = None, **kwargs) -> TopupSSH:
+    """
+    按配置创建执行器
+
+    Args:
+        mode: 'ssh'（经双跳SSH在 beslogin 上执行）或 'local'（直接在本机执行），
+              默认使用环境变量 TOPUP_EXECUTOR 或 config.EXECUTOR_CONFIG['mode']
+        **kwargs: SSH模式下传给 TopupSSH 的参数（pool、use_daemon、transport_profile）
+
+    Returns:
+        TopupSSH: TopupSSH 或 LocalExecutor 实例
+    """
+    mode = mode or executor_config()['mode']
+    if mode == 'local':
+        return LocalExecutor()
+    if mode != 'ssh':
+        raise ValueError(f'不支持的执行方式: {mode}（可选 ssh/local）')
+    return TopupSSH(**kwargs)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输出流处理模块
+- OutputBuffer: 有界内存的输出缓冲，超过上限后写入临时文件，只在内存中保留首尾预览
+- StreamMatcher: 在滚动窗口上做多模式正则匹配，标记跨两次读取时也能识别
+"""
+
+import os
+import re
+import codecs
+import tempfile
+from typing import Dict, List, Optional, Tuple, Union, Pattern
+
+import config
+
+
+def _buffer_config() -> Dict:
+    """读取输出缓冲配置（缺省项使用默认值）"""
+    defaults = {
+        'max_memory_chars': 1000000,
+        'spill_to_disk': True,
+        'spill_dir': None,
+        'preview_chars': 4096
+    }
+    defaults.update(getattr(config, 'OUTPUT_BUFFER_CONFIG', {}))
+    return defaults
+
+
+class OutputBuffer:
+    """
+    有界内存的输出缓冲
+
+    输出总量不超过 max_memory_chars 时全部保留在内存中；
+    超过后把已有内容和后续输出写入临时文件（spill_to_disk=True），
+    或直接丢弃中间部分（spill_to_disk=False），内存中只保留开头和结尾各 preview_chars 个字符。
+    """
+
+    def __init__(self, max_memory_chars: Optional[int] = None, spill_to_disk: Optional[bool] = None,
+                 spill_dir: Optional[str] = None, preview_chars: Optional[int] = None):
+        """
+        初始化输出缓冲（未指定的参数使用 config.OUTPUT_BUFFER_CONFIG）
+
+        Args:
+            max_memory_chars: 内存中保留的最大字符数
+            spill_to_disk: 超过上限后是否写入临时文件
+            spill_dir: 临时文件目录，默认使用系统临时目录
+            preview_chars: 超过上限后保留的首尾预览字符数
+        """
+        settings = _buffer_config()
+        self.max_memory_chars = settings['max_memory_chars'] if max_memory_chars is None else max_memory_chars
+        self.spill_to_disk = settings['spill_to_disk'] if spill_to_disk is None else spill_to_disk
+        self.spill_dir = spill_dir or settings['spill_dir']
+        self.preview_chars = settings['preview_chars'] if preview_chars is None else preview_chars
+
+        self.total_chars = 0
+        self.total_bytes = 0
+        self.head = ''
+        self.tail = ''
+        self.spill_path: Optional[str] = None
+        self.truncated = False
+
+        self._chunks: List[str] = []
+        self._memory_chars = 0
+        self._spill_file = None
+        self._decoder = None
+
+    @property
+    def overflowed(self) -> bool:
+        """输出是否超过了内存上限"""
+        return self.spill_path is not None or self.truncated
+
+    def write(self, text: str):
+        """追加一段输出"""
+        if not text:
+            return
+        self.total_chars += len(text)
+        if len(self.head) < self.preview_chars:
+            self.head += text[:self.preview_chars - len(self.head)]
+        self.tail = (self.tail + text)[-self.preview_chars:]
+
+        if self._spill_file is not None:
+            self._spill_file.write(text)
+            return
+        if self.truncated:
+            return
+
+        self._chunks.append(text)
+        self._memory_chars += len(text)
+        if self._memory_chars > self.max_memory_chars:
+            self._overflow()
+
+    def write_bytes(self, data: bytes):
+        """追加一段原始字节输出（按utf-8增量解码，多字节字符被拆在两次读取之间时不会丢失）"""
+        if self._decoder is None:
+            self._decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        self.total_bytes += len(data)
+        self.write(self._decoder.decode(data))
+
+    def to_result(self, prefix: str) -> Dict:
+        """
+        生成放入结果字典的字段
+
+        Args:
+            prefix: 字段名前缀（如 'output'、'error'）
+
+        Returns:
+            dict: {prefix: 内容或首尾预览}；超过上限时另含 {prefix}_file（临时文件路径，丢弃模式下为None）、
+                  {prefix}_chars（总字符数）、{prefix}_head、{prefix}_tail
+        """
+        self.close()
+        fields = {prefix: self.getvalue()}
+        if self.overflowed:
+            fields.update({
+                f'{prefix}_file': self.spill_path,
+                f'{prefix}_chars': self.total_chars,
+                f'{prefix}_head': self.head,
+                f'{prefix}_tail': self.tail
+            })
+        return fields
+
+    def getvalue(self) -> str:
+        """
+        获取输出内容
+
+        Returns:
+            str: 未超过上限时为完整输出，否则为“开头预览 + 省略说明 + 结尾预览”
+        """
+        if not self.overflowed:
+            return ''.join(self._chunks)
+        omitted = self.total_chars - len(self.head) - len(self.tail)
+        where = f"，完整输出: {self.spill_path}" if self.spill_path else ''
+        return f"{self.head}\n...[输出过长，省略 {max(omitted, 0)} 个字符{where}]...\n{self.tail}"
+
+    def read_all(self) -> str:
+        """读取完整输出（已写入临时文件时从文件读取；被丢弃的部分无法恢复）"""
+        if self.spill_path is None:
+            return self.getvalue()
+        self.flush()
+        with open(self.spill_path, 'r', encoding='utf-8') as spill_file:
+            return spill_file.read()
+
+    def flush(self):
+        """把临时文件缓冲写入磁盘"""
+        if self._spill_file is not None:
+            self._spill_file.flush()
+
+    def close(self):
+        """关闭临时文件（文件本身保留，供调用方查看）"""
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def _overflow(self):
+        """超过内存上限：写入临时文件或丢弃中间部分"""
+        if self.spill_to_disk:
+            if self.spill_dir:
+                os.makedirs(self.spill_dir, exist_ok=True)
+            fd, self.spill_path = tempfile.mkstemp(prefix='topup_output_', suffix='.log', dir=self.spill_dir)
+            self._spill_file = os.fdopen(fd, 'w', encoding='utf-8')
+            self._spill_file.write(''.join(self._chunks))
+        else:
+            self.truncated = True
+        self._chunks = []
+        self._memory_chars = 0
+
+
+class StreamMatcher:
+    """
+    流式多模式匹配
+
+    每次 feed 在“上次保留的窗口 + 新数据”上匹配全部模式，
+    只报告结束位置落在新数据中的匹配（已报告过的不会重复报告），
+    然后只保留最后 window_chars 个字符，内存占用与输出总量无关。
+    长度超过 window_chars 的匹配无法识别。
+    """
+
+    def __init__(self, patterns: Dict[str, Union[str, Pattern]], window_chars: int = 4096):
+        """
+        初始化匹配器
+
+        Args:
+            patterns: 模式名 -> 正则表达式（字符串或已编译的模式）
+            window_chars: 滚动窗口保留的字符数
+        """
+        self.patterns = {
+            name: pattern if hasattr(pattern, 'finditer') else re.compile(pattern)
+            for name, pattern in patterns.items()
+        }
+        self.window_chars = window_chars
+        self._window = ''
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        """
+        输入一段新输出
+
+        Args:
+            text: 新输出
+
+        Returns:
+            list: 新出现的匹配 [(模式名, 匹配文本), ...]，按在输出中出现的位置排序
+        """
+        if not text:
+            return []
+        window = self._window + text
+        scanned = len(self._window)
+        hits = []
+        for name, pattern in self.patterns.items():
+            for match in pattern.finditer(window):
+                if match.end() > scanned:
+                    hits.append((match.start(), name, match.group(0)))
+        self._window = window[-self.window_chars:]
+        hits.sort(key=lambda hit: hit[0])
+        return [(name, matched) for _, name, matched in hits]
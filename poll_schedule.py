@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轮询调度模块
+按单调时钟截止时间安排作业完成检查：有进展时按基础间隔检查，长时间没有进展时逐步退避，
+接近预计完成时间时加快检查；根据完成曲线和各步骤的历史等待时长预测剩余时间
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+import config
+
+
+def schedule_config() -> Dict[str, Any]:
+    """读取轮询调度配置（缺省项使用默认值）"""
+    defaults = {
+        'min_interval': 5,
+        'max_interval': 120,
+        'backoff_factor': 1.5,
+        'history_file': os.path.join(os.path.dirname(os.path.abspath(__file__)), '.step_durations'),
+        'history_size': 20
+    }
+    defaults.update(getattr(config, 'POLL_SCHEDULE_CONFIG', {}))
+    return defaults
+
+
+class StepDurationHistory:
+    """各步骤历史等待时长（JSON状态文件，步骤 -> 最近若干次从开始检查到全部完成的秒数）"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化存储
+
+        Args:
+            path: 状态文件路径，默认使用 config.POLL_SCHEDULE_CONFIG['history_file']
+        """
+        self.path = path or schedule_config()['history_file']
+        self._lock = threading.Lock()
+
+    def expected(self, step: str) -> Optional[float]:
+        """步骤的预计等待时长（历史记录的中位数），没有记录时返回None"""
+        with self._lock:
+            durations = sorted(self._load().get(step, []))
+        if not durations:
+            return None
+        middle = len(durations) // 2
+        return durations[middle] if len(durations) % 2 else (durations[middle - 1] + durations[middle]) / 2
+
+    def record(self, step: str, seconds: float):
+        """记录一次等待时长（只保留最近 history_size 条）"""
+        with self._lock:
+            state = self._load()
+            durations = state.setdefault(step, [])
+            durations.append(round(seconds, 1))
+            del durations[:-schedule_config()['history_size']]
+            self._save(state)
+
+    def _load(self) -> Dict[str, List[float]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, state: Dict[str, List[float]]):
+        # 先写临时文件再改名，进程中途退出不会留下损坏的状态文件
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+
+# 进程内共用的历史记录
+duration_history = StepDurationHistory()
+
+
+class PollSchedule:
+    """
+    一次等待的轮询调度
+
+    用法：每次检查后调用 observe() 报告已完成数量，按 next_interval() 等待到下一次检查，
+    expired() 为True时停止等待，全部完成后调用 finish() 记录历史时长。
+    """
+
+    def __init__(self, max_wait_seconds: float, total: int, step: Optional[str] = None,
+                 base_interval: Optional[float] = None):
+        """
+        Args:
+            max_wait_seconds: 最大等待时间（秒），从创建时开始按单调时钟计算
+            total: 需要完成的数量（run数）
+            step: 步骤标识，用于读取和记录历史等待时长
+            base_interval: 基础检查间隔（秒），默认使用 config.CHECK_INTERVAL_SECONDS
+        """
+        settings = schedule_config()
+        self.start = time.monotonic()
+        self.deadline = self.start + max_wait_seconds
+        self.total = total
+        self.step = step
+        self.base_interval = base_interval if base_interval is not None else config.CHECK_INTERVAL_SECONDS
+        self.min_interval = min(settings['min_interval'], self.base_interval)
+        self.max_interval = max(settings['max_interval'], self.base_interval)
+        self.backoff_factor = settings['backoff_factor']
+        self.expected = duration_history.expected(step) if step else None
+
+        self.done: Optional[int] = None               # 最近一次检查的完成数量
+        self.initially_done: Optional[int] = None     # 第一次检查时的完成数量
+        self.interval = self.base_interval            # 按进展调整后的检查间隔
+        self._progress: List[Tuple[float, int]] = []  # 完成曲线 (时间, 完成数量)，只记录有进展的检查
+
+    def elapsed(self) -> float:
+        """已等待秒数"""
+        return time.monotonic() - self.start
+
+    def expired(self) -> bool:
+        """是否已到截止时间"""
+        return time.monotonic() >= self.deadline
+
+    def observe(self, done: int, changed: bool = True):
+        """
+        报告一次检查结果
+
+        Args:
+            done: 已完成数量
+            changed: 本次检查时目录是否有变化（有新文件生成但run尚未完成时也算有进展）
+        """
+        now = time.monotonic()
+        progressed = self.done is None or done > self.done
+        if self.done is None:
+            self.initially_done = done
+            if done > 0:
+                self._progress.append((now, done))
+        elif done > self.done:
+            self._progress.append((now, done))
+        self.done = done
+
+        if progressed or changed:
+            self.interval = self.base_interval
+        else:
+            self.interval = min(self.interval * self.backoff_factor, self.max_interval)
+
+    def eta(self) -> Optional[Tuple[float, str]]:
+        """
+        预测剩余等待时间
+
+        Returns:
+            tuple: (剩余秒数, 依据)，依据为 '完成曲线' 或 '历史时长'；无法预测时返回None
+        """
+        if self.done is not None and self.done >= self.total:
+            return 0.0, '完成曲线'
+        now = time.monotonic()
+        if len(self._progress) >= 2:
+            (first_time, first_done), (last_time, last_done) = self._progress[0], self._progress[-1]
+            rate = (last_done - first_done) / (last_time - first_time)
+            return max(0.0, last_time + (self.total - last_done) / rate - now), '完成曲线'
+        if self.expected is not None:
+            return max(0.0, self.start + self.expected - now), '历史时长'
+        return None
+
+    def next_interval(self) -> float:
+        """下一次检查前的等待秒数（不超过截止时间）"""
+        interval = self.interval
+        prediction = self.eta()
+        if prediction is not None:
+            remaining = prediction[0]
+            # 接近预计完成时加快检查；已超过预计时间时不再退避
+            interval = min(interval, max(self.min_interval, remaining / 2)) if remaining > 0 \
+                else min(interval, self.base_interval)
+        return max(0.0, min(interval, self.deadline - time.monotonic()))
+
+    def finish(self):
+        """全部完成时记录本次等待时长（第一次检查时已全部完成的不记录）"""
+        if self.step and self.initially_done is not None and self.initially_done < self.total \
+                and self.done is not None and self.done >= self.total:
+            duration_history.record(self.step, self.elapsed())
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+远程查询缓存模块
+缓存只读远程查询（ls 等只读命令、SFTP目录列表/通配符匹配）的结果，
+按路径配置有效期；执行会修改某路径的命令（rm、mv、genJob.sh 等）时自动失效该路径下的缓存
+"""
+
+import re
+import time
+import shlex
+import fnmatch
+import posixpath
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Iterable, Tuple, Hashable
+
+import config
+
+
+def _cache_config() -> Dict[str, Any]:
+    """读取缓存配置（缺省项使用默认值）"""
+    defaults = {
+        'enabled': True,
+        'default_ttl': 0,
+        'path_ttls': {},
+        'max_entries': 512
+    }
+    defaults.update(getattr(config, 'QUERY_CACHE_CONFIG', {}))
+    return defaults
+
+
+def _static_dir(path: str) -> str:
+    """路径中不含通配符的部分（含通配符时取其所在目录），用于判断两个路径是否相关"""
+    for index, char in enumerate(path):
+        if char in '*?[':
+            return posixpath.dirname(path[:index]) or '/'
+    return posixpath.normpath(path)
+
+
+def _overlaps(path_a: str, path_b: str) -> bool:
+    """两个路径是否相关（相同或一个位于另一个之下）"""
+    a, b = _static_dir(path_a), _static_dir(path_b)
+    if a == b or a == '/' or b == '/':
+        return True
+    return b.startswith(a.rstrip('/') + '/') or a.startswith(b.rstrip('/') + '/')
+
+
+def command_paths(command: str) -> List[str]:
+    """
+    提取命令涉及的远程路径
+
+    绝对路径直接使用；`cd 绝对路径` 之后的相对路径参数按该目录拼接，
+    cd 的目标目录本身也计入（其中的脚本可能修改该目录）。
+
+    Args:
+        command: shell命令
+
+    Returns:
+        list: 路径列表（可能包含通配符）；无法解析时返回空列表
+    """
+    paths = []
+    cwd = None
+    for segment in re.split(r'&&|\|\||[;|\n]', command):
+        try:
+            tokens = shlex.split(segment)
+        except ValueError:
+            return []
+        if not tokens:
+            continue
+        if tokens[0] == 'cd':
+            target = tokens[1] if len(tokens) > 1 else ''
+            cwd = target if target.startswith('/') else None
+            if cwd:
+                paths.append(cwd)
+            continue
+        for token in tokens[1:]:
+            token = token.split('=', 1)[-1] if token.startswith('--') else token
+            if token.startswith('/'):
+                paths.append(token)
+            elif cwd and token and not token.startswith('-'):
+                paths.append(posixpath.join(cwd, token))
+    return paths
+
+
+class QueryCache:
+    """
+    只读远程查询的TTL缓存
+
+    每条缓存记录查询涉及的路径，有效期取这些路径在 path_ttls 中配置的最小值
+    （path_ttls 的键为通配符模式，按 fnmatch 匹配查询路径；未匹配的路径使用 default_ttl），
+    有效期为0的查询不缓存。写操作涉及的路径与缓存路径相同或存在包含关系时，该缓存失效。
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, default_ttl: Optional[float] = None,
+                 path_ttls: Optional[Dict[str, float]] = None, max_entries: Optional[int] = None):
+        """
+        初始化缓存（未指定的参数使用 config.QUERY_CACHE_CONFIG）
+
+        Args:
+            enabled: 是否启用
+            default_ttl: 未配置路径的有效期（秒），0表示不缓存
+            path_ttls: 路径通配符模式 -> 有效期（秒）
+            max_entries: 最多保留的缓存条数，超出时淘汰最早写入的
+        """
+        settings = _cache_config()
+        self.enabled = settings['enabled'] if enabled is None else enabled
+        self.default_ttl = settings['default_ttl'] if default_ttl is None else default_ttl
+        self.path_ttls = dict(settings['path_ttls'] if path_ttls is None else path_ttls)
+        self.max_entries = settings['max_entries'] if max_entries is None else max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any, Tuple[str, ...]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ttl_for(self, paths: Iterable[str]) -> float:
+        """
+        计算一组路径的缓存有效期
+
+        Args:
+            paths: 查询涉及的路径
+
+        Returns:
+            float: 有效期（秒），0表示不缓存（无路径或任一路径不缓存）
+        """
+        paths = list(paths)
+        if not self.enabled or not paths:
+            return 0
+        ttls = []
+        for path in paths:
+            normalized = path.rstrip('/') or '/'
+            matched = [ttl for pattern, ttl in self.path_ttls.items()
+                       if fnmatch.fnmatchcase(normalized, pattern.rstrip('/') or '/')]
+            ttls.append(min(matched) if matched else self.default_ttl)
+        return max(min(ttls), 0)
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        查找缓存（计入命中/未命中次数）
+
+        Returns:
+            tuple: (是否命中, 缓存值)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key: Hashable, value: Any, paths: Iterable[str], ttl: float):
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            value: 查询结果
+            paths: 查询涉及的路径（用于失效判断）
+            ttl: 有效期（秒）
+        """
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value, tuple(paths))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, paths: Optional[Iterable[str]] = None) -> int:
+        """
+        使与指定路径相关的缓存失效
+
+        Args:
+            paths: 被修改的路径，None或空表示全部失效（无法判断写操作影响范围时）
+
+        Returns:
+            int: 失效的缓存条数
+        """
+        paths = list(paths or [])
+        with self._lock:
+            if not paths:
+                stale = list(self._entries)
+            else:
+                stale = [key for key, (_, _, entry_paths) in self._entries.items()
+                         if any(_overlaps(entry_path, path) for entry_path in entry_paths for path in paths)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def invalidate_command(self, command: str) -> int:
+        """使写命令涉及路径下的缓存失效（无法解析出路径时全部失效）"""
+        return self.invalidate(command_paths(command))
+
+    def clear(self):
+        """清空缓存（不重置计数）"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            dict: 包含enabled, entries, hits, misses, hit_rate, invalidations
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations
+            }
+
+
+# 每个连接池一份缓存（同一进程内访问同一服务器的 TopupSSH 实例共享）
+_caches: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def get_query_cache(pool) -> QueryCache:
+    """
+    获取（或创建）连接池对应的查询缓存
+
+    Args:
+        pool: SSHConnectionPool 实例
+
+    Returns:
+        QueryCache: 共享的查询缓存
+    """
+    with _caches_lock:
+        cache = _caches.get(pool)
+        if cache is None:
+            cache = QueryCache()
+            _caches[pool] = cache
+        return cache
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+远程辅助进程模块
+把一个轻量的Python脚本上传到目标服务器，在一个长期保持的exec通道中运行，
+通过逐行JSON请求/响应回答文件系统查询（存在性、stat、目录修改时间和条目数、列目录、遍历目录树、通配符计数、grep、tail），
+一次往返可以回答任意多个查询，且不需要为每个查询启动shell
+"""
+
+import json
+import time
+import hashlib
+import posixpath
+import selectors
+import threading
+import weakref
+from typing import Dict, Any, List, Optional
+
+import paramiko
+
+import config
+
+# 远程执行的辅助脚本（兼容 Python 2.6+ 和 Python 3，目标服务器可能只有系统自带的python）
+_AGENT_SOURCE = r'''
+import os, sys, json, glob, re, stat
+
+def entry(path, st):
+    return [path, st.st_size, int(st.st_mtime), stat.S_ISDIR(st.st_mode)]
+
+def op_exists(q):
+    return dict((p, os.path.exists(p)) for p in q['paths'])
+
+def op_stat(q):
+    result = {}
+    for p in q['paths']:
+        try:
+            result[p] = entry(p, os.stat(p))
+        except OSError:
+            result[p] = None
+    return result
+
+def op_dirstat(q):
+    result = {}
+    for p in q['paths']:
+        try:
+            result[p] = [os.stat(p).st_mtime, len(os.listdir(p))]
+        except OSError:
+            result[p] = None
+    return result
+
+def op_listdir(q):
+    d = q['path']
+    items = []
+    for name in sorted(os.listdir(d)):
+        try:
+            items.append(entry(os.path.join(d, name), os.lstat(os.path.join(d, name))))
+        except OSError:
+            pass
+    return items
+
+def op_glob(q):
+    items = []
+    for p in sorted(glob.glob(q['pattern'])):
+        try:
+            items.append(entry(p, os.stat(p)))
+        except OSError:
+            pass
+    return items
+
+def op_scan(q):
+    root = q['path'].rstrip('/') or '/'
+    depth = q.get('depth', 1)
+    items = []
+    pending = [(root, 1)]
+    while pending:
+        d, level = pending.pop()
+        try:
+            names = sorted(os.listdir(d))
+        except OSError:
+            if d == root:
+                raise
+            continue
+        for name in names:
+            p = os.path.join(d, name)
+            try:
+                st = os.lstat(p)
+            except OSError:
+                continue
+            items.append(entry(p, st))
+            if level < depth and stat.S_ISDIR(st.st_mode):
+                pending.append((p, level + 1))
+    return sorted(items)
+
+def op_count(q):
+    return len(glob.glob(q['pattern']))
+
+def op_grep(q):
+    regex = re.compile(q['pattern'])
+    limit = q.get('max_matches') or 0
+    result = {}
+    for p in q['paths']:
+        try:
+            f = open(p, 'rb')
+        except (IOError, OSError):
+            continue
+        lines = []
+        try:
+            for raw in f:
+                line = raw.decode('utf-8', 'ignore').rstrip('\r\n')
+                if regex.search(line):
+                    lines.append(line)
+                    if limit and len(lines) >= limit:
+                        break
+        finally:
+            f.close()
+        if lines:
+            result[p] = lines
+    return result
+
+def op_tail(q):
+    count = q.get('lines', 10)
+    f = open(q['path'], 'rb')
+    try:
+        f.seek(0, 2)
+        size = f.tell()
+        block = 65536
+        data = b''
+        while size > 0 and data.count(b'\n') <= count:
+            step = min(block, size)
+            size -= step
+            f.seek(size)
+            data = f.read(step) + data
+    finally:
+        f.close()
+    lines = data.decode('utf-8', 'ignore').splitlines()
+    return '\n'.join(lines[-count:]) if count else ''
+
+def op_read(q):
+    f = open(q['path'], 'rb')
+    try:
+        data = f.read(q['max_bytes']) if q.get('max_bytes') else f.read()
+    finally:
+        f.close()
+    return data.decode('utf-8', 'ignore')
+
+OPS = {'exists': op_exists, 'stat': op_stat, 'dirstat': op_dirstat, 'listdir': op_listdir, 'glob': op_glob,
+       'scan': op_scan, 'count': op_count, 'grep': op_grep, 'tail': op_tail, 'read': op_read}
+
+def answer(q):
+    try:
+        return {'ok': True, 'value': OPS[q['op']](q)}
+    except KeyError:
+        return {'ok': False, 'error': 'unknown op: %s' % q.get('op')}
+    except Exception:
+        return {'ok': False, 'error': str(sys.exc_info()[1])}
+
+def main():
+    sys.stdout.write(json.dumps({'ready': True, 'version': VERSION}) + '\n')
+    sys.stdout.flush()
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        try:
+            request = json.loads(line)
+            response = {'id': request.get('id'), 'results': [answer(q) for q in request.get('queries', [])]}
+        except Exception:
+            response = {'id': None, 'error': str(sys.exc_info()[1])}
+        sys.stdout.write(json.dumps(response) + '\n')
+        sys.stdout.flush()
+
+main()
+'''
+
+# 查询类型（与辅助脚本中的 OPS 对应）
+AGENT_OPS = ('exists', 'stat', 'dirstat', 'listdir', 'glob', 'scan', 'count', 'grep', 'tail', 'read')
+
+
+def _agent_config() -> Dict[str, Any]:
+    """读取辅助进程配置（缺省项使用默认值）"""
+    defaults = {
+        'enabled': True,
+        'remote_dir': '.topup_agent',
+        'python': None,
+        'start_timeout': 15,
+        'request_timeout': 60
+    }
+    defaults.update(getattr(config, 'REMOTE_AGENT_CONFIG', {}))
+    return defaults
+
+
+class RemoteAgent:
+    """
+    远程辅助进程客户端
+
+    首次使用时把辅助脚本上传到目标服务器（脚本名带内容哈希，已存在则不重复上传），
+    然后占用连接池的一个通道运行该脚本；请求串行发送，每个请求一行JSON、一次往返。
+    启动失败后在同一连接代内不再重试，调用方应回退到普通命令。
+    """
+
+    def __init__(self, pool):
+        """
+        初始化辅助进程客户端
+
+        Args:
+            pool: SSHConnectionPool 实例
+        """
+        self.pool = pool
+        settings = _agent_config()
+        self.enabled = settings['enabled']
+        self.remote_dir = settings['remote_dir']
+        self.python = settings['python']
+        self.start_timeout = settings['start_timeout']
+        self.request_timeout = settings['request_timeout']
+
+        self.version = hashlib.sha1(_AGENT_SOURCE.encode('utf-8')).hexdigest()[:12]
+        self.remote_path: Optional[str] = None
+        self.requests = 0
+        self.queries = 0
+        self.starts = 0
+
+        self._channel: Optional[paramiko.Channel] = None
+        self._generation: Optional[int] = None
+        self._failed_generation: Optional[int] = None
+        self._buffer = b''
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """辅助进程是否在当前连接上运行"""
+        return (self._channel is not None and not self._channel.closed
+                and self._generation == self.pool.generation)
+
+    def available(self) -> bool:
+        """辅助进程是否可用（已运行，或尚未在当前连接上启动失败过）"""
+        return self.enabled and (self.running or self._failed_generation != self.pool.generation)
+
+    def request(self, queries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        发送一批查询，一次往返返回全部结果
+
+        Args:
+            queries: 查询列表，如 [{'op': 'exists', 'paths': [...]}, {'op': 'count', 'pattern': '...'}]
+
+        Returns:
+            list: 与queries一一对应的结果 [{'ok': True, 'value': ...} 或 {'ok': False, 'error': ...}]
+
+        Raises:
+            ConnectionError: 辅助进程不可用或通信失败（此时辅助进程已关闭）
+        """
+        with self._lock:
+            if not self.running:
+                self._start()
+            self._next_id += 1
+            request_id = self._next_id
+            try:
+                self._channel.sendall((json.dumps({'id': request_id, 'queries': queries}) + '\n').encode('utf-8'))
+                response = json.loads(self._read_line(time.monotonic() + self.request_timeout))
+            except Exception as e:
+                self._stop()
+                raise ConnectionError(f'远程辅助进程通信失败: {str(e)}')
+            if response.get('id') != request_id or 'results' not in response:
+                self._stop()
+                raise ConnectionError(f"远程辅助进程响应无效: {response.get('error', response)}")
+            self.requests += 1
+            self.queries += len(queries)
+            return response['results']
+
+    def close(self):
+        """关闭辅助进程（归还通道名额）"""
+        with self._lock:
+            self._stop()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取辅助进程统计
+
+        Returns:
+            dict: 包含enabled, running, starts, requests, queries
+        """
+        return {
+            'enabled': self.enabled,
+            'running': self.running,
+            'starts': self.starts,
+            'requests': self.requests,
+            'queries': self.queries
+        }
+
+    def _start(self):
+        """上传（必要时）并启动辅助进程，等待就绪行"""
+        generation = self.pool.generation
+        if not self.enabled or self._failed_generation == generation:
+            raise ConnectionError('远程辅助进程不可用')
+        self._stop()
+        try:
+            self._upload()
+            channel = self.pool.open_channel(timeout=self.start_timeout)
+            self._channel = channel
+            self._generation = generation
+            self._buffer = b''
+            if self.python:
+                launcher = f"exec {self.python} -u {self.remote_path}"
+            else:
+                launcher = (f"if command -v python3 >/dev/null 2>&1; then exec python3 -u {self.remote_path}; "
+                            f"else exec python -u {self.remote_path}; fi")
+            channel.exec_command(launcher)
+            ready = json.loads(self._read_line(time.monotonic() + self.start_timeout))
+            if not ready.get('ready') or ready.get('version') != self.version:
+                raise ConnectionError(f'远程辅助进程版本不匹配: {ready}')
+            self.starts += 1
+            print(f"✓ 远程辅助进程已启动: {self.remote_path}")
+        except Exception as e:
+            self._stop()
+            self._failed_generation = generation
+            print(f"⚠ 远程辅助进程启动失败，改用普通命令: {str(e)}")
+            raise ConnectionError(f'远程辅助进程启动失败: {str(e)}')
+
+    def _upload(self):
+        """把辅助脚本上传到远程目录（同名脚本已存在时跳过）"""
+        source = _AGENT_SOURCE.replace('main()\n', f"VERSION = {self.version!r}\nmain()\n", 1)
+        data = source.encode('utf-8')
+        with self.pool.shared_sftp() as sftp:
+            remote_dir = self.remote_dir
+            if not remote_dir.startswith('/'):
+                remote_dir = posixpath.join(sftp.normalize('.'), remote_dir)
+            remote_path = posixpath.join(remote_dir, f"agent_{self.version}.py")
+            try:
+                if sftp.stat(remote_path).st_size == len(data):
+                    self.remote_path = remote_path
+                    return
+            except IOError:
+                pass
+            try:
+                sftp.mkdir(remote_dir)
+            except IOError:
+                pass
+            # 先写临时文件再改名，避免并发启动时读到写了一半的脚本
+            temp_path = f"{remote_path}.{time.time_ns()}.tmp"
+            with sftp.open(temp_path, 'wb') as remote_file:
+                remote_file.write(data)
+            sftp.posix_rename(temp_path, remote_path)
+        self.remote_path = remote_path
+
+    def _read_line(self, deadline: float) -> str:
+        """读取一行响应（超时或通道关闭时抛出异常）"""
+        selector = selectors.DefaultSelector()
+        selector.register(self._channel, selectors.EVENT_READ)
+        try:
+            while b'\n' not in self._buffer:
+                if self._channel.recv_ready():
+                    data = self._channel.recv(65536)
+                    if not data:
+                        raise ConnectionError('远程辅助进程已退出')
+                    self._buffer += data
+                    continue
+                if self._channel.closed or self._channel.eof_received:
+                    raise ConnectionError('远程辅助进程已退出')
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError('等待远程辅助进程响应超时')
+                selector.select(remaining)
+        finally:
+            selector.close()
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return line.decode('utf-8', errors='ignore')
+
+    def _stop(self):
+        """关闭辅助进程通道"""
+        channel, self._channel = self._channel, None
+        self._buffer = b''
+        if channel is not None:
+            self.pool.close_channel(channel)
+
+
+# 每个连接池一个辅助进程（同一进程内的 TopupSSH 实例共享）
+_agents: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+_agents_lock = threading.Lock()
+
+
+def get_remote_agent(pool) -> RemoteAgent:
+    """
+    获取（或创建）连接池对应的远程辅助进程客户端
+
+    Args:
+        pool: SSHConnectionPool 实例
+
+    Returns:
+        RemoteAgent: 共享的辅助进程客户端
+    """
+    with _agents_lock:
+        agent = _agents.get(pool)
+        if agent is None:
+            agent = RemoteAgent(pool)
+            _agents[pool] = agent
+        return agent
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 """
 远程命令执行脚本
-支持通过SSH双跳连接在远程服务器上执行ls和cat命令
+支持通过SSH双跳连接在远程服务器上执行ls、cat命令和跟踪日志文件
 
 功能说明：
 1. ls命令：列出远程服务器上指定目录的内容，使用ls -lah显示详细信息
@@ -13,12 +13,16 @@
    - 支持文本文件查看
    - 显示完整文件内容
 
+3. follow命令：持续跟踪远程服务器上的日志文件（类似 tail -f）
+   - 只读取上次跟踪之后新增的内容（偏移保存在本地，重新执行时继续）
+   - 按 Ctrl+C 结束
+
 使用方法：
   python remote_command.py <command> <path>
   
 参数说明：
-  command: 要执行的命令，只能是 "ls" 或 "cat"
-  path: 远程服务器上的路径（目录或文件）
+  command: 要执行的命令，只能是 "ls"、"cat" 或 "follow"
+  path: 远程服务器上的路径（目录或文件；follow 可以指定多个文件）
 
 SSH连接：
 - 使用SSH双跳连接：跳板机(lxlogin) → 目标服务器(beslogin)
@@ -39,11 +43,14 @@ SSH连接：
   
   # 列出当前目录
   python remote_command.py ls .
+
+  # 跟踪作业日志
+  python remote_command.py follow /besfs5/groups/cal/topup/round18/DataValid/InjSigTimeCal/250519/rec85383_1.txt.bosserr
 """
 
 import sys
 import argparse
-from topup_ssh import TopupSSH
+from local_executor import create_executor
 
 
 def execute_ls(ssh, path: str):
@@ -122,6 +129,44 @@ def execute_cat(ssh, path: str):
     return result['success']
 
 
+def execute_follow(ssh, paths: list, duration: float = 0):
+    """
+    执行follow命令，持续跟踪远程服务器上的一个或多个文件并输出新增的行
+
+    功能：
+    - 每个文件从上次跟踪结束的位置继续读取（首次跟踪时从头读取）
+    - 跟踪多个文件时在每行前标注文件名
+    - 文件被截断或替换时从头读取
+
+    Args:
+        ssh: SSH连接实例
+        paths: 要跟踪的文件路径列表
+        duration: 跟踪的秒数，0 表示一直跟踪直到用户中断
+
+    Returns:
+        bool: 执行是否成功
+    """
+    print(f"\n跟踪文件: {', '.join(paths)}")
+    print("="*60)
+
+    def show_line(path: str, line: str):
+        prefix = f"[{path.rsplit('/', 1)[-1]}] " if len(paths) > 1 else ''
+        print(f"{prefix}{line}", flush=True)
+
+    result = ssh.follow(paths, on_line=show_line, consumer='remote_command',
+                        duration=duration if duration > 0 else float('inf'))
+
+    if not result['success']:
+        print("\n✗ 执行失败")
+        print(f"错误: {result['error']}")
+    else:
+        missing = [path for path, item in result['files'].items() if not item['exists']]
+        if missing:
+            print(f"\n⚠ 文件不存在: {', '.join(missing)}")
+
+    return result['success']
+
+
 def main():
     """
     主函数：处理命令行参数并执行远程命令
@@ -156,20 +201,31 @@ def main():
 
   # 查看日志文件
   python remote_command.py cat /besfs5/groups/cal/topup/round18/DataValid/InjSigTimeCal/250519/rec85383_1.txt.bosslog
+
+  # 跟踪作业日志（只显示上次跟踪之后新增的内容，Ctrl+C 结束）
+  python remote_command.py follow /besfs5/groups/cal/topup/round18/DataValid/InjSigTimeCal/250519/rec85383_1.txt.bosslog
         """
     )
     
     parser.add_argument(
         'command',
         type=str,
-        choices=['ls', 'cat'],
-        help='要执行的命令：ls（列出目录）或cat（查看文件）'
+        choices=['ls', 'cat', 'follow'],
+        help='要执行的命令：ls（列出目录）、cat（查看文件）或follow（跟踪文件新增内容）'
     )
     
     parser.add_argument(
         'path',
         type=str,
-        help='远程服务器上的路径（目录或文件）'
+        nargs='+',
+        help='远程服务器上的路径（目录或文件；follow 可以指定多个文件）'
+    )
+
+    parser.add_argument(
+        '--duration',
+        type=float,
+        default=0,
+        help='follow 跟踪的秒数，默认一直跟踪直到 Ctrl+C'
     )
     
     args = parser.parse_args()
@@ -179,10 +235,10 @@ def main():
     print("远程命令执行脚本")
     print("="*60)
     print(f"命令: {args.command}")
-    print(f"路径: {args.path}")
+    print(f"路径: {' '.join(args.path)}")
     print("="*60)
     
-    ssh = TopupSSH()
+    ssh = create_executor()
     
     if not ssh.connect():
         print("\n✗ SSH连接失败，程序退出")
@@ -191,9 +247,11 @@ def main():
     try:
         # 根据命令类型执行
         if args.command == 'ls':
-            success = execute_ls(ssh, args.path)
+            success = execute_ls(ssh, args.path[0])
         elif args.command == 'cat':
-            success = execute_cat(ssh, args.path)
+            success = execute_cat(ssh, args.path[0])
+        elif args.command == 'follow':
+            success = execute_follow(ssh, args.path, args.duration)
         else:
             print(f"\n✗ 不支持的命令: {args.command}")
             success = False
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+远程文件系统模块
+基于连接池中长期保持的SFTP会话提供结构化的文件查询接口，
+替代 `ls ... | wc -l` 之类的shell命令和文本解析
+"""
+
+import errno
+import uuid
+import fnmatch
+import posixpath
+import stat as stat_module
+from typing import Dict, List, Optional, NamedTuple, Iterable
+
+import paramiko
+
+
+class RemoteFileEntry(NamedTuple):
+    """远程文件条目"""
+    name: str       # 文件名
+    path: str       # 完整路径
+    size: int       # 文件大小（字节）
+    mtime: float    # 修改时间（Unix时间戳）
+    is_dir: bool    # 是否为目录
+
+    @classmethod
+    def from_attr(cls, path: str, attr: paramiko.SFTPAttributes) -> 'RemoteFileEntry':
+        """由SFTP属性构造条目"""
+        return cls(
+            name=posixpath.basename(path.rstrip('/')) or path,
+            path=path,
+            size=attr.st_size or 0,
+            mtime=float(attr.st_mtime or 0),
+            is_dir=stat_module.S_ISDIR(attr.st_mode or 0)
+        )
+
+
+def _is_missing(error: Exception) -> bool:
+    """判断SFTP异常是否表示文件不存在"""
+    return isinstance(error, FileNotFoundError) or getattr(error, 'errno', None) == errno.ENOENT
+
+
+def _has_magic(pattern: str) -> bool:
+    """判断路径中是否包含通配符"""
+    return any(char in pattern for char in '*?[')
+
+
+class RemoteFileSystem:
+    """
+    远程文件系统查询
+
+    所有查询复用连接池中的持久SFTP会话（pool.shared_sftp），
+    不需要为每次查询启动远端shell，也不需要解析ls的文本输出。
+    """
+
+    def __init__(self, pool):
+        """
+        初始化远程文件系统
+
+        Args:
+            pool: SSHConnectionPool 实例
+        """
+        self.pool = pool
+
+    def stat(self, path: str) -> Optional[RemoteFileEntry]:
+        """
+        获取文件属性
+
+        Args:
+            path: 远程路径
+
+        Returns:
+            RemoteFileEntry: 文件条目，文件不存在时返回None
+        """
+        with self.pool.shared_sftp() as sftp:
+            try:
+                return RemoteFileEntry.from_attr(path, sftp.stat(path))
+            except IOError as e:
+                if _is_missing(e):
+                    return None
+                raise
+
+    def listdir_attr(self, path: str) -> List[RemoteFileEntry]:
+        """
+        列出目录内容（一次往返获取全部条目的名称、大小和修改时间）
+
+        Args:
+            path: 远程目录路径
+
+        Returns:
+            list: 按文件名排序的 RemoteFileEntry 列表
+
+        Raises:
+            FileNotFoundError: 目录不存在
+        """
+        with self.pool.shared_sftp() as sftp:
+            attrs = sftp.listdir_attr(path)
+        entries = [RemoteFileEntry.from_attr(posixpath.join(path, attr.filename), attr) for attr in attrs]
+        entries.sort(key=lambda entry: entry.name)
+        return entries
+
+    def exists_many(self, paths: Iterable[str]) -> Dict[str, bool]:
+        """
+        批量检查文件是否存在
+
+        按所在目录分组，每个目录只列出一次，
+        因此同一目录下的任意多个文件只需一次往返。
+
+        Args:
+            paths: 远程路径列表
+
+        Returns:
+            dict: 路径 -> 是否存在
+        """
+        paths = list(paths)
+        by_dir: Dict[str, List[str]] = {}
+        for path in paths:
+            by_dir.setdefault(posixpath.dirname(path) or '.', []).append(path)
+
+        existing = {}
+        for directory, dir_paths in by_dir.items():
+            try:
+                names = {entry.name for entry in self.listdir_attr(directory)}
+            except IOError as e:
+                if not _is_missing(e):
+                    raise
+                names = set()
+            for path in dir_paths:
+                existing[path] = posixpath.basename(path) in names
+
+        return {path: existing[path] for path in paths}
+
+    def glob(self, pattern: str) -> List[RemoteFileEntry]:
+        """
+        按shell通配符匹配远程文件（与shell一样，*不匹配以.开头的文件）
+
+        Args:
+            pattern: 通配符路径，如 /path/to/dir/rec*_1.txt
+
+        Returns:
+            list: 匹配的 RemoteFileEntry 列表（按路径排序）
+        """
+        dirname, basename = posixpath.split(pattern)
+
+        if not _has_magic(dirname):
+            directories = [dirname or '.']
+        else:
+            directories = [entry.path for entry in self.glob(dirname) if entry.is_dir]
+
+        matches = []
+        for directory in directories:
+            if not _has_magic(basename):
+                entry = self.stat(posixpath.join(directory, basename))
+                if entry is not None:
+                    matches.append(entry)
+                continue
+
+            try:
+                entries = self.listdir_attr(directory)
+            except IOError as e:
+                if _is_missing(e):
+                    continue
+                raise
+            for entry in entries:
+                if entry.name.startswith('.') and not basename.startswith('.'):
+                    continue
+                if fnmatch.fnmatchcase(entry.name, basename):
+                    matches.append(entry)
+
+        matches.sort(key=lambda entry: entry.path)
+        return matches
+
+    def read_text(self, path: str, encoding: str = 'utf-8', max_bytes: Optional[int] = None) -> str:
+        """
+        读取远程文本文件
+
+        Args:
+            path: 远程文件路径
+            encoding: 文本编码，默认utf-8（无法解码的字节被忽略）
+            max_bytes: 最多读取的字节数，默认读取整个文件
+
+        Returns:
+            str: 文件内容
+        """
+        with self.pool.shared_sftp() as sftp:
+            with sftp.open(path, 'rb') as remote_file:
+                remote_file.prefetch()
+                data = remote_file.read(max_bytes) if max_bytes else remote_file.read()
+        return data.decode(encoding, errors='ignore')
+
+    def write_many(self, files: Dict[str, bytes], mode: Optional[int] = None) -> Dict[str, int]:
+        """
+        在一个SFTP会话上原子地写入多个文件
+
+        每个文件先写入同目录下的临时文件（.<文件名>.tmp-<随机串>），写完后改名覆盖目标文件，
+        读取方只会看到旧内容或完整的新内容；已存在的文件保留原权限。
+        某个文件失败时删除它的临时文件并抛出异常，之前已改名的文件保持新内容。
+
+        Args:
+            files: 远程路径 -> 文件内容
+            mode: 新建文件的权限（如 0o644），默认使用服务器的默认权限
+
+        Returns:
+            dict: 远程路径 -> 写入的字节数
+        """
+        written = {}
+        with self.pool.shared_sftp() as sftp:
+            for path, data in files.items():
+                directory, name = posixpath.split(path)
+                temp_path = posixpath.join(directory, f".{name}.tmp-{uuid.uuid4().hex[:8]}")
+                try:
+                    existing_mode = sftp.stat(path).st_mode
+                except IOError as e:
+                    if not _is_missing(e):
+                        raise
+                    existing_mode = None
+                try:
+                    with sftp.open(temp_path, 'wb') as remote_file:
+                        remote_file.set_pipelined(True)
+                        remote_file.write(data)
+                    if existing_mode is not None or mode is not None:
+                        sftp.chmod(temp_path, stat_module.S_IMODE(existing_mode) if existing_mode is not None else mode)
+                    self._replace(sftp, temp_path, path)
+                except Exception:
+                    try:
+                        sftp.remove(temp_path)
+                    except IOError:
+                        pass
+                    raise
+                written[path] = len(data)
+        return written
+
+    @staticmethod
+    def _replace(sftp: paramiko.SFTPClient, source: str, target: str):
+        """改名覆盖目标文件（优先使用 posix-rename 扩展，服务器不支持时先删除目标再改名）"""
+        try:
+            sftp.posix_rename(source, target)
+        except IOError as e:
+            if 'unsupported' not in str(e).lower():
+                raise
+            try:
+                sftp.remove(target)
+            except IOError:
+                pass
+            sftp.rename(source, target)
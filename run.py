@@ -17,6 +17,7 @@ BESIII Topup 数据验证执行脚本
 - 批量执行：python run.py --all --date 250519
 - Total模式：python run.py --total
 - 列出步骤：python run.py --list
+- 在beslogin上直接运行（不经过SSH）：python run.py --all --date 250519 --executor local
 
 超时配置说明：
 - 作业提交步骤（1.1, 2.1, 3.1, 4, 5.1, 6.1）：300秒（5分钟）
@@ -30,10 +31,11 @@ import time
 import re
 
 # 导入核心模块
-from topup_ssh import TopupSSH
+from local_executor import create_executor
 import config
 import error_codes
 from logger import step_logger
+from ssh_metrics import command_metrics
 from iflow_cli_client import iflow_client
 
 # 导入步骤模块
@@ -105,6 +107,7 @@ STEPS = {
         'name': '步骤2.3：生成png文件',
         'func': step2_3_generate_png.step2_3_generate_png,
         'needs_date': False,
+        'optional_date': True,
         'is_check_step': False
     },
     '2.4': {
@@ -183,6 +186,7 @@ STEPS = {
         'name': '步骤7：运行reset.sh脚本',
         'func': step7_run_reset_script.step7_run_reset_script,
         'needs_date': False,
+        'optional_date': True,
         'is_check_step': False
     },
     '8': {
@@ -338,6 +342,8 @@ def analyze_result(step_name: str, result: dict, ssh=None) -> dict:
         # 显示是否有未完成的run号
         if 'incomplete_runs' in result and result['incomplete_runs']:
             print(f"未完成的run号: {result['incomplete_runs']}")
+            if result.get('eta_seconds') is not None:
+                print(f"预计还需等待: {result['eta_seconds']}秒")
 
         print("\n推荐操作")
         print(f"推荐操作: {error_info['action']}")
@@ -405,8 +411,13 @@ def execute_step(ssh, step_key, date=None, max_wait=None, retry_params=None, sub
                 step_name_with_retry += f" (重试 {retry_count}/{max_retries})"
             step_logger.log_step_start(step_key, step_name_with_retry, date)
 
-        # 调用步骤函数
-        result = _call_step_function(ssh, step_key, step_info, date, max_wait, retry_params, submit_job_arg, check_arg)
+        # 调用步骤函数（期间的远程操作按步骤计入SSH统计）
+        with command_metrics.step_scope(step_key):
+            result = _call_step_function(ssh, step_key, step_info, date, max_wait, retry_params, submit_job_arg, check_arg)
+
+        # 记录执行该步骤的连接路径（跳板机→目标节点 -> 操作数）
+        if isinstance(result, dict):
+            result['ssh_paths'] = command_metrics.step_paths(step_key)
 
         # 如果成功，跳出重试循环
         if result and result.get('success', False):
@@ -624,6 +635,9 @@ def _call_step_function(ssh, step_key, step_info, date, max_wait, retry_params,
     elif step_info['needs_date']:
         # 需要日期的非检查步骤
         return step_info['func'](ssh, date)
+    elif step_info.get('optional_date') and date:
+        # 日期可选的非检查步骤（日期用于区分不同日期的后台作业）
+        return step_info['func'](ssh, date)
     else:
         # 不需要日期的非检查步骤
         return step_info['func'](ssh)
@@ -710,9 +724,9 @@ def get_date_for_step(ssh, step_key, args_date):
     Returns:
         str: 日期
     """
-    # 如果步骤不需要日期，返回None
+    # 如果步骤不需要日期，返回None（可选日期的步骤使用命令行参数中的日期，未指定时由步骤使用当天日期）
     if not STEPS[step_key]['needs_date']:
-        return None
+        return args_date if STEPS[step_key].get('optional_date') else None
 
     # 如果用户指定了日期，直接使用
     if args_date:
@@ -1102,6 +1116,18 @@ def execute_total_mode(ssh, args):
         config.clear_step_progress()
 
 
+def report_ssh_metrics():
+    """打印各步骤的SSH远程操作统计，并按 config.SSH_METRICS_CONFIG 导出为JSON"""
+    if not command_metrics.summary()['total']['operations']:
+        return
+    command_metrics.print_summary()
+    if getattr(config, 'SSH_METRICS_CONFIG', {}).get('dump_on_exit', True):
+        try:
+            print(f"SSH统计已导出: {command_metrics.dump()}")
+        except OSError as e:
+            print(f"⚠ SSH统计导出失败: {str(e)}")
+
+
 # ============================================================================
 # 主函数
 # ============================================================================
@@ -1119,6 +1145,8 @@ def main():
     parser.add_argument('--max-wait', type=int, help='最大等待时间（分钟），用于定时检查步骤（1.1、2.2、2.5、3.1、5.1、6.2）')
     parser.add_argument('--submit-job', type=str, choices=['true', 'false'], help='是否提交作业（true/false），用于步骤1.1、2.1、3.1、4.1、5.1、6.1。默认为true')
     parser.add_argument('--check', type=str, choices=['true', 'false'], help='是否检查生成的文件（true/false），用于步骤4.1。默认为false（非topup模式）')
+    parser.add_argument('--executor', type=str, choices=['ssh', 'local'], help='执行方式：ssh（经双跳SSH）或 local（直接运行在beslogin上时使用），默认使用 config.EXECUTOR_CONFIG')
+    parser.add_argument('--file-events', type=str, choices=['true', 'false'], help='等待作业结果时是否由远程监视进程推送文件事件（true/false），默认使用 config.FILE_EVENTS_CONFIG')
 
     args = parser.parse_args()
 
@@ -1136,6 +1164,10 @@ def main():
     args.submit_job_arg = submit_job_arg
     args.check_arg = check_arg
 
+    # 处理file_events参数（覆盖配置文件，各步骤的等待循环按配置决定是否使用文件事件）
+    if args.file_events:
+        config.FILE_EVENTS_CONFIG['enabled'] = args.file_events == 'true'
+
     # 列出所有可用步骤
     if args.list:
         print("\n所有可用步骤：")
@@ -1160,7 +1192,7 @@ def main():
 
     # 建立SSH连接
     print("\n正在建立SSH连接...")
-    ssh = TopupSSH()
+    ssh = create_executor(args.executor)
 
     if not ssh.connect():
         print("\n✗ SSH连接失败")
@@ -1181,6 +1213,7 @@ def main():
         ssh.close()
         # 关闭日志记录
         step_logger.disable()
+        report_ssh_metrics()
 
     return
 
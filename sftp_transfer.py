@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件传输模块
+- SFTPDownloader: 流水线、可断点续传、多通道并行的SFTP下载引擎，下载完成后用远程校验和验证完整性
+- TarStreamDownloader: 大量小文件通过单个tar流批量下载
+"""
+
+import os
+import json
+import time
+import shlex
+import shutil
+import tarfile
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional
+
+import config
+
+
+def _transfer_config() -> Dict[str, Any]:
+    """读取传输配置（缺省项使用默认值）"""
+    defaults = {
+        'chunk_size': 32768,
+        'requests_in_flight': 64,
+        'parallel_threshold_mb': 8,
+        'max_ranges': 4,
+        'verify_checksum': True,
+        'checksum_algorithm': 'md5',
+        'transport_profile': 'bulk'
+    }
+    defaults.update(getattr(config, 'SFTP_TRANSFER_CONFIG', {}))
+    return defaults
+
+
+class SFTPDownloader:
+    """
+    SFTP下载引擎
+
+    - 流水线：每个通道同时保持 requests_in_flight 个读请求（SFTPFile.readv）
+    - 并行：大于 parallel_threshold_mb 的文件切分为多个区间，每个区间使用独立的SFTP通道
+    - 续传：数据先写入 <本地路径>.part，进度记录在 <本地路径>.part.json，
+      中断后再次下载同一文件（远程大小和修改时间未变）时从断点继续
+    - 校验：下载完成后比较远程和本地的校验和（md5sum/sha1sum/sha256sum）
+    """
+
+    def __init__(self, ssh, **overrides):
+        """
+        初始化下载引擎
+
+        Args:
+            ssh: 已连接的 TopupSSH 实例（使用其连接池和命令执行）
+            **overrides: 覆盖 config.SFTP_TRANSFER_CONFIG 中的配置项
+        """
+        self.ssh = ssh
+        self.pool = ssh.pool
+        self.settings = _transfer_config()
+        self.settings.update(overrides)
+
+    def download(self, remote_path: str, local_path: str, verify: Optional[bool] = None,
+                 resume: bool = True) -> Dict[str, Any]:
+        """
+        下载单个文件
+
+        Args:
+            remote_path: 远程文件路径
+            local_path: 本地文件路径
+            verify: 是否校验，默认使用配置中的 verify_checksum
+            resume: 是否从已有的 .part 文件续传
+
+        Returns:
+            dict: 下载结果，包含success, message, size, transferred_bytes, resumed_bytes,
+                  ranges, elapsed, throughput_mbps, checksum
+        """
+        verify = self.settings['verify_checksum'] if verify is None else verify
+        part_path = local_path + '.part'
+        state_path = part_path + '.json'
+        start_time = time.time()
+
+        remote = self.ssh.stat(remote_path)
+        if remote is None:
+            raise FileNotFoundError(f'远程文件不存在: {remote_path}')
+
+        # 读取断点；远程文件已变化或不续传时重新开始
+        state = self._load_state(state_path) if resume else None
+        if (state is None or state.get('size') != remote.size or state.get('mtime') != remote.mtime
+                or not os.path.exists(part_path)):
+            state = {
+                'remote_path': remote_path,
+                'size': remote.size,
+                'mtime': remote.mtime,
+                'ranges': self._plan_ranges(remote.size)
+            }
+            with open(part_path, 'wb') as part_file:
+                part_file.truncate(remote.size)
+        resumed_bytes = sum(done for _, _, done in state['ranges'])
+        if resumed_bytes:
+            print(f"  从断点续传: 已完成 {resumed_bytes}/{remote.size} 字节")
+
+        state_lock = threading.Lock()
+        errors: List[Exception] = []
+        pending = [index for index, (start, end, done) in enumerate(state['ranges']) if start + done < end]
+
+        if len(pending) == 1 and len(state['ranges']) == 1:
+            # 单区间：直接使用持久SFTP会话，省去打开新子系统的往返
+            with self.pool.shared_sftp() as sftp:
+                self._fetch_range(sftp, remote_path, part_path, state, 0, state_lock, state_path)
+        elif pending:
+            print(f"  并行下载 {len(pending)} 个区间")
+            workers = [
+                threading.Thread(
+                    target=self._range_worker,
+                    args=(remote_path, part_path, state, index, state_lock, state_path, errors),
+                    daemon=True
+                )
+                for index in pending
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        if errors:
+            self._save_state(state_path, state, state_lock)
+            raise errors[0]
+
+        local_digest = None
+        if verify:
+            remote_digest = self._remote_checksum(remote_path)
+            local_digest = self._local_checksum(part_path)
+            if remote_digest != local_digest:
+                os.remove(part_path)
+                self._remove_state(state_path)
+                raise IOError(f'校验和不一致: 远程 {remote_digest}，本地 {local_digest}')
+            print(f"  ✓ 校验通过（{self.settings['checksum_algorithm']}: {local_digest}）")
+
+        os.replace(part_path, local_path)
+        self._remove_state(state_path)
+
+        elapsed = time.time() - start_time
+        transferred = remote.size - resumed_bytes
+        throughput = transferred / elapsed / (1024 * 1024) if elapsed > 0 else 0.0
+        print(f"  传输 {transferred} 字节，耗时 {elapsed:.2f} 秒，平均速率 {throughput:.2f} MB/s")
+
+        return {
+            'success': True,
+            'message': f'文件下载成功: {local_path}',
+            'remote_path': remote_path,
+            'local_path': local_path,
+            'size': remote.size,
+            'transferred_bytes': transferred,
+            'resumed_bytes': resumed_bytes,
+            'ranges': len(state['ranges']),
+            'elapsed': elapsed,
+            'throughput_mbps': throughput,
+            'checksum': local_digest
+        }
+
+    def _plan_ranges(self, size: int) -> List[List[int]]:
+        """按文件大小切分下载区间，每个区间为 [起始, 结束, 已完成字节数]"""
+        threshold = self.settings['parallel_threshold_mb'] * 1024 * 1024
+        if size <= threshold:
+            return [[0, size, 0]]
+        # 持久SFTP会话可能占用一个通道名额，区间数不超过剩余名额
+        count = max(1, min(self.settings['max_ranges'], self.pool.max_channels - 1))
+        step = -(-size // count)
+        return [[start, min(start + step, size), 0] for start in range(0, size, step)]
+
+    def _range_worker(self, remote_path, part_path, state, index, state_lock, state_path, errors):
+        """在独立的SFTP通道上下载一个区间"""
+        try:
+            with self.pool.lease_sftp(profile=self.settings['transport_profile']) as sftp:
+                self._fetch_range(sftp, remote_path, part_path, state, index, state_lock, state_path)
+        except Exception as e:
+            errors.append(e)
+
+    def _fetch_range(self, sftp, remote_path, part_path, state, index, state_lock, state_path):
+        """
+        下载一个区间：每批发出 requests_in_flight 个读请求（readv流水线），
+        写入 .part 文件后记录进度
+        """
+        chunk_size = self.settings['chunk_size']
+        batch_bytes = chunk_size * self.settings['requests_in_flight']
+        start, end, done = state['ranges'][index]
+        offset = start + done
+
+        with sftp.open(remote_path, 'rb') as remote_file, open(part_path, 'r+b') as part_file:
+            while offset < end:
+                batch_end = min(offset + batch_bytes, end)
+                chunks = [(pos, min(chunk_size, batch_end - pos)) for pos in range(offset, batch_end, chunk_size)]
+                part_file.seek(offset)
+                for data in remote_file.readv(chunks):
+                    part_file.write(data)
+                part_file.flush()
+                offset = batch_end
+                with state_lock:
+                    state['ranges'][index][2] = offset - start
+                self._save_state(state_path, state, state_lock)
+
+    def _remote_checksum(self, remote_path: str) -> str:
+        """在远程服务器上计算校验和"""
+        algorithm = self.settings['checksum_algorithm']
+        result = self.ssh.execute_command(f"{algorithm}sum {shlex.quote(remote_path)}")
+        if not result['success'] or not result['output'].strip():
+            raise IOError(f"远程校验和计算失败: {result.get('error', '')}")
+        return result['output'].split()[0].lower()
+
+    def _local_checksum(self, local_path: str) -> str:
+        """计算本地文件校验和"""
+        digest = hashlib.new(self.settings['checksum_algorithm'])
+        with open(local_path, 'rb') as local_file:
+            for block in iter(lambda: local_file.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _load_state(state_path: str) -> Optional[Dict[str, Any]]:
+        """读取断点信息"""
+        try:
+            with open(state_path, 'r', encoding='utf-8') as state_file:
+                return json.load(state_file)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _save_state(state_path: str, state: Dict[str, Any], state_lock: threading.Lock):
+        """保存断点信息（先写临时文件再替换，避免中断时留下半个JSON）"""
+        with state_lock:
+            tmp_path = state_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as state_file:
+                json.dump(state, state_file)
+            os.replace(tmp_path, state_path)
+
+    @staticmethod
+    def _remove_state(state_path: str):
+        """删除断点信息"""
+        try:
+            os.remove(state_path)
+        except OSError:
+            pass
+
+
+class _CountingReader:
+    """统计读取字节数的只读流包装"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+class TarStreamDownloader:
+    """
+    tar流批量下载
+
+    在远程服务器上用 find 选出文件、tar 打包到标准输出，
+    通过一个exec通道传回，本地边接收边解包。
+    大量小文件只需一次往返，传输时间取决于带宽而不是延迟。
+    """
+
+    # 压缩方式 -> (tar参数, tarfile流模式)
+    COMPRESSION = {
+        None: ('', 'r|'),
+        'gz': ('z', 'r|gz'),
+        'bz2': ('j', 'r|bz2'),
+        'xz': ('J', 'r|xz')
+    }
+
+    def __init__(self, ssh):
+        """
+        初始化tar流下载
+
+        Args:
+            ssh: 已连接的 TopupSSH 实例
+        """
+        self.ssh = ssh
+        self.pool = ssh.pool
+
+    def download_tree(self, remote_dir: str, local_dir: str, patterns: Optional[List[str]] = None,
+                      changed_since: Optional[float] = None, compression: Optional[str] = None) -> Dict[str, Any]:
+        """
+        下载远程目录树（保留相对目录结构）
+
+        Args:
+            remote_dir: 远程根目录
+            local_dir: 本地目标目录
+            patterns: 相对于 remote_dir 的通配符列表（如 ['*.png', '*/hist*.root']），默认全部文件；
+                      按 find -path 匹配，* 也匹配子目录中的 /
+            changed_since: 只下载修改时间晚于该Unix时间戳的文件
+            compression: 压缩方式（None/'gz'/'bz2'/'xz'）
+
+        Returns:
+            dict: 下载结果，包含success, message, files, count, bytes, elapsed, throughput_mbps
+        """
+        selection = self._find_filters([f"./{pattern}" for pattern in (patterns or [])], changed_since)
+        command = f"cd {shlex.quote(remote_dir)} && find . -type f {selection} -print0 2>/dev/null"
+        return self._stream(command, local_dir, compression, flatten=False)
+
+    def download_many(self, remote_patterns: List[str], local_dir: str, changed_since: Optional[float] = None,
+                      compression: Optional[str] = None) -> Dict[str, Any]:
+        """
+        下载多个远程文件到同一本地目录（不保留目录结构，同名文件后者覆盖前者）
+
+        Args:
+            remote_patterns: 远程绝对路径或通配符列表（如 ['/dir/Interval_run*.png', '/dir2/run*_cut.png']）
+            local_dir: 本地目标目录
+            changed_since: 只下载修改时间晚于该Unix时间戳的文件
+            compression: 压缩方式（None/'gz'/'bz2'/'xz'）
+
+        Returns:
+            dict: 下载结果，包含success, message, files, count, bytes, elapsed, throughput_mbps
+        """
+        remote_patterns = [pattern if os.path.dirname(pattern) else f"./{pattern}" for pattern in remote_patterns]
+        directories = sorted({os.path.dirname(pattern) for pattern in remote_patterns})
+        selection = self._find_filters(remote_patterns, changed_since)
+        roots = ' '.join(shlex.quote(directory) for directory in directories)
+        command = f"find {roots} -maxdepth 1 -type f {selection} -print0 2>/dev/null"
+        return self._stream(command, local_dir, compression, flatten=True)
+
+    @staticmethod
+    def _find_filters(path_patterns: List[str], changed_since: Optional[float]) -> str:
+        """生成find的路径匹配和修改时间过滤条件"""
+        filters = ''
+        if path_patterns:
+            clauses = ' -o '.join(f"-path {shlex.quote(pattern)}" for pattern in path_patterns)
+            filters += f"\\( {clauses} \\)"
+        if changed_since is not None:
+            filters += f" -newermt @{int(changed_since)}"
+        return filters
+
+    def _stream(self, find_command: str, local_dir: str, compression: Optional[str], flatten: bool) -> Dict[str, Any]:
+        """执行远程 find | tar 并在本地流式解包"""
+        if compression not in self.COMPRESSION:
+            raise ValueError(f'不支持的压缩方式: {compression}')
+        tar_flag, stream_mode = self.COMPRESSION[compression]
+        command = f"{find_command} | tar --null -T - -c{tar_flag}f - 2>/dev/null"
+
+        os.makedirs(local_dir, exist_ok=True)
+        start_time = time.time()
+        files = []
+        payload_bytes = 0
+
+        with self.pool.lease_channel(profile=_transfer_config()['transport_profile']) as channel:
+            channel.exec_command(command)
+            reader = _CountingReader(channel.makefile('rb'))
+            try:
+                with tarfile.open(fileobj=reader, mode=stream_mode) as archive:
+                    for member in archive:
+                        if not member.isfile():
+                            continue
+                        target = self._local_target(local_dir, member.name, flatten)
+                        if target is None:
+                            continue
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        source = archive.extractfile(member)
+                        with open(target, 'wb') as local_file:
+                            shutil.copyfileobj(source, local_file, 1024 * 1024)
+                        os.utime(target, (member.mtime, member.mtime))
+                        files.append(target)
+                        payload_bytes += member.size
+            except tarfile.ReadError:
+                # 没有匹配的文件时远程可能不输出任何数据
+                if reader.bytes_read:
+                    raise
+            exit_code = channel.recv_exit_status()
+
+        if exit_code != 0:
+            raise IOError(f'远程tar打包失败（退出码: {exit_code}）')
+
+        elapsed = time.time() - start_time
+        throughput = reader.bytes_read / elapsed / (1024 * 1024) if elapsed > 0 else 0.0
+        print(f"  tar流下载 {len(files)} 个文件（{payload_bytes} 字节，传输 {reader.bytes_read} 字节），"
+              f"耗时 {elapsed:.2f} 秒，平均速率 {throughput:.2f} MB/s")
+
+        return {
+            'success': True,
+            'message': f'成功下载 {len(files)} 个文件到 {local_dir}',
+            'local_dir': local_dir,
+            'files': files,
+            'count': len(files),
+            'bytes': payload_bytes,
+            'transferred_bytes': reader.bytes_read,
+            'elapsed': elapsed,
+            'throughput_mbps': throughput
+        }
+
+    @staticmethod
+    def _local_target(local_dir: str, member_name: str, flatten: bool) -> Optional[str]:
+        """计算成员的本地路径，拒绝绝对路径和跳出目标目录的成员"""
+        name = os.path.basename(member_name) if flatten else os.path.normpath(member_name)
+        if not name or os.path.isabs(name) or name == '..' or name.startswith('..' + os.sep):
+            return None
+        return os.path.join(local_dir, name)
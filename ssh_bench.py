@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSH性能基准测试脚本
+测量 TopupSSH 单条命令的往返延迟，对比旧的轮询实现与事件驱动实现
+
+功能说明：
+1. latency：对同一条小命令重复执行N次，统计旧实现（exit_status_ready + sleep(0.1)轮询，
+   退出后才读取输出）与当前 execute_command 的延迟分布
+2. 大输出测试：执行一条输出超过通道窗口的命令，旧实现会因窗口填满而阻塞直到超时
+3. profiles：对每个传输参数方案（config.TRANSPORT_PROFILES）分别建立连接，
+   测量握手时间、小命令往返延迟，以及可压缩文本和随机数据的批量传输吞吐量
+
+测试目标：
+- 默认使用 config.py 中配置的 lxlogin → beslogin 双跳连接
+- 使用 --local 时在本机启动两个 paramiko 替身服务器（模拟跳板机和目标服务器），
+  可用 --hop-delay-ms 为跳板转发增加延迟以模拟广域网
+
+使用方法：
+  python ssh_bench.py latency --local -n 50
+  python ssh_bench.py latency -n 20 --command hostname
+  python ssh_bench.py profiles --local --hop-delay-ms 5 --bulk-mb 32
+"""
+
+import os
+import sys
+import time
+import socket
+import select
+import argparse
+import threading
+import subprocess
+import statistics
+from typing import Dict, Any, List
+
+import paramiko
+from paramiko import SFTPServer, SFTPServerInterface, SFTPAttributes, SFTPHandle, SFTP_OK
+
+import config
+
+
+# ============================================================================
+# 本地替身服务器
+# ============================================================================
+
+class _StandInSFTPHandle(SFTPHandle):
+    """替身SFTP文件句柄"""
+
+    def stat(self):
+        return SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+
+class _StandInSFTP(SFTPServerInterface):
+    """直接映射本地文件系统的替身SFTP服务"""
+
+    def list_folder(self, path):
+        try:
+            entries = []
+            for name in os.listdir(path):
+                attr = SFTPAttributes.from_stat(os.lstat(os.path.join(path, name)))
+                attr.filename = name
+                entries.append(attr)
+            return entries
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try:
+            return SFTPAttributes.from_stat(os.stat(path))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def lstat(self, path):
+        try:
+            return SFTPAttributes.from_stat(os.lstat(path))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def open(self, path, flags, attr):
+        try:
+            fd = os.open(path, flags, 0o644)
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+        if flags & os.O_WRONLY:
+            mode = 'ab' if flags & os.O_APPEND else 'wb'
+        elif flags & os.O_RDWR:
+            mode = 'r+b'
+        else:
+            mode = 'rb'
+        handle = _StandInSFTPHandle(flags)
+        handle.filename = path
+        handle.readfile = handle.writefile = os.fdopen(fd, mode)
+        return handle
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+        return SFTP_OK
+
+    def rename(self, oldpath, newpath):
+        try:
+            os.rename(oldpath, newpath)
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+        return SFTP_OK
+
+    def posix_rename(self, oldpath, newpath):
+        return self.rename(oldpath, newpath)
+
+    def mkdir(self, path, attr):
+        try:
+            os.mkdir(path)
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+        return SFTP_OK
+
+    def chattr(self, path, attr):
+        try:
+            SFTPServer.set_file_attr(path, attr)
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+        return SFTP_OK
+
+    def canonicalize(self, path):
+        return os.path.realpath(path)
+
+
+class _StandInServer(paramiko.ServerInterface):
+    """接受任意密码，支持 exec / shell / direct-tcpip 的替身服务端"""
+
+    def __init__(self, owner: 'LocalStandIn'):
+        self.owner = owner
+        self.pty_channels = set()
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_direct_tcpip_request(self, chanid, origin, destination):
+        self.owner.pending_forwards[chanid] = destination
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        self.pty_channels.add(channel.get_id())
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        use_pty = channel.get_id() in self.pty_channels
+        threading.Thread(target=self.owner.run_exec, args=(channel, command.decode(), use_pty),
+                         daemon=True).start()
+        return True
+
+    def check_channel_shell_request(self, channel):
+        threading.Thread(target=self.owner.run_shell, args=(channel,), daemon=True).start()
+        return True
+
+
+class LocalStandIn:
+    """
+    本地SSH替身：在本机启动跳板机和目标服务器两个监听端口
+
+    命令通过本机 bash 执行，SFTP 直接访问本地文件系统，
+    跳板机的 direct-tcpip 转发可附加固定延迟以模拟双跳网络往返。
+    """
+
+    def __init__(self, hop_delay: float = 0.0):
+        """
+        初始化替身服务器
+
+        Args:
+            hop_delay: 跳板机转发每个数据块前附加的延迟（秒）
+        """
+        self.hop_delay = hop_delay
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.pending_forwards: Dict[int, Any] = {}
+        self.sockets: List[socket.socket] = []
+
+    def start(self) -> Dict[str, Dict[str, Any]]:
+        """
+        启动两个监听端口
+
+        Returns:
+            dict: 可直接替换 config.SSH_CONFIG['servers'] 的服务器配置
+        """
+        ports = [self._listen() for _ in range(2)]
+        os.environ.setdefault('SSH_PASS_STANDIN', 'standin')
+        servers = {}
+        for key, name, port in (('server1', 'lxlogin', ports[0]), ('server2', 'beslogin', ports[1])):
+            servers[key] = {
+                'name': f'{name}-standin',
+                'host': '127.0.0.1',
+                'port': port,
+                'username': 'topup',
+                'env_password': 'SSH_PASS_STANDIN'
+            }
+        return servers
+
+    def stop(self):
+        """关闭监听端口"""
+        for sock in self.sockets:
+            sock.close()
+        self.sockets = []
+
+    def _listen(self) -> int:
+        """在随机端口上监听并返回端口号"""
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(50)
+        self.sockets.append(listener)
+
+        def accept_loop():
+            while True:
+                try:
+                    client, _ = listener.accept()
+                except OSError:
+                    return
+                threading.Thread(target=self._serve_client, args=(client,), daemon=True).start()
+
+        threading.Thread(target=accept_loop, daemon=True).start()
+        return listener.getsockname()[1]
+
+    def _serve_client(self, client: socket.socket):
+        """处理单个SSH连接"""
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        transport = paramiko.Transport(client)
+        transport.add_server_key(self.host_key)
+        transport.set_subsystem_handler('sftp', SFTPServer, _StandInSFTP)
+        transport.start_server(server=_StandInServer(self))
+
+        # paramiko 只弱引用通道，需要在此持有引用直到通道关闭
+        channels = []
+        while transport.is_active():
+            channel = transport.accept(1)
+            if channel is None:
+                channels = [c for c in channels if not c.closed]
+                continue
+            channels.append(channel)
+            destination = self.pending_forwards.pop(channel.get_id(), None)
+            if destination is not None:
+                threading.Thread(target=self._relay, args=(channel, destination), daemon=True).start()
+
+    def _relay(self, channel: paramiko.Channel, destination):
+        """跳板机转发：在通道与目标端口之间双向复制数据"""
+        upstream = socket.create_connection(destination)
+        upstream.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while True:
+                readable, _, _ = select.select([channel, upstream], [], [])
+                if channel in readable:
+                    data = channel.recv(65536)
+                    if not data:
+                        break
+                    if self.hop_delay:
+                        time.sleep(self.hop_delay)
+                    upstream.sendall(data)
+                if upstream in readable:
+                    data = upstream.recv(65536)
+                    if not data:
+                        break
+                    if self.hop_delay:
+                        time.sleep(self.hop_delay)
+                    channel.sendall(data)
+        except (OSError, EOFError):
+            pass
+        finally:
+            upstream.close()
+            channel.close()
+
+    def run_exec(self, channel: paramiko.Channel, command: str, use_pty: bool):
+        """用本机 bash 执行命令，并把输出写回通道"""
+        process = subprocess.Popen(
+            ['bash', '-c', command],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if use_pty else subprocess.PIPE
+        )
+
+        def pump(stream, send):
+            try:
+                while True:
+                    data = os.read(stream.fileno(), 65536)
+                    if not data:
+                        break
+                    send(data)
+            except (OSError, EOFError, paramiko.SSHException):
+                process.kill()
+
+        def feed_stdin():
+            try:
+                while True:
+                    data = channel.recv(65536)
+                    if not data:
+                        break
+                    process.stdin.write(data)
+                    process.stdin.flush()
+            except (OSError, EOFError, ValueError):
+                pass
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+        threading.Thread(target=feed_stdin, daemon=True).start()
+        pumps = [threading.Thread(target=pump, args=(process.stdout, channel.sendall))]
+        if not use_pty:
+            pumps.append(threading.Thread(target=pump, args=(process.stderr, channel.sendall_stderr)))
+        for thread in pumps:
+            thread.start()
+        for thread in pumps:
+            thread.join()
+        exit_code = process.wait()
+        if exit_code < 0:
+            # 被信号终止时按shell惯例返回 128+信号值
+            exit_code = 128 - exit_code
+        try:
+            channel.send_exit_status(exit_code)
+            channel.shutdown_write()
+        except (OSError, EOFError):
+            pass
+        channel.close()
+
+    def run_shell(self, channel: paramiko.Channel):
+        """在伪终端中启动交互式 bash"""
+        import pty
+
+        master, slave = pty.openpty()
+        process = subprocess.Popen(
+            ['bash', '--norc', '-i'],
+            stdin=slave, stdout=slave, stderr=slave,
+            start_new_session=True,
+            env=dict(os.environ, PS1='[topup@beslogin ~]$ ')
+        )
+        os.close(slave)
+
+        def pump_output():
+            while True:
+                try:
+                    data = os.read(master, 65536)
+                except OSError:
+                    break
+                if not data:
+                    break
+                try:
+                    channel.sendall(data)
+                except (OSError, EOFError):
+                    break
+            channel.close()
+
+        threading.Thread(target=pump_output, daemon=True).start()
+        try:
+            while True:
+                data = channel.recv(65536)
+                if not data:
+                    break
+                os.write(master, data)
+        except (OSError, EOFError):
+            pass
+        process.kill()
+        os.close(master)
+
+
+# ============================================================================
+# 基准测试
+# ============================================================================
+
+def legacy_execute(ssh, command: str, timeout: int = 600) -> Dict[str, Any]:
+    """
+    旧版 execute_command 的执行方式（用于对比）
+
+    以 0.1 秒间隔轮询 exit_status_ready()，命令结束后才读取 stdout/stderr
+    """
+    with ssh.pool.lease_channel() as channel:
+        channel.exec_command(command)
+        start_time = time.time()
+        while not channel.exit_status_ready():
+            if time.time() - start_time > timeout:
+                channel.close()
+                return {'success': False, 'exit_code': -1, 'output': '', 'error': '命令执行超时'}
+            time.sleep(0.1)
+        exit_code = channel.recv_exit_status()
+        output = channel.makefile('r').read().decode('utf-8', errors='ignore')
+        error = channel.makefile_stderr('r').read().decode('utf-8', errors='ignore')
+    return {'success': exit_code == 0, 'exit_code': exit_code, 'output': output, 'error': error}
+
+
+def _quiet(func, *args, **kwargs):
+    """执行函数并屏蔽其打印输出"""
+    devnull = open(os.devnull, 'w')
+    stdout = sys.stdout
+    sys.stdout = devnull
+    try:
+        return func(*args, **kwargs)
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+
+
+def _summarize(samples: List[float]) -> Dict[str, float]:
+    """计算延迟统计（毫秒）"""
+    ordered = sorted(samples)
+    return {
+        'mean': statistics.mean(ordered) * 1000,
+        'p50': ordered[len(ordered) // 2] * 1000,
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        'max': ordered[-1] * 1000
+    }
+
+
+def bench_latency(ssh, command: str, iterations: int, large_output_bytes: int) -> Dict[str, Any]:
+    """
+    对比旧实现与当前实现的单命令延迟
+
+    Args:
+        ssh: 已连接的 TopupSSH 实例
+        command: 测试命令
+        iterations: 每种实现的执行次数
+        large_output_bytes: 大输出测试的字节数（0表示跳过）
+
+    Returns:
+        dict: 两种实现的统计结果
+    """
+    results = {}
+    for label, runner in (('legacy', lambda: legacy_execute(ssh, command)),
+                          ('current', lambda: _quiet(ssh.execute_command, command))):
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            result = runner()
+            samples.append(time.perf_counter() - start)
+            if not result['success']:
+                raise RuntimeError(f"{label} 命令执行失败: {result.get('error')}")
+        results[label] = _summarize(samples)
+
+    if large_output_bytes:
+        big_command = f"head -c {large_output_bytes} /dev/zero | tr '\\0' 'x'"
+        for label, runner in (('legacy', lambda: legacy_execute(ssh, big_command, timeout=10)),
+                              ('current', lambda: _quiet(ssh.execute_command, big_command, timeout=10))):
+            start = time.perf_counter()
+            result = runner()
+            elapsed = time.perf_counter() - start
+            results[f'{label}_large_output'] = {
+                'seconds': elapsed,
+                'bytes': len(result['output']),
+                'completed': result['success']
+            }
+    return results
+
+
+def print_latency_report(results: Dict[str, Any], command: str, iterations: int):
+    """打印延迟对比报告"""
+    print("\n" + "=" * 60)
+    print(f"单命令延迟（命令: {command}，每种实现 {iterations} 次）")
+    print("=" * 60)
+    print(f"{'实现':<10}{'mean(ms)':>12}{'p50(ms)':>12}{'p95(ms)':>12}{'max(ms)':>12}")
+    for label in ('legacy', 'current'):
+        stats = results[label]
+        print(f"{label:<10}{stats['mean']:>12.1f}{stats['p50']:>12.1f}{stats['p95']:>12.1f}{stats['max']:>12.1f}")
+    saved = results['legacy']['mean'] - results['current']['mean']
+    print(f"\n平均每条命令节省: {saved:.1f} ms")
+
+    for label in ('legacy', 'current'):
+        large = results.get(f'{label}_large_output')
+        if large:
+            status = '完成' if large['completed'] else '超时（通道窗口填满后阻塞）'
+            print(f"大输出 [{label}]: {large['seconds']:.2f}s, 收到 {large['bytes']} 字节, {status}")
+
+
+def _stream_bytes(ssh, command: str, profile: str) -> int:
+    """在指定传输方案的通道上执行命令并读完stdout，返回字节数"""
+    total = 0
+    with ssh.pool.lease_channel(profile=profile) as channel:
+        channel.exec_command(command)
+        while True:
+            data = channel.recv(1024 * 1024)
+            if not data:
+                break
+            total += len(data)
+        channel.recv_exit_status()
+    return total
+
+
+def bench_profiles(profiles: List[str], iterations: int, bulk_mb: int) -> Dict[str, Any]:
+    """
+    对比各传输参数方案的延迟和吞吐量
+
+    每个方案使用独立的连接（压缩和加密算法是连接级参数）。
+
+    Args:
+        profiles: 方案名列表
+        iterations: 小命令往返次数
+        bulk_mb: 批量传输测试的数据量（MB）
+
+    Returns:
+        dict: 方案名 -> 统计结果
+    """
+    from ssh_pool import get_transport_profile
+    from topup_ssh import TopupSSH
+
+    payloads = {
+        'text': f"yes 'run 85383 InjSigTime 0.123456 OK' | head -c {bulk_mb * 1024 * 1024}",
+        'random': f"head -c {bulk_mb * 1024 * 1024} /dev/urandom"
+    }
+    results = {}
+    for name in profiles:
+        profile = get_transport_profile(name)
+        ssh = TopupSSH(use_daemon=False, transport_profile=name)
+        start = time.perf_counter()
+        if not _quiet(ssh.connect):
+            raise RuntimeError(f"方案 {name} 连接失败")
+        handshake = time.perf_counter() - start
+        try:
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                _stream_bytes(ssh, 'echo ok', name)
+                samples.append(time.perf_counter() - start)
+
+            throughput = {}
+            for label, command in payloads.items():
+                start = time.perf_counter()
+                received = _stream_bytes(ssh, command, name)
+                elapsed = time.perf_counter() - start
+                throughput[label] = received / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+
+            transport = ssh.pool.ssh2.get_transport()
+            results[name] = {
+                'handshake_ms': handshake * 1000,
+                'latency': _summarize(samples),
+                'throughput_mbps': throughput,
+                'cipher': transport.remote_cipher,
+                'compress': profile['compress'],
+                'window_size': profile['window_size']
+            }
+        finally:
+            _quiet(ssh.close)
+    return results
+
+
+def print_profiles_report(results: Dict[str, Any], iterations: int, bulk_mb: int):
+    """打印传输方案对比报告"""
+    print("\n" + "=" * 78)
+    print(f"传输参数方案对比（小命令 {iterations} 次，批量传输 {bulk_mb} MB）")
+    print("=" * 78)
+    print(f"{'方案':<10}{'握手(ms)':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'文本(MB/s)':>12}{'随机(MB/s)':>12}  加密/压缩/窗口")
+    for name, stats in results.items():
+        window = stats['window_size'] or '默认'
+        print(f"{name:<10}{stats['handshake_ms']:>10.0f}{stats['latency']['p50']:>10.1f}"
+              f"{stats['latency']['p95']:>10.1f}{stats['throughput_mbps']['text']:>12.1f}"
+              f"{stats['throughput_mbps']['random']:>12.1f}  "
+              f"{stats['cipher']}/{'压缩' if stats['compress'] else '不压缩'}/{window}")
+
+
+def main():
+    """主函数：解析参数并运行基准测试"""
+    parser = argparse.ArgumentParser(description='TopupSSH 性能基准测试')
+    parser.add_argument('mode', choices=['latency', 'profiles'], help='测试项目')
+    parser.add_argument('--local', action='store_true', help='使用本机替身服务器代替配置的远程服务器')
+    parser.add_argument('--hop-delay-ms', type=float, default=0.0, help='替身跳板机每次转发附加的延迟（毫秒）')
+    parser.add_argument('-n', '--iterations', type=int, default=30, help='每种实现的执行次数')
+    parser.add_argument('--command', default='echo ok', help='延迟测试使用的命令')
+    parser.add_argument('--large-output', type=int, default=4 * 1024 * 1024,
+                        help='大输出测试的字节数，0表示跳过')
+    parser.add_argument('--profiles', default=None,
+                        help='profiles 测试的方案名（逗号分隔），默认测试全部方案')
+    parser.add_argument('--bulk-mb', type=int, default=16, help='profiles 测试的批量传输数据量（MB）')
+    args = parser.parse_args()
+
+    standin = None
+    if args.local:
+        standin = LocalStandIn(hop_delay=args.hop_delay_ms / 1000.0)
+        config.SSH_CONFIG['servers'].update(standin.start())
+        print(f"已启动本地替身服务器: {config.SSH_CONFIG['servers']['server1']['port']} → "
+              f"{config.SSH_CONFIG['servers']['server2']['port']}")
+
+    if args.mode == 'profiles':
+        from ssh_pool import _DEFAULT_TRANSPORT_PROFILES
+        names = args.profiles.split(',') if args.profiles else list(
+            dict(_DEFAULT_TRANSPORT_PROFILES, **getattr(config, 'TRANSPORT_PROFILES', {})))
+        try:
+            results = bench_profiles(names, args.iterations, args.bulk_mb)
+            print_profiles_report(results, args.iterations, args.bulk_mb)
+        finally:
+            if standin:
+                standin.stop()
+        return
+
+    from topup_ssh import TopupSSH
+
+    ssh = TopupSSH(use_daemon=False)
+    if not ssh.connect():
+        print("\n✗ SSH连接失败，程序退出")
+        sys.exit(1)
+
+    try:
+        if args.mode == 'latency':
+            results = bench_latency(ssh, args.command, args.iterations, args.large_output)
+            print_latency_report(results, args.command, args.iterations)
+    finally:
+        ssh.close()
+        if standin:
+            standin.stop()
+
+
+if __name__ == "__main__":
+    main()
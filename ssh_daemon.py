@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地SSH守护进程
+类似 OpenSSH ControlMaster：在后台保持一条已认证的双跳连接，
+通过Unix套接字为 remote_command.py、check_files.py、run.py --step 等短生命周期的工具执行命令。
+守护进程运行时，TopupSSH().connect() 会自动连接守护进程，不再重新完成两跳认证。
+
+使用方法：
+  python ssh_daemon.py start     # 在后台启动守护进程
+  python ssh_daemon.py status    # 查看守护进程状态
+  python ssh_daemon.py stop      # 停止守护进程
+  python ssh_daemon.py serve     # 在前台运行（调试用）
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import threading
+import subprocess
+import socketserver
+from typing import Dict, Any, Optional
+
+from topup_ssh import TopupSSH
+from ssh_metrics import command_metrics, UNTAGGED_STEP
+from local_daemon import (DAEMON_METHODS, DaemonClient, LineReader, daemon_config,
+                          encode_value, decode_value, send_message)
+
+
+class _ThreadLocalStdout:
+    """按线程重定向print输出：处理客户端请求的线程把输出转发给该客户端，其他线程写入原标准输出"""
+
+    def __init__(self, default):
+        self._default = default
+        self._local = threading.local()
+
+    def redirect(self, target):
+        """设置当前线程的输出目标（None表示恢复原标准输出）"""
+        self._local.target = target
+
+    def write(self, text):
+        target = getattr(self._local, 'target', None)
+        return (target or self._default).write(text)
+
+    def flush(self):
+        target = getattr(self._local, 'target', None)
+        (target or self._default).flush()
+
+    def __getattr__(self, name):
+        return getattr(self._default, name)
+
+
+class _EventWriter:
+    """把print输出作为 log 事件发送给客户端"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+
+    def write(self, text):
+        if text:
+            try:
+                send_message(self.sock, {'log': text})
+            except OSError:
+                pass
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class SSHDaemon:
+    """
+    本地SSH守护进程
+
+    持有一个已连接的 TopupSSH（不再连接守护进程自身），每个客户端连接由独立线程处理，
+    多个客户端的命令通过连接池的多个通道并发执行。超过 idle_timeout 秒没有请求时自动退出。
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, idle_timeout: Optional[float] = None):
+        """
+        初始化守护进程
+
+        Args:
+            socket_path: Unix套接字路径，默认使用 config.SSH_DAEMON_CONFIG
+            idle_timeout: 空闲退出时间（秒），0表示不自动退出
+        """
+        settings = daemon_config()
+        self.socket_path = socket_path or settings['socket_path']
+        self.idle_timeout = settings['idle_timeout'] if idle_timeout is None else idle_timeout
+        self.ssh = TopupSSH(use_daemon=False)
+        self.started_at = time.time()
+        self.requests = 0
+        self._last_request = time.monotonic()
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+        self._stdout = _ThreadLocalStdout(sys.stdout)
+
+    def serve_forever(self) -> bool:
+        """
+        建立SSH连接并开始服务（阻塞直到 stop 或空闲超时）
+
+        Returns:
+            bool: 是否成功启动
+        """
+        if not self.ssh.connect():
+            print("✗ SSH连接失败，守护进程退出")
+            return False
+
+        socket_dir = os.path.dirname(self.socket_path)
+        os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                daemon._handle_client(self.request)
+
+        old_umask = os.umask(0o077)
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        finally:
+            os.umask(old_umask)
+        self._server.daemon_threads = True
+        sys.stdout = self._stdout
+
+        if self.idle_timeout:
+            threading.Thread(target=self._idle_watch, daemon=True).start()
+
+        print(f"✓ SSH守护进程已启动 (pid {os.getpid()}, 套接字 {self.socket_path})")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            sys.stdout = self._stdout._default
+            self.ssh.close()
+            print("SSH守护进程已停止")
+        return True
+
+    def stop(self):
+        """停止服务（在其他线程中调用）"""
+        if self._server is not None:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def _handle_client(self, sock: socket.socket):
+        """处理一个客户端连接上的全部请求"""
+        reader = LineReader(sock)
+        while True:
+            try:
+                request = reader.read()
+            except (OSError, ValueError):
+                return
+            if request is None:
+                return
+            self._last_request = time.monotonic()
+            self.requests += 1
+            try:
+                response = {'result': encode_value(self._dispatch(sock, request))}
+            except Exception as e:
+                response = {'error': str(e), 'type': type(e).__name__}
+            try:
+                send_message(sock, response)
+            except OSError:
+                return
+
+    def _dispatch(self, sock: socket.socket, request: Dict[str, Any]) -> Any:
+        """执行一个请求"""
+        method = request.get('method')
+        if method == 'ping':
+            return self._info()
+        if method == 'shutdown':
+            self.stop()
+            return True
+        if method not in DAEMON_METHODS:
+            raise ValueError(f'不支持的方法: {method}')
+
+        kwargs = decode_value(dict(request.get('kwargs') or {}))
+        if request.get('stream_chunks'):
+            kwargs['on_chunk'] = lambda chunk: send_message(sock, {'chunk': chunk})
+        self._stdout.redirect(_EventWriter(sock))
+        try:
+            # 统计按客户端所在的步骤归类
+            with command_metrics.step_scope(request.get('step') or UNTAGGED_STEP):
+                return getattr(self.ssh, method)(*decode_value(request.get('args') or []), **kwargs)
+        finally:
+            self._stdout.redirect(None)
+
+    def _info(self) -> Dict[str, Any]:
+        """守护进程状态"""
+        return {
+            'pid': os.getpid(),
+            'connected': self.ssh.connected and self.ssh.pool.is_active(),
+            'uptime': time.time() - self.started_at,
+            'requests': self.requests,
+            'pool': self.ssh.pool.stats(),
+            'cache': self.ssh.cache.stats(),
+            'metrics': command_metrics.summary()['total']
+        }
+
+    def _idle_watch(self):
+        """空闲超时后自动退出"""
+        while True:
+            remaining = self.idle_timeout - (time.monotonic() - self._last_request)
+            if remaining <= 0:
+                print(f"空闲超过 {self.idle_timeout} 秒，守护进程退出")
+                self.stop()
+                return
+            time.sleep(min(remaining, 60))
+
+
+def start_background(socket_path: Optional[str] = None, wait: float = 60) -> bool:
+    """
+    在后台启动守护进程并等待其就绪
+
+    Args:
+        socket_path: Unix套接字路径
+        wait: 等待就绪的最长时间（秒）
+
+    Returns:
+        bool: 守护进程是否就绪
+    """
+    settings = daemon_config()
+    socket_path = socket_path or settings['socket_path']
+    client = DaemonClient(socket_path)
+    if client.connect():
+        client.close()
+        print(f"SSH守护进程已在运行: {socket_path}")
+        return True
+
+    log_file = settings['log_file']
+    os.makedirs(os.path.dirname(log_file), mode=0o700, exist_ok=True)
+    command = [sys.executable, os.path.abspath(__file__), 'serve', '--socket', socket_path]
+    with open(log_file, 'a', encoding='utf-8') as log:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                                   start_new_session=True, env=dict(os.environ, PYTHONUNBUFFERED='1'))
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            print(f"✗ SSH守护进程启动失败，详见日志: {log_file}")
+            return False
+        if client.connect():
+            client.close()
+            print(f"✓ SSH守护进程已启动 (pid {process.pid}, 套接字 {socket_path})")
+            return True
+        time.sleep(0.2)
+    print(f"✗ 等待SSH守护进程就绪超时，详见日志: {log_file}")
+    return False
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='本地SSH守护进程（共享已认证的双跳连接）')
+    parser.add_argument('action', choices=['start', 'stop', 'status', 'serve'], help='操作')
+    parser.add_argument('--socket', default=None, help='Unix套接字路径，默认使用 config.SSH_DAEMON_CONFIG')
+    args = parser.parse_args()
+
+    if args.action == 'serve':
+        sys.exit(0 if SSHDaemon(args.socket).serve_forever() else 1)
+    if args.action == 'start':
+        sys.exit(0 if start_background(args.socket) else 1)
+
+    client = DaemonClient(args.socket)
+    if not client.connect():
+        print("SSH守护进程未运行")
+        sys.exit(1 if args.action == 'status' else 0)
+    try:
+        if args.action == 'status':
+            info = client.info
+            print(f"SSH守护进程运行中 (pid {info['pid']})")
+            print(f"  运行时间: {info['uptime']:.0f} 秒")
+            print(f"  已处理请求: {info['requests']}")
+            print(f"  连接池: {info['pool']}")
+            print(f"  查询缓存: {info['cache']}")
+            metrics = info.get('metrics', {})
+            print(f"  远程往返: {metrics.get('round_trips', 0)} 次，"
+                  f"p50 {metrics.get('latency_ms', {}).get('p50', 0):.1f} ms，"
+                  f"p99 {metrics.get('latency_ms', {}).get('p99', 0):.1f} ms")
+        else:
+            client.call('shutdown')
+            print("✓ 已通知SSH守护进程停止")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,816 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSH连接池模块
+在进程内共享一条已认证的双跳连接（lxlogin → beslogin），
+并把第二跳传输上的exec/SFTP通道按需租借给多个调用方和任务
+"""
+
+import os
+import time
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Tuple, List
+
+import paramiko
+
+import config
+from interactive_shell import InteractiveShell
+from ssh_paths import path_health, path_key, candidate_paths, paths_config
+
+# 内置传输参数方案（可在 config.TRANSPORT_PROFILES 中覆盖或新增）
+#   compress: 第二跳（端到端）传输是否启用zlib压缩，连接级
+#   ciphers: 优先使用的加密算法（按顺序，服务器不支持的自动忽略），连接级
+#   window_size / max_packet_size: 通道流控窗口和最大包长（None表示paramiko默认值），通道级
+_DEFAULT_TRANSPORT_PROFILES = {
+    'latency': {
+        'compress': False,
+        'ciphers': ['aes128-gcm@openssh.com', 'aes128-ctr'],
+        'window_size': None,
+        'max_packet_size': None
+    },
+    'bulk': {
+        'compress': True,
+        'ciphers': ['aes128-gcm@openssh.com', 'aes128-ctr'],
+        'window_size': 16 * 1024 * 1024,
+        'max_packet_size': 32768
+    }
+}
+
+
+def get_transport_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    获取传输参数方案
+
+    Args:
+        name: 方案名（如 'latency'、'bulk'），默认使用 config.DEFAULT_TRANSPORT_PROFILE
+
+    Returns:
+        dict: 包含name, compress, ciphers, window_size, max_packet_size
+
+    Raises:
+        ValueError: 方案不存在
+    """
+    name = name or getattr(config, 'DEFAULT_TRANSPORT_PROFILE', 'latency')
+    profiles = dict(_DEFAULT_TRANSPORT_PROFILES)
+    profiles.update(getattr(config, 'TRANSPORT_PROFILES', {}))
+    if name not in profiles:
+        raise ValueError(f'未知的传输参数方案: {name}（可选: {", ".join(profiles)}）')
+    profile = {'compress': False, 'ciphers': [], 'window_size': None, 'max_packet_size': None}
+    profile.update(profiles[name])
+    profile['name'] = name
+    return profile
+
+
+class SSHConnectionPool:
+    """
+    双跳连接池
+
+    所有 TopupSSH 实例通过 acquire()/release() 共享同一条第二跳传输，
+    只有第一个租约（或连接失效后）才会真正执行双跳握手；
+    每条命令/SFTP会话通过 lease_channel()/lease_sftp() 占用一个通道名额，
+    并发通道数受 max_channels 限制，避免超过 beslogin 的 MaxSessions。
+    配置了多个跳板机/目标节点（config.SSH_CONFIG 的 jump_hosts/targets）时，
+    每次建立连接按 ssh_paths 的健康度选择最快的健康路径，失败时自动换下一条。
+    """
+
+    def __init__(self, server1_config: Dict[str, Any], server2_config: Dict[str, Any],
+                 max_channels: int = 8, idle_linger_seconds: int = 0,
+                 channel_wait_timeout: int = 300, keepalive_interval: int = 30,
+                 probe_after_idle_seconds: int = 60, probe_timeout: int = 10,
+                 reconnect_attempts: int = 5, reconnect_backoff_max: int = 30,
+                 shell_pool_size: int = 0, shell_init_commands: Optional[List[str]] = None,
+                 shell_ready_timeout: int = 60, transport_profile: Optional[str] = None,
+                 sftp_timeout: int = 120):
+        """
+        初始化连接池
+
+        Args:
+            server1_config: 首选跳板机配置
+            server2_config: 首选目标服务器配置
+            max_channels: 同时租借的通道上限
+            idle_linger_seconds: 最后一个租约释放后保留连接的秒数，0表示立即关闭
+            channel_wait_timeout: 等待空闲通道名额的最长时间（秒）
+            keepalive_interval: 两跳传输发送SSH保活包的间隔（秒），0表示不发送
+            probe_after_idle_seconds: 连接空闲超过该时间后，下次使用前先探测连接是否存活
+            probe_timeout: 存活探测的超时时间（秒）
+            reconnect_attempts: 连接断开后重连的最大尝试次数
+            reconnect_backoff_max: 重连退避等待的上限（秒）
+            shell_pool_size: 保持预热的空闲交互式shell数量，0表示不预热、用完即关闭
+            shell_init_commands: 交互式shell初始化时执行的命令（如 source 环境脚本）
+            shell_ready_timeout: 等待交互式shell就绪的超时时间（秒）
+            transport_profile: 连接级传输参数方案（压缩、加密算法），也是通道的默认方案
+            sftp_timeout: 持久SFTP会话单个请求等待响应的超时时间（秒），0表示不限制
+        """
+        # 当前连接使用的跳板机和目标服务器（建立连接时从候选路径中选择）
+        self.server1_config = server1_config
+        self.server2_config = server2_config
+        self.paths = candidate_paths(server1_config, server2_config)
+        self.path_key: Optional[str] = None
+        self.max_channels = max_channels
+        self.idle_linger_seconds = idle_linger_seconds
+        self.channel_wait_timeout = channel_wait_timeout
+        self.keepalive_interval = keepalive_interval
+        self.probe_after_idle_seconds = probe_after_idle_seconds
+        self.probe_timeout = probe_timeout
+        self.reconnect_attempts = reconnect_attempts
+        self.reconnect_backoff_max = reconnect_backoff_max
+        self.shell_pool_size = shell_pool_size
+        self.shell_init_commands = list(shell_init_commands or [])
+        self.shell_ready_timeout = shell_ready_timeout
+        self.profile = get_transport_profile(transport_profile)
+        self.sftp_timeout = sftp_timeout
+
+        # SSH连接
+        self.ssh1: Optional[paramiko.SSHClient] = None
+        self.ssh2: Optional[paramiko.SSHClient] = None
+
+        # 跳板机传输通道
+        self.transport: Optional[paramiko.Transport] = None
+
+        # 加锁顺序：_reconnect_lock → _sftp_lock → _lock → _shells_lock（_disconnect 在 _lock 内调用 _drop_shells）；
+        # 持有 _shells_lock 时不再获取 _lock，双跳握手只在 _reconnect_lock 内进行、不占用 _lock
+        self._lock = threading.RLock()
+        # 连接建立锁：首次连接与重连（含握手和退避等待）串行进行
+        self._reconnect_lock = threading.Lock()
+        self._channel_slots = threading.BoundedSemaphore(max_channels)
+        # 每个线程最近一次等待通道名额的时间（供 ssh_metrics 统计排队等待）
+        self._slot_wait = threading.local()
+        self._linger_timer: Optional[threading.Timer] = None
+
+        # 连接代数：每次成功建立连接加1，用于避免多个调用方对同一次断线重复重连
+        self.generation = 0
+        self._last_used = 0.0
+
+        # 持久SFTP会话（长期占用一个通道名额，由 shared_sftp() 串行使用）
+        self._sftp: Optional[paramiko.SFTPClient] = None
+        self._sftp_lock = threading.RLock()
+
+        # 空闲的预热交互式shell（每个长期占用一个通道名额）
+        self._idle_shells: List[InteractiveShell] = []
+        self._shells_lock = threading.Lock()
+        self._warming = False
+
+        # 统计信息
+        self.leases = 0
+        self.channels_in_use = 0
+        self.handshakes = 0
+        self.channels_opened = 0
+        self.reconnects = 0
+        self.failovers = 0
+        self.shells_opened = 0
+        self.shells_reused = 0
+        self.queue_wait_seconds = 0.0
+
+    def is_active(self) -> bool:
+        """两跳传输是否都仍然可用"""
+        ssh1, ssh2 = self.ssh1, self.ssh2
+        if ssh1 is None or ssh2 is None:
+            return False
+        transport1 = ssh1.get_transport()
+        transport2 = ssh2.get_transport()
+        return bool(transport1 and transport1.is_active() and transport2 and transport2.is_active())
+
+    def acquire(self) -> bool:
+        """
+        租用共享连接，必要时建立双跳连接
+
+        Returns:
+            bool: 连接是否可用
+        """
+        with self._lock:
+            self._cancel_linger()
+            # 先记入租约，握手期间空闲关闭定时器不会关闭新连接
+            self.leases += 1
+            if self.is_active():
+                print(f"✓ 复用已建立的SSH连接 {self.server2_config['host']}（当前租约: {self.leases}）")
+                return True
+
+        # 握手在 _lock 之外进行，其他线程的通道借还和统计不受阻塞
+        with self._reconnect_lock:
+            with self._lock:
+                if not self.is_active() and (self.ssh1 is not None or self.ssh2 is not None):
+                    print("检测到共享SSH连接已失效，重新建立连接...")
+                    self._disconnect()
+            # 等待重连锁期间其他调用方可能已建立连接
+            if self.is_active() or self._connect():
+                return True
+        with self._lock:
+            self.leases -= 1
+        return False
+
+    def release(self):
+        """归还共享连接租约，最后一个租约归还后按 idle_linger_seconds 关闭连接"""
+        with self._lock:
+            if self.leases > 0:
+                self.leases -= 1
+            if self.leases > 0:
+                return
+            if self.idle_linger_seconds > 0:
+                self._linger_timer = threading.Timer(self.idle_linger_seconds, self._close_if_idle)
+                self._linger_timer.daemon = True
+                self._linger_timer.start()
+            else:
+                self._disconnect()
+
+    @contextmanager
+    def lease_channel(self, timeout: Optional[float] = None, profile: Optional[str] = None):
+        """
+        在第二跳传输上租用一个会话通道
+
+        Args:
+            timeout: 等待通道名额的超时时间（秒），默认使用 channel_wait_timeout
+            profile: 通道的传输参数方案（窗口和包长），默认使用连接的方案
+
+        Yields:
+            paramiko.Channel: 新打开的会话通道，退出时自动关闭
+        """
+        channel = self.open_channel(timeout, profile)
+        try:
+            yield channel
+        finally:
+            self.close_channel(channel)
+
+    def open_channel(self, timeout: Optional[float] = None, profile: Optional[str] = None) -> paramiko.Channel:
+        """
+        占用一个通道名额并打开会话通道（需配对调用 close_channel）
+
+        Args:
+            timeout: 等待通道名额的超时时间（秒），默认使用 channel_wait_timeout
+            profile: 通道的传输参数方案（窗口和包长），默认使用连接的方案
+
+        Returns:
+            paramiko.Channel: 新打开的会话通道
+        """
+        self._take_slot(timeout)
+        self._last_used = time.monotonic()
+        try:
+            start = time.monotonic()
+            channel = self._transport2().open_session(timeout=30, **self._channel_options(profile))
+            # 打开会话通道是一次经过两跳的往返，用作路径往返耗时
+            path_health.record_latency(self.path_key, time.monotonic() - start)
+        except Exception:
+            self._give_slot()
+            raise
+        with self._lock:
+            self.channels_opened += 1
+        return channel
+
+    def close_channel(self, channel: paramiko.Channel):
+        """关闭 open_channel 打开的通道并归还通道名额"""
+        try:
+            channel.close()
+        finally:
+            self._give_slot()
+
+    def last_queue_wait(self) -> float:
+        """当前线程最近一次等待通道名额的时间（秒）"""
+        return getattr(self._slot_wait, 'seconds', 0.0)
+
+    def acquire_shell(self, timeout: Optional[float] = None) -> InteractiveShell:
+        """
+        取得一个已就绪的交互式shell：优先复用预热的空闲shell，没有时新建
+
+        Args:
+            timeout: 等待通道名额的超时时间（秒）
+
+        Returns:
+            InteractiveShell: 已初始化的交互式shell，用完后调用 release_shell 归还
+        """
+        stale = []
+        try:
+            with self._shells_lock:
+                while self._idle_shells:
+                    shell = self._idle_shells.pop()
+                    if shell.is_usable(self.generation):
+                        self.shells_reused += 1
+                        return shell
+                    stale.append(shell)
+        finally:
+            for shell in stale:
+                self.close_channel(shell.channel)
+        return self._open_shell(timeout)
+
+    def release_shell(self, shell: InteractiveShell, reusable: bool = True):
+        """
+        归还交互式shell，可复用且空闲shell未满时保留，否则关闭
+
+        Args:
+            shell: acquire_shell 取得的shell
+            reusable: 命令是否正常结束（shell处于可用状态）
+        """
+        with self._shells_lock:
+            if reusable and shell.is_usable(self.generation) and len(self._idle_shells) < self.shell_pool_size:
+                self._idle_shells.append(shell)
+                return
+        self.close_channel(shell.channel)
+
+    def warm_shells(self):
+        """在后台把空闲的预热shell补足到 shell_pool_size 个"""
+        with self._shells_lock:
+            if self._warming or len(self._idle_shells) >= self.shell_pool_size:
+                return
+            self._warming = True
+
+        def warm():
+            try:
+                while True:
+                    with self._shells_lock:
+                        if len(self._idle_shells) >= self.shell_pool_size:
+                            return
+                    shell = self._open_shell(timeout=0)
+                    self.release_shell(shell)
+            except Exception:
+                # 预热失败（如通道名额已满）不影响正常使用，需要时再新建
+                pass
+            finally:
+                with self._shells_lock:
+                    self._warming = False
+
+        threading.Thread(target=warm, daemon=True).start()
+
+    @contextmanager
+    def lease_sftp(self, timeout: Optional[float] = None, profile: Optional[str] = None):
+        """
+        在第二跳传输上租用一个SFTP会话
+
+        Args:
+            timeout: 等待通道名额的超时时间（秒），默认使用 channel_wait_timeout
+            profile: 通道的传输参数方案（窗口和包长），默认使用连接的方案
+
+        Yields:
+            paramiko.SFTPClient: SFTP客户端，退出时自动关闭
+        """
+        self._take_slot(timeout)
+        self._last_used = time.monotonic()
+        sftp = None
+        try:
+            sftp = paramiko.SFTPClient.from_transport(self._transport2(), **self._channel_options(profile))
+            with self._lock:
+                self.channels_opened += 1
+            yield sftp
+        finally:
+            if sftp is not None:
+                sftp.close()
+            self._give_slot()
+
+    @contextmanager
+    def shared_sftp(self):
+        """
+        使用连接上的持久SFTP会话
+
+        会话在首次使用时打开并一直保持到连接关闭，
+        避免每次文件查询/下载都重新打开SFTP子系统；
+        同一时刻只允许一个调用方使用（SFTP请求在会话内串行）；单个请求超过 sftp_timeout 秒
+        没有响应时抛出 socket.timeout。断线重连不等待当前调用方，直接关闭会话使其返回。
+
+        Yields:
+            paramiko.SFTPClient: 持久SFTP客户端，退出时不会关闭
+        """
+        with self._sftp_lock:
+            sftp = self._sftp
+            if sftp is None or sftp.get_channel().closed:
+                self._drop_sftp()
+                self._take_slot(None)
+                try:
+                    sftp = paramiko.SFTPClient.from_transport(self._transport2(), **self._channel_options(None))
+                except Exception:
+                    self._give_slot()
+                    raise
+                if self.sftp_timeout:
+                    # 传输失去响应时请求超时返回并释放 _sftp_lock，不会一直阻塞其他调用方
+                    sftp.get_channel().settimeout(self.sftp_timeout)
+                with self._lock:
+                    self._sftp = sftp
+                    self.channels_opened += 1
+            self._last_used = time.monotonic()
+            try:
+                yield sftp
+            except socket.timeout:
+                # 超时的请求仍可能在会话中等待响应，关闭会话，下次使用时重新打开
+                if self._sftp is sftp:
+                    self._drop_sftp()
+                raise
+
+    def probe(self, timeout: Optional[float] = None) -> bool:
+        """
+        探测两跳连接是否存活（在第二跳上打开并关闭一个会话通道，一次往返经过两跳）
+
+        Args:
+            timeout: 探测超时时间（秒），默认使用 probe_timeout
+
+        Returns:
+            bool: 连接是否存活
+        """
+        if not self.is_active():
+            return False
+        try:
+            start = time.monotonic()
+            channel = self._transport2().open_session(timeout=self.probe_timeout if timeout is None else timeout)
+            path_health.record_latency(self.path_key, time.monotonic() - start)
+            channel.close()
+            return True
+        except Exception:
+            return False
+
+    def ensure_alive(self) -> bool:
+        """
+        使用连接前确认连接可用：传输已断开，或空闲较久且探测失败时自动重连
+
+        Returns:
+            bool: 连接是否可用
+        """
+        generation = self.generation
+        idle = time.monotonic() - self._last_used
+        if self.is_active() and (idle < self.probe_after_idle_seconds or self.probe()):
+            self._last_used = time.monotonic()
+            if self._should_switch_path():
+                print(f"⚠ 当前路径 {self.path_key} 往返耗时过长，切换到更快的路径")
+                return self.reconnect(generation)
+            return True
+        print("检测到共享SSH连接已断开")
+        if self.path_key is not None:
+            path_health.record_failure(self.path_key, '连接断开')
+        return self.reconnect(generation)
+
+    def reconnect(self, failed_generation: Optional[int] = None) -> bool:
+        """
+        重新建立两跳连接（有上限的指数退避）
+
+        Args:
+            failed_generation: 调用方发现断线时的连接代数；若其他调用方已完成重连则直接返回
+
+        Returns:
+            bool: 重连是否成功
+        """
+        # 重连过程（含握手和退避等待）只占用重连锁，其他线程的通道借还和统计不受阻塞
+        with self._reconnect_lock:
+            with self._lock:
+                if failed_generation is not None and failed_generation != self.generation and self.is_active():
+                    return True
+                self._disconnect()
+
+            delay = 1
+            for attempt in range(1, self.reconnect_attempts + 1):
+                print(f"正在重新连接（第 {attempt}/{self.reconnect_attempts} 次）...")
+                # 等待期间其他调用方可能已建立连接
+                if self.is_active() or self._connect():
+                    self.reconnects += 1
+                    print("✓ SSH连接已恢复")
+                    return True
+                if attempt < self.reconnect_attempts:
+                    print(f"重连失败，{delay} 秒后重试")
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.reconnect_backoff_max)
+
+            print(f"✗ 重连失败（已尝试 {self.reconnect_attempts} 次）")
+            return False
+
+    def close(self):
+        """强制关闭共享连接（不论是否仍有租约）"""
+        with self._lock:
+            self._cancel_linger()
+            self.leases = 0
+            self._disconnect()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取连接池统计信息
+
+        Returns:
+            dict: 包含active, leases, channels_in_use, max_channels, handshakes, channels_opened, reconnects,
+                  idle_shells, shells_opened, shells_reused, queue_wait_seconds（累计等待通道名额的秒数），
+                  path（当前路径）, failovers（换用非首选路径的次数）, paths（各候选路径的健康度）
+        """
+        with self._lock:
+            return {
+                'active': self.is_active(),
+                'leases': self.leases,
+                'channels_in_use': self.channels_in_use,
+                'max_channels': self.max_channels,
+                'handshakes': self.handshakes,
+                'channels_opened': self.channels_opened,
+                'reconnects': self.reconnects,
+                'idle_shells': len(self._idle_shells),
+                'shells_opened': self.shells_opened,
+                'shells_reused': self.shells_reused,
+                'queue_wait_seconds': self.queue_wait_seconds,
+                'transport_profile': self.profile['name'],
+                'path': self.path_label,
+                'failovers': self.failovers,
+                'paths': path_health.snapshot([path_key(*path) for path in self.paths])
+            }
+
+    @property
+    def path_label(self) -> Optional[str]:
+        """当前连接使用的路径（未连接时为None）"""
+        return self.path_key if self.is_active() else None
+
+    def _connect(self) -> bool:
+        """按健康度依次尝试候选路径，执行一次完整的双跳握手（调用方持有 _reconnect_lock，不持有 _lock）"""
+        paths = {path_key(*path): path for path in self.paths}
+        ranked = path_health.rank(list(paths))
+        for index, key in enumerate(ranked):
+            server1_config, server2_config = paths[key]
+            if len(ranked) > 1:
+                print(f"尝试连接路径 {key}（{index + 1}/{len(ranked)}）")
+            start = time.monotonic()
+            try:
+                ssh1, ssh2 = self._connect_path(server1_config, server2_config)
+            except Exception as e:
+                print(f"✗ SSH连接失败: {str(e)}")
+                path_health.record_failure(key, str(e) or type(e).__name__)
+                continue
+            path_health.record_handshake(key, time.monotonic() - start)
+            # 握手完成后才在 _lock 内换入新连接
+            with self._lock:
+                path_health.acquire(key)
+                self.ssh1, self.ssh2, self.transport = ssh1, ssh2, ssh1.get_transport()
+                self.server1_config, self.server2_config, self.path_key = server1_config, server2_config, key
+                if key != path_key(*self.paths[0]):
+                    self.failovers += 1
+                self.handshakes += 1
+                self.generation += 1
+                self._last_used = time.monotonic()
+            return True
+        return False
+
+    def _connect_path(self, server1_config: Dict[str, Any],
+                      server2_config: Dict[str, Any]) -> Tuple[paramiko.SSHClient, paramiko.SSHClient]:
+        """
+        通过指定的跳板机和目标服务器执行一次双跳握手（不修改连接池状态）
+
+        Returns:
+            tuple: (跳板机客户端, 目标服务器客户端)
+
+        Raises:
+            Exception: 握手失败，已建立的部分连接会被关闭
+        """
+        ssh1 = ssh2 = None
+        try:
+            # 创建第一个SSH客户端（连接到跳板机）
+            ssh1 = paramiko.SSHClient()
+            ssh1.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+
+            # 跳板机密码
+            password1 = os.getenv(server1_config['env_password'])
+
+            # 连接到跳板机
+            print(f"正在连接到跳板机 {server1_config['host']}...")
+            ssh1.connect(
+                hostname=server1_config['host'],
+                port=server1_config['port'],
+                username=server1_config['username'],
+                password=password1,
+                timeout=30,
+                auth_timeout=30,
+                banner_timeout=30,
+                transport_factory=self._transport_factory
+            )
+            print(f"✓ 成功连接到跳板机 {server1_config['host']}")
+
+            # 创建传输通道到目标服务器
+            transport = ssh1.get_transport()
+            dest_addr = (server2_config['host'], server2_config['port'])
+            local_addr = ('localhost', 22)
+            print("正在创建SSH通道...")
+            channel = transport.open_channel("direct-tcpip", dest_addr, local_addr, timeout=300)
+            print(f"正在通过跳板机连接到目标服务器 {server2_config['host']}...")
+
+            # 创建第二个SSH客户端（连接到目标服务器）
+            ssh2 = paramiko.SSHClient()
+            ssh2.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+
+            # 目标服务器密码
+            password2 = os.getenv(server2_config['env_password'])
+
+            # 通过通道连接到目标服务器
+            ssh2.connect(
+                hostname=server2_config['host'],
+                port=server2_config['port'],
+                username=server2_config['username'],
+                password=password2,
+                sock=channel,
+                timeout=30,
+                auth_timeout=30,
+                banner_timeout=30,
+                compress=self.profile['compress'],
+                transport_factory=self._transport_factory
+            )
+            print(f"✓ 成功连接到目标服务器 {server2_config['host']}")
+
+            self._enable_keepalive(ssh1, ssh2)
+            self._tune_socket(ssh1)
+            return ssh1, ssh2
+
+        except Exception:
+            for client in (ssh2, ssh1):
+                if client is not None:
+                    client.close()
+            raise
+
+    def _should_switch_path(self) -> bool:
+        """
+        当前路径是否应切换：往返耗时超过 slow_threshold_ms、存在排名更靠前的其他路径，
+        且除预热shell和持久SFTP会话外没有正在使用的通道（切换不会中断进行中的命令）
+        """
+        if len(self.paths) < 2 or not paths_config()['switch_when_slow'] or not path_health.is_slow(self.path_key):
+            return False
+        ranked = path_health.rank([path_key(*path) for path in self.paths])
+        if ranked[0] == self.path_key or path_health.score(ranked[0]) is None:
+            return False
+        with self._lock:
+            busy = self.channels_in_use - len(self._idle_shells) - (1 if self._sftp is not None else 0)
+        return busy <= 0
+
+    def _open_shell(self, timeout: Optional[float] = None) -> InteractiveShell:
+        """打开并初始化一个新的交互式shell"""
+        channel = self.open_channel(timeout)
+        shell = InteractiveShell(channel, self.generation)
+        try:
+            shell.initialize(self.shell_init_commands, self.shell_ready_timeout)
+        except Exception:
+            self.close_channel(channel)
+            raise
+        with self._lock:
+            self.shells_opened += 1
+        return shell
+
+    def _drop_shells(self):
+        """关闭全部空闲的预热shell并归还通道名额"""
+        with self._shells_lock:
+            shells, self._idle_shells = self._idle_shells, []
+        for shell in shells:
+            self.close_channel(shell.channel)
+
+    def _drop_sftp(self):
+        """关闭持久SFTP会话并归还其通道名额"""
+        # 不等待 _sftp_lock：断线时正在使用会话的调用方可能阻塞在I/O上，关闭会话才能让其返回
+        with self._lock:
+            sftp, self._sftp = self._sftp, None
+        if sftp is not None:
+            try:
+                sftp.close()
+            except Exception:
+                pass
+            self._give_slot()
+
+    def _disconnect(self):
+        """关闭两跳连接"""
+        self._drop_sftp()
+        self._drop_shells()
+        path_health.release(self.path_key)
+        self.path_key = None
+
+        if self.ssh2:
+            self.ssh2.close()
+            self.ssh2 = None
+
+        if self.ssh1:
+            self.ssh1.close()
+            self.ssh1 = None
+
+        if self.transport:
+            self.transport.close()
+            self.transport = None
+
+    def _enable_keepalive(self, ssh1: paramiko.SSHClient, ssh2: paramiko.SSHClient):
+        """
+        开启保活：两跳传输定期发送SSH保活包，防止空闲连接被防火墙/NAT断开；
+        跳板机TCP连接开启内核keepalive，对端失联时由内核及时关闭，通道立即感知断线
+        """
+        if self.keepalive_interval <= 0:
+            return
+        for client in (ssh1, ssh2):
+            client.get_transport().set_keepalive(self.keepalive_interval)
+
+        sock = ssh1.get_transport().sock
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for option, value in (('TCP_KEEPIDLE', self.keepalive_interval), ('TCP_KEEPINTVL', 10), ('TCP_KEEPCNT', 3)):
+            if hasattr(socket, option):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+    def _transport_factory(self, sock, **kwargs) -> paramiko.Transport:
+        """创建传输并按方案调整加密算法优先顺序（SSHClient.connect 的 transport_factory）"""
+        transport = paramiko.Transport(sock, **kwargs)
+        options = transport.get_security_options()
+        preferred = [cipher for cipher in self.profile['ciphers'] if cipher in options.ciphers]
+        if preferred:
+            options.ciphers = tuple(preferred + [cipher for cipher in options.ciphers if cipher not in preferred])
+        return transport
+
+    def _tune_socket(self, ssh1: paramiko.SSHClient):
+        """跳板机TCP连接关闭Nagle算法：小命令的请求/响应包立即发出，不等待合并"""
+        sock = ssh1.get_transport().sock
+        if hasattr(sock, 'setsockopt'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _channel_options(self, profile: Optional[str]) -> Dict[str, int]:
+        """通道级传输参数（窗口和包长）"""
+        settings = self.profile if profile is None else get_transport_profile(profile)
+        return {key: settings[key] for key in ('window_size', 'max_packet_size') if settings[key]}
+
+    def _transport2(self) -> paramiko.Transport:
+        """获取第二跳传输，连接不可用时抛出异常"""
+        transport = self.ssh2.get_transport() if self.ssh2 else None
+        if transport is None or not transport.is_active():
+            raise paramiko.SSHException('共享SSH连接不可用')
+        return transport
+
+    def _take_slot(self, timeout: Optional[float]):
+        """占用一个通道名额"""
+        wait = self.channel_wait_timeout if timeout is None else timeout
+        start = time.monotonic()
+        acquired = self._channel_slots.acquire(timeout=wait)
+        waited = time.monotonic() - start
+        self._slot_wait.seconds = waited
+        if not acquired:
+            raise TimeoutError(f'等待空闲SSH通道超时（{wait}秒，上限 {self.max_channels} 个通道）')
+        with self._lock:
+            self.channels_in_use += 1
+            self.queue_wait_seconds += waited
+
+    def _give_slot(self):
+        """归还通道名额"""
+        with self._lock:
+            self.channels_in_use -= 1
+        self._channel_slots.release()
+
+    def _cancel_linger(self):
+        """取消空闲关闭定时器"""
+        if self._linger_timer is not None:
+            self._linger_timer.cancel()
+            self._linger_timer = None
+
+    def _close_if_idle(self):
+        """空闲保留时间到期后，若仍无租约则关闭连接"""
+        with self._lock:
+            self._linger_timer = None
+            if self.leases == 0:
+                self._disconnect()
+                print("空闲SSH连接已关闭")
+
+
+# 进程级连接池注册表：(跳板机, 目标服务器) -> SSHConnectionPool
+_pools: Dict[Tuple, SSHConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(server_config: Dict[str, Any]) -> Tuple:
+    """根据服务器配置生成连接池键"""
+    return (server_config['host'], server_config['port'], server_config['username'])
+
+
+def get_pool(server1_config: Optional[Dict[str, Any]] = None,
+             server2_config: Optional[Dict[str, Any]] = None,
+             transport_profile: Optional[str] = None) -> SSHConnectionPool:
+    """
+    获取（或创建）指定双跳路径的共享连接池
+
+    Args:
+        server1_config: 跳板机配置，默认使用 config.SSH_CONFIG
+        server2_config: 目标服务器配置，默认使用 config.SSH_CONFIG
+        transport_profile: 连接级传输参数方案，不同方案使用不同的连接
+
+    Returns:
+        SSHConnectionPool: 共享连接池
+    """
+    server1_config = server1_config or config.SSH_CONFIG['servers']['server1']
+    server2_config = server2_config or config.SSH_CONFIG['servers']['server2']
+    transport_profile = get_transport_profile(transport_profile)['name']
+    key = (_pool_key(server1_config), _pool_key(server2_config), transport_profile)
+
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool_config = getattr(config, 'SSH_POOL_CONFIG', {})
+            shell_config = getattr(config, 'SHELL_POOL_CONFIG', {})
+            pool = SSHConnectionPool(
+                server1_config,
+                server2_config,
+                max_channels=pool_config.get('max_channels', 8),
+                idle_linger_seconds=pool_config.get('idle_linger_seconds', 0),
+                channel_wait_timeout=pool_config.get('channel_wait_timeout', 300),
+                keepalive_interval=pool_config.get('keepalive_interval', 30),
+                probe_after_idle_seconds=pool_config.get('probe_after_idle_seconds', 60),
+                probe_timeout=pool_config.get('probe_timeout', 10),
+                reconnect_attempts=pool_config.get('reconnect_attempts', 5),
+                reconnect_backoff_max=pool_config.get('reconnect_backoff_max', 30),
+                shell_pool_size=shell_config.get('size', 0),
+                shell_init_commands=shell_config.get('init_commands', []),
+                shell_ready_timeout=shell_config.get('ready_timeout', 60),
+                transport_profile=transport_profile,
+                sftp_timeout=pool_config.get('sftp_timeout', 120)
+            )
+            _pools[key] = pool
+        return pool
+
+
+def close_all_pools():
+    """关闭进程内所有共享连接"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -6,10 +6,11 @@
 支持date参数、进度文件管理和submit_job参数控制是否提交作业
 """
 
-import time
 import re
 from typing import Dict, Any, List, Optional
 from topup_ssh import TopupSSH
+from local_executor import create_executor
+from completion_watcher import CompletionWatcher
 import config
 
 
@@ -138,8 +139,8 @@ def step1_1_first_job_submission(
     if submit_job is None:
         # 检查日期目录是否存在
         date_dir = config.get_date_dir(config.INJ_SIG_TIME_CAL_DIR, selected_date)
-        check_result = ssh.execute_command(f"ls -d {date_dir} 2>/dev/null")
-        if check_result['success'] and check_result['output'].strip():
+        date_entry = ssh.stat(date_dir)
+        if date_entry is not None and date_entry.is_dir:
             # 目录存在，只检查文件
             submit_job = False
             print(f"\n检测到日期目录已存在，将只检查文件而不提交作业")
@@ -223,30 +224,23 @@ def step1_1_first_job_submission(
     try:
         print(f"\n进入日期目录: {date_dir}")
 
-        # 获取作业文件列表，确定run号
-        result = ssh.execute_command(f"cd {date_dir} && ls rec*_1.txt")
-
-        if not result['success']:
+        # 获取作业文件列表，确定run号（通过SFTP直接匹配文件名）
+        try:
+            rec_entries = ssh.glob(f"{date_dir}/rec*_1.txt")
+        except Exception as e:
             return {
                 'success': False,
                 'message': '获取作业文件列表失败',
                 'step_name': '步骤1.1：第一次作业提交并检查结果文件',
                 'date': selected_date,
-                'output': result['output'],
-                'error': result.get('error', '')
+                'output': '',
+                'error': str(e)
             }
 
         # 解析run号列表
-        # ls输出可能是多行，每行包含多个文件名，用空格分隔
-        rec_files = []
-        for line in result['output'].split('\n'):
-            if line.strip():
-                # 分割每行中的多个文件名
-                rec_files.extend(line.strip().split())
-
         run_numbers = []
-        for filename in rec_files:
-            match = re.match(r'rec(\d+)_1\.txt', filename)
+        for entry in rec_entries:
+            match = re.match(r'rec(\d+)_1\.txt$', entry.name)
             if match:
                 run_numbers.append(match.group(1))
 
@@ -261,13 +255,6 @@ def step1_1_first_job_submission(
 
         print(f"找到 {len(run_numbers)} 个run号: {run_numbers}")
 
-        # 定期检查文件
-        max_wait_seconds = max_wait_minutes * 60
-        check_interval = config.CHECK_INTERVAL_SECONDS  # 使用配置文件中的检查间隔
-        elapsed_time = 0
-
-        incomplete_runs = run_numbers.copy()
-
         # 先列出目录中的所有文件（用于诊断）
         print(f"\n列出目录中的所有文件:")
         list_cmd = f"cd {date_dir} && ls -la"
@@ -275,62 +262,29 @@ def step1_1_first_job_submission(
         if result['success']:
             print(f"目录内容:\n{result['output']}")
 
-        while elapsed_time < max_wait_seconds and incomplete_runs:
-            print(f"\n检查进度: {elapsed_time}/{max_wait_seconds}秒")
-            print(f"未完成的run号: {incomplete_runs}")
-
-            # 检查每个run号的文件
-            complete_runs = []
-            still_incomplete = []
-
-            for run_num in incomplete_runs:
-                # 检查6个必需文件（使用配置文件中的格式）
-                files_to_check = [
-                    f"rec{run_num}_1.txt",
-                    f"rec{run_num}_1.txt.bosserr",
-                    f"rec{run_num}_1.txt.bosslog",
-                    config.REQUIRED_FILES_STEP1["root_file"].format(run=run_num),
-                    config.REQUIRED_FILES_STEP1["png_file"].format(run=run_num),
-                    config.REQUIRED_FILES_STEP1["txt_file"].format(run=run_num)
-                ]
-
-                # 检查文件是否存在
-                check_cmd = f"cd {date_dir} && ls {' '.join(files_to_check)} 2>/dev/null | wc -l"
-                result = ssh.execute_command(check_cmd)
-
-                if result['success']:
-                    file_count = int(result['output'].strip())
-                    if file_count == len(files_to_check):
-                        complete_runs.append(run_num)
-                    else:
-                        still_incomplete.append(run_num)
-                        print(f"  Run {run_num}: {file_count}/{len(files_to_check)} 文件已生成")
-                else:
-                    still_incomplete.append(run_num)
-                    print(f"  Run {run_num}: 检查失败")
-
-            incomplete_runs = still_incomplete
-
-            if not incomplete_runs:
-                print(f"\n✓ 所有 {len(run_numbers)} 个run号的文件都已生成")
-                break
-
-            # 检查是否出现了Interval_run0.png文件（数据异常）
-            check_anomaly_cmd = f"cd {date_dir} && ls Interval_run0.png 2>/dev/null"
-            anomaly_result = ssh.execute_command(check_anomaly_cmd)
-            if anomaly_result['success'] and anomaly_result['output'].strip():
-                return {
-                    'success': False,
-                    'message': '出现了Interval_run0.png的文件，该日期数据不正常',
-                    'step_name': '步骤1.1：第一次作业提交并检查结果文件',
-                    'date': selected_date,
-                    'anomaly_file': 'Interval_run0.png',
-                    'requires_manual_intervention': True
-                }
-
-            # 等待30秒
-            time.sleep(check_interval)
-            elapsed_time += check_interval
+        # 定期检查6个必需文件（每次检查只遍历一次日期目录），同时检查异常文件
+        watcher = CompletionWatcher(
+            ssh, date_dir, run_numbers, config.REQUIRED_FILES_STEP1,
+            keys=("job_file", "error_file", "log_file", "root_file", "png_file", "txt_file"), step='1.1'
+        )
+        anomaly_file = 'Interval_run0.png'
+        wait_result = watcher.wait(
+            max_wait_minutes,
+            abort=lambda w: anomaly_file if w.exists(anomaly_file) else None
+        )
+        incomplete_runs = wait_result['incomplete_runs']
+        elapsed_time = wait_result['elapsed_time']
+
+        # 检查是否出现了Interval_run0.png文件（数据异常）
+        if wait_result['aborted']:
+            return {
+                'success': False,
+                'message': '出现了Interval_run0.png的文件，该日期数据不正常',
+                'step_name': '步骤1.1：第一次作业提交并检查结果文件',
+                'date': selected_date,
+                'anomaly_file': anomaly_file,
+                'requires_manual_intervention': True
+            }
 
         # 返回结果
         if incomplete_runs:
@@ -340,9 +294,11 @@ def step1_1_first_job_submission(
                 'step_name': '步骤1.1：第一次作业提交并检查结果文件',
                 'date': selected_date,
                 'total_runs': len(run_numbers),
-                'complete_runs': run_numbers[:-len(incomplete_runs)],
+                'complete_runs': wait_result['complete_runs'],
                 'incomplete_runs': incomplete_runs,
-                'elapsed_time': elapsed_time
+                'missing_files': wait_result['missing'],
+                'elapsed_time': elapsed_time,
+                'eta_seconds': wait_result['eta_seconds']
             }
         else:
             return {
@@ -353,7 +309,8 @@ def step1_1_first_job_submission(
                 'total_runs': len(run_numbers),
                 'complete_runs': run_numbers,
                 'incomplete_runs': [],
-                'elapsed_time': elapsed_time
+                'elapsed_time': elapsed_time,
+                'eta_seconds': wait_result['eta_seconds']
             }
 
     except Exception as e:
@@ -368,7 +325,7 @@ def step1_1_first_job_submission(
 
 if __name__ == "__main__":
     # 测试步骤1.1
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             # 测试1：提交作业并检查（默认）
             print("\n测试1：提交作业并检查（submit_job=True）")
@@ -7,6 +7,7 @@
 
 from typing import Dict, Any
 from topup_ssh import TopupSSH
+from local_executor import create_executor
 import config
 
 
@@ -33,9 +34,13 @@ def step1_2_move_files(ssh: TopupSSH, date: str) -> Dict[str, Any]:
         date_dir = config.get_date_dir(config.INJ_SIG_TIME_CAL_DIR, date)
         print(f"\n进入日期目录: {date_dir}")
 
-        # 移动root文件
-        print("\n移动root文件到calibConst目录...")
-        result1 = ssh.execute_command(f"cd {date_dir} && mv InjSigTime*.root {config.CALIB_CONST_DIR}")
+        # 移动root文件、移动png文件、验证剩余文件，合并为一次批量执行（遇错停止）
+        print("\n移动root文件到calibConst目录，移动png文件到Interval_plot目录...")
+        result1, result2, result3 = ssh.execute_batch([
+            f"cd {date_dir} && mv InjSigTime*.root {config.CALIB_CONST_DIR}",
+            f"cd {date_dir} && mv Interval*.png {config.INTERVAL_PLOT_DIR}",
+            f"cd {date_dir} && ls -la"
+        ])
 
         if not result1['success']:
             return {
@@ -49,10 +54,6 @@ def step1_2_move_files(ssh: TopupSSH, date: str) -> Dict[str, Any]:
 
         print("✓ root文件移动成功")
 
-        # 移动png文件
-        print("\n移动png文件到Interval_plot目录...")
-        result2 = ssh.execute_command(f"cd {date_dir} && mv Interval*.png {config.INTERVAL_PLOT_DIR}")
-
         if not result2['success']:
             return {
                 'success': False,
@@ -66,8 +67,6 @@ def step1_2_move_files(ssh: TopupSSH, date: str) -> Dict[str, Any]:
         print("✓ png文件移动成功")
 
         # 验证文件移动
-        print("\n验证文件移动...")
-        result3 = ssh.execute_command(f"cd {date_dir} && ls -la")
         print(f"日期目录剩余文件:\n{result3['output']}")
 
         print("\n✓ 文件移动完成")
@@ -92,7 +91,7 @@ def step1_2_move_files(ssh: TopupSSH, date: str) -> Dict[str, Any]:
 
 if __name__ == "__main__":
     # 测试步骤1.2
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             # 使用测试日期
             result = step1_2_move_files(ssh, "250624")
@@ -7,8 +7,10 @@
 
 import config
 import re
+import shlex
 from typing import Dict, Any, List
 from topup_ssh import TopupSSH
+from local_executor import create_executor
 
 
 def step1_3_ist_analysis(ssh: TopupSSH, date: str, check: bool = True) -> Dict[str, Any]:
@@ -135,9 +137,10 @@ def step1_3_ist_analysis(ssh: TopupSSH, date: str, check: bool = True) -> Dict[s
         # 构建要追加的内容
         content_to_append = '\n'.join([f"{run} 15000000" for run in sorted_runs])
 
-        # 追加到全局的interval.txt文件
+        # 追加到全局的interval.txt文件（O_APPEND，其他任务同时追加时不会互相覆盖；内容经 shlex.quote 转义）
         global_interval_file = f"{config.INJ_SIG_TIME_CAL_DIR}/interval.txt"
-        result_append = ssh.execute_command(f"echo '{content_to_append}' >> {global_interval_file}")
+        result_append = ssh.execute_command(
+            f"printf '%s\\n' {shlex.quote(content_to_append)} >> {shlex.quote(global_interval_file)}")
 
         if not result_append['success']:
             return {
@@ -146,16 +149,15 @@ def step1_3_ist_analysis(ssh: TopupSSH, date: str, check: bool = True) -> Dict[s
                 'step_name': '步骤1.3：IST分析',
                 'date': date,
                 'ist_results': ist_results,
-                'output': result_append['output'],
                 'error': result_append.get('error', '')
             }
 
-        # 验证全局interval.txt文件内容（根据run号数量检查相应行数）
+        # 本次追加的内容（其他任务可能同时追加，不再用 tail 读取文件末尾）
         tail_lines = len(sorted_runs)
-        result_verify = ssh.execute_command(f"tail -{tail_lines} {global_interval_file}")
+        interval_tail = f"{content_to_append}\n"
 
         print(f"\n✓ IST分析完成")
-        print(f"全局interval.txt文件最后{tail_lines}行:\n{result_verify['output']}")
+        print(f"追加到全局interval.txt文件的{tail_lines}行:\n{interval_tail}")
 
         return {
             'success': True,
@@ -163,7 +165,7 @@ def step1_3_ist_analysis(ssh: TopupSSH, date: str, check: bool = True) -> Dict[s
             'step_name': '步骤1.3：IST分析',
             'date': date,
             'ist_results': ist_results,
-            'interval_file_content': result_verify['output']
+            'interval_file_content': interval_tail
         }
 
     except Exception as e:
@@ -178,7 +180,7 @@ def step1_3_ist_analysis(ssh: TopupSSH, date: str, check: bool = True) -> Dict[s
 
 if __name__ == "__main__":
     # 测试步骤1.3
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             # 使用测试日期
             result = step1_3_ist_analysis(ssh, "250624")
@@ -7,6 +7,7 @@
 
 from typing import Dict, Any, Optional
 from topup_ssh import TopupSSH
+from local_executor import create_executor
 import config
 
 
@@ -125,7 +126,7 @@ def step1_4_merge_images(ssh: TopupSSH, date: Optional[str] = None) -> Dict[str,
 
 if __name__ == "__main__":
     # 测试步骤1.4
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             result = step1_4_merge_images(ssh, "250519")
             print("\n" + "="*60)
@@ -6,10 +6,10 @@
 支持submit_job参数控制是否提交作业
 """
 
-import time
-import re
 from typing import Dict, Any, List, Optional
 from topup_ssh import TopupSSH
+from local_executor import create_executor
+from completion_watcher import CompletionWatcher
 import config
 
 
@@ -136,21 +136,21 @@ def step2_1_second_job_submission(
 
         print(f"\n进入日期目录: {date_dir}")
 
-        # 获取run号子目录列表
-        result = ssh.execute_command(f"cd {date_dir} && ls -d */ | sed 's|/||'")
-
-        if not result['success']:
+        # 获取run号子目录列表（通过SFTP列出目录，只保留子目录）
+        try:
+            date_entries = ssh.listdir_attr(date_dir)
+        except Exception as e:
             return {
                 'success': False,
                 'message': '获取run号子目录列表失败',
                 'step_name': '步骤2.1：第二次作业提交并检查hist文件',
                 'date': selected_date,
-                'output': result['output'],
-                'error': result.get('error', '')
+                'output': '',
+                'error': str(e)
             }
 
         # 解析run号列表
-        run_numbers = [line.strip() for line in result['output'].split('\n') if line.strip()]
+        run_numbers = [entry.name for entry in date_entries if entry.is_dir and not entry.name.startswith('.')]
 
         if not run_numbers:
             return {
@@ -163,57 +163,14 @@ def step2_1_second_job_submission(
 
         print(f"找到 {len(run_numbers)} 个run号子目录: {run_numbers}")
 
-        # 定期检查文件
-        max_wait_seconds = max_wait_minutes * 60
-        check_interval = config.CHECK_INTERVAL_SECONDS  # 使用配置文件中的检查间隔
-        elapsed_time = 0
-
-        incomplete_runs = run_numbers.copy()
-
-        while elapsed_time < max_wait_seconds and incomplete_runs:
-            print(f"\n检查进度: {elapsed_time}/{max_wait_seconds}秒")
-            print(f"未完成的run号: {incomplete_runs}")
-
-            # 检查每个run号的hist文件
-            complete_runs = []
-            still_incomplete = []
-
-            for run_num in incomplete_runs:
-                run_dir = f"{date_dir}/{run_num}"
-
-                # 获取该run号下的作业文件数量
-                result_jobs = ssh.execute_command(r"cd " + run_dir + r" && ls *.txt 2>/dev/null | grep -v '\.out|\.err' | wc -l")
-
-                if result_jobs['success']:
-                    job_count = int(result_jobs['output'].strip())
-
-                    # 获取hist文件数量
-                    result_hist = ssh.execute_command(f"cd {run_dir} && ls hist*.root 2>/dev/null | wc -l")
-
-                    if result_hist['success']:
-                        hist_count = int(result_hist['output'].strip())
-
-                        if hist_count >= job_count and hist_count > 0:
-                            complete_runs.append(run_num)
-                        else:
-                            still_incomplete.append(run_num)
-                            print(f"  Run {run_num}: {hist_count}/{job_count} hist文件已生成")
-                    else:
-                        still_incomplete.append(run_num)
-                        print(f"  Run {run_num}: 检查hist文件失败")
-                else:
-                    still_incomplete.append(run_num)
-                    print(f"  Run {run_num}: 检查作业文件失败")
-
-            incomplete_runs = still_incomplete
-
-            if not incomplete_runs:
-                print(f"\n✓ 所有 {len(run_numbers)} 个run号的hist文件都已生成")
-                break
-
-            # 等待检查间隔
-            time.sleep(check_interval)
-            elapsed_time += check_interval
+        # 定期检查hist文件（每次检查只遍历一次日期目录及其run号子目录）
+        watcher = CompletionWatcher(
+            ssh, date_dir, run_numbers, config.REQUIRED_FILES_STEP2,
+            keys=("hist_file",), count_match={"hist_file": "job_file"}, step='2.1'
+        )
+        wait_result = watcher.wait(max_wait_minutes)
+        incomplete_runs = wait_result['incomplete_runs']
+        elapsed_time = wait_result['elapsed_time']
 
         # 返回结果
         if incomplete_runs:
@@ -223,9 +180,11 @@ def step2_1_second_job_submission(
                 'step_name': '步骤2.1：第二次作业提交并检查hist文件',
                 'date': selected_date,
                 'total_runs': len(run_numbers),
-                'complete_runs': run_numbers[:-len(incomplete_runs)],
+                'complete_runs': wait_result['complete_runs'],
                 'incomplete_runs': incomplete_runs,
-                'elapsed_time': elapsed_time
+                'missing_files': wait_result['missing'],
+                'elapsed_time': elapsed_time,
+                'eta_seconds': wait_result['eta_seconds']
             }
         else:
             return {
@@ -236,7 +195,8 @@ def step2_1_second_job_submission(
                 'total_runs': len(run_numbers),
                 'complete_runs': run_numbers,
                 'incomplete_runs': [],
-                'elapsed_time': elapsed_time
+                'elapsed_time': elapsed_time,
+                'eta_seconds': wait_result['eta_seconds']
             }
 
     except Exception as e:
@@ -251,7 +211,7 @@ def step2_1_second_job_submission(
 
 if __name__ == "__main__":
     # 测试步骤2.1
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             # 测试1：提交作业并检查（默认）
             print("\n测试1：提交作业并检查（submit_job=True）")
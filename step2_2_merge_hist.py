@@ -7,6 +7,7 @@
 
 from typing import Dict, Any
 from topup_ssh import TopupSSH
+from local_executor import create_executor
 import config
 
 
@@ -32,9 +33,9 @@ def step2_2_merge_hist(ssh: TopupSSH, date: str) -> Dict[str, Any]:
         date_dir = config.get_date_dir(config.DATA_VALID_DIR, date)
         print(f"\n进入日期目录: {date_dir}")
 
-        # 执行mergeHist.sh脚本
+        # 以后台作业执行mergeHist.sh脚本（连接中断或步骤重试时重新附着，不重复执行）
         print(f"\n执行mergeHist.sh脚本...")
-        result = ssh.execute_command(f"cd {date_dir} && ./mergeHist.sh")
+        result = ssh.run_detached(f"cd {date_dir} && ./mergeHist.sh", name=f"2.2_{date}")
 
         if not result['success']:
             return {
@@ -47,7 +48,6 @@ def step2_2_merge_hist(ssh: TopupSSH, date: str) -> Dict[str, Any]:
             }
 
         print(f"\n✓ hist文件合并成功")
-        print(f"输出:\n{result['output']}")
         
         return {
             'success': True,
@@ -69,7 +69,7 @@ def step2_2_merge_hist(ssh: TopupSSH, date: str) -> Dict[str, Any]:
 
 if __name__ == "__main__":
     # 测试步骤2.2
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             # 使用测试日期
             result = step2_2_merge_hist(ssh, "250624")
@@ -5,12 +5,14 @@
 进入hist目录，执行./01go.sh脚本
 """
 
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional
 from topup_ssh import TopupSSH
+from local_executor import create_executor
 import config
 
 
-def step2_3_generate_png(ssh: TopupSSH) -> Dict[str, Any]:
+def step2_3_generate_png(ssh: TopupSSH, date: Optional[str] = None) -> Dict[str, Any]:
     """
     生成png文件
     
@@ -18,10 +20,14 @@ def step2_3_generate_png(ssh: TopupSSH) -> Dict[str, Any]:
     
     Args:
         ssh: SSH连接实例
+        date: 日期参数（如250624），用于区分不同日期的后台作业，默认使用当天日期
         
     Returns:
         dict: 执行结果
     """
+    # 后台作业名带上日期，未指定日期时使用当天日期（返回结果中的date仍为传入值，不改写进度文件中的日期）
+    job_date = date or time.strftime('%y%m%d')
+
     print("\n" + "="*60)
     print("步骤2.3：生成png文件")
     print("="*60)
@@ -31,26 +37,27 @@ def step2_3_generate_png(ssh: TopupSSH) -> Dict[str, Any]:
         hist_dir = config.HIST_DIR
         print(f"\n进入hist目录: {hist_dir}")
 
-        # 执行01go.sh脚本
+        # 以后台作业执行01go.sh脚本（连接中断或步骤重试时重新附着，不重复执行）
         print(f"\n执行01go.sh脚本...")
-        result = ssh.execute_command(f"cd {hist_dir} && ./01go.sh")
+        result = ssh.run_detached(f"cd {hist_dir} && ./01go.sh", name=f"2.3_{job_date}")
 
         if not result['success']:
             return {
                 'success': False,
                 'message': '执行01go.sh脚本失败',
                 'step_name': '步骤2.3：生成png文件',
+                'date': date,
                 'output': result['output'],
                 'error': result.get('error', '')
             }
 
         print(f"\n✓ png文件生成成功")
-        print(f"输出:\n{result['output']}")
         
         return {
             'success': True,
             'message': 'png文件生成成功',
             'step_name': '步骤2.3：生成png文件',
+            'date': date,
             'output': result['output']
         }
         
@@ -59,15 +66,17 @@ def step2_3_generate_png(ssh: TopupSSH) -> Dict[str, Any]:
             'success': False,
             'message': f'生成png文件异常: {str(e)}',
             'step_name': '步骤2.3：生成png文件',
+            'date': date,
             'error': str(e)
         }
 
 
 if __name__ == "__main__":
     # 测试步骤2.3
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
-            result = step2_3_generate_png(ssh)
+            # 使用测试日期
+            result = step2_3_generate_png(ssh, "250624")
             print("\n" + "="*60)
             print("步骤2.3执行结果:")
             print("="*60)
@@ -6,9 +6,11 @@
 """
 
 import time
-import re
+import fnmatch
 from typing import Dict, Any
 from topup_ssh import TopupSSH
+from local_executor import create_executor
+from poll_schedule import PollSchedule
 import config
 
 
@@ -40,26 +42,20 @@ def step2_4_check_png_files(ssh: TopupSSH, max_wait_minutes: int = None) -> Dict
         hist_dir = config.HIST_DIR
         print(f"\n进入hist目录: {hist_dir}")
 
-        # 获取hist文件列表
-        result = ssh.execute_command(f"cd {hist_dir} && ls hist*.root")
-
-        if not result['success']:
+        # 获取hist文件列表（通过SFTP直接匹配文件名）
+        hist_pattern = config.REQUIRED_FILES_STEP2_4["hist_file"]
+        png_pattern = config.REQUIRED_FILES_STEP2_4["png_file"]
+        try:
+            hist_files = [entry.name for entry in ssh.glob(f"{hist_dir}/{hist_pattern}")]
+        except Exception as e:
             return {
                 'success': False,
                 'message': '获取hist文件列表失败',
                 'step_name': '步骤2.4：检查png文件',
-                'output': result['output'],
-                'error': result.get('error', '')
+                'output': '',
+                'error': str(e)
             }
 
-        # 解析hist文件列表
-        # ls输出可能是多行，每行包含多个文件名，用空格分隔
-        hist_files = []
-        for line in result['output'].split('\n'):
-            if line.strip():
-                # 分割每行中的多个文件名
-                hist_files.extend(line.strip().split())
-
         if not hist_files:
             return {
                 'success': False,
@@ -70,49 +66,71 @@ def step2_4_check_png_files(ssh: TopupSSH, max_wait_minutes: int = None) -> Dict
 
         print(f"找到 {len(hist_files)} 个hist文件")
 
-        # 定期检查文件
+        # 定期检查png文件数：先获取hist目录的修改时间和条目数，目录未变化时沿用上次的数量
         max_wait_seconds = max_wait_minutes * 60
-        check_interval = config.CHECK_INTERVAL_SECONDS  # 使用配置文件中的检查间隔
-        elapsed_time = 0
-
-        while elapsed_time < max_wait_seconds:
-            print(f"\n检查进度: {elapsed_time}/{max_wait_seconds}秒")
-
-            # 获取png文件列表
-            result_png = ssh.execute_command(f"cd {hist_dir} && ls check*.png")
-
-            if result_png['success']:
-                # ls输出可能是多行，每行包含多个文件名，用空格分隔
-                png_files = []
-                for line in result_png['output'].split('\n'):
-                    if line.strip():
-                        # 分割每行中的多个文件名
-                        png_files.extend(line.strip().split())
-                print(f"  已生成 {len(png_files)}/{len(hist_files)} 个png文件")
-
-                if len(png_files) >= len(hist_files):
-                    print(f"\n✓ 所有 {len(hist_files)} 个png文件都已生成")
-                    return {
-                        'success': True,
-                        'message': f'所有 {len(hist_files)} 个png文件都已生成',
-                        'step_name': '步骤2.4：检查png文件',
-                        'total_hist_files': len(hist_files),
-                        'total_png_files': len(png_files),
-                        'elapsed_time': elapsed_time
-                    }
-
-            # 等待检查间隔
-            time.sleep(check_interval)
-            elapsed_time += check_interval
+        schedule = PollSchedule(max_wait_seconds, len(hist_files), step='2.4')
+        signature = None
+        png_count = 0
+
+        while True:
+            print(f"\n检查进度: {int(schedule.elapsed())}/{max_wait_seconds}秒")
+
+            changed = False
+            try:
+                answer = ssh.query_many([{'op': 'dirstat', 'paths': [hist_dir]}])[0]
+                if not answer['success']:
+                    raise IOError(answer['error'] or '获取目录状态失败')
+                current = answer['value'].get(hist_dir)
+                if current is None or current != signature:
+                    names = [entry.name for entry in ssh.scan_tree(hist_dir, 1)]
+                    png_count = len(fnmatch.filter(names, png_pattern))
+                    signature = current
+                    changed = True
+            except Exception as e:
+                print(f"  检查png文件失败: {str(e)}")
+            else:
+                if changed:
+                    print(f"  已生成 {png_count}/{len(hist_files)} 个png文件")
+                else:
+                    print(f"  hist目录未变化，沿用上次检查结果（{png_count}/{len(hist_files)}）")
+            schedule.observe(min(png_count, len(hist_files)), changed=changed)
+
+            if png_count >= len(hist_files):
+                print(f"\n✓ 所有 {len(hist_files)} 个png文件都已生成")
+                schedule.finish()
+                prediction = schedule.eta()
+                return {
+                    'success': True,
+                    'message': f'所有 {len(hist_files)} 个png文件都已生成',
+                    'step_name': '步骤2.4：检查png文件',
+                    'total_hist_files': len(hist_files),
+                    'total_png_files': png_count,
+                    'elapsed_time': int(schedule.elapsed()),
+                    'eta_seconds': int(prediction[0]) if prediction is not None else None
+                }
+
+            if schedule.expired():
+                break
+
+            # 等待到下一次检查（没有进展时逐步退避，接近预计完成时间时加快）
+            interval = schedule.next_interval()
+            prediction = schedule.eta()
+            if prediction is not None:
+                print(f"  预计剩余: {int(prediction[0])}秒（依据{prediction[1]}），{int(interval)}秒后再次检查")
+            else:
+                print(f"  {int(interval)}秒后再次检查")
+            time.sleep(interval)
 
         # 超时
+        prediction = schedule.eta()
         return {
             'success': False,
             'message': f'在 {max_wait_minutes} 分钟内未完成所有png文件的生成',
             'step_name': '步骤2.4：检查png文件',
             'total_hist_files': len(hist_files),
-            'total_png_files': len(png_files) if 'png_files' in locals() else 0,
-            'elapsed_time': elapsed_time
+            'total_png_files': png_count,
+            'elapsed_time': int(schedule.elapsed()),
+            'eta_seconds': int(prediction[0]) if prediction is not None else None
         }
 
     except Exception as e:
@@ -126,7 +144,7 @@ def step2_4_check_png_files(ssh: TopupSSH, max_wait_minutes: int = None) -> Dict
 
 if __name__ == "__main__":
     # 测试步骤2.4
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             result = step2_4_check_png_files(ssh)
             print("\n" + "="*60)
@@ -7,6 +7,7 @@
 
 from typing import Dict, Any, Optional
 from topup_ssh import TopupSSH
+from local_executor import create_executor
 import config
 
 
@@ -123,7 +124,7 @@ def step2_5_merge_images(ssh: TopupSSH, date: Optional[str] = None) -> Dict[str,
 
 if __name__ == "__main__":
     # 测试步骤2.5
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             result = step2_5_merge_images(ssh, "250519")
             print("\n" + "="*60)
@@ -6,10 +6,11 @@
 支持submit_job参数控制是否提交作业
 """
 
-import time
 import re
 from typing import Dict, Any, Optional
 from topup_ssh import TopupSSH
+from local_executor import create_executor
+from completion_watcher import CompletionWatcher
 import config
 
 
@@ -91,28 +92,22 @@ def step3_1_third_job_submission(
         print(f"最大等待时间: {max_wait_minutes} 分钟")
         print(f"检查间隔: {config.CHECK_INTERVAL_SECONDS} 秒")
 
-        # 获取作业文件列表
-        result = ssh.execute_command(f"cd {search_peak_dir} && ls run_*_3.txt")
-
-        if not result['success']:
+        # 获取作业文件列表（通过SFTP直接匹配文件名）
+        try:
+            job_entries = ssh.glob(f"{search_peak_dir}/run_*_3.txt")
+        except Exception as e:
             return {
                 'success': False,
                 'message': '获取作业文件列表失败',
                 'step_name': '步骤3.1：第三次作业提交并检查shield文件',
-                'output': result['output'],
-                'error': result.get('error', '')
+                'output': '',
+                'error': str(e)
             }
 
         # 解析作业文件列表，提取run号
-        # ls输出可能是多行，每行包含多个文件名，用空格分隔
-        job_files = []
-        for line in result['output'].split('\n'):
-            if line.strip():
-                # 分割每行中的多个文件名
-                job_files.extend(line.strip().split())
         run_numbers = []
-        for filename in job_files:
-            match = re.match(r'run_(\d+)_3\.txt', filename)
+        for entry in job_entries:
+            match = re.match(r'run_(\d+)_3\.txt$', entry.name)
             if match:
                 run_numbers.append(match.group(1))
 
@@ -126,40 +121,14 @@ def step3_1_third_job_submission(
 
         print(f"找到 {len(run_numbers)} 个作业文件")
 
-        # 定期检查文件
-        max_wait_seconds = max_wait_minutes * 60
-        check_interval = config.CHECK_INTERVAL_SECONDS  # 使用配置文件中的检查间隔
-        elapsed_time = 0
-
-        incomplete_runs = run_numbers.copy()
-
-        while elapsed_time < max_wait_seconds and incomplete_runs:
-            print(f"\n检查进度: {elapsed_time}/{max_wait_seconds}秒")
-            print(f"未完成的run号: {incomplete_runs}")
-
-            # 检查每个run号的shield文件
-            complete_runs = []
-            still_incomplete = []
-
-            for run_num in incomplete_runs:
-                shield_file = f"shield_run{run_num}.txt"
-                result_check = ssh.execute_command(f"cd {search_peak_dir} && ls {shield_file} 2>/dev/null")
-
-                if result_check['success'] and shield_file in result_check['output']:
-                    complete_runs.append(run_num)
-                else:
-                    still_incomplete.append(run_num)
-                    print(f"  Run {run_num}: shield文件未生成")
-
-            incomplete_runs = still_incomplete
-
-            if not incomplete_runs:
-                print(f"\n✓ 所有 {len(run_numbers)} 个shield文件都已生成")
-                break
-
-            # 等待检查间隔
-            time.sleep(check_interval)
-            elapsed_time += check_interval
+        # 定期检查shield文件（每次检查只遍历一次目录）
+        watcher = CompletionWatcher(
+            ssh, search_peak_dir, run_numbers, config.REQUIRED_FILES_STEP3,
+            keys=("shield_file",), step='3.1'
+        )
+        wait_result = watcher.wait(max_wait_minutes)
+        incomplete_runs = wait_result['incomplete_runs']
+        elapsed_time = wait_result['elapsed_time']
 
         # 返回结果
         if incomplete_runs:
@@ -168,9 +137,11 @@ def step3_1_third_job_submission(
                 'message': f'在 {max_wait_minutes} 分钟内未完成所有shield文件的生成',
                 'step_name': '步骤3.1：第三次作业提交并检查shield文件',
                 'total_runs': len(run_numbers),
-                'complete_runs': run_numbers[:-len(incomplete_runs)],
+                'complete_runs': wait_result['complete_runs'],
                 'incomplete_runs': incomplete_runs,
-                'elapsed_time': elapsed_time
+                'missing_files': wait_result['missing'],
+                'elapsed_time': elapsed_time,
+                'eta_seconds': wait_result['eta_seconds']
             }
         else:
             return {
@@ -180,7 +151,8 @@ def step3_1_third_job_submission(
                 'total_runs': len(run_numbers),
                 'complete_runs': run_numbers,
                 'incomplete_runs': [],
-                'elapsed_time': elapsed_time
+                'elapsed_time': elapsed_time,
+                'eta_seconds': wait_result['eta_seconds']
             }
 
     except Exception as e:
@@ -194,7 +166,7 @@ def step3_1_third_job_submission(
 
 if __name__ == "__main__":
     # 测试步骤3.1
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             # 测试1：提交作业并检查（默认）
             print("\n测试1：提交作业并检查（submit_job=True）")
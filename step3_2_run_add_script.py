@@ -5,8 +5,10 @@
 运行search_peak目录下的add.sh脚本
 """
 
+import re
 from typing import Dict, Any
 from topup_ssh import TopupSSH
+from local_executor import create_executor
 import config
 
 
@@ -50,20 +52,31 @@ def step3_2_run_add_script(ssh: TopupSSH) -> Dict[str, Any]:
         # 删除window.dat文件中只有run号的行（只有一个数字的行）
         print(f"\n清理window.dat文件，删除只有run号的行...")
         window_file = f"{search_peak_dir}/window.dat"
-        result_clean = ssh.execute_command(
-            f"cd {search_peak_dir} && sed '/^[0-9]\\+$/d' window.dat > window.dat.tmp && mv window.dat.tmp window.dat"
-        )
-        
+        try:
+            window_content = ssh.read_text(window_file)
+        except Exception as e:
+            return {
+                'success': False,
+                'message': '读取window.dat文件失败',
+                'step_name': '步骤3.2：运行add.sh脚本',
+                'error': str(e)
+            }
+
+        # 在本地删除只有数字的行后原子写回（等价于 sed '/^[0-9]\+$/d'）
+        kept_lines = [line for line in window_content.splitlines(keepends=True)
+                      if not re.fullmatch(r'[0-9]+', line.rstrip('\n'))]
+        removed = len(window_content.splitlines()) - len(kept_lines)
+        result_clean = ssh.write_text_atomic(window_file, ''.join(kept_lines))
+
         if not result_clean['success']:
             return {
                 'success': False,
                 'message': '清理window.dat文件失败',
                 'step_name': '步骤3.2：运行add.sh脚本',
-                'output': result_clean['output'],
                 'error': result_clean.get('error', '')
             }
-        
-        print(f"✓ window.dat文件清理完成")
+
+        print(f"✓ window.dat文件清理完成（删除 {removed} 行）")
         
         return {
             'success': True,
@@ -83,7 +96,7 @@ def step3_2_run_add_script(ssh: TopupSSH) -> Dict[str, Any]:
 
 if __name__ == "__main__":
     # 测试步骤3.2
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             result = step3_2_run_add_script(ssh)
             print("\n" + "="*60)
@@ -7,8 +7,10 @@
 
 from typing import Dict, Any
 from topup_ssh import TopupSSH
+from local_executor import create_executor
+from completion_watcher import CompletionWatcher
 import config
-import time
+import re
 
 
 def step4_1_fourth_job_submission(
@@ -86,25 +88,24 @@ def step4_1_fourth_job_submission(
         if check:
             # 获取作业文件列表以确定run号
             print(f"\n获取作业文件列表...")
-            result_files = ssh.execute_command(f"cd {checkShieldCalib_dir} && ls run_*_4.txt")
-            if not result_files['success']:
+            try:
+                job_entries = ssh.glob(f"{checkShieldCalib_dir}/run_*_4.txt")
+            except Exception as e:
                 return {
                     'success': False,
                     'message': '获取作业文件列表失败',
                     'step_name': '步骤4.1：第四次作业提交',
                     'date': date,
-                    'output': result_files['output'],
-                    'error': result_files.get('error', '')
+                    'output': '',
+                    'error': str(e)
                 }
 
-            # 提取run号
+            # 提取run号（格式：run_XXXXX_4.txt）
             run_numbers = []
-            for line in result_files['output'].split('\n'):
-                if line.strip() and 'run_' in line:
-                    # 从文件名中提取run号（格式：run_XXXXX_4.txt）
-                    parts = line.strip().split('_')
-                    if len(parts) >= 2:
-                        run_numbers.append(parts[1])
+            for entry in job_entries:
+                match = re.match(r'run_(\d+)_4\.txt$', entry.name)
+                if match:
+                    run_numbers.append(match.group(1))
 
             if not run_numbers:
                 return {
@@ -112,86 +113,45 @@ def step4_1_fourth_job_submission(
                     'message': '未找到作业文件',
                     'step_name': '步骤4.1：第四次作业提交',
                     'date': date,
-                    'output': result_files['output']
+                    'output': '\n'.join(entry.name for entry in job_entries)
                 }
 
             print(f"找到 {len(run_numbers)} 个run号: {run_numbers}")
 
-            # 检查每个run的4个文件
-            required_files = [
-                'cut_detail.png',   # 滤波窗口详细图
-                'after_cut.png',    # 应用滤波后的结果图
-                'before_cut.png',   # 应用滤波前的对比图
-                'check.png'         # 整体检查图
-            ]
-
+            # 检查每个run的4个图片文件（每次检查只遍历一次目录）
             total_runs = len(run_numbers)
-            complete_runs = []
-            incomplete_runs = []
-
             print(f"\n开始检查文件，最大等待时间: {max_wait_minutes} 分钟...")
-            start_time = time.time()
-            check_interval = config.CHECK_INTERVAL_SECONDS
-
-            while True:
-                complete_runs = []
-                incomplete_runs = []
-
-                for run in run_numbers:
-                    all_files_exist = True
-                    missing_files = []
-
-                    for file_suffix in required_files:
-                        file_name = f"run{run}_{file_suffix}"
-                        file_path = f"{checkShieldCalib_dir}/{file_name}"
-                        result_check = ssh.execute_command(f"ls {file_path}")
-                        if not result_check['success'] or not result_check['output'].strip():
-                            all_files_exist = False
-                            missing_files.append(file_suffix)
-
-                    if all_files_exist:
-                        complete_runs.append(run)
-                    else:
-                        incomplete_runs.append({
-                            'run': run,
-                            'missing': missing_files
-                        })
-
-                elapsed_time = time.time() - start_time
-
-                # 如果所有文件都已生成，退出循环
-                if len(complete_runs) == total_runs:
-                    print(f"✓ 所有 {total_runs} 个run的文件都已生成")
-                    break
-
-                # 检查是否超时
-                if elapsed_time >= max_wait_minutes * 60:
-                    print(f"\n✗ 文件检查超时")
-                    print(f"总run数: {total_runs}")
-                    print(f"已完成run数: {len(complete_runs)}")
-                    print(f"未完成run数: {len(incomplete_runs)}")
-                    for item in incomplete_runs[:5]:  # 只显示前5个
-                        print(f"  - run{item['run']}: 缺少 {', '.join(item['missing'])}")
-                    if len(incomplete_runs) > 5:
-                        print(f"  ... 还有 {len(incomplete_runs) - 5} 个run未完成")
-
-                    return {
-                        'success': False,
-                        'message': f'文件检查超时（等待{max_wait_minutes}分钟）',
-                        'step_name': '步骤4.1：第四次作业提交',
-                        'date': date,
-                        'output': result['output'],
-                        'total_runs': total_runs,
-                        'complete_runs': len(complete_runs),
-                        'incomplete_runs': [item['run'] for item in incomplete_runs],
-                        'elapsed_time': elapsed_time
-                    }
-
-                # 显示进度
-                print(f"[{int(elapsed_time)}秒] 完成: {len(complete_runs)}/{total_runs} run", end='\r')
-
-                # 等待一段时间后再次检查
-                time.sleep(check_interval)
+            watcher = CompletionWatcher(
+                ssh, checkShieldCalib_dir, run_numbers, config.REQUIRED_FILES_STEP4,
+                keys=("cut_detail_file", "after_cut_file", "before_cut_file", "check_file"), step='4.1'
+            )
+            wait_result = watcher.wait(max_wait_minutes)
+            incomplete_runs = wait_result['incomplete_runs']
+            elapsed_time = wait_result['elapsed_time']
+
+            if incomplete_runs:
+                print(f"\n✗ 文件检查超时")
+                print(f"总run数: {total_runs}")
+                print(f"已完成run数: {len(wait_result['complete_runs'])}")
+                print(f"未完成run数: {len(incomplete_runs)}")
+                for run in incomplete_runs[:5]:  # 只显示前5个
+                    print(f"  - run{run}: 缺少 {', '.join(wait_result['missing'].get(run, []))}")
+                if len(incomplete_runs) > 5:
+                    print(f"  ... 还有 {len(incomplete_runs) - 5} 个run未完成")
+
+                return {
+                    'success': False,
+                    'message': f'文件检查超时（等待{max_wait_minutes}分钟）',
+                    'step_name': '步骤4.1：第四次作业提交',
+                    'date': date,
+                    'output': result['output'],
+                    'total_runs': total_runs,
+                    'complete_runs': len(wait_result['complete_runs']),
+                    'incomplete_runs': incomplete_runs,
+                    'missing_files': wait_result['missing'],
+                    'elapsed_time': elapsed_time,
+                    'eta_seconds': wait_result['eta_seconds']
+                }
 
             print(f"\n✓ 文件检查完成，耗时: {int(elapsed_time)} 秒")
 
@@ -202,8 +162,9 @@ def step4_1_fourth_job_submission(
                 'date': date,
                 'output': result['output'],
                 'total_runs': total_runs,
-                'complete_runs': len(complete_runs),
-                'elapsed_time': elapsed_time
+                'complete_runs': len(wait_result['complete_runs']),
+                'elapsed_time': elapsed_time,
+                'eta_seconds': wait_result['eta_seconds']
             }
         else:
             print(f"\ncheck=False，跳过文件检查")
@@ -227,7 +188,7 @@ def step4_1_fourth_job_submission(
 
 if __name__ == "__main__":
     # 测试步骤4.1
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             result = step4_1_fourth_job_submission(ssh, "250519", submit_job=True, check=False, max_wait_minutes=25)
             print("\n" + "="*60)
@@ -7,6 +7,7 @@
 
 from typing import Dict, Any, Optional
 from topup_ssh import TopupSSH
+from local_executor import create_executor
 import config
 
 
@@ -148,7 +149,7 @@ def step4_2_merge_images(ssh: TopupSSH, date: Optional[str] = None) -> Dict[str,
 
 if __name__ == "__main__":
     # 测试步骤4.2
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             result = step4_2_merge_images(ssh, "250519")
             print("\n" + "="*60)
@@ -5,10 +5,11 @@
 进入ETS_cut目录，执行./genJob.sh脚本，然后检查cut和all文件
 """
 
-import time
 import re
 from typing import Dict, Any, Optional
 from topup_ssh import TopupSSH
+from local_executor import create_executor
+from completion_watcher import CompletionWatcher
 import config
 
 
@@ -83,28 +84,24 @@ def step5_1_fifth_job_submission(ssh: TopupSSH, date: str, submit_job: bool = Tr
         # 步骤B：检查cut和all文件
         print(f"\n[步骤B] 检查cut和all文件...")
 
-        # 获取作业文件列表
-        result = ssh.execute_command(f"cd {ets_cut_dir} && ls plot_ETS_*.txt")
-
-        if not result['success']:
+        # 获取作业文件列表（通过SFTP直接匹配文件名）
+        try:
+            job_entries = ssh.glob(f"{ets_cut_dir}/plot_ETS_*.txt")
+        except Exception as e:
             return {
                 'success': False,
                 'message': '获取作业文件列表失败',
                 'step_name': '步骤5.1：第五次作业提交并检查cut和all文件',
                 'date': date,
                 'submit_job': submit_job,
-                'output': result['output'],
-                'error': result.get('error', '')
+                'output': '',
+                'error': str(e)
             }
 
         # 解析作业文件列表，提取run号
-        job_files = []
-        for line in result['output'].split('\n'):
-            if line.strip():
-                job_files.extend(line.strip().split())
         run_numbers = []
-        for filename in job_files:
-            match = re.match(r'plot_ETS_(\d+)\.txt', filename)
+        for entry in job_entries:
+            match = re.match(r'plot_ETS_(\d+)\.txt$', entry.name)
             if match:
                 run_numbers.append(match.group(1))
 
@@ -120,46 +117,14 @@ def step5_1_fifth_job_submission(ssh: TopupSSH, date: str, submit_job: bool = Tr
 
         print(f"找到 {len(run_numbers)} 个作业文件")
 
-        # 定期检查文件
-        max_wait_seconds = max_wait_minutes * 60
-        check_interval = config.CHECK_INTERVAL_SECONDS
-        elapsed_time = 0
-
-        incomplete_runs = run_numbers.copy()
-
-        while elapsed_time < max_wait_seconds and incomplete_runs:
-            print(f"\n检查进度: {elapsed_time}/{max_wait_seconds}秒")
-            print(f"未完成的run号: {incomplete_runs}")
-
-            # 检查每个run号的cut和all文件
-            complete_runs = []
-            still_incomplete = []
-
-            for run_num in incomplete_runs:
-                cut_file = f"run{run_num}_cut.png"
-                all_file = f"run{run_num}_total.png"
-
-                result_cut = ssh.execute_command(f"cd {ets_cut_dir} && ls {cut_file} 2>/dev/null")
-                result_all = ssh.execute_command(f"cd {ets_cut_dir} && ls {all_file} 2>/dev/null")
-
-                cut_exists = result_cut['success'] and cut_file in result_cut['output']
-                all_exists = result_all['success'] and all_file in result_all['output']
-
-                if cut_exists and all_exists:
-                    complete_runs.append(run_num)
-                else:
-                    still_incomplete.append(run_num)
-                    print(f"  Run {run_num}: cut文件={'✓' if cut_exists else '✗'}, all文件={'✓' if all_exists else '✗'}")
-
-            incomplete_runs = still_incomplete
-
-            if not incomplete_runs:
-                print(f"\n✓ 所有 {len(run_numbers)} 个cut和all文件都已生成")
-                break
-
-            # 等待指定间隔
-            time.sleep(check_interval)
-            elapsed_time += check_interval
+        # 定期检查cut和all文件（每次检查只遍历一次目录）
+        watcher = CompletionWatcher(
+            ssh, ets_cut_dir, run_numbers, config.REQUIRED_FILES_STEP5,
+            keys=("cut_file", "all_file"), step='5.1'
+        )
+        wait_result = watcher.wait(max_wait_minutes)
+        incomplete_runs = wait_result['incomplete_runs']
+        elapsed_time = wait_result['elapsed_time']
 
         # 返回结果
         if incomplete_runs:
@@ -170,9 +135,11 @@ def step5_1_fifth_job_submission(ssh: TopupSSH, date: str, submit_job: bool = Tr
                 'date': date,
                 'submit_job': submit_job,
                 'total_runs': len(run_numbers),
-                'complete_runs': run_numbers[:-len(incomplete_runs)],
+                'complete_runs': wait_result['complete_runs'],
                 'incomplete_runs': incomplete_runs,
-                'elapsed_time': elapsed_time
+                'missing_files': wait_result['missing'],
+                'elapsed_time': elapsed_time,
+                'eta_seconds': wait_result['eta_seconds']
             }
         else:
             return {
@@ -184,7 +151,8 @@ def step5_1_fifth_job_submission(ssh: TopupSSH, date: str, submit_job: bool = Tr
                 'total_runs': len(run_numbers),
                 'complete_runs': run_numbers,
                 'incomplete_runs': [],
-                'elapsed_time': elapsed_time
+                'elapsed_time': elapsed_time,
+                'eta_seconds': wait_result['eta_seconds']
             }
 
     except Exception as e:
@@ -200,7 +168,7 @@ def step5_1_fifth_job_submission(ssh: TopupSSH, date: str, submit_job: bool = Tr
 
 if __name__ == "__main__":
     # 测试步骤5.1
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             # 测试提交作业并检查
             result = step5_1_fifth_job_submission(ssh, "250519", submit_job=True)
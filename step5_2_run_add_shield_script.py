@@ -7,6 +7,7 @@
 
 from typing import Dict, Any
 from topup_ssh import TopupSSH
+from local_executor import create_executor
 import config
 
 
@@ -66,7 +67,7 @@ def step5_2_run_add_shield_script(ssh: TopupSSH, date: str = None) -> Dict[str,
 
 if __name__ == "__main__":
     # 测试步骤5.2
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             result = step5_2_run_add_shield_script(ssh)
             print("\n" + "="*60)
@@ -7,11 +7,24 @@
 3. 删除重复的行
 """
 
-from typing import Dict, Any
+import re
+from decimal import Decimal
+from typing import Dict, Any, Tuple
 from topup_ssh import TopupSSH
+from local_executor import create_executor
 import config
 
 
+def _numeric_sort_key(line: str) -> Tuple[Decimal, str]:
+    """
+    与 LC_ALL=C sort -n -k1,1 相同的排序键：按第一列开头的数值排序（跳过行首空格和制表符，
+    不是数字时视为0；用 Decimal 精确比较，位数很多的数值不会因浮点精度被视为相等），
+    数值相同时按整行逐字符比较（即 sort 的最后比较规则）
+    """
+    match = re.match(r'[ \t]*(-?(?:\d+\.?\d*|\.\d+))', line)
+    return (Decimal(match.group(1)) if match else Decimal(0), line)
+
+
 def step5_3_organize_ets_cut_file(ssh: TopupSSH, date: str = None) -> Dict[str, Any]:
     """
     整理ets_cut.txt文件
@@ -36,75 +49,54 @@ def step5_3_organize_ets_cut_file(ssh: TopupSSH, date: str = None) -> Dict[str,
         ets_cut_dir = config.ETS_CUT_DIR
         print(f"\n进入ETS_cut目录: {ets_cut_dir}")
 
-        # 步骤1：删除只有一个数字的行
-        print("\n步骤1：删除只有一个数字的行...")
-        result1 = ssh.execute_command(
-            f"cd {ets_cut_dir} && "
-            f"grep -vE '^[0-9]+$' ets_cut.txt > ets_cut_temp.txt && "
-            f"mv ets_cut_temp.txt ets_cut.txt"
-        )
-
-        if not result1['success']:
+        # 读取文件，在本地完成三次整理后原子写回（一次读取、一次上传）
+        ets_cut_file = f"{ets_cut_dir}/ets_cut.txt"
+        try:
+            content = ssh.read_text(ets_cut_file)
+        except Exception as e:
             return {
                 'success': False,
-                'message': '删除单数字行失败',
+                'message': '读取ets_cut.txt文件失败',
                 'step_name': '步骤5.3：整理ets_cut.txt文件',
-                'output': result1['output'],
-                'error': result1.get('error', '')
+                'error': str(e)
             }
 
+        print("\n步骤1：删除只有一个数字的行...")
+        # 与 grep/sort/uniq 一样只按换行符分行（splitlines 还会在 \r 等字符处分行）
+        lines = content.split('\n')
+        if lines[-1] == '':
+            lines.pop()
+        lines = [line for line in lines if not re.fullmatch(r'[0-9]+', line)]
         print("✓ 删除单数字行成功")
 
-        # 步骤2：根据每行的第一个数字排序
-        print("\n步骤2：根据每行的第一个数字排序...")
-        result2 = ssh.execute_command(
-            f"cd {ets_cut_dir} && "
-            f"sort -n -k1,1 ets_cut.txt > ets_cut_temp.txt && "
-            f"mv ets_cut_temp.txt ets_cut.txt"
-        )
-
-        if not result2['success']:
-            return {
-                'success': False,
-                'message': '排序失败',
-                'step_name': '步骤5.3：整理ets_cut.txt文件',
-                'output': result2['output'],
-                'error': result2.get('error', '')
-            }
-
+        print("步骤2：根据每行的第一个数字排序...")
+        # 数值相同再按整行比较，完全相同的行相邻，下一步只需比较相邻行（同 uniq）
+        lines.sort(key=_numeric_sort_key)
         print("✓ 排序成功")
 
-        # 步骤3：删除重复的行
-        print("\n步骤3：删除重复的行...")
-        result3 = ssh.execute_command(
-            f"cd {ets_cut_dir} && "
-            f"uniq ets_cut.txt > ets_cut_temp.txt && "
-            f"mv ets_cut_temp.txt ets_cut.txt"
-        )
+        print("步骤3：删除重复的行...")
+        lines = [line for index, line in enumerate(lines) if index == 0 or line != lines[index - 1]]
+        print("✓ 删除重复行成功")
 
-        if not result3['success']:
+        new_content = ''.join(f"{line}\n" for line in lines)
+        result_write = ssh.write_text_atomic(ets_cut_file, new_content)
+
+        if not result_write['success']:
             return {
                 'success': False,
-                'message': '删除重复行失败',
+                'message': '写回ets_cut.txt文件失败',
                 'step_name': '步骤5.3：整理ets_cut.txt文件',
-                'output': result3['output'],
-                'error': result3.get('error', '')
+                'error': result_write.get('error', '')
             }
 
-        print("✓ 删除重复行成功")
-
-        # 验证整理后的文件
-        print("\n验证整理后的文件...")
-        result_verify = ssh.execute_command(f"cd {ets_cut_dir} && cat ets_cut.txt")
-
         print(f"\n✓ ets_cut.txt文件整理完成")
-        print(f"文件内容:\n{result_verify['output']}")
+        print(f"文件内容:\n{new_content}")
 
         return {
             'success': True,
             'message': 'ets_cut.txt文件整理完成',
             'step_name': '步骤5.3：整理ets_cut.txt文件',
-            'file_content': result_verify['output']
+            'file_content': new_content
         }
 
     except Exception as e:
@@ -118,7 +110,7 @@ def step5_3_organize_ets_cut_file(ssh: TopupSSH, date: str = None) -> Dict[str,
 
 if __name__ == "__main__":
     # 测试步骤5.3
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             result = step5_3_organize_ets_cut_file(ssh)
             print("\n" + "="*60)
@@ -5,10 +5,11 @@
 进入check_ETScut_CalibConst目录，执行./genJob.sh脚本，然后检查png和root文件
 """
 
-import time
 import re
 from typing import Dict, Any, Optional
 from topup_ssh import TopupSSH
+from local_executor import create_executor
+from completion_watcher import CompletionWatcher
 import config
 
 
@@ -59,22 +60,29 @@ def step6_1_sixth_job_submission(ssh: TopupSSH, submit_job: bool = True, max_wai
             }
 
         # 检查生成的作业文件
-        result_check = ssh.execute_command(f"cd {check_dir} && ls ETScut_check_*.txt")
+        try:
+            job_entries = ssh.glob(f"{check_dir}/ETScut_check_*.txt")
+        except Exception as e:
+            print(f"⚠ 获取作业文件列表失败: {str(e)}")
+            job_entries = []
 
         print(f"\n✓ 作业提交成功")
-        print(f"生成的作业文件:\n{result_check['output']}")
+        print(f"生成的作业文件:\n{chr(10).join(entry.name for entry in job_entries)}")
     else:
         print(f"\n[子步骤1] 跳过作业提交（submit_job=False）")
         # 检查作业文件是否存在
-        result_check = ssh.execute_command(f"cd {check_dir} && ls ETScut_check_*.txt")
-        if not result_check['success'] or not result_check['output'].strip():
+        try:
+            job_entries = ssh.glob(f"{check_dir}/ETScut_check_*.txt")
+        except Exception:
+            job_entries = []
+        if not job_entries:
             return {
                 'success': False,
                 'message': '未找到作业文件，请先提交作业',
                 'step_name': '步骤6.1：第六次作业提交与文件检查',
                 'error': 'No job files found'
             }
-        print(f"✓ 找到已有作业文件:\n{result_check['output']}")
+        print(f"✓ 找到已有作业文件:\n{chr(10).join(entry.name for entry in job_entries)}")
     
     # 步骤2：检查png和root文件
     print(f"\n[子步骤2] 检查png和root文件")
@@ -90,14 +98,9 @@ def step6_1_sixth_job_submission(ssh: TopupSSH, submit_job: bool = True, max_wai
         print(f"\n进入check_ETScut_CalibConst目录: {check_dir}")
 
         # 解析作业文件列表，提取run号
-        job_files = []
-        for line in result_check['output'].split('\n'):
-            if line.strip():
-                # 分割每行中的多个文件名
-                job_files.extend(line.strip().split())
         run_numbers = []
-        for filename in job_files:
-            match = re.match(r'ETScut_check_(\d+)\.txt', filename)
+        for entry in job_entries:
+            match = re.match(r'ETScut_check_(\d+)\.txt$', entry.name)
             if match:
                 run_numbers.append(match.group(1))
 
@@ -111,47 +114,15 @@ def step6_1_sixth_job_submission(ssh: TopupSSH, submit_job: bool = True, max_wai
 
         print(f"找到 {len(run_numbers)} 个作业文件")
         
-        # 定期检查文件
-        max_wait_seconds = max_wait_minutes * 60
-        check_interval = config.CHECK_INTERVAL_SECONDS
-        elapsed_time = 0
-        
-        incomplete_runs = run_numbers.copy()
-        
-        while elapsed_time < max_wait_seconds and incomplete_runs:
-            print(f"\n检查进度: {elapsed_time}/{max_wait_seconds}秒")
-            print(f"未完成的run号: {incomplete_runs}")
-            
-            # 检查每个run号的png和root文件
-            complete_runs = []
-            still_incomplete = []
-
-            for run_num in incomplete_runs:
-                png_file = f"run{run_num}.png"
-                root_file = f"run{run_num}.root"
-
-                result_png = ssh.execute_command(f"cd {check_dir} && ls {png_file} 2>/dev/null")
-                result_root = ssh.execute_command(f"cd {check_dir} && ls {root_file} 2>/dev/null")
+        # 定期检查png和root文件（每次检查只遍历一次目录）
+        watcher = CompletionWatcher(
+            ssh, check_dir, run_numbers, config.REQUIRED_FILES_STEP6,
+            keys=("png_file", "root_file"), step='6.1'
+        )
+        wait_result = watcher.wait(max_wait_minutes)
+        incomplete_runs = wait_result['incomplete_runs']
+        elapsed_time = wait_result['elapsed_time']
 
-                png_exists = result_png['success'] and png_file in result_png['output']
-                root_exists = result_root['success'] and root_file in result_root['output']
-
-                if png_exists and root_exists:
-                    complete_runs.append(run_num)
-                else:
-                    still_incomplete.append(run_num)
-                    print(f"  Run {run_num}: png文件={'✓' if png_exists else '✗'}, root文件={'✓' if root_exists else '✗'}")
-            
-            incomplete_runs = still_incomplete
-            
-            if not incomplete_runs:
-                print(f"\n✓ 所有 {len(run_numbers)} 个png和root文件都已生成")
-                break
-            
-            # 等待
-            time.sleep(check_interval)
-            elapsed_time += check_interval
-        
         # 返回结果
         if incomplete_runs:
             return {
@@ -159,9 +130,11 @@ def step6_1_sixth_job_submission(ssh: TopupSSH, submit_job: bool = True, max_wai
                 'message': f'在 {max_wait_minutes} 分钟内未完成所有png和root文件的生成',
                 'step_name': '步骤6.1：第六次作业提交与文件检查',
                 'total_runs': len(run_numbers),
-                'complete_runs': run_numbers[:-len(incomplete_runs)],
+                'complete_runs': wait_result['complete_runs'],
                 'incomplete_runs': incomplete_runs,
+                'missing_files': wait_result['missing'],
                 'elapsed_time': elapsed_time,
+                'eta_seconds': wait_result['eta_seconds'],
                 'submit_job': submit_job
             }
         else:
@@ -173,6 +146,7 @@ def step6_1_sixth_job_submission(ssh: TopupSSH, submit_job: bool = True, max_wai
                 'complete_runs': run_numbers,
                 'incomplete_runs': [],
                 'elapsed_time': elapsed_time,
+                'eta_seconds': wait_result['eta_seconds'],
                 'submit_job': submit_job
             }
         
@@ -188,7 +162,7 @@ def step6_1_sixth_job_submission(ssh: TopupSSH, submit_job: bool = True, max_wai
 
 if __name__ == "__main__":
     # 测试步骤6.1
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             # 测试1：提交作业并检查
             result = step6_1_sixth_job_submission(ssh, submit_job=True)
@@ -66,21 +66,27 @@ echo "done"
 ---
 """
 
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional
 from topup_ssh import TopupSSH
+from local_executor import create_executor
 import config
 
 
-def step7_run_reset_script(ssh: TopupSSH) -> Dict[str, Any]:
+def step7_run_reset_script(ssh: TopupSSH, date: Optional[str] = None) -> Dict[str, Any]:
     """
     进入INJ_SIG_TIME_CAL_DIR目录并执行./reset.sh脚本
 
     Args:
         ssh: SSH连接实例
+        date: 日期参数（如250624），用于区分不同日期的后台作业，默认使用当天日期
 
     Returns:
         dict: 执行结果
     """
+    # 后台作业名带上日期，未指定日期时使用当天日期（返回结果中的date仍为传入值，不改写进度文件中的日期）
+    job_date = date or time.strftime('%y%m%d')
+
     print("\n" + "="*60)
     print("步骤7：运行reset.sh脚本")
     print("="*60)
@@ -88,24 +94,26 @@ def step7_run_reset_script(ssh: TopupSSH) -> Dict[str, Any]:
     try:
         # 进入INJ_SIG_TIME_CAL_DIR目录并执行reset.sh脚本
         print(f"\n进入目录 {config.INJ_SIG_TIME_CAL_DIR} 并执行reset.sh脚本...")
-        result = ssh.execute_command(f"cd {config.INJ_SIG_TIME_CAL_DIR} && ./reset.sh", use_pty=False)
+        # 以后台作业执行（连接中断或步骤重试时重新附着，不会重复执行reset.sh）
+        result = ssh.run_detached(f"cd {config.INJ_SIG_TIME_CAL_DIR} && ./reset.sh", name=f"7_{job_date}")
 
         if not result['success']:
             return {
                 'success': False,
                 'message': '执行reset.sh脚本失败',
                 'step_name': '步骤7：运行reset.sh脚本',
+                'date': date,
                 'output': result['output'],
                 'error': result.get('error', '')
             }
 
         print(f"\n✓ reset.sh脚本执行成功")
-        print(f"输出:\n{result['output']}")
 
         return {
             'success': True,
             'message': 'reset.sh脚本执行成功',
             'step_name': '步骤7：运行reset.sh脚本',
+            'date': date,
             'output': result['output']
         }
 
@@ -114,15 +122,17 @@ def step7_run_reset_script(ssh: TopupSSH) -> Dict[str, Any]:
             'success': False,
             'message': f'执行reset.sh脚本异常: {str(e)}',
             'step_name': '步骤7：运行reset.sh脚本',
+            'date': date,
             'error': str(e)
         }
 
 
 if __name__ == "__main__":
     # 测试步骤7
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
-            result = step7_run_reset_script(ssh)
+            # 使用测试日期
+            result = step7_run_reset_script(ssh, "250624")
             print("\n" + "="*60)
             print("步骤7执行结果:")
             print("="*60)
@@ -7,8 +7,9 @@
 
 import config
 import re
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from topup_ssh import TopupSSH
+from local_executor import create_executor
 
 
 def step8_submit_injsiginterval_db(ssh: TopupSSH) -> Dict[str, Any]:
@@ -121,6 +122,44 @@ def step8_submit_injsiginterval_db(ssh: TopupSSH) -> Dict[str, Any]:
         }
 
 
+def _run_command_chain(ssh: TopupSSH, part: str, index: int,
+                       chain: List[Tuple[Optional[str], str, str, str]]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    将一组顺序命令合并为一个后台作业顺序执行（遇错停止）
+
+    连接中断或步骤重试时重新附着到同一作业，已提交的数据库命令不会重复执行。
+    作业结束后才逐条打印子步骤标题和对应结果，失败时给出失败命令在本组中的序号。
+
+    Args:
+        ssh: SSH连接实例
+        part: 所属部分编号（如 '8.1'）
+        index: 该部分中的命令组序号（从1开始），每组使用独立的后台作业名
+        chain: (子步骤标题, 命令, 失败消息, 成功提示) 列表，标题为None时与上一条命令同属一个子步骤
+
+    Returns:
+        tuple: (各命令结果列表, 失败时的返回字典；全部成功时为None)
+    """
+    results = ssh.run_detached_batch([command for _, command, _, _ in chain], name=f"8_{part}_{index}")
+
+    for number, ((title, command, fail_message, success_message), result) in enumerate(zip(chain, results), 1):
+        if title:
+            print(f"\n{title}")
+        if not result['success']:
+            print(f"✗ {fail_message}（第 {number}/{len(chain)} 条命令）")
+            return results, {
+                'success': False,
+                'message': f"{fail_message}（第 {number}/{len(chain)} 条命令）",
+                'part': part,
+                'failed_command': command,
+                'failed_index': number,
+                'output': result['output'],
+                'error': result.get('error', '')
+            }
+        print(f"✓ {success_message}")
+
+    return results, None
+
+
 def _execute_injsiginterval_db(ssh: TopupSSH, run_from: str, run_to: str) -> Dict[str, Any]:
     """
     步骤8.1：InjSigInterval提交数据库
@@ -138,137 +177,46 @@ def _execute_injsiginterval_db(ssh: TopupSSH, run_from: str, run_to: str) -> Dic
     print("="*60)
 
     try:
-        # 1. 进入InjSigTimeCal目录，运行clean_interval.sh
-        print("\n[步骤8.1.1] 进入InjSigTimeCal目录，运行clean_interval.sh")
-        print(f"目录: {config.INJ_SIG_TIME_CAL_DIR}")
-
-        result_clean = ssh.execute_command(f"cd {config.INJ_SIG_TIME_CAL_DIR} && source {config.ENV_SCRIPT} && bash clean_interval.sh")
-
-        if not result_clean['success']:
-            return {
-                'success': False,
-                'message': 'clean_interval.sh执行失败',
-                'part': '8.1',
-                'output': result_clean['output'],
-                'error': result_clean.get('error', '')
-            }
-
-        print(f"✓ clean_interval.sh执行成功")
-
-        # 2. 进入genConst目录，激活环境，编译genConst.cpp并运行生成常数文件（合并原8.1.2和8.1.3）
-        print("\n[步骤8.1.2] 进入genConst目录，编译genConst.cpp并运行生成常数文件")
-        print(f"目录: {config.GEN_CONST_DIR}")
-
-        # 编译genConst.cpp
-        result_compile = ssh.execute_command(
-            f"cd {config.GEN_CONST_DIR} && source {config.ENV_SCRIPT} && g++ -Wall genConst.cpp"
-        )
-
-        if not result_compile['success']:
-            return {
-                'success': False,
-                'message': '编译genConst.cpp失败',
-                'part': '8.1',
-                'output': result_compile['output'],
-                'error': result_compile.get('error', '')
-            }
-
-        print(f"✓ genConst.cpp编译成功")
-
-        # 运行./a.out XXXXX（起始run号）
-        print(f"  运行./a.out {run_from}")
-        result_aout = ssh.execute_command(f"cd {config.GEN_CONST_DIR} && source {config.ENV_SCRIPT} && ./a.out {run_from}")
-
-        if not result_aout['success']:
-            return {
-                'success': False,
-                'message': f'./a.out {run_from}执行失败',
-                'part': '8.1',
-                'output': result_aout['output'],
-                'error': result_aout.get('error', '')
-            }
-
-        print(f"✓ ./a.out {run_from}执行成功")
-
-        # 3. 为copy.sh添加执行权限并执行（原8.1.4）
-        print("\n[步骤8.1.3] 为copy.sh添加执行权限并执行")
-
-        result_copy = ssh.execute_command(f"cd {config.GEN_CONST_DIR} && source {config.ENV_SCRIPT} && chmod +x copy.sh && ./copy.sh")
-
-        if not result_copy['success']:
-            return {
-                'success': False,
-                'message': 'copy.sh执行失败',
-                'part': '8.1',
-                'output': result_copy['output'],
-                'error': result_copy.get('error', '')
-            }
-
-        print(f"✓ copy.sh执行成功")
-
-        # 4. 进入const_runForm_runTo目录，运行rootmove.sh（原8.1.5）
-        print("\n[步骤8.1.4] 进入const_runForm_runTo目录，运行rootmove.sh")
-        print(f"目录: {config.CONST_RUN_FORM_RUN_TO_DIR}")
-
-        result_rootmove = ssh.execute_command(
-            f"cd {config.CONST_RUN_FORM_RUN_TO_DIR} && source {config.ENV_SCRIPT} && ./rootmove.sh"
-        )
-
-        if not result_rootmove['success']:
-            return {
-                'success': False,
-                'message': 'rootmove.sh执行失败',
-                'part': '8.1',
-                'output': result_rootmove['output'],
-                'error': result_rootmove.get('error', '')
-            }
-
-        print(f"✓ rootmove.sh执行成功")
-
-        # 5. 进入数据库目录，验证提交命令（原8.1.6）
-        print("\n[步骤8.1.5] 进入数据库目录，验证提交命令")
-        print(f"目录: {config.INJ_SIG_INTERVAL_DB_DIR}")
-        print(f"命令: genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 0")
-
-        result_verify = ssh.execute_command(
-            f"cd {config.INJ_SIG_INTERVAL_DB_DIR} && source {config.ENV_SCRIPT} && bash genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 0"
-        )
-
-        if not result_verify['success']:
-            return {
-                'success': False,
-                'message': '验证提交命令失败',
-                'part': '8.1',
-                'output': result_verify['output'],
-                'error': result_verify.get('error', '')
-            }
-
-        print(f"✓ 验证提交命令成功")
-
-        # 6. 提交到数据库（原8.1.7）
-        print("\n[步骤8.1.6] 提交到数据库")
-        print(f"命令: genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 1")
-
-        result_db = ssh.execute_command(
-            f"cd {config.INJ_SIG_INTERVAL_DB_DIR} && source {config.ENV_SCRIPT} && bash genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 1"
-        )
-
-        if not result_db['success']:
-            return {
-                'success': False,
-                'message': '提交数据库失败',
-                'part': '8.1',
-                'output': result_db['output'],
-                'error': result_db.get('error', '')
-            }
-
-        print(f"✓ InjSigInterval提交数据库成功")
+        # 各子步骤合并为一个后台作业顺序执行，提交数据库仅在前面所有命令成功后才会执行；
+        # 标题在作业结束后与结果一起打印
+        results, failure = _run_command_chain(ssh, '8.1', 1, [
+            # 1. 进入InjSigTimeCal目录，运行clean_interval.sh
+            (f"[步骤8.1.1] 进入InjSigTimeCal目录，运行clean_interval.sh\n目录: {config.INJ_SIG_TIME_CAL_DIR}",
+             f"cd {config.INJ_SIG_TIME_CAL_DIR} && source {config.ENV_SCRIPT} && bash clean_interval.sh",
+             'clean_interval.sh执行失败', 'clean_interval.sh执行成功'),
+            # 2. 进入genConst目录，激活环境，编译genConst.cpp并运行生成常数文件（合并原8.1.2和8.1.3）
+            (f"[步骤8.1.2] 进入genConst目录，编译genConst.cpp并运行生成常数文件\n目录: {config.GEN_CONST_DIR}",
+             f"cd {config.GEN_CONST_DIR} && source {config.ENV_SCRIPT} && g++ -Wall genConst.cpp",
+             '编译genConst.cpp失败', 'genConst.cpp编译成功'),
+            (None,
+             f"cd {config.GEN_CONST_DIR} && source {config.ENV_SCRIPT} && ./a.out {run_from}",
+             f'./a.out {run_from}执行失败', f'./a.out {run_from}执行成功'),
+            # 3. 为copy.sh添加执行权限并执行（原8.1.4）
+            ("[步骤8.1.3] 为copy.sh添加执行权限并执行",
+             f"cd {config.GEN_CONST_DIR} && source {config.ENV_SCRIPT} && chmod +x copy.sh && ./copy.sh",
+             'copy.sh执行失败', 'copy.sh执行成功'),
+            # 4. 进入const_runForm_runTo目录，运行rootmove.sh（原8.1.5）
+            (f"[步骤8.1.4] 进入const_runForm_runTo目录，运行rootmove.sh\n目录: {config.CONST_RUN_FORM_RUN_TO_DIR}",
+             f"cd {config.CONST_RUN_FORM_RUN_TO_DIR} && source {config.ENV_SCRIPT} && ./rootmove.sh",
+             'rootmove.sh执行失败', 'rootmove.sh执行成功'),
+            # 5. 进入数据库目录，验证提交命令（原8.1.6）
+            (f"[步骤8.1.5] 进入数据库目录，验证提交命令\n目录: {config.INJ_SIG_INTERVAL_DB_DIR}\n"
+             f"命令: genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 0",
+             f"cd {config.INJ_SIG_INTERVAL_DB_DIR} && source {config.ENV_SCRIPT} && bash genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 0",
+             '验证提交命令失败', '验证提交命令成功'),
+            # 6. 提交到数据库（原8.1.7）
+            (f"[步骤8.1.6] 提交到数据库\n命令: genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 1",
+             f"cd {config.INJ_SIG_INTERVAL_DB_DIR} && source {config.ENV_SCRIPT} && bash genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 1",
+             '提交数据库失败', 'InjSigInterval提交数据库成功'),
+        ])
+        if failure:
+            return failure
 
         return {
             'success': True,
             'message': 'InjSigInterval提交数据库完成',
             'part': '8.1',
-            'output': result_db.get('output', '')
+            'output': results[-1].get('output', '')
         }
 
     except Exception as e:
@@ -297,69 +245,29 @@ def _execute_injsigtime_db(ssh: TopupSSH, run_from: str, run_to: str) -> Dict[st
     print("="*60)
 
     try:
-        # 1. 进入calibConst目录，执行rootmove.sh
-        print("\n[步骤8.2.1] 进入calibConst目录，执行rootmove.sh")
-        print(f"目录: {config.CALIB_CONST_DIR}")
-
-        result_rootmove = ssh.execute_command(
-            f"cd {config.CALIB_CONST_DIR} && source {config.ENV_SCRIPT} && ./rootmove.sh"
-        )
-
-        if not result_rootmove['success']:
-            return {
-                'success': False,
-                'message': 'rootmove.sh执行失败',
-                'part': '8.2',
-                'output': result_rootmove['output'],
-                'error': result_rootmove.get('error', '')
-            }
-
-        print(f"✓ rootmove.sh执行成功")
-
-        # 2. 进入InjSigTime数据库目录，验证提交命令（sub_switch=0）
-        print("\n[步骤8.2.2] 进入InjSigTime数据库目录，验证提交命令")
-        print(f"目录: {config.INJ_SIG_TIME_DB_DIR}")
-        print(f"命令: genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 0")
-
-        result_generate = ssh.execute_command(
-            f"cd {config.INJ_SIG_TIME_DB_DIR} && source {config.ENV_SCRIPT} && bash genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 0"
-        )
-
-        if not result_generate['success']:
-            return {
-                'success': False,
-                'message': '验证提交命令失败',
-                'part': '8.2',
-                'output': result_generate['output'],
-                'error': result_generate.get('error', '')
-            }
-
-        print(f"✓ 验证提交命令成功")
-
-        # 3. 提交到数据库（sub_switch=1）
-        print("\n[步骤8.2.3] 提交到数据库")
-        print(f"命令: genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 1")
-
-        result_submit = ssh.execute_command(
-            f"cd {config.INJ_SIG_TIME_DB_DIR} && source {config.ENV_SCRIPT} && bash genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 1"
-        )
-
-        if not result_submit['success']:
-            return {
-                'success': False,
-                'message': '提交数据库失败',
-                'part': '8.2',
-                'output': result_submit['output'],
-                'error': result_submit.get('error', '')
-            }
-
-        print(f"✓ InjSigTime提交数据库成功")
+        results, failure = _run_command_chain(ssh, '8.2', 1, [
+            # 1. 进入calibConst目录，执行rootmove.sh
+            (f"[步骤8.2.1] 进入calibConst目录，执行rootmove.sh\n目录: {config.CALIB_CONST_DIR}",
+             f"cd {config.CALIB_CONST_DIR} && source {config.ENV_SCRIPT} && ./rootmove.sh",
+             'rootmove.sh执行失败', 'rootmove.sh执行成功'),
+            # 2. 进入InjSigTime数据库目录，验证提交命令（sub_switch=0）
+            (f"[步骤8.2.2] 进入InjSigTime数据库目录，验证提交命令\n目录: {config.INJ_SIG_TIME_DB_DIR}\n"
+             f"命令: genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 0",
+             f"cd {config.INJ_SIG_TIME_DB_DIR} && source {config.ENV_SCRIPT} && bash genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 0",
+             '验证提交命令失败', '验证提交命令成功'),
+            # 3. 提交到数据库（sub_switch=1），仅在验证成功后才会执行
+            (f"[步骤8.2.3] 提交到数据库\n命令: genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 1",
+             f"cd {config.INJ_SIG_TIME_DB_DIR} && source {config.ENV_SCRIPT} && bash genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 1",
+             '提交数据库失败', 'InjSigTime提交数据库成功'),
+        ])
+        if failure:
+            return failure
 
         return {
             'success': True,
             'message': 'InjSigTime提交数据库完成',
             'part': '8.2',
-            'output': result_submit.get('output', '')
+            'output': results[-1].get('output', '')
         }
 
     except Exception as e:
@@ -375,6 +283,9 @@ def _execute_offlineevtfilter_db(ssh: TopupSSH, run_from: str, run_to: str) -> D
     """
     步骤8.3：OfflineEvtFilter提交数据库
 
+    命令按输出检查点分为三批执行：ccompare/a.out 和 check/a.out 的输出
+    需要在本地检查通过后才能继续执行后续命令。
+
     Args:
         ssh: SSH连接实例
         run_from: 起始run号
@@ -388,65 +299,29 @@ def _execute_offlineevtfilter_db(ssh: TopupSSH, run_from: str, run_to: str) -> D
     print("="*60)
 
     try:
-        # 1. 进入OfflineEvtFilter目录，运行cp_3files.sh
-        print("\n[步骤8.3.1] 进入OfflineEvtFilter目录，运行cp_3files.sh")
-        print(f"目录: {config.OFFLINE_EVT_DIR}")
-
-        result_cp3files = ssh.execute_command(
-            f"cd {config.OFFLINE_EVT_DIR} && source {config.ENV_SCRIPT} && ./cp_3files.sh"
-        )
-
-        if not result_cp3files['success']:
-            return {
-                'success': False,
-                'message': 'cp_3files.sh执行失败',
-                'part': '8.3',
-                'output': result_cp3files['output'],
-                'error': result_cp3files.get('error', '')
-            }
-
-        print(f"✓ cp_3files.sh执行成功")
-
-        # 2. 进入duration_caculate目录，执行a.out
-        print("\n[步骤8.3.2] 进入duration_caculate目录，执行a.out")
         duration_dir = f"{config.OFFLINE_EVT_DIR}/duration_caculate"
-        print(f"目录: {duration_dir}")
-
-        result_duration = ssh.execute_command(
-            f"cd {duration_dir} && source {config.ENV_SCRIPT} && ./a.out"
-        )
-
-        if not result_duration['success']:
-            return {
-                'success': False,
-                'message': 'duration_caculate/a.out执行失败',
-                'part': '8.3',
-                'output': result_duration['output'],
-                'error': result_duration.get('error', '')
-            }
-
-        print(f"✓ duration_caculate/a.out执行成功")
-
-        # 3. 进入ccompare目录，执行a.out并检查错误
-        print("\n[步骤8.3.3] 进入ccompare目录，执行a.out并检查错误")
         ccompare_dir = f"{config.OFFLINE_EVT_DIR}/ccompare"
-        print(f"目录: {ccompare_dir}")
+        check_dir = f"{config.OFFLINE_EVT_DIR}/check"
 
-        result_ccompare = ssh.execute_command(
-            f"cd {ccompare_dir} && source {config.ENV_SCRIPT} && ./a.out 2>&1"
-        )
-
-        if not result_ccompare['success']:
-            return {
-                'success': False,
-                'message': 'ccompare/a.out执行失败',
-                'part': '8.3',
-                'output': result_ccompare['output'],
-                'error': result_ccompare.get('error', '')
-            }
+        results, failure = _run_command_chain(ssh, '8.3', 1, [
+            # 1. 进入OfflineEvtFilter目录，运行cp_3files.sh
+            (f"[步骤8.3.1] 进入OfflineEvtFilter目录，运行cp_3files.sh\n目录: {config.OFFLINE_EVT_DIR}",
+             f"cd {config.OFFLINE_EVT_DIR} && source {config.ENV_SCRIPT} && ./cp_3files.sh",
+             'cp_3files.sh执行失败', 'cp_3files.sh执行成功'),
+            # 2. 进入duration_caculate目录，执行a.out
+            (f"[步骤8.3.2] 进入duration_caculate目录，执行a.out\n目录: {duration_dir}",
+             f"cd {duration_dir} && source {config.ENV_SCRIPT} && ./a.out",
+             'duration_caculate/a.out执行失败', 'duration_caculate/a.out执行成功'),
+            # 3. 进入ccompare目录，执行a.out并检查错误
+            (f"[步骤8.3.3] 进入ccompare目录，执行a.out并检查错误\n目录: {ccompare_dir}",
+             f"cd {ccompare_dir} && source {config.ENV_SCRIPT} && ./a.out 2>&1",
+             'ccompare/a.out执行失败', 'ccompare/a.out执行完成'),
+        ])
+        if failure:
+            return failure
 
         # 检查是否包含特定错误关键词
-        output = result_ccompare.get('output', '')
+        output = results[-1].get('output', '')
         if re.search(r'error:\s+(repeat|order|miss)', output, re.IGNORECASE):
             error_match = re.search(r'error:\s+(repeat|order|miss)', output, re.IGNORECASE)
             return {
@@ -458,63 +333,25 @@ def _execute_offlineevtfilter_db(ssh: TopupSSH, run_from: str, run_to: str) -> D
 
         print(f"✓ ccompare/a.out执行成功")
 
-        # 4. 返回OfflineEvtFilter目录，执行a.out BOSSE run_from run_to
-        print(f"\n[步骤8.3.4] 执行a.out {config.BOSSE} {run_from} {run_to}")
-        print(f"目录: {config.OFFLINE_EVT_DIR}")
-
-        result_aout_params = ssh.execute_command(
-            f"cd {config.OFFLINE_EVT_DIR} && source {config.ENV_SCRIPT} && ./a.out {config.BOSSE} {run_from} {run_to}"
-        )
-
-        if not result_aout_params['success']:
-            return {
-                'success': False,
-                'message': f'a.out 720 {run_from} {run_to}执行失败',
-                'part': '8.3',
-                'output': result_aout_params['output'],
-                'error': result_aout_params.get('error', '')
-            }
-
-        print(f"✓ a.out 720 {run_from} {run_to}执行成功")
-
-        # 5. 进入check目录，生成file.txt
-        print("\n[步骤8.3.5] 进入check目录，生成file.txt")
-        check_dir = f"{config.OFFLINE_EVT_DIR}/check"
-        print(f"目录: {check_dir}")
-
-        result_file_txt = ssh.execute_command(
-            f"cd {check_dir} && source {config.ENV_SCRIPT} && ls ../OfflineEvtFilter_00*.root > file.txt 2>/dev/null"
-        )
-
-        if not result_file_txt['success']:
-            return {
-                'success': False,
-                'message': '生成file.txt失败',
-                'part': '8.3',
-                'output': result_file_txt['output'],
-                'error': result_file_txt.get('error', '')
-            }
-
-        print(f"✓ file.txt生成成功")
-
-        # 6. 执行check目录下的a.out BOSSE run_from run_to
-        print(f"\n[步骤8.3.6] 执行check/a.out {config.BOSSE} {run_from} {run_to}")
-
-        result_check_aout = ssh.execute_command(
-            f"cd {check_dir} && source {config.ENV_SCRIPT} && ./a.out {config.BOSSE} {run_from} {run_to} 2>&1"
-        )
-
-        if not result_check_aout['success']:
-            return {
-                'success': False,
-                'message': f'check/a.out 720 {run_from} {run_to}执行失败',
-                'part': '8.3',
-                'output': result_check_aout['output'],
-                'error': result_check_aout.get('error', '')
-            }
+        results, failure = _run_command_chain(ssh, '8.3', 2, [
+            # 4. 返回OfflineEvtFilter目录，执行a.out BOSSE run_from run_to
+            (f"[步骤8.3.4] 执行a.out {config.BOSSE} {run_from} {run_to}\n目录: {config.OFFLINE_EVT_DIR}",
+             f"cd {config.OFFLINE_EVT_DIR} && source {config.ENV_SCRIPT} && ./a.out {config.BOSSE} {run_from} {run_to}",
+             f'a.out 720 {run_from} {run_to}执行失败', f'a.out 720 {run_from} {run_to}执行成功'),
+            # 5. 进入check目录，生成file.txt
+            (f"[步骤8.3.5] 进入check目录，生成file.txt\n目录: {check_dir}",
+             f"cd {check_dir} && source {config.ENV_SCRIPT} && ls ../OfflineEvtFilter_00*.root > file.txt 2>/dev/null",
+             '生成file.txt失败', 'file.txt生成成功'),
+            # 6. 执行check目录下的a.out BOSSE run_from run_to
+            (f"[步骤8.3.6] 执行check/a.out {config.BOSSE} {run_from} {run_to}",
+             f"cd {check_dir} && source {config.ENV_SCRIPT} && ./a.out {config.BOSSE} {run_from} {run_to} 2>&1",
+             f'check/a.out 720 {run_from} {run_to}执行失败', f'check/a.out 720 {run_from} {run_to}执行完成'),
+        ])
+        if failure:
+            return failure
 
         # 检查是否有错误输出
-        check_output = result_check_aout.get('output', '')
+        check_output = results[-1].get('output', '')
         if check_output.strip():
             return {
                 'success': False,
@@ -525,87 +362,33 @@ def _execute_offlineevtfilter_db(ssh: TopupSSH, run_from: str, run_to: str) -> D
 
         print(f"✓ check/a.out 720 {run_from} {run_to}执行成功")
 
-        # 7. 返回OfflineEvtFilter目录，运行rootmove.sh
-        print("\n[步骤8.3.7] 返回OfflineEvtFilter目录，运行rootmove.sh")
-
-        result_rootmove2 = ssh.execute_command(
-            f"cd {config.OFFLINE_EVT_DIR} && source {config.ENV_SCRIPT} && ./rootmove.sh"
-        )
-
-        if not result_rootmove2['success']:
-            return {
-                'success': False,
-                'message': 'rootmove.sh执行失败',
-                'part': '8.3',
-                'output': result_rootmove2['output'],
-                'error': result_rootmove2.get('error', '')
-            }
-
-        print(f"✓ rootmove.sh执行成功")
-
-        # 8. 进入OfflineEvtFilter数据库目录，验证提交命令
-        print("\n[步骤8.3.8] 进入OfflineEvtFilter数据库目录，验证提交命令")
-        print(f"目录: {config.OFFLINE_EVT_DB_DIR}")
-        print(f"命令: genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 0")
-
-        result_verify = ssh.execute_command(
-            f"cd {config.OFFLINE_EVT_DB_DIR} && source {config.ENV_SCRIPT} && bash genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 0"
-        )
-
-        if not result_verify['success']:
-            return {
-                'success': False,
-                'message': '验证提交命令失败',
-                'part': '8.3',
-                'output': result_verify['output'],
-                'error': result_verify.get('error', '')
-            }
-
-        print(f"✓ 验证提交命令成功")
-
-        # 9. 提交到数据库
-        print("\n[步骤8.3.9] 提交到数据库")
-        print(f"命令: genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 1")
-
-        result_db_submit = ssh.execute_command(
-            f"cd {config.OFFLINE_EVT_DB_DIR} && source {config.ENV_SCRIPT} && bash genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 1"
-        )
-
-        if not result_db_submit['success']:
-            return {
-                'success': False,
-                'message': '提交数据库失败',
-                'part': '8.3',
-                'output': result_db_submit['output'],
-                'error': result_db_submit.get('error', '')
-            }
-
-        print(f"✓ OfflineEvtFilter提交数据库成功")
-
-        # 10. 进入checkDBAlg的share目录，运行reset_root.sh
-        print("\n[步骤8.3.10] 进入checkDBAlg的share目录，运行reset_root.sh")
-        print(f"目录: {config.CHECK_DB_ALG_DIR}")
-
-        result_reset_root = ssh.execute_command(
-            f"cd {config.CHECK_DB_ALG_DIR} && source {config.ENV_SCRIPT} && bash reset_root.sh"
-        )
-
-        if not result_reset_root['success']:
-            return {
-                'success': False,
-                'message': 'reset_root.sh执行失败',
-                'part': '8.3',
-                'output': result_reset_root['output'],
-                'error': result_reset_root.get('error', '')
-            }
-
-        print(f"✓ reset_root.sh执行成功")
+        results, failure = _run_command_chain(ssh, '8.3', 3, [
+            # 7. 返回OfflineEvtFilter目录，运行rootmove.sh
+            ("[步骤8.3.7] 返回OfflineEvtFilter目录，运行rootmove.sh",
+             f"cd {config.OFFLINE_EVT_DIR} && source {config.ENV_SCRIPT} && ./rootmove.sh",
+             'rootmove.sh执行失败', 'rootmove.sh执行成功'),
+            # 8. 进入OfflineEvtFilter数据库目录，验证提交命令
+            (f"[步骤8.3.8] 进入OfflineEvtFilter数据库目录，验证提交命令\n目录: {config.OFFLINE_EVT_DB_DIR}\n"
+             f"命令: genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 0",
+             f"cd {config.OFFLINE_EVT_DB_DIR} && source {config.ENV_SCRIPT} && bash genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 0",
+             '验证提交命令失败', '验证提交命令成功'),
+            # 9. 提交到数据库
+            (f"[步骤8.3.9] 提交到数据库\n命令: genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 1",
+             f"cd {config.OFFLINE_EVT_DB_DIR} && source {config.ENV_SCRIPT} && bash genInsertCmd.sh -runfrom {run_from} -runto {run_to} -sub_switch 1",
+             '提交数据库失败', 'OfflineEvtFilter提交数据库成功'),
+            # 10. 进入checkDBAlg的share目录，运行reset_root.sh
+            (f"[步骤8.3.10] 进入checkDBAlg的share目录，运行reset_root.sh\n目录: {config.CHECK_DB_ALG_DIR}",
+             f"cd {config.CHECK_DB_ALG_DIR} && source {config.ENV_SCRIPT} && bash reset_root.sh",
+             'reset_root.sh执行失败', 'reset_root.sh执行成功'),
+        ])
+        if failure:
+            return failure
 
         return {
             'success': True,
             'message': 'OfflineEvtFilter提交数据库完成',
             'part': '8.3',
-            'output': result_db_submit.get('output', '')
+            'output': results[2].get('output', '')
         }
 
     except Exception as e:
@@ -619,7 +402,7 @@ def _execute_offlineevtfilter_db(ssh: TopupSSH, run_from: str, run_to: str) -> D
 
 if __name__ == "__main__":
     # 测试步骤8
-    with TopupSSH() as ssh:
+    with create_executor() as ssh:
         if ssh.connected:
             result = step8_submit_injsiginterval_db(ssh)
             print("\n" + "="*60)
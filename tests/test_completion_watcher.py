@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""CompletionWatcher 测试：用内存中的假文件系统代替远程服务器"""
+
+import posixpath
+import types
+
+import pytest
+
+import config
+import completion_watcher
+import poll_schedule
+from completion_watcher import CompletionWatcher
+from poll_schedule import StepDurationHistory
+from remote_fs import RemoteFileEntry
+
+JOB_DIR = '/jobs/round18'
+TEMPLATES = {
+    'job_file': 'job_{run}_*.txt',
+    'hist_file': 'hist_{run}_*.root',
+    'sub_hist': '{run}/hist_{node}.root'
+}
+
+
+class FakeFileSystem:
+    """目录 -> {名称: 是否为目录}，每次修改目录时递增其版本号（相当于修改时间）"""
+
+    def __init__(self):
+        self.dirs = {}
+        self.versions = {}
+
+    def add(self, path):
+        parent, name = posixpath.split(path)
+        self._ensure_dir(parent)
+        self.dirs[parent][name] = False
+        self.versions[parent] += 1
+
+    def _ensure_dir(self, path):
+        if path in self.dirs:
+            return
+        self.dirs[path] = {}
+        self.versions[path] = 0
+        parent, name = posixpath.split(path)
+        if parent != path:
+            self._ensure_dir(parent)
+            self.dirs[parent][name] = True
+            self.versions[parent] += 1
+
+    def entries(self, path):
+        return [RemoteFileEntry(name, posixpath.join(path, name), 0, 0.0, is_dir)
+                for name, is_dir in sorted(self.dirs.get(path, {}).items())]
+
+
+class FakeSSH:
+    """实现 CompletionWatcher 用到的 query_many / scan_tree / file_events，记录调用"""
+
+    def __init__(self, fs, stream=None):
+        self.fs = fs
+        self.stream = stream
+        self.calls = []
+
+    def query_many(self, queries):
+        answers = []
+        for query in queries:
+            self.calls.append((query['op'], query.get('path') or tuple(query.get('paths', []))))
+            if query['op'] == 'dirstat':
+                value = {path: [self.fs.versions[path], len(self.fs.dirs[path])] if path in self.fs.dirs else None
+                         for path in query['paths']}
+            else:
+                value = self.fs.entries(query['path'])
+            answers.append({'success': True, 'value': value, 'error': None})
+        return answers
+
+    def scan_tree(self, directory, depth):
+        self.calls.append(('tree', directory))
+        entries, level = [], [directory]
+        for _ in range(depth):
+            found = [entry for path in level for entry in self.fs.entries(path)]
+            entries.extend(found)
+            level = [entry.path for entry in found if entry.is_dir]
+        return entries
+
+    def file_events(self, directories):
+        if self.stream is None:
+            raise ConnectionError('未启用')
+        self.stream.directories = directories
+        return self.stream
+
+    def ops(self, op):
+        return [target for name, target in self.calls if name == op]
+
+
+class FakeEventStream:
+    """按顺序返回预先准备的事件批次，同时把文件加入假文件系统"""
+
+    def __init__(self, fs, batches):
+        self.fs = fs
+        self.batches = list(batches)
+        self.closed = False
+
+    def wait(self, timeout):
+        if not self.batches:
+            raise ConnectionError('事件已用完')
+        batch = self.batches.pop(0)
+        for event in batch:
+            for name in event.get('created', []):
+                self.fs.add(posixpath.join(event['dir'], name))
+        return batch
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fs(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'POLL_SCHEDULE_CONFIG', {
+        'history_file': str(tmp_path / 'durations.json')
+    }, raising=False)
+    monkeypatch.setattr(poll_schedule, 'duration_history', StepDurationHistory())
+    filesystem = FakeFileSystem()
+    filesystem._ensure_dir(JOB_DIR)
+    return filesystem
+
+
+def test_scan_reports_missing_files_and_count_match(fs):
+    fs.add(f'{JOB_DIR}/job_1001_0.txt')
+    fs.add(f'{JOB_DIR}/job_1001_1.txt')
+    fs.add(f'{JOB_DIR}/hist_1001_0.root')
+    fs.add(f'{JOB_DIR}/job_1002_0.txt')
+    fs.add(f'{JOB_DIR}/hist_1002_0.root')
+    watcher = CompletionWatcher(FakeSSH(fs), JOB_DIR, ['1001', '1002', '1003'], TEMPLATES,
+                                keys=['job_file', 'hist_file'], count_match={'hist_file': 'job_file'})
+
+    result = watcher.scan()
+
+    assert result['complete_runs'] == ['1002']
+    assert result['incomplete_runs'] == ['1001', '1003']
+    assert result['missing']['1001'] == ['hist_1001_*.root (1/2)']
+    assert result['missing']['1003'] == ['job_1003_*.txt', 'hist_1003_*.root (0/0)']
+    assert watcher.exists('job_1001_1.txt') and watcher.count('job_1001_*.txt') == 2
+
+
+def test_unchanged_directories_are_not_listed_again(fs):
+    ssh = FakeSSH(fs)
+    fs.add(f'{JOB_DIR}/1001/hist_a.root')
+    watcher = CompletionWatcher(ssh, JOB_DIR, ['1001', '1002'], TEMPLATES, keys=['sub_hist'])
+
+    first = watcher.scan()
+    assert first['changed'] and first['complete_runs'] == ['1001']
+    assert ssh.ops('tree') == [JOB_DIR]
+
+    ssh.calls.clear()
+    second = watcher.scan()
+    assert not second['changed'] and second['incomplete_runs'] == ['1002']
+    assert ssh.ops('dirstat') and not ssh.ops('scan') and not ssh.ops('tree')
+
+    fs.add(f'{JOB_DIR}/1002/hist_b.root')
+    ssh.calls.clear()
+    third = watcher.scan()
+    assert third['changed'] and third['complete_runs'] == ['1001', '1002']
+    assert ssh.ops('scan') == [f'{JOB_DIR}/1002'] and not ssh.ops('tree')
+
+
+def test_wait_polls_until_all_runs_complete(fs, monkeypatch):
+    pending = [f'{JOB_DIR}/job_1001_0.txt', f'{JOB_DIR}/job_1002_0.txt']
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        fs.add(pending.pop(0))
+
+    monkeypatch.setattr(completion_watcher, 'time', types.SimpleNamespace(
+        monotonic=completion_watcher.time.monotonic, sleep=fake_sleep))
+    watcher = CompletionWatcher(FakeSSH(fs), JOB_DIR, ['1001', '1002'], TEMPLATES, keys=['job_file'])
+
+    result = watcher.wait(max_wait_minutes=10, check_interval=30, events=False)
+
+    assert result['complete_runs'] == ['1001', '1002'] and result['incomplete_runs'] == []
+    assert len(sleeps) == 2 and result['aborted'] is None
+
+
+def test_wait_stops_when_abort_returns_reason(fs, monkeypatch):
+    monkeypatch.setattr(completion_watcher, 'time', types.SimpleNamespace(
+        monotonic=completion_watcher.time.monotonic, sleep=lambda seconds: pytest.fail('不应等待')))
+    fs.add(f'{JOB_DIR}/job_1001_0.txt')
+    watcher = CompletionWatcher(FakeSSH(fs), JOB_DIR, ['1001', '1002'], TEMPLATES, keys=['job_file'])
+
+    result = watcher.wait(max_wait_minutes=10, events=False,
+                          abort=lambda w: '发现异常文件' if w.exists('job_1001_0.txt') else None)
+
+    assert result['aborted'] == '发现异常文件'
+    assert result['incomplete_runs'] == ['1002']
+
+
+def test_wait_completes_from_file_events_without_listing_again(fs, monkeypatch):
+    monkeypatch.setattr(completion_watcher, 'time', types.SimpleNamespace(
+        monotonic=completion_watcher.time.monotonic, sleep=lambda seconds: pytest.fail('不应等待')))
+    stream = FakeEventStream(fs, [
+        [],
+        [{'dir': JOB_DIR, 'created': ['job_1001_0.txt']}],
+        [{'dir': JOB_DIR, 'created': ['job_1002_0.txt']}],
+    ])
+    ssh = FakeSSH(fs, stream)
+    watcher = CompletionWatcher(ssh, JOB_DIR, ['1001', '1002'], TEMPLATES, keys=['job_file'])
+
+    result = watcher.wait(max_wait_minutes=10, events=True)
+
+    assert result['complete_runs'] == ['1001', '1002']
+    assert stream.directories == [JOB_DIR] and stream.closed
+    # 只有第一次检查列出目录；空的事件批次（等待超时）触发的完整检查目录未变化，之后全部来自事件
+    assert ssh.ops('scan') == [JOB_DIR] and len(ssh.ops('dirstat')) == 2
+
+
+def test_wait_falls_back_to_polling_when_events_unavailable(fs, monkeypatch):
+    def fake_sleep(seconds):
+        fs.add(f'{JOB_DIR}/job_1001_0.txt')
+
+    monkeypatch.setattr(completion_watcher, 'time', types.SimpleNamespace(
+        monotonic=completion_watcher.time.monotonic, sleep=fake_sleep))
+    watcher = CompletionWatcher(FakeSSH(fs), JOB_DIR, ['1001'], TEMPLATES, keys=['job_file'])
+
+    result = watcher.wait(max_wait_minutes=10, check_interval=5, events=True)
+
+    assert result['complete_runs'] == ['1001']
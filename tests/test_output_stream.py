@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""StreamMatcher 的流式多模式匹配测试"""
+
+import re
+
+from output_stream import StreamMatcher
+
+
+def test_marker_split_across_chunks_is_found_once():
+    matcher = StreamMatcher({'success': 'Job submitted'})
+    assert matcher.feed('...Job sub') == []
+    assert matcher.feed('mitted to queue') == [('success', 'Job submitted')]
+    assert matcher.feed(' more output') == []
+
+
+def test_hits_are_ordered_by_position_across_patterns():
+    matcher = StreamMatcher({'success': r'DONE', 'error': re.compile(r'Error: \w+')})
+    hits = matcher.feed('Error: disk DONE Error: quota')
+    assert hits == [('error', 'Error: disk'), ('success', 'DONE'), ('error', 'Error: quota')]
+
+
+def test_each_occurrence_is_reported_when_it_arrives():
+    matcher = StreamMatcher({'success': 'DONE'})
+    assert matcher.feed('DONE ') == [('success', 'DONE')]
+    assert matcher.feed('DONE') == [('success', 'DONE')]
+    assert matcher.feed('') == []
+
+
+def test_window_stays_bounded():
+    matcher = StreamMatcher({'success': 'DONE'}, window_chars=16)
+    for _ in range(100):
+        matcher.feed('x' * 1000)
+    assert len(matcher._window) == 16
+    assert matcher.feed('DO') == []
+    assert matcher.feed('NE') == [('success', 'DONE')]
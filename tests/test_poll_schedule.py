@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""PollSchedule 的退避、预测和历史时长测试（使用可控的单调时钟）"""
+
+import types
+
+import pytest
+
+import config
+import poll_schedule
+from poll_schedule import PollSchedule, StepDurationHistory
+
+
+class FakeClock:
+    """替代 time.monotonic 的可控时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'POLL_SCHEDULE_CONFIG', {
+        'min_interval': 5, 'max_interval': 120, 'backoff_factor': 2,
+        'history_file': str(tmp_path / 'durations.json'), 'history_size': 3
+    }, raising=False)
+    monkeypatch.setattr(poll_schedule, 'duration_history', StepDurationHistory())
+    fake = FakeClock()
+    monkeypatch.setattr(poll_schedule, 'time', types.SimpleNamespace(monotonic=fake))
+    return fake
+
+
+def test_backs_off_without_progress_and_resets_on_change(clock):
+    schedule = PollSchedule(3600, total=10, base_interval=30)
+    schedule.observe(0)
+    assert schedule.interval == 30
+    schedule.observe(0, changed=False)
+    schedule.observe(0, changed=False)
+    assert schedule.interval == 120
+    schedule.observe(0, changed=False)
+    assert schedule.interval == 120
+    schedule.observe(0, changed=True)
+    assert schedule.interval == 30
+
+
+def test_next_interval_never_passes_deadline(clock):
+    schedule = PollSchedule(50, total=10, base_interval=30)
+    schedule.observe(0)
+    clock.advance(40)
+    assert schedule.next_interval() == pytest.approx(10)
+    clock.advance(20)
+    assert schedule.expired()
+    assert schedule.next_interval() == 0
+
+
+def test_eta_from_completion_curve_shortens_interval(clock):
+    schedule = PollSchedule(3600, total=10, base_interval=60)
+    schedule.observe(2)
+    clock.advance(100)
+    schedule.observe(6)
+    remaining, basis = schedule.eta()
+    assert basis == '完成曲线'
+    assert remaining == pytest.approx(100)
+    assert schedule.next_interval() == pytest.approx(50)
+
+    schedule.observe(10)
+    assert schedule.eta() == (0.0, '完成曲线')
+
+
+def test_history_is_recorded_and_used_for_eta(clock):
+    first = PollSchedule(3600, total=4, step='2.1')
+    first.observe(0)
+    clock.advance(300)
+    first.observe(4)
+    first.finish()
+    assert poll_schedule.duration_history.expected('2.1') == 300
+
+    second = PollSchedule(3600, total=4, step='2.1')
+    second.observe(0)
+    clock.advance(100)
+    assert second.eta() == (pytest.approx(200), '历史时长')
+
+
+def test_finish_skips_runs_already_done_at_first_check(clock):
+    schedule = PollSchedule(3600, total=4, step='3.1')
+    schedule.observe(4)
+    schedule.finish()
+    assert poll_schedule.duration_history.expected('3.1') is None
+
+
+def test_history_keeps_last_entries_and_uses_median(clock):
+    history = poll_schedule.duration_history
+    for seconds in (10, 1000, 20, 30):
+        history.record('4.1', seconds)
+    assert history.expected('4.1') == 30
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""QueryCache 的有效期和写操作失效测试"""
+
+import time
+
+from query_cache import QueryCache, command_paths
+
+
+def _cache(**kwargs):
+    options = {'enabled': True, 'default_ttl': 60, 'path_ttls': {}, 'max_entries': 16}
+    options.update(kwargs)
+    return QueryCache(**options)
+
+
+def test_command_paths_resolves_relative_arguments_after_cd():
+    paths = command_paths('cd /data/run1 && rm -f out.txt /tmp/x && ls')
+    assert paths == ['/data/run1', '/data/run1/out.txt', '/tmp/x']
+
+
+def test_write_invalidates_same_parent_and_child_paths():
+    cache = _cache()
+    cache.put('dir', ['a'], ['/data/run1'], 60)
+    cache.put('glob', ['b'], ['/data/run1/*.root'], 60)
+    cache.put('parent', ['c'], ['/data'], 60)
+    cache.put('other', ['d'], ['/data/run2'], 60)
+
+    assert cache.invalidate_command('cd /data/run1 && rm -f job_1.root') == 3
+    assert cache.get('dir') == (False, None)
+    assert cache.get('glob') == (False, None)
+    assert cache.get('parent') == (False, None)
+    assert cache.get('other') == (True, ['d'])
+
+
+def test_unparseable_write_invalidates_everything():
+    cache = _cache()
+    cache.put('a', 1, ['/data/run1'], 60)
+    cache.put('b', 2, ['/other'], 60)
+    assert cache.invalidate_command('./genJob.sh') == 2
+    assert cache.stats()['entries'] == 0
+
+
+def test_entries_expire_and_zero_ttl_is_not_cached():
+    cache = _cache()
+    cache.put('short', 1, ['/data'], 0.01)
+    cache.put('none', 2, ['/data'], 0)
+    time.sleep(0.02)
+    assert cache.get('short') == (False, None)
+    assert cache.get('none') == (False, None)
+
+
+def test_ttl_for_uses_smallest_matching_pattern():
+    cache = _cache(default_ttl=30, path_ttls={'/data/*': 10, '/data/live/*': 0})
+    assert cache.ttl_for(['/data/run1']) == 10
+    assert cache.ttl_for(['/elsewhere']) == 30
+    assert cache.ttl_for(['/data/run1', '/data/live/x']) == 0
+    assert cache.ttl_for([]) == 0
+    assert _cache(enabled=False).ttl_for(['/data/run1']) == 0
+
+
+def test_oldest_entries_are_evicted_beyond_max_entries():
+    cache = _cache(max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, key, ['/data'], 60)
+    assert cache.get('a') == (False, None)
+    assert cache.get('c') == (True, 'c')
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""topup_ssh 的纯本地逻辑测试（不连接服务器）"""
+
+import pytest
+
+from topup_ssh import is_read_only_command
+
+
+@pytest.mark.parametrize('command', [
+    'ls -l /besfs5/data',
+    'cd /besfs5/data && ls *.root | wc -l',
+    'cat a.txt 2>&1',
+    'grep -c error log.txt 2>/dev/null',
+    'find /besfs5/data -name "*.root" -newer stamp',
+    'sort -n -k1,1 ets_cut.txt | uniq',
+    'uniq -c ets_cut.txt',
+    'uniq -f 2 ets_cut.txt',
+    'test -f a.txt || echo missing',
+])
+def test_read_only_commands(command):
+    assert is_read_only_command(command)
+
+
+@pytest.mark.parametrize('command', [
+    'rm -f a.txt',
+    'ls > list.txt',
+    'cat a.txt >> b.txt',
+    'ls >/dev/null_copy',
+    'echo $(rm a.txt)',
+    'echo `rm a.txt`',
+    'cat <<EOF\nx\nEOF',
+    'ls && rm a.txt',
+    'cd /besfs5/data; ./genJob.sh',
+    "awk '{print > \"out.txt\"}' a.txt",
+    "awk 'BEGIN{system(\"rm a\")}'",
+    "sed -n '1w out.txt' a.txt",
+    'sed -i s/a/b/ a.txt',
+    'sort -o out.txt a.txt',
+    'sort -uo out.txt a.txt',
+    'sort --output=out.txt a.txt',
+    'uniq a.txt b.txt',
+    'find . -delete',
+    'find . -exec rm {} ;',
+    'find . -fprint out.txt',
+    "grep 'unterminated",
+])
+def test_write_or_unknown_commands(command):
+    assert not is_read_only_command(command)
+
+
+def _run_batch(commands, stop_on_error=True, token='0123456789abcdef'):
+    """在本地bash中执行批量脚本，再按分隔帧切分（与 execute_batch 相同的脚本和解析）"""
+    import subprocess
+    from topup_ssh import TopupSSH
+
+    script = TopupSSH._batch_script(commands, token, stop_on_error)
+    completed = subprocess.run(['bash', '-c', script], capture_output=True, text=True, timeout=30)
+    ssh = TopupSSH.__new__(TopupSSH)
+    return ssh._split_batch(commands, token, completed.stdout, completed.stderr, False, 30)
+
+
+def test_batch_frames_split_output_per_command():
+    results = _run_batch(['echo one', 'printf two; echo err >&2', 'cd /; pwd'])
+    assert [result['output'] for result in results] == ['one\n', 'two', '/\n']
+    assert [result['error'] for result in results] == ['', 'err\n', '']
+    assert all(result['success'] and not result['skipped'] for result in results)
+
+
+def test_batch_commands_run_in_separate_subshells_without_stdin():
+    results = _run_batch(['cd /tmp; export X=1', 'pwd; echo "x=$X"', 'read line; echo "rc=$?"'])
+    assert not results[1]['output'].startswith('/tmp\n')
+    assert results[1]['output'].endswith('x=\n')
+    assert results[2]['output'] == 'rc=1\n'
+
+
+def test_batch_stops_on_first_failure():
+    results = _run_batch(['echo ok', 'exit 3', 'echo never'])
+    assert results[0]['success']
+    assert results[1]['exit_code'] == 3 and not results[1]['success']
+    assert results[2]['skipped'] and results[2]['exit_code'] == -1
+
+
+def test_batch_continues_after_failure_when_requested():
+    results = _run_batch(['false', 'echo after'], stop_on_error=False)
+    assert results[0]['exit_code'] == 1
+    assert results[1]['output'] == 'after\n' and results[1]['success']
+
+
+def test_batch_timeout_marks_running_command():
+    from topup_ssh import TopupSSH
+
+    token = 'fedcba9876543210'
+    stdout = f"first\n\x1e{token}:0:0\x1e partial"
+    ssh = TopupSSH.__new__(TopupSSH)
+    results = ssh._split_batch(['echo first', 'sleep 100', 'echo last'], token, stdout, '', True, 5)
+    assert results[0]['output'] == 'first\n'
+    assert results[1]['error'] == '命令执行超时' and not results[1]['skipped']
+    assert results[2]['skipped']
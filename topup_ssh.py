@@ -8,21 +8,151 @@ Topup SSH连接管理模块
 import paramiko
 import os
 import time
-from typing import Optional, Tuple, Dict, Any
+import selectors
+import re
+import shlex
+import copy
+import codecs
+import hashlib
+import functools
+import posixpath
+import uuid
+from typing import Optional, Tuple, Dict, Any, List, Callable, Union
 import config
 from logger import step_logger
+from ssh_pool import SSHConnectionPool, get_pool
+from output_stream import OutputBuffer
+from query_cache import QueryCache, get_query_cache, command_paths
+from remote_agent import RemoteAgent, get_remote_agent, AGENT_OPS
+from file_events import FileEventStream
+import local_daemon
+import detached_jobs
+import log_follow
+from detached_jobs import job_store
+from ssh_metrics import command_metrics
+from remote_fs import RemoteFileSystem, RemoteFileEntry
+from sftp_transfer import SFTPDownloader, TarStreamDownloader
+
+# 每次从通道读取的最大字节数
+_RECV_CHUNK_SIZE = 32768
+
+# 后台作业每次轮询从每个日志读取的最大字节数
+_JOB_READ_LIMIT = 4 * 1024 * 1024
+
+# 只读命令：连接中断后可以安全地重新执行
+# （awk、sed 可在脚本内写文件或执行命令，如 system()、print > file、sed 的 w/e 命令，不列入）
+_READ_ONLY_COMMANDS = {
+    'ls', 'cat', 'head', 'tail', 'grep', 'egrep', 'fgrep', 'wc', 'find', 'stat', 'test', '[',
+    'echo', 'printf', 'pwd', 'cd', 'du', 'df', 'md5sum', 'sha1sum', 'sha256sum', 'file', 'date',
+    'whoami', 'hostname', 'readlink', 'realpath', 'basename', 'dirname', 'sort', 'uniq', 'cut',
+    'tr', 'diff', 'cmp', 'true', 'which'
+}
+
+# find 的写操作（删除、执行命令、把结果写入文件）
+_FIND_WRITE_ACTIONS = {'-delete', '-exec', '-execdir', '-ok', '-okdir', '-fprint', '-fprint0', '-fprintf', '-fls'}
+
+
+def is_read_only_command(command: str) -> bool:
+    """
+    判断命令是否只读（不修改远程文件，重复执行无副作用）
+
+    命令按 && || ; | 拆分后，每一段的程序都必须在只读白名单中，
+    且不能包含输出重定向（>/dev/null 和 2>&1 除外）、命令替换，
+    以及 sort -o、uniq 输入 输出、find -delete/-exec/-fprint 等写操作。
+
+    Args:
+        command: shell命令
+
+    Returns:
+        bool: 是否只读
+    """
+    if '`' in command or '$(' in command or '<<' in command:
+        return False
+    stripped = re.sub(r'\d?>\s*/dev/null(?![\w./-])|\d?>&\d', '', command)
+    if '>' in stripped:
+        return False
+
+    for segment in re.split(r'&&|\|\||[;|\n]', stripped):
+        try:
+            tokens = shlex.split(segment)
+        except ValueError:
+            return False
+        if not tokens:
+            continue
+        program = tokens[0].rsplit('/', 1)[-1]
+        if program not in _READ_ONLY_COMMANDS:
+            return False
+        # sort 的 -o 可与其他短选项合写（如 -uo、-no）
+        if program == 'sort' and any(token.startswith('--output') or (re.match(r'-[^-]', token) and 'o' in token)
+                                     for token in tokens[1:]):
+            return False
+        # uniq 的第二个操作数是输出文件（-f/-s/-w 的数字参数不计）
+        if program == 'uniq' and len([token for token in tokens[1:]
+                                      if not token.startswith('-') and not token.isdigit()]) > 1:
+            return False
+        if program == 'find' and any(token in _FIND_WRITE_ACTIONS for token in tokens):
+            return False
+    return True
+
+
+def _via_daemon(method):
+    """
+    已连接本地SSH守护进程时，把方法调用转发给守护进程执行
+
+    守护进程通信中断时，返回字典的方法返回失败结果，其他方法抛出 ConnectionError。
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._daemon is None:
+            return method(self, *args, **kwargs)
+        target = args[0] if args and isinstance(args[0], str) else ''
+        try:
+            with command_metrics.measure('daemon', f"{method.__name__} {target}".strip()):
+                return self._daemon.call(method.__name__, *args, **kwargs)
+        except local_daemon.DaemonConnectionError as e:
+            self._daemon = None
+            self.connected = False
+            print(f"✗ {str(e)}")
+            if method.__name__ in ('execute_batch', 'run_detached_batch'):
+                return [self._batch_entry(command, -1, '', str(e), '本地SSH守护进程连接中断') for command in args[0]]
+            if method.__name__.startswith(('execute_', 'download_', 'upload_', 'write_')) \
+                    or method.__name__.endswith('_detached'):
+                return {'success': False, 'message': '本地SSH守护进程连接中断', 'exit_code': -1,
+                        'output': '', 'error': str(e)}
+            raise
+    return wrapper
 
 
 class TopupSSH:
     """SSH双跳连接管理类"""
 
-    def __init__(self):
+    def __init__(self, pool: Optional[SSHConnectionPool] = None, use_daemon: Optional[bool] = None,
+                 transport_profile: Optional[str] = None):
         """
         初始化SSH连接管理器
+
+        Args:
+            pool: 共享连接池，默认使用 config.SSH_CONFIG 对应的进程级连接池
+            use_daemon: 本地SSH守护进程（ssh_daemon.py）运行时是否通过它执行命令，
+                        默认在未指定 pool 和 transport_profile 时自动连接（见 config.SSH_DAEMON_CONFIG）
+            transport_profile: 连接的传输参数方案（'latency'/'bulk'，见 config.TRANSPORT_PROFILES），
+                               默认使用 config.DEFAULT_TRANSPORT_PROFILE
         """
         # 服务器配置（从config.py导入）
         self.server1_config = config.SSH_CONFIG['servers']['server1']
         self.server2_config = config.SSH_CONFIG['servers']['server2']
+
+        # 共享连接池（同一进程内的实例复用一条双跳连接）
+        self.pool = pool or get_pool(self.server1_config, self.server2_config, transport_profile)
+
+        # 只读查询结果缓存（与连接池一样在进程内共享）
+        self.cache: QueryCache = get_query_cache(self.pool)
+
+        # 远程辅助进程（批量文件系统查询，一次往返；不可用时回退到普通命令）
+        self.agent: Optional[RemoteAgent] = get_remote_agent(self.pool)
+
+        # 远程文件系统查询（复用连接池的持久SFTP会话）
+        self.fs = RemoteFileSystem(self.pool)
         
         # SSH连接
         self.ssh1: Optional[paramiko.SSHClient] = None
@@ -33,84 +163,76 @@ class TopupSSH:
         
         # 连接状态
         self.connected = False
+
+        # 本地SSH守护进程客户端（连接守护进程时不建立自己的双跳连接）
+        if use_daemon is None:
+            use_daemon = pool is None and transport_profile is None
+        self.use_daemon = use_daemon
+        self._daemon: Optional[local_daemon.DaemonClient] = None
+
+        # 目标服务器主机名缓存 (连接代数, 主机名)，用于判断后台作业是否运行在当前主机
+        self._host_cache: Optional[Tuple[int, str]] = None
+
+    @property
+    def via_daemon(self) -> bool:
+        """是否通过本地SSH守护进程执行"""
+        return self._daemon is not None
     
     def connect(self) -> bool:
         """
         建立SSH双跳连接
+
+        从连接池租用共享的第二跳传输，只有池中没有可用连接时才执行完整的双跳握手
         
         Returns:
             bool: 连接是否成功
         """
-        try:
-            # 创建第一个SSH客户端（连接到跳板机）
-            self.ssh1 = paramiko.SSHClient()
-            self.ssh1.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            # 跳板机密码
-            password1 = os.getenv(self.server1_config['env_password'])
-            
-            # 连接到跳板机
-            print(f"正在连接到跳板机 {self.server1_config['host']}...")
-            self.ssh1.connect(
-                hostname=self.server1_config['host'],
-                port=self.server1_config['port'],
-                username=self.server1_config['username'],
-                password=password1,
-                timeout=30,
-                auth_timeout=30,
-                banner_timeout=30
-            )
-            print(f"✓ 成功连接到跳板机 {self.server1_config['host']}")
-            
-            # 创建传输通道到目标服务器
-            
-            self.transport = self.ssh1.get_transport()
-            dest_addr = (self.server2_config['host'], self.server2_config['port'])
-            local_addr = ('localhost', 22)
-            print("正在创建SSH通道...")
-            channel = self.transport.open_channel("direct-tcpip", dest_addr, local_addr , timeout=300)
-            print(f"正在通过跳板机连接到目标服务器 {self.server2_config['host']}...")
-            # 创建第二个SSH客户端（连接到目标服务器）
-            self.ssh2 = paramiko.SSHClient()
-            self.ssh2.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            # 目标服务器密码
-            password2 = os.getenv(self.server2_config['env_password'])
-            
-            # 通过通道连接到目标服务器
-            self.ssh2.connect(
-                hostname=self.server2_config['host'],
-                port=self.server2_config['port'],
-                username=self.server2_config['username'],
-                password=password2,
-                sock=channel,
-                timeout=30,
-                auth_timeout=30,
-                banner_timeout=30
-            )
-            print(f"✓ 成功连接到目标服务器 {self.server2_config['host']}")
-            
-            self.connected = True
-            return True
-            
-        except Exception as e:
-            print(f"✗ SSH连接失败: {str(e)}")
+        if self.connected:
+            if self._daemon is not None or self.pool.is_active():
+                return True
             self.close()
+
+        if self.use_daemon:
+            self._daemon = local_daemon.attach()
+            if self._daemon is not None:
+                self.connected = True
+                print(f"✓ 已连接本地SSH守护进程 (pid {self._daemon.info.get('pid')})，复用其双跳连接")
+                return True
+
+        if not self.pool.acquire():
             return False
+
+        self._refresh_connection()
+        self.connected = True
+
+        # 后台预热交互式shell，首次提交作业时无需等待shell初始化
+        self.pool.warm_shells()
+        return True
     
-    def execute_command(self, command: str, timeout: int = 600, use_pty: bool = False) -> Dict[str, Any]:
+    @_via_daemon
+    def execute_command(self, command: str, timeout: int = 600, use_pty: bool = False,
+                        idempotent: Optional[bool] = None, use_cache: bool = True) -> Dict[str, Any]:
         """
         在远程服务器上执行命令
 
+        执行前确认共享连接存活（必要时自动重连）；执行中连接断开时，
+        只读或标记为幂等的命令在重连后自动重新执行，其他命令返回失败。
+        只读命令的成功结果按 QUERY_CACHE_CONFIG 的路径有效期缓存，
+        非只读命令执行前后使其涉及路径下的缓存失效。
+
         Args:
             command: 要执行的命令
             timeout: 超时时间（秒），默认600秒
             use_pty: 是否使用PTY伪终端，默认False。对于简单命令（如reset.sh）不需要PTY
+            idempotent: 命令是否可安全重放，默认按 is_read_only_command 自动判断
+            use_cache: 是否使用只读查询缓存（仅对只读且路径配置了有效期的命令生效）
 
         Returns:
-            dict: 执行结果，包含success, message, exit_code, output, error
+            dict: 执行结果，包含success, message, exit_code, output, error；
+                  输出超过 OUTPUT_BUFFER_CONFIG 上限时 output/error 为首尾预览，
+                  并附带 output_file/error_file（完整输出的本地临时文件）、*_chars、*_head、*_tail
         """
-        if not self.connected or self.ssh2 is None:
+        if not self._ready():
             return {
                 'success': False,
                 'message': 'SSH未连接',
@@ -119,6 +241,19 @@ class TopupSSH:
                 'error': 'SSH连接未建立'
             }
 
+        read_only = is_read_only_command(command)
+        cache_key = ('command', command, use_pty)
+        cache_ttl = self.cache.ttl_for(command_paths(command)) if read_only and use_cache else 0
+        if cache_ttl > 0:
+            hit, cached = self.cache.get(cache_key)
+            if hit:
+                print(f"\n执行命令: {command}（使用缓存结果）")
+                with command_metrics.measure('command', command, path=self.pool.path_label) as sample:
+                    sample.update(round_trips=0, cached=True, exit_code=cached['exit_code'])
+                return dict(cached)
+        elif not read_only:
+            self.cache.invalidate_command(command)
+
         try:
             print(f"\n执行命令: {command}")
 
@@ -126,57 +261,43 @@ class TopupSSH:
             if step_logger.enabled:
                 step_logger.log_command(command)
 
-            stdin, stdout, stderr = self.ssh2.exec_command(command, get_pty=use_pty)
-
-            # 等待命令完成，带超时
-            import time
-            start_time = time.time()
-            while not stdout.channel.exit_status_ready():
-                if time.time() - start_time > timeout:
-                    # 超时，关闭连接
-                    stdout.channel.close()
-
-                    # 记录超时到日志
-                    if step_logger.enabled:
-                        step_logger.log_command_output(f"命令执行超时（{timeout}秒）")
-
-                    return {
-                        'success': False,
-                        'message': f'命令执行超时（{timeout}秒）',
-                        'exit_code': -1,
-                        'output': '',
-                        'error': '命令执行超时'
-                    }
-                time.sleep(0.1)
-
-            # 获取退出码
-            exit_code = stdout.channel.recv_exit_status()
-
-            # 读取输出（设置读取超时，避免阻塞）
-            import select
-            output = ""
-            error = ""
-
-            # 非阻塞读取stdout
-            if use_pty:
-                # 使用PTY时，需要特殊处理
-                import socket
-                stdout.channel.setblocking(0)
-                while True:
-                    if stdout.channel.recv_ready():
-                        data = stdout.channel.recv(1024)
-                        if len(data) == 0:
-                            break
-                        output += data.decode('utf-8', errors='ignore')
-                    else:
-                        time.sleep(0.01)
-                        break
-            else:
-                # 不使用PTY时，直接读取
-                output = stdout.read().decode('utf-8', errors='ignore')
+            with command_metrics.measure('command', command, path=self.pool.path_label) as sample:
+                sample['round_trips'] = 0
+
+                def run_once():
+                    return self._exec_channel(command, timeout, sample, use_pty=use_pty)
+
+                replayable = read_only if idempotent is None else idempotent
+                try:
+                    exit_code, stdout, stderr = self._with_reconnect(run_once, replayable)
+                finally:
+                    if not read_only:
+                        # 命令执行期间可能有并发查询写入了旧结果
+                        self.cache.invalidate_command(command)
+                sample.update(exit_code=exit_code, bytes_in=stdout.total_bytes + stderr.total_bytes)
+                if exit_code is None:
+                    sample['error'] = '命令执行超时'
+            # 超过内存上限时 output/error 只保留首尾预览，完整内容见 output_file/error_file
+            output_fields = stdout.to_result('output')
+            error_fields = stderr.to_result('error')
+            output = output_fields['output']
+            error = error_fields['error']
 
-            # 读取stderr
-            error = stderr.read().decode('utf-8', errors='ignore')
+            if exit_code is None:
+                # 记录超时到日志
+                if step_logger.enabled:
+                    step_logger.log_command_output(f"命令执行超时（{timeout}秒）")
+
+                result = {
+                    'success': False,
+                    'message': f'命令执行超时（{timeout}秒）',
+                    'exit_code': -1,
+                    **output_fields,
+                    'error': '命令执行超时'
+                }
+                if stderr.overflowed:
+                    result.update(error_fields, error='命令执行超时')
+                return result
 
             # 记录输出到日志
             if step_logger.enabled:
@@ -191,9 +312,16 @@ class TopupSSH:
                 'success': exit_code == 0,
                 'message': '命令执行成功' if exit_code == 0 else '命令执行失败',
                 'exit_code': exit_code,
-                'output': output,
-                'error': error
+                **output_fields,
+                **error_fields
             }
+            if stdout.overflowed or stderr.overflowed:
+                print(f"  输出过长，仅保留首尾预览（stdout {stdout.total_chars} 字符，stderr {stderr.total_chars} 字符）")
+                for buffer in (stdout, stderr):
+                    if buffer.spill_path:
+                        print(f"  完整输出: {buffer.spill_path}")
+            elif exit_code == 0 and cache_ttl > 0:
+                self.cache.put(cache_key, dict(result), command_paths(command), cache_ttl)
 
             if exit_code == 0:
                 print(f"✓ 命令执行成功 (退出码: {exit_code})")
@@ -221,18 +349,329 @@ class TopupSSH:
                 'error': str(e)
             }
     
-    def execute_interactive_command(self, command: str, completion_marker: str) -> Dict[str, Any]:
+    @_via_daemon
+    def execute_batch(self, commands: List[str], stop_on_error: bool = True,
+                      timeout: int = 600, idempotent: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """
+        在一个通道中顺序执行多条命令，一次往返返回每条命令的结果
+
+        每条命令在独立的子shell中执行（与单独调用 execute_command 一样互不影响工作目录），
+        命令结束后向stdout/stderr写入带随机标记的分隔帧，本地按分隔帧切分各命令的输出。
+
+        Args:
+            commands: 要执行的命令列表
+            stop_on_error: True时遇到第一条失败的命令即停止，后续命令标记为skipped；
+                           False时无论成败执行全部命令
+            timeout: 整批命令的超时时间（秒），默认600秒
+            idempotent: 连接中断后能否整批重放，默认所有命令都只读时才重放
+
+        Returns:
+            list: 与commands一一对应的结果列表，每项格式同 execute_command，
+                  额外包含 command 和 skipped 字段
+        """
+        if not commands:
+            return []
+
+        if not self._ready():
+            return [self._batch_entry(command, -1, '', 'SSH连接未建立', 'SSH未连接') for command in commands]
+
+        print(f"\n执行批量命令（{len(commands)}条，{'遇错停止' if stop_on_error else '遇错继续'}）:")
+        for index, command in enumerate(commands, 1):
+            print(f"  [{index}] {command}")
+
+        # 记录命令到日志
+        if step_logger.enabled:
+            for index, command in enumerate(commands, 1):
+                step_logger.log_command(f"[批量 {index}/{len(commands)}] {command}")
+
+        token = uuid.uuid4().hex[:16]
+        script = self._batch_script(commands, token, stop_on_error)
+
+        try:
+            with command_metrics.measure('batch', ' ; '.join(commands), path=self.pool.path_label) as sample:
+                sample.update(round_trips=0, commands=len(commands))
+
+                def run_once():
+                    return self._exec_channel(f"bash -c {shlex.quote(script)}", timeout, sample)
+
+                writes = [command for command in commands if not is_read_only_command(command)]
+                for command in writes:
+                    self.cache.invalidate_command(command)
+                if idempotent is None:
+                    idempotent = not writes
+                try:
+                    exit_code, stdout, stderr = self._with_reconnect(run_once, idempotent)
+                finally:
+                    for command in writes:
+                        self.cache.invalidate_command(command)
+                sample.update(exit_code=exit_code, bytes_in=stdout.total_bytes + stderr.total_bytes)
+                if exit_code is None:
+                    sample['error'] = '命令执行超时'
+        except Exception as e:
+            print(f"✗ 批量命令执行异常: {str(e)}")
+            if step_logger.enabled:
+                step_logger.log_command_output(f"批量命令执行异常: {str(e)}")
+            return [self._batch_entry(command, -1, '', str(e), f'命令执行异常: {str(e)}') for command in commands]
+
+        # 整批输出超过内存上限时已写入临时文件，切分前读回；切分后各命令的输出再分别按上限截断
+        output_text = stdout.read_all()
+        error_text = stderr.read_all()
+        for buffer in (stdout, stderr):
+            buffer.close()
+            if buffer.spill_path:
+                os.remove(buffer.spill_path)
+
+        results = self._split_batch(commands, token, output_text, error_text, exit_code is None, timeout)
+        self._print_batch_results(results)
+        return results
+
+    @staticmethod
+    def _batch_script(commands: List[str], token: str, stop_on_error: bool) -> str:
+        """
+        生成批量执行脚本：每条命令在独立子shell中执行，结束后向stdout/stderr写入带标记的分隔帧
+
+        Args:
+            commands: 命令列表
+            token: 分隔帧中的随机标记
+            stop_on_error: 是否遇到第一条失败的命令即停止
+
+        Returns:
+            str: bash脚本
+        """
+        script_lines = []
+        for index, command in enumerate(commands):
+            script_lines.append(f"( {command}\n) < /dev/null")
+            script_lines.append("__topup_rc=$?")
+            script_lines.append(f"printf '\\036{token}:{index}:%d\\036' $__topup_rc")
+            script_lines.append(f"printf '\\036{token}:{index}\\036' >&2")
+            if stop_on_error:
+                script_lines.append("[ $__topup_rc -eq 0 ] || exit 0")
+        return '\n'.join(script_lines)
+
+    def _split_batch(self, commands: List[str], token: str, output_text: str, error_text: str,
+                     timed_out: bool, timeout: Optional[float]) -> List[Dict[str, Any]]:
+        """按分隔帧切分批量脚本的stdout（帧中带退出码）和stderr，得到每条命令的结果"""
+        outputs: Dict[int, Tuple[int, str]] = {}
+        position = 0
+        for match in re.finditer('\x1e' + token + r':(\d+):(-?\d+)\x1e', output_text):
+            outputs[int(match.group(1))] = (int(match.group(2)), output_text[position:match.start()])
+            position = match.end()
+
+        errors: Dict[int, str] = {}
+        position = 0
+        for match in re.finditer('\x1e' + token + r':(\d+)\x1e', error_text):
+            errors[int(match.group(1))] = error_text[position:match.start()]
+            position = match.end()
+
+        results = []
+        for index, command in enumerate(commands):
+            if index in outputs:
+                rc, out = outputs[index]
+                results.append(self._batch_entry(
+                    command, rc, out, errors.get(index, ''),
+                    '命令执行成功' if rc == 0 else '命令执行失败'
+                ))
+            elif timed_out and (index == 0 or index - 1 in outputs):
+                # 超时时正在执行的命令
+                results.append(self._batch_entry(
+                    command, -1, '', '命令执行超时', f'命令执行超时（{timeout}秒）'
+                ))
+            else:
+                entry = self._batch_entry(command, -1, '', '前序命令失败或超时，未执行', '命令未执行')
+                entry['skipped'] = True
+                results.append(entry)
+        return results
+
+    @staticmethod
+    def _print_batch_results(results: List[Dict[str, Any]]):
+        """打印批量命令的结果并记录到日志"""
+        for index, result in enumerate(results, 1):
+            if result['skipped']:
+                print(f"- [{index}] 已跳过")
+            elif result['success']:
+                print(f"✓ [{index}] 命令执行成功 (退出码: {result['exit_code']})")
+            else:
+                print(f"✗ [{index}] 命令执行失败 (退出码: {result['exit_code']})")
+                if result['error'].strip():
+                    print(f"错误: {result['error'].strip()}")
+
+        # 记录输出到日志
+        if step_logger.enabled:
+            for index, result in enumerate(results, 1):
+                output_log = f"[批量 {index}/{len(results)}] 退出码: {result['exit_code']}\n"
+                if result['output'].strip():
+                    output_log += f"输出:\n{result['output'].strip()}\n"
+                if result['error'].strip():
+                    output_log += f"错误:\n{result['error'].strip()}\n"
+                step_logger.log_command_output(output_log)
+
+    @staticmethod
+    def _batch_entry(command: str, exit_code: int, output: str, error: str, message: str) -> Dict[str, Any]:
+        """构造单条批量命令的结果（格式同 execute_command，输出同样按内存上限截断）"""
+        entry = {
+            'success': exit_code == 0,
+            'message': message,
+            'exit_code': exit_code
+        }
+        for prefix, text in (('output', output), ('error', error)):
+            buffer = OutputBuffer()
+            buffer.write(text)
+            entry.update(buffer.to_result(prefix))
+        entry.update(command=command, skipped=False)
+        return entry
+
+    def _with_reconnect(self, operation, replayable: bool = True):
+        """
+        执行远程操作，连接中断时自动重连
+
+        Args:
+            operation: 无参数的可调用对象，执行一次远程操作
+            replayable: 连接中断后是否重新执行该操作
+
+        Returns:
+            operation 的返回值
+        """
+        replay_attempts = getattr(config, 'SSH_POOL_CONFIG', {}).get('replay_attempts', 2)
+        attempts = 0
+        while True:
+            if not self.pool.ensure_alive():
+                raise ConnectionError('SSH连接不可用，重连失败')
+            self._refresh_connection()
+            generation = self.pool.generation
+            try:
+                return operation()
+            except Exception as e:
+                if not self._is_connection_error(e):
+                    raise
+                print(f"✗ SSH连接中断: {str(e)}")
+                if not self.pool.probe():
+                    self.pool.reconnect(generation)
+                    self._refresh_connection()
+                if not replayable or attempts >= replay_attempts:
+                    raise
+                attempts += 1
+                print(f"重新执行（第 {attempts}/{replay_attempts} 次）")
+
+    def _exec_channel(self, command: str, timeout: float, sample: Dict[str, Any], use_pty: bool = False
+                      ) -> Tuple[Optional[int], OutputBuffer, OutputBuffer]:
+        """
+        在新通道中执行一条命令并读取全部输出（一次往返，计入统计样本）
+
+        Args:
+            command: 要执行的命令
+            timeout: 超时时间（秒）
+            sample: 统计样本
+            use_pty: 是否使用PTY伪终端
+
+        Returns:
+            tuple: (退出码, stdout缓冲, stderr缓冲)，超时时退出码为None
+        """
+        with self.pool.lease_channel() as channel:
+            self._note_channel(sample, channel)
+            if use_pty:
+                channel.get_pty()
+            channel.exec_command(command)
+
+            # 边执行边读取stdout/stderr，收到退出码后立即返回
+            return self._drain_channel(channel, timeout)
+
+    def _note_channel(self, sample: Dict[str, Any], channel: paramiko.Channel):
+        """把一次通道往返（排队等待、通道号）计入统计样本"""
+        sample['queue_wait'] += self.pool.last_queue_wait()
+        sample['channel'] = channel.get_id()
+        sample['round_trips'] += 1
+
+    def _is_connection_error(self, error: Exception) -> bool:
+        """判断异常是否由连接中断引起（等待通道名额超时不算）"""
+        if isinstance(error, TimeoutError):
+            return False
+        return isinstance(error, (paramiko.SSHException, EOFError, ConnectionError)) or not self.pool.is_active()
+
+    def _refresh_connection(self):
+        """重连后同步连接池中的最新连接对象"""
+        self.ssh1 = self.pool.ssh1
+        self.ssh2 = self.pool.ssh2
+        self.transport = self.pool.transport
+
+    def _drain_channel(self, channel: paramiko.Channel, timeout: float
+                       ) -> Tuple[Optional[int], OutputBuffer, OutputBuffer]:
+        """
+        事件驱动地等待命令结束，同时持续读取stdout和stderr
+
+        通过 selectors 等待通道可读事件，命令运行期间就把输出读走，
+        避免输出填满通道窗口后远端阻塞（如对大目录 ls -la、cat 大文件）；
+        收到退出码后立即返回，不再按固定间隔轮询。
+        输出写入有界内存的 OutputBuffer，超过 OUTPUT_BUFFER_CONFIG 上限的部分写入本地临时文件。
+
+        Args:
+            channel: 已执行 exec_command 的会话通道
+            timeout: 超时时间（秒）
+
+        Returns:
+            tuple: (退出码, stdout缓冲, stderr缓冲)，超时时退出码为None
+        """
+        stdout = OutputBuffer()
+        stderr = OutputBuffer()
+        deadline = time.monotonic() + timeout
+
+        selector = selectors.DefaultSelector()
+        selector.register(channel, selectors.EVENT_READ)
+        try:
+            while True:
+                while channel.recv_ready():
+                    stdout.write_bytes(channel.recv(_RECV_CHUNK_SIZE))
+                while channel.recv_stderr_ready():
+                    stderr.write_bytes(channel.recv_stderr(_RECV_CHUNK_SIZE))
+
+                if channel.exit_status_ready():
+                    # SSH协议保证退出码在全部数据之后到达，此时缓冲区中的数据即为完整输出
+                    while channel.recv_ready():
+                        stdout.write_bytes(channel.recv(_RECV_CHUNK_SIZE))
+                    while channel.recv_stderr_ready():
+                        stderr.write_bytes(channel.recv_stderr(_RECV_CHUNK_SIZE))
+                    if channel.exit_status == -1 and not channel.get_transport().is_active():
+                        # 传输断开时通道被关闭，没有收到真正的退出码
+                        raise ConnectionError('SSH连接已断开')
+                    return channel.recv_exit_status(), stdout, stderr
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # 超时，关闭通道
+                    channel.close()
+                    return None, stdout, stderr
+
+                if channel.eof_received:
+                    # EOF之后通道一直处于可读状态，改为直接等待退出码事件
+                    channel.status_event.wait(remaining)
+                else:
+                    selector.select(remaining)
+        finally:
+            selector.close()
+
+    @_via_daemon
+    def execute_interactive_command(self, command: str, completion_marker: str, timeout: Optional[int] = None,
+                                    error_patterns: Optional[List[str]] = None,
+                                    on_chunk: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """
         使用交互式shell执行命令
-        
+
+        从连接池取得预热好的交互式shell（环境已加载，通过就绪标记确认可用，不再固定等待），
+        阻塞读取输出直到完成标记或错误标记出现且命令结束；命令正常结束的shell归还连接池供下次复用。
+        标记在滚动窗口上匹配，跨两次读取也能识别；输出保存在有界内存缓冲中，过长时写入临时文件。
+
         Args:
             command: 要执行的命令
-            completion_marker: 完成标记字符串，检测到此字符串时关闭shell（必选）
-            
+            completion_marker: 完成标记字符串，检测到此字符串时视为命令完成（必选）
+            timeout: 超时时间（秒），默认不限时
+            error_patterns: 错误标记正则表达式列表，先于完成标记出现时视为失败，
+                            默认使用 config.SHELL_POOL_CONFIG['error_patterns']
+            on_chunk: 每收到一段输出时调用的回调（用于实时显示进度）
+
         Returns:
-            dict: 执行结果，包含success, message, output, error
+            dict: 执行结果，包含success, message, output, error，
+                  以及 matched_pattern（匹配到的标记文本）；输出写入临时文件时包含 output_file
         """
-        if not self.connected or self.ssh2 is None:
+        if not self._ready():
             return {
                 'success': False,
                 'message': 'SSH未连接',
@@ -240,55 +679,103 @@ class TopupSSH:
                 'error': 'SSH连接未建立'
             }
         
+        # 交互式命令（genJob.sh 等）视为写操作
+        self.cache.invalidate_command(command)
+
         try:
-            # 创建交互式shell
-            shell = self.ssh2.invoke_shell()
-            time.sleep(2)  # 等待shell初始化
-            
-            # 清空初始输出
-            while shell.recv_ready():
-                shell.recv(4096)
-            
+            # 提交类命令不自动重放，但执行前先确认连接存活，避免在已断开的连接上提交
+            if not self.pool.ensure_alive():
+                raise ConnectionError('SSH连接不可用，重连失败')
+            self._refresh_connection()
+
+            shell_config = getattr(config, 'SHELL_POOL_CONFIG', {})
+            if error_patterns is None:
+                error_patterns = shell_config.get('error_patterns', [])
+            patterns = {'success': re.escape(completion_marker)}
+            if error_patterns:
+                patterns['error'] = '|'.join(f"(?:{pattern})" for pattern in error_patterns)
+
             # 发送命令
             print(f"\n执行命令: {command}")
             print(f"完成标记: {completion_marker}")
-            
+
             # 记录命令到日志
             if step_logger.enabled:
                 step_logger.log_command(f"{command} (交互式)")
                 step_logger.log_command_output(f"完成标记: {completion_marker}")
-            
-            shell.send(f"{command}\n")
-            
-            # 读取输出（无时间限制）
-            full_output = ""
-            
-            while True:
-                if shell.recv_ready():
-                    chunk = shell.recv(4096).decode('utf-8', errors='ignore')
-                    full_output += chunk
-                    print(chunk, end='', flush=True)
-                    
-                    # 检查是否在输出中检测到完成标记
-                    if completion_marker in chunk:
-                        print(f"\n✓ 检测到完成标记: {completion_marker}")
-                        break
-                time.sleep(0.1)
-            
-            # 关闭shell
-            shell.close()
-            
+
+            def show_chunk(chunk: str):
+                print(chunk, end='', flush=True)
+                if on_chunk:
+                    on_chunk(chunk)
+
+            # 取得交互式shell（占用连接池中的一个通道），执行完毕后归还
+            with command_metrics.measure('interactive', command, path=self.pool.path_label) as sample:
+                wait_start = time.monotonic()
+                shell = self.pool.acquire_shell()
+                sample['queue_wait'] = time.monotonic() - wait_start
+                sample['channel'] = shell.channel.get_id()
+                reusable = False
+                try:
+                    run = shell.run(
+                        command,
+                        patterns,
+                        timeout=timeout,
+                        settle_timeout=shell_config.get('settle_timeout', 0),
+                        on_chunk=show_chunk
+                    )
+                    reusable = run['finished']
+                finally:
+                    self.pool.release_shell(shell, reusable)
+                # 交互式shell的输出已解码，按字符数统计
+                sample.update(exit_code=run['exit_code'], bytes_in=run['output'].total_chars)
+                if run['matched'] != 'success':
+                    sample['error'] = run['match_text'] or ('输出读取超时' if run['timed_out'] else '未检测到完成标记')
+            self.pool.warm_shells()
+
+            buffer = run['output']
+            buffer.close()
+            full_output = buffer.getvalue()
+
             # 记录输出到日志
             if step_logger.enabled:
                 step_logger.log_command_output(f"输出:\n{full_output}")
-            
+
             result = {
-                'success': True,
-                'message': '命令执行完成',
-                'output': full_output
+                'output': full_output,
+                'matched_pattern': run['match_text']
             }
-            
-            print(f"\n✓ 命令执行完成")
+            if buffer.spill_path:
+                result['output_file'] = buffer.spill_path
+
+            if run['matched'] == 'success':
+                print(f"\n✓ 检测到完成标记: {completion_marker}")
+                print(f"\n✓ 命令执行完成")
+                result.update({
+                    'success': True,
+                    'message': '命令执行完成'
+                })
+            elif run['matched'] == 'error':
+                print(f"\n✗ 检测到错误标记: {run['match_text']}")
+                result.update({
+                    'success': False,
+                    'message': f"检测到错误标记: {run['match_text']}",
+                    'error': run['match_text']
+                })
+            elif run['timed_out']:
+                print(f"\n✗ 输出读取超时（{timeout}秒）")
+                result.update({
+                    'success': False,
+                    'message': f'输出读取超时（{timeout}秒）',
+                    'error': '输出读取超时'
+                })
+            else:
+                print(f"\n✗ 命令已结束（退出码: {run['exit_code']}），未检测到完成标记: {completion_marker}")
+                result.update({
+                    'success': False,
+                    'message': f"命令已结束（退出码: {run['exit_code']}），未检测到完成标记",
+                    'error': '未检测到完成标记'
+                })
             return result
             
         except Exception as e:
@@ -305,35 +792,453 @@ class TopupSSH:
                 'error': str(e)
             }
     
+    @_via_daemon
+    def start_detached(self, command: str, name: Optional[str] = None, label: Optional[str] = None) -> Dict[str, Any]:
+        """
+        在远程后台启动长时间运行的命令（nohup，不依赖当前通道和连接）
+
+        作业的pid、stdout/stderr日志和退出码写入远程作业目录（config.DETACHED_JOB_CONFIG['remote_dir']），
+        句柄保存在本地状态文件中，之后用 attach_detached 附着读取输出和退出码。
+
+        Args:
+            command: 要执行的命令
+            name: 作业名（run_detached 据此重新附着），默认使用作业ID
+            label: 显示和日志中使用的命令描述，默认为命令本身
+
+        Returns:
+            dict: 包含success, message, error, job（作业句柄）
+        """
+        if not self._ready():
+            return {'success': False, 'message': 'SSH未连接', 'error': 'SSH连接未建立', 'job': None}
+
+        # 后台作业视为写操作
+        self.cache.invalidate_command(command)
+        try:
+            remote_root = detached_jobs.jobs_config()['remote_dir']
+            if not remote_root.startswith('/'):
+                home = self._with_reconnect(lambda: self._sftp_call(lambda sftp: sftp.normalize('.')))
+                remote_root = posixpath.join(home, remote_root)
+            handle = detached_jobs.new_handle(command, remote_root, name)
+            handle['label'] = label or command
+
+            print(f"\n后台执行命令: {handle['label']}")
+            print(f"  作业目录: {handle['job_dir']}")
+            if step_logger.enabled:
+                step_logger.log_command(f"{handle['label']} (后台作业 {handle['job_id']})")
+
+            # 启动前先保存句柄：启动过程中连接中断时，重新附着可根据远程pid文件判断作业是否已启动
+            job_store.put(handle)
+            exit_code, stdout, stderr = self._with_reconnect(
+                lambda: self._exec_quiet(detached_jobs.launch_command(handle), 60), replayable=False
+            )
+            fields = stdout.getvalue().split()
+            if exit_code != 0 or len(fields) < 2:
+                job_store.remove(handle['name'])
+                raise RuntimeError(stderr.getvalue().strip() or f'启动命令退出码: {exit_code}')
+            handle['pid'], handle['host'] = int(fields[0]), fields[1]
+            job_store.put(handle)
+
+            print(f"✓ 后台作业已启动 (pid {handle['pid']}, 主机 {handle['host']})")
+            return {'success': True, 'message': '后台作业已启动', 'error': '', 'job': handle}
+        except Exception as e:
+            print(f"✗ 启动后台作业失败: {str(e)}")
+            if step_logger.enabled:
+                step_logger.log_command_output(f"启动后台作业失败: {str(e)}")
+            return {'success': False, 'message': f'启动后台作业失败: {str(e)}', 'error': str(e), 'job': None}
+
+    @_via_daemon
+    def attach_detached(self, job: Union[str, Dict[str, Any]], timeout: Optional[float] = None,
+                        on_chunk: Optional[Callable[[str], None]] = None,
+                        show_output: bool = True) -> Dict[str, Any]:
+        """
+        附着到后台作业：持续读取远程日志中的新输出，直到作业结束，返回退出码和完整输出
+
+        连接中断时自动重连后继续读取（作业本身不受影响）；等待超时或重连失败时作业仍在后台运行，
+        句柄保留在状态文件中，可以再次附着。之前附着时已显示过的输出不再重复显示，
+        但结果中的 output/error 始终是作业的完整输出。
+
+        Args:
+            job: 作业句柄或作业名
+            timeout: 最长等待时间（秒），默认一直等待到作业结束
+            on_chunk: 收到新的stdout输出时调用的回调
+            show_output: 是否实时打印stdout输出
+
+        Returns:
+            dict: 执行结果，格式同 execute_command（success, message, exit_code, output, error 等），
+                  另含 job（作业句柄）和 finished（作业是否已结束）
+        """
+        handle = job_store.get(job) if isinstance(job, str) else job
+        if not self._ready() or handle is None:
+            error = 'SSH连接未建立' if handle is not None else f'未找到后台作业: {job}'
+            return {'success': False, 'message': error, 'exit_code': -1, 'output': '', 'error': error,
+                    'job': handle, 'finished': False}
+
+        settings = detached_jobs.jobs_config()
+        stdout = OutputBuffer()
+        stderr = OutputBuffer()
+        offsets = {'stdout': 0, 'stderr': 0}
+        display = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        deadline = time.monotonic() + timeout if timeout else None
+        interval = settings['poll_interval']
+        next_liveness = time.monotonic() + settings['liveness_interval']
+        exit_code = None
+        status = 'running'
+
+        print(f"\n附着后台作业 {handle['name']} (pid {handle['pid']}): {handle.get('label', handle['command'])}")
+        try:
+            with command_metrics.measure('detached', handle.get('label', handle['command']), path=self.pool.path_label) as sample:
+                sample['round_trips'] = 0
+                if handle['pid'] is None and not self._with_reconnect(lambda: self._resolve_job_pid(handle)):
+                    status = 'not_started'
+                while status == 'running':
+                    exit_code, data = self._with_reconnect(lambda: self._read_job(handle, offsets))
+                    sample['round_trips'] += 1
+
+                    # 已显示过的部分（之前附着时）只写入结果缓冲，不再显示
+                    shown = handle['stdout_offset'] - offsets['stdout']
+                    for stream, buffer in (('stdout', stdout), ('stderr', stderr)):
+                        buffer.write_bytes(data[stream])
+                        offsets[stream] += len(data[stream])
+                    fresh = data['stdout'][max(shown, 0):]
+                    if fresh:
+                        text = display.decode(fresh)
+                        if show_output:
+                            print(text, end='', flush=True)
+                        if on_chunk:
+                            on_chunk(text)
+                        handle['stdout_offset'] = offsets['stdout']
+                        job_store.put(handle)
+
+                    more = any(len(chunk) >= _JOB_READ_LIMIT for chunk in data.values())
+                    if exit_code is not None and not more:
+                        status = 'finished'
+                        break
+                    if more or any(data.values()):
+                        interval = settings['poll_interval']
+                        if more:
+                            continue
+
+                    now = time.monotonic()
+                    if deadline is not None and now >= deadline:
+                        status = 'timeout'
+                        break
+                    if exit_code is None and now >= next_liveness:
+                        next_liveness = now + settings['liveness_interval']
+                        if not self._with_reconnect(lambda: self._job_alive(handle)):
+                            # 退出码在进程结束前写入，进程已不存在时再读一次即可确定
+                            exit_code, _ = self._with_reconnect(lambda: self._read_job(handle, dict(offsets)))
+                            if exit_code is None:
+                                status = 'lost'
+                                break
+                            continue
+                    wait = interval if deadline is None else min(interval, max(deadline - now, 0))
+                    time.sleep(wait)
+                    interval = min(interval * 2, settings['max_poll_interval'])
+
+                sample.update(exit_code=exit_code, bytes_in=stdout.total_bytes + stderr.total_bytes)
+                if status != 'finished':
+                    sample['error'] = status
+        except Exception as e:
+            print(f"\n✗ 附着后台作业失败: {str(e)}（作业仍在后台运行，可重新附着）")
+            if step_logger.enabled:
+                step_logger.log_command_output(f"附着后台作业失败: {str(e)}")
+            return {'success': False, 'message': f'附着后台作业失败: {str(e)}', 'exit_code': -1,
+                    **stdout.to_result('output'), 'error': str(e), 'job': handle, 'finished': False}
+
+        if status in ('finished', 'lost', 'not_started'):
+            self.cache.invalidate_command(handle['command'])
+            job_store.remove(handle['name'])
+            if status == 'finished' and (exit_code == 0 or not settings['keep_failed_logs']):
+                self._remove_job_dir(handle)
+
+        output_fields = stdout.to_result('output')
+        error_fields = stderr.to_result('error')
+        result = {'exit_code': -1 if exit_code is None else exit_code, **output_fields, **error_fields,
+                  'job': handle, 'finished': status == 'finished'}
+        if status == 'finished':
+            result.update(success=exit_code == 0, message='命令执行成功' if exit_code == 0 else '命令执行失败')
+        elif status == 'timeout':
+            result.update(success=False, message=f'等待后台作业超时（{timeout}秒），作业仍在后台运行',
+                          error='等待后台作业超时')
+        elif status == 'lost':
+            result.update(success=False, message='后台作业进程已退出但未写入退出码（可能被终止）',
+                          error='后台作业异常退出')
+        else:
+            result.update(success=False, message='后台作业未启动', error='后台作业未启动')
+
+        if step_logger.enabled:
+            output_log = f"后台作业 {handle['job_id']} 退出码: {result['exit_code']}\n"
+            if result['output'].strip():
+                output_log += f"输出:\n{result['output'].strip()}\n"
+            if result['error'].strip():
+                output_log += f"错误:\n{result['error'].strip()}\n"
+            step_logger.log_command_output(output_log)
+
+        if result['success']:
+            print(f"\n✓ 后台作业执行成功 (退出码: {exit_code})")
+        else:
+            print(f"\n✗ {result['message']} (退出码: {result['exit_code']})")
+            if result['error'].strip():
+                print(f"错误: {result['error'].strip()}")
+            if status == 'finished' and settings['keep_failed_logs']:
+                print(f"  作业日志: {handle['job_dir']}")
+        return result
+
+    @_via_daemon
+    def run_detached(self, command: str, name: str, timeout: Optional[float] = None,
+                     on_chunk: Optional[Callable[[str], None]] = None, show_output: bool = True,
+                     label: Optional[str] = None) -> Dict[str, Any]:
+        """
+        以后台作业方式执行命令并等待结果；同名作业仍在运行或结果未取回时重新附着，而不是重新执行
+
+        步骤因连接中断、任务暂停或自动重试而重新执行时，只要命令相同且作业启动时间在
+        config.DETACHED_JOB_CONFIG['reattach_hours'] 之内，就继续读取原作业的剩余输出和退出码。
+
+        Args:
+            command: 要执行的命令
+            name: 作业名（同一步骤的同一次执行应使用相同的名字，如 '2.2_250624'）
+            timeout: 最长等待时间（秒），默认一直等待到作业结束
+            on_chunk: 收到新的stdout输出时调用的回调
+            show_output: 是否实时打印stdout输出
+            label: 显示和日志中使用的命令描述，默认为命令本身
+
+        Returns:
+            dict: 同 attach_detached，另含 reattached（是否附着到已有作业）
+        """
+        settings = detached_jobs.jobs_config()
+        handle = job_store.get(name)
+        reattach = (handle is not None and handle['command'] == command
+                    and time.time() - handle['started_at'] < settings['reattach_hours'] * 3600)
+        if reattach:
+            started_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(handle['started_at']))
+            print(f"\n发现未完成的后台作业 {name}（启动于 {started_at}），重新附着")
+        else:
+            if handle is not None:
+                print(f"⚠ 忽略过期或命令不同的后台作业记录: {name} ({handle['job_dir']})")
+            started = self.start_detached(command, name, label=label)
+            if not started['success']:
+                return {'success': False, 'message': started['message'], 'exit_code': -1, 'output': '',
+                        'error': started['error'], 'job': None, 'finished': False, 'reattached': False}
+            handle = started['job']
+
+        result = self.attach_detached(handle, timeout=timeout, on_chunk=on_chunk, show_output=show_output)
+        result['reattached'] = reattach
+        return result
+
+    @_via_daemon
+    def run_detached_batch(self, commands: List[str], name: str, stop_on_error: bool = True,
+                           timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        以一个后台作业顺序执行多条命令（语义同 execute_batch），中断后可重新附着
+
+        Args:
+            commands: 要执行的命令列表
+            name: 作业名
+            stop_on_error: True时遇到第一条失败的命令即停止，后续命令标记为skipped
+            timeout: 最长等待时间（秒），默认一直等待到作业结束
+
+        Returns:
+            list: 与commands一一对应的结果列表，格式同 execute_batch
+        """
+        if not commands:
+            return []
+
+        print(f"\n后台执行批量命令（{len(commands)}条，{'遇错停止' if stop_on_error else '遇错继续'}）:")
+        for index, command in enumerate(commands, 1):
+            print(f"  [{index}] {command}")
+
+        # 分隔帧标记由命令内容决定，重新执行时脚本不变，才能附着到同一作业
+        token = hashlib.sha1('\n'.join(commands).encode('utf-8')).hexdigest()[:16]
+        script = self._batch_script(commands, token, stop_on_error)
+        result = self.run_detached(f"bash -c {shlex.quote(script)}", name, timeout=timeout, show_output=False,
+                                   label=f"批量命令（{len(commands)}条）")
+
+        texts = {}
+        for prefix in ('output', 'error'):
+            path = result.get(f'{prefix}_file')
+            if path:
+                with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                    texts[prefix] = f.read()
+                os.remove(path)
+            else:
+                texts[prefix] = result.get(prefix, '')
+
+        results = self._split_batch(commands, token, texts['output'], texts['error'],
+                                    not result['finished'], timeout)
+        if not result['finished']:
+            for entry in results:
+                if not entry['skipped'] and entry['exit_code'] == -1:
+                    entry.update(message=result['message'], error=result['error'])
+        self._print_batch_results(results)
+        return results
+
+    @_via_daemon
+    def cancel_detached(self, job: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        终止后台作业（整个进程组）并删除本地句柄
+
+        Args:
+            job: 作业句柄或作业名
+
+        Returns:
+            dict: 包含success, message, error
+        """
+        handle = job_store.get(job) if isinstance(job, str) else job
+        if handle is None:
+            return {'success': False, 'message': f'未找到后台作业: {job}', 'error': '作业不存在'}
+        if not self._ready():
+            return {'success': False, 'message': 'SSH未连接', 'error': 'SSH连接未建立'}
+
+        try:
+            if handle['pid'] is None and not self._with_reconnect(lambda: self._resolve_job_pid(handle)):
+                job_store.remove(handle['name'])
+                return {'success': True, 'message': '后台作业未启动', 'error': ''}
+            host = self._with_reconnect(self._remote_host)
+            if handle['host'] and handle['host'] != host:
+                message = f"作业运行在 {handle['host']}，当前连接到 {host}，无法终止"
+                return {'success': False, 'message': message, 'error': message}
+            self._with_reconnect(lambda: self._exec_quiet(detached_jobs.cancel_command(handle), 30))
+            job_store.remove(handle['name'])
+            self.cache.invalidate_command(handle['command'])
+            print(f"✓ 已终止后台作业 {handle['name']} (pid {handle['pid']})")
+            return {'success': True, 'message': '后台作业已终止', 'error': ''}
+        except Exception as e:
+            print(f"✗ 终止后台作业失败: {str(e)}")
+            return {'success': False, 'message': f'终止后台作业失败: {str(e)}', 'error': str(e)}
+
+    def list_detached(self) -> Dict[str, Dict[str, Any]]:
+        """
+        列出本地记录的后台作业（仍在运行或结果尚未取回）
+
+        Returns:
+            dict: 作业名 -> 作业句柄
+        """
+        return job_store.all()
+
+    def _exec_quiet(self, command: str, timeout: float) -> Tuple[Optional[int], OutputBuffer, OutputBuffer]:
+        """在新通道中执行辅助命令（不打印、不使用缓存），返回 (退出码, stdout缓冲, stderr缓冲)"""
+        with command_metrics.measure('command', command, path=self.pool.path_label) as sample:
+            sample['round_trips'] = 0
+            exit_code, stdout, stderr = self._exec_channel(command, timeout, sample)
+            sample.update(exit_code=exit_code, bytes_in=stdout.total_bytes + stderr.total_bytes)
+        return exit_code, stdout, stderr
+
+    def _sftp_call(self, operation: Callable[[paramiko.SFTPClient], Any]) -> Any:
+        """在持久SFTP会话上执行一次操作"""
+        with self.pool.shared_sftp() as sftp:
+            return operation(sftp)
+
+    def _read_job(self, handle: Dict[str, Any], offsets: Dict[str, int]) -> Tuple[Optional[int], Dict[str, bytes]]:
+        """
+        读取后台作业的退出码和日志新增内容（先读退出码：读到退出码时日志已完整）
+
+        Returns:
+            tuple: (退出码，未结束时为None, {'stdout': 新增字节, 'stderr': 新增字节})
+        """
+        with self.pool.shared_sftp() as sftp:
+            exit_code = None
+            try:
+                with sftp.open(posixpath.join(handle['job_dir'], 'exit'), 'r') as f:
+                    exit_code = int(f.read().decode('ascii', errors='ignore').strip())
+            except (IOError, ValueError):
+                pass
+            data = {}
+            for stream in ('stdout', 'stderr'):
+                try:
+                    with sftp.open(posixpath.join(handle['job_dir'], f'{stream}.log'), 'rb') as f:
+                        f.seek(offsets[stream])
+                        data[stream] = f.read(_JOB_READ_LIMIT)
+                except IOError:
+                    data[stream] = b''
+        return exit_code, data
+
+    def _resolve_job_pid(self, handle: Dict[str, Any]) -> bool:
+        """启动时连接中断、句柄中没有pid时，从远程pid文件读取；返回作业是否已启动"""
+        def read_pid(sftp):
+            with sftp.open(posixpath.join(handle['job_dir'], 'pid'), 'r') as f:
+                return f.read()
+
+        try:
+            handle['pid'] = int(self._sftp_call(read_pid).decode('ascii', errors='ignore').strip())
+        except (IOError, ValueError):
+            return False
+        job_store.put(handle)
+        return True
+
+    def _job_alive(self, handle: Dict[str, Any]) -> bool:
+        """
+        后台作业进程是否仍在运行
+
+        只能检查作业所在的主机（目标服务器地址可能对应多台登录节点）；
+        当前连接到其他主机或远程没有 /proc 时无法判断，视为仍在运行，只依赖退出码文件。
+        """
+        if handle['pid'] is None or (handle['host'] and handle['host'] != self._remote_host()):
+            return True
+
+        def read_stat(sftp):
+            with sftp.open(f"/proc/{int(handle['pid'])}/stat", 'r') as f:
+                return f.read().decode('ascii', errors='ignore')
+
+        try:
+            # 状态字段在进程名（括号）之后，Z 表示已退出未回收
+            return self._sftp_call(read_stat).rsplit(')', 1)[-1].split()[:1] != ['Z']
+        except IOError:
+            try:
+                self._sftp_call(lambda sftp: sftp.stat('/proc/1'))
+            except IOError:
+                return True
+            return False
+
+    def _remote_host(self) -> str:
+        """当前连接的目标服务器主机名（每个连接代查询一次）"""
+        generation = self.pool.generation
+        if self._host_cache is None or self._host_cache[0] != generation:
+            exit_code, stdout, _ = self._exec_quiet('hostname', 30)
+            self._host_cache = (generation, stdout.getvalue().strip() if exit_code == 0 else '')
+        return self._host_cache[1]
+
+    def _remove_job_dir(self, handle: Dict[str, Any]):
+        """删除已取回结果的远程作业目录（失败时忽略）"""
+        try:
+            self._exec_quiet(f"rm -rf {shlex.quote(handle['job_dir'])}", 60)
+        except Exception as e:
+            print(f"⚠ 删除后台作业目录失败: {str(e)}")
+
     def close(self):
-        """关闭SSH连接"""
-        if self.ssh2:
-            self.ssh2.close()
-            self.ssh2 = None
-        
-        if self.ssh1:
-            self.ssh1.close()
-            self.ssh1 = None
-        
-        if self.transport:
-            self.transport.close()
-            self.transport = None
+        """关闭SSH连接（归还连接池租约，最后一个租约归还时才真正断开）"""
+        if self._daemon is not None:
+            self._daemon.close()
+            self._daemon = None
+        elif self.connected:
+            self.pool.release()
+
+        self.ssh2 = None
+        self.ssh1 = None
+        self.transport = None
         
         self.connected = False
         print("SSH连接已关闭")
     
-    def download_file(self, remote_path: str, local_path: str) -> Dict[str, Any]:
+    @_via_daemon
+    def download_file(self, remote_path: str, local_path: str, verify: Optional[bool] = None,
+                      resume: bool = True) -> Dict[str, Any]:
         """
         使用SFTP从远程服务器下载文件
+
+        大文件分区间在多个通道上并行下载，每个通道保持多个读请求；
+        中断后再次调用会从 .part 文件续传，完成后校验远程和本地校验和
         
         Args:
             remote_path: 远程文件路径
             local_path: 本地文件路径
+            verify: 是否校验校验和，默认使用 config.SFTP_TRANSFER_CONFIG
+            resume: 是否从上次中断处续传
             
         Returns:
-            dict: 下载结果，包含success, message, error
+            dict: 下载结果，包含success, message, error，
+                  成功时还包含size, transferred_bytes, elapsed, throughput_mbps等传输统计
         """
-        if not self.connected or self.ssh2 is None:
+        if not self._ready():
             return {
                 'success': False,
                 'message': 'SSH未连接',
@@ -341,27 +1246,19 @@ class TopupSSH:
             }
         
         try:
-            # 创建SFTP客户端
-            sftp = self.ssh2.open_sftp()
-            
             print(f"\n使用SFTP下载文件:")
             print(f"  远程路径: {remote_path}")
             print(f"  本地路径: {local_path}")
             
-            # 下载文件
-            sftp.get(remote_path, local_path)
-            
-            # 关闭SFTP
-            sftp.close()
+            with command_metrics.measure('download', f"sftp {remote_path}", path=self.pool.path_label) as sample:
+                result = self._with_reconnect(
+                    lambda: SFTPDownloader(self).download(remote_path, local_path, verify=verify, resume=resume)
+                )
+                sample['bytes_in'] = result.get('transferred_bytes', 0)
             
             print(f"✓ 文件下载成功")
             
-            return {
-                'success': True,
-                'message': f'文件下载成功: {local_path}',
-                'remote_path': remote_path,
-                'local_path': local_path
-            }
+            return result
             
         except Exception as e:
             print(f"✗ 文件下载失败: {str(e)}")
@@ -371,6 +1268,553 @@ class TopupSSH:
                 'error': str(e)
             }
     
+    @_via_daemon
+    def download_tree(self, remote_dir: str, local_dir: str, patterns: Optional[List[str]] = None,
+                      changed_since: Optional[float] = None, compression: Optional[str] = None) -> Dict[str, Any]:
+        """
+        通过单个tar流下载远程目录树（保留相对目录结构）
+
+        Args:
+            remote_dir: 远程根目录
+            local_dir: 本地目标目录
+            patterns: 相对于 remote_dir 的通配符列表，默认全部文件
+            changed_since: 只下载修改时间晚于该Unix时间戳的文件
+            compression: 压缩方式（None/'gz'/'bz2'/'xz'）
+
+        Returns:
+            dict: 下载结果，包含success, message, files, count, bytes, elapsed, throughput_mbps
+        """
+        if not self._ready():
+            return {
+                'success': False,
+                'message': 'SSH未连接',
+                'error': 'SSH连接未建立'
+            }
+
+        try:
+            print("\n使用tar流下载目录:")
+            print(f"  远程目录: {remote_dir}")
+            print(f"  本地目录: {local_dir}")
+            with command_metrics.measure('download', f"tar {remote_dir}", path=self.pool.path_label) as sample:
+                result = self._with_reconnect(lambda: TarStreamDownloader(self).download_tree(
+                    remote_dir, local_dir, patterns=patterns, changed_since=changed_since, compression=compression
+                ))
+                sample['bytes_in'] = result.get('transferred_bytes', 0)
+            return result
+        except Exception as e:
+            print(f"✗ 目录下载失败: {str(e)}")
+            return {
+                'success': False,
+                'message': f'目录下载失败: {str(e)}',
+                'error': str(e)
+            }
+
+    @_via_daemon
+    def download_many(self, remote_patterns: List[str], local_dir: str, changed_since: Optional[float] = None,
+                      compression: Optional[str] = None) -> Dict[str, Any]:
+        """
+        通过单个tar流把多个远程文件（支持通配符）下载到同一本地目录
+
+        Args:
+            remote_patterns: 远程路径或通配符列表，如 ['/dir/Interval_run*.png']
+            local_dir: 本地目标目录
+            changed_since: 只下载修改时间晚于该Unix时间戳的文件
+            compression: 压缩方式（None/'gz'/'bz2'/'xz'）
+
+        Returns:
+            dict: 下载结果，包含success, message, files, count, bytes, elapsed, throughput_mbps
+        """
+        if not self._ready():
+            return {
+                'success': False,
+                'message': 'SSH未连接',
+                'error': 'SSH连接未建立'
+            }
+
+        try:
+            print(f"\n使用tar流批量下载 {len(remote_patterns)} 个路径到: {local_dir}")
+            with command_metrics.measure('download', f"tar {' '.join(remote_patterns)}", path=self.pool.path_label) as sample:
+                result = self._with_reconnect(lambda: TarStreamDownloader(self).download_many(
+                    remote_patterns, local_dir, changed_since=changed_since, compression=compression
+                ))
+                sample['bytes_in'] = result.get('transferred_bytes', 0)
+            return result
+        except Exception as e:
+            print(f"✗ 批量下载失败: {str(e)}")
+            return {
+                'success': False,
+                'message': f'批量下载失败: {str(e)}',
+                'error': str(e)
+            }
+
+    @_via_daemon
+    def upload_many(self, files: Dict[str, Union[str, bytes]], encoding: str = 'utf-8',
+                    mode: Optional[int] = None) -> Dict[str, Any]:
+        """
+        通过持久SFTP会话批量上传文件内容（每个文件写入临时文件后原子改名）
+
+        替代 echo ... >> 文件、sed/sort 改写等shell命令：在本地修改好内容后一次调用写回，
+        内容不经过shell引号转义，读取方不会看到写了一半的文件。
+
+        Args:
+            files: 远程路径 -> 文件内容（str 按 encoding 编码，bytes 原样写入）
+            encoding: 文本内容的编码
+            mode: 新建文件的权限（如 0o644），已存在的文件保留原权限
+
+        Returns:
+            dict: 上传结果，包含success, message, files（远程路径 -> 写入的字节数）, bytes, error
+        """
+        if not self._ready():
+            return {
+                'success': False,
+                'message': 'SSH未连接',
+                'error': 'SSH连接未建立'
+            }
+
+        payload = {path: data.encode(encoding) if isinstance(data, str) else data for path, data in files.items()}
+        print(f"\n上传 {len(payload)} 个文件（临时文件 + 原子改名）:")
+        for path, data in payload.items():
+            print(f"  {path} ({len(data)} 字节)")
+
+        try:
+            with command_metrics.measure('upload', f"sftp {' '.join(payload)}", path=self.pool.path_label) as sample:
+                # 写入同样的内容可以安全地重复执行
+                written = self._with_reconnect(lambda: self.fs.write_many(payload, mode=mode))
+                sample['bytes_out'] += sum(written.values())
+        except Exception as e:
+            print(f"✗ 文件上传失败: {str(e)}")
+            return {
+                'success': False,
+                'message': f'文件上传失败: {str(e)}',
+                'error': str(e)
+            }
+        finally:
+            self.cache.invalidate(list(payload))
+
+        print("✓ 文件上传成功")
+        return {
+            'success': True,
+            'message': f'成功上传 {len(written)} 个文件',
+            'files': written,
+            'bytes': sum(written.values())
+        }
+
+    @_via_daemon
+    def write_text_atomic(self, remote_path: str, text: str, encoding: str = 'utf-8',
+                          mode: Optional[int] = None) -> Dict[str, Any]:
+        """
+        原子地写入远程文本文件（写入临时文件后改名覆盖）
+
+        Args:
+            remote_path: 远程文件路径
+            text: 文件内容
+            encoding: 文本编码
+            mode: 新建文件的权限，已存在的文件保留原权限
+
+        Returns:
+            dict: 上传结果，包含success, message, files, bytes, error（见 upload_many）
+        """
+        return self.upload_many({remote_path: text}, encoding=encoding, mode=mode)
+
+    @_via_daemon
+    def stat(self, remote_path: str) -> Optional[RemoteFileEntry]:
+        """
+        获取远程文件属性
+
+        Args:
+            remote_path: 远程路径
+
+        Returns:
+            RemoteFileEntry: 文件条目（name, path, size, mtime, is_dir），不存在时返回None
+        """
+        self._require_connection()
+        return self._cached_query(('stat', remote_path), [remote_path], lambda: self.fs.stat(remote_path))
+
+    @_via_daemon
+    def listdir_attr(self, remote_dir: str) -> List[RemoteFileEntry]:
+        """
+        列出远程目录内容
+
+        Args:
+            remote_dir: 远程目录路径
+
+        Returns:
+            list: 按文件名排序的 RemoteFileEntry 列表
+        """
+        self._require_connection()
+        return self._cached_query(('listdir', remote_dir), [remote_dir], lambda: self.fs.listdir_attr(remote_dir))
+
+    @_via_daemon
+    def exists_many(self, remote_paths: List[str]) -> Dict[str, bool]:
+        """
+        批量检查远程文件是否存在（同一目录下的文件只需一次往返）
+
+        Args:
+            remote_paths: 远程路径列表
+
+        Returns:
+            dict: 路径 -> 是否存在
+        """
+        self._require_connection()
+        return self._cached_query(('exists', tuple(remote_paths)), remote_paths, lambda: self.fs.exists_many(remote_paths))
+
+    @_via_daemon
+    def glob(self, pattern: str) -> List[RemoteFileEntry]:
+        """
+        按shell通配符匹配远程文件
+
+        Args:
+            pattern: 通配符路径，如 /path/to/dir/run_*_3.txt
+
+        Returns:
+            list: 匹配的 RemoteFileEntry 列表
+        """
+        self._require_connection()
+        return self._cached_query(('glob', pattern), [pattern], lambda: self.fs.glob(pattern))
+
+    @_via_daemon
+    def scan_tree(self, remote_dir: str, depth: int = 1) -> List[RemoteFileEntry]:
+        """
+        一次往返遍历远程目录树（辅助进程的 scan 查询，不可用时回退为一条 find 命令）
+
+        Args:
+            remote_dir: 远程目录路径
+            depth: 遍历深度，1 表示只列出目录本身的内容
+
+        Returns:
+            list: 深度不超过depth的全部 RemoteFileEntry（目录本身除外）
+        """
+        result = self.query_many([{'op': 'scan', 'path': remote_dir, 'depth': depth}])[0]
+        if not result['success']:
+            raise IOError(result['error'] or f"无法遍历目录: {remote_dir}")
+        return result['value']
+
+    def file_events(self, directories: List[str]) -> FileEventStream:
+        """
+        启动远程文件事件流（见 file_events.py），调用方用完后需要 close()
+
+        事件流占用一个长期保持的通道，无法经本地SSH守护进程转发，此时抛出 ConnectionError，
+        调用方应改用定期检查。
+
+        Args:
+            directories: 要监视的远程目录列表
+
+        Returns:
+            FileEventStream: 已启动的事件流
+        """
+        self._require_connection()
+        if self._daemon is not None:
+            raise ConnectionError("通过本地SSH守护进程连接时不支持文件事件")
+        stream = FileEventStream(self.pool, directories)
+        backend = stream.start()
+        print(f"✓ 远程文件监视进程已启动（{backend}，{len(stream.directories)} 个目录）")
+        return stream
+
+    @_via_daemon
+    def read_text(self, remote_path: str, encoding: str = 'utf-8', max_bytes: Optional[int] = None) -> str:
+        """
+        读取远程文本文件
+
+        Args:
+            remote_path: 远程文件路径
+            encoding: 文本编码
+            max_bytes: 最多读取的字节数，默认读取整个文件
+
+        Returns:
+            str: 文件内容
+        """
+        self._require_connection()
+        with command_metrics.measure('sftp', f"read {remote_path}", path=self.pool.path_label) as sample:
+            text = self._with_reconnect(lambda: self.fs.read_text(remote_path, encoding=encoding, max_bytes=max_bytes))
+            sample['bytes_in'] = len(text.encode(encoding, errors='ignore'))
+        return text
+
+    @_via_daemon
+    def read_appended(self, positions: Dict[str, int], max_bytes: Optional[int] = None,
+                      final: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        读取多个远程文件从指定偏移开始新增的完整行（共用一个持久SFTP会话）
+
+        Args:
+            positions: 路径 -> 已读取的字节偏移（-1 表示从文件当前末尾开始）
+            max_bytes: 每个文件本次最多读取的字节数，默认使用 config.LOG_FOLLOW_CONFIG['read_limit']
+            final: 是否返回末尾不完整的行
+
+        Returns:
+            dict: 路径 -> {exists, size, offset, next_offset, lines, truncated, remaining}（见 log_follow.read_appended）
+        """
+        self._require_connection()
+        with command_metrics.measure('sftp', f"tail {' '.join(positions)}", path=self.pool.path_label) as sample:
+            results = self._with_reconnect(lambda: self._sftp_call(
+                lambda sftp: log_follow.read_appended(sftp, positions, read_limit=max_bytes, final=final)))
+            sample['round_trips'] = sum(entry.pop('requests') for entry in results.values())
+            sample['bytes_in'] = sum(entry['next_offset'] - entry['offset'] for entry in results.values())
+        return results
+
+    def follow(self, paths: List[str], on_line: Optional[Callable[[str, str], None]] = None,
+               consumer: str = 'default', from_start: bool = True, duration: float = 0,
+               interval: Optional[float] = None, until: Optional[Callable[[], bool]] = None,
+               final: bool = False) -> Dict[str, Any]:
+        """
+        跟踪一个或多个远程文件，只读取上次调用之后新增的内容并逐行交给回调
+
+        每个跟踪者（consumer）的偏移保存在本地状态文件中（config.LOG_FOLLOW_CONFIG['state_file']），
+        下次调用（或进程重启后）从上次的位置继续；文件变短时视为被截断或替换，从头读取。
+        尚不存在的文件记为偏移0，出现后从头读取。
+
+        Args:
+            paths: 远程文件路径列表
+            on_line: 行回调 on_line(路径, 行)，不指定时新增的行在结果的 lines 中返回
+            consumer: 跟踪者名称（不同跟踪者的偏移互不影响）
+            from_start: 首次跟踪已存在的文件时是否从头读取，False 表示只读取之后新增的内容
+            duration: 持续跟踪的秒数，0 表示只读取一次当前新增的内容
+            interval: 持续跟踪时的读取间隔（秒），默认使用 config.LOG_FOLLOW_CONFIG['poll_interval']
+            until: 持续跟踪时每次读取后调用，返回True时提前结束
+            final: 是否返回末尾不完整的行（确认文件不会再增长时使用）
+
+        Returns:
+            dict: 包含success, message, files（路径 -> exists, size, offset, new_lines, truncated）,
+                  line_count，以及未指定 on_line 时的 lines（路径 -> 新增的行）
+        """
+        settings = log_follow.follow_config()
+        interval = settings['poll_interval'] if interval is None else interval
+        stored = log_follow.offset_store.get(consumer)
+        positions = {path: stored[path]['offset'] if path in stored else (0 if from_start else -1) for path in paths}
+        files = {path: {'exists': False, 'size': 0, 'offset': max(0, position), 'new_lines': 0, 'truncated': False}
+                 for path, position in positions.items()}
+        collected: Dict[str, List[str]] = {path: [] for path in paths}
+        deadline = time.monotonic() + duration
+
+        try:
+            while True:
+                results = self.read_appended(positions, final=final)
+                for path, entry in results.items():
+                    if entry['truncated']:
+                        print(f"⚠ {path} 变短（被截断或替换），从头读取")
+                    for line in entry['lines']:
+                        if on_line is None:
+                            collected[path].append(line)
+                        else:
+                            on_line(path, line)
+                    positions[path] = entry['next_offset']
+                    files[path].update(exists=entry['exists'], size=entry['size'], offset=entry['next_offset'],
+                                       new_lines=files[path]['new_lines'] + len(entry['lines']),
+                                       truncated=files[path]['truncated'] or entry['truncated'])
+                log_follow.offset_store.update(consumer, {
+                    path: {'offset': positions[path], 'size': results[path]['size']} for path in paths
+                })
+
+                # 达到单次读取上限的文件立即继续读取
+                if any(entry['remaining'] > 0 for entry in results.values()):
+                    continue
+                if time.monotonic() >= deadline or (until is not None and until()):
+                    break
+                time.sleep(max(0.0, min(interval, deadline - time.monotonic())))
+        except Exception as e:
+            print(f"✗ 跟踪远程文件失败: {str(e)}")
+            return {
+                'success': False,
+                'message': f'跟踪远程文件失败: {str(e)}',
+                'files': files,
+                'error': str(e)
+            }
+
+        line_count = sum(item['new_lines'] for item in files.values())
+        result = {
+            'success': True,
+            'message': f'读取到 {line_count} 行新内容',
+            'files': files,
+            'line_count': line_count
+        }
+        if on_line is None:
+            result['lines'] = collected
+        return result
+
+    def reset_follow(self, paths: Optional[List[str]] = None, consumer: str = 'default'):
+        """
+        清除跟踪偏移，之后从头读取
+
+        Args:
+            paths: 要清除的路径，默认清除该跟踪者的全部偏移
+            consumer: 跟踪者名称
+        """
+        log_follow.offset_store.reset(consumer, paths)
+
+    @_via_daemon
+    def query_many(self, queries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量执行文件系统查询
+
+        优先交给远程辅助进程，全部查询只需一次往返；辅助进程不可用（未启用、启动失败、
+        通信中断）时回退到SFTP查询和普通命令，结果格式相同。
+
+        支持的查询:
+            {'op': 'exists', 'paths': [...]}                       -> {路径: 是否存在}
+            {'op': 'stat', 'paths': [...]}                         -> {路径: RemoteFileEntry或None}
+            {'op': 'dirstat', 'paths': [...]}                      -> {路径: [修改时间, 条目数]或None}（目录不存在为None）
+            {'op': 'listdir', 'path': ...}                         -> [RemoteFileEntry, ...]
+            {'op': 'glob', 'pattern': ...}                         -> [RemoteFileEntry, ...]
+            {'op': 'scan', 'path': ..., 'depth': N}                -> [RemoteFileEntry, ...]（目录树中深度不超过N的全部条目）
+            {'op': 'count', 'pattern': ...}                        -> 匹配的文件数
+            {'op': 'grep', 'pattern': 正则, 'paths': [...], 'max_matches': N}
+                                                                   -> {路径: [匹配行, ...]}（只含有匹配的文件）
+            {'op': 'tail', 'path': ..., 'lines': N}                -> 最后N行文本
+            {'op': 'read', 'path': ..., 'max_bytes': N}            -> 文件内容
+
+        Args:
+            queries: 查询列表
+
+        Returns:
+            list: 与queries一一对应的结果，每项包含success, value, error
+        """
+        self._require_connection()
+        for query in queries:
+            if query.get('op') not in AGENT_OPS:
+                raise ValueError(f"不支持的查询类型: {query.get('op')}")
+
+        if self.agent is not None and self.agent.available() and self.pool.ensure_alive():
+            try:
+                with command_metrics.measure('agent', ' '.join(sorted({query['op'] for query in queries})), path=self.pool.path_label) as sample:
+                    answers = self.agent.request(queries)
+                    sample['queries'] = len(queries)
+                return [
+                    {'success': True, 'value': self._agent_value(query, answer['value']), 'error': ''}
+                    if answer.get('ok') else {'success': False, 'value': None, 'error': answer.get('error', '')}
+                    for query, answer in zip(queries, answers)
+                ]
+            except ConnectionError as e:
+                print(f"⚠ {str(e)}，改用普通命令查询")
+
+        results = []
+        for query in queries:
+            try:
+                results.append({'success': True, 'value': self._query_fallback(query), 'error': ''})
+            except Exception as e:
+                results.append({'success': False, 'value': None, 'error': str(e)})
+        return results
+
+    @staticmethod
+    def _agent_value(query: Dict[str, Any], value: Any) -> Any:
+        """把辅助进程返回的原始值转换为与回退查询相同的格式"""
+        def to_entry(item):
+            path, size, mtime, is_dir = item
+            return RemoteFileEntry(name=path.rstrip('/').rsplit('/', 1)[-1] or path, path=path,
+                                   size=size, mtime=float(mtime), is_dir=bool(is_dir))
+
+        if query['op'] == 'stat':
+            return {path: to_entry(item) if item else None for path, item in value.items()}
+        if query['op'] in ('listdir', 'glob', 'scan'):
+            return [to_entry(item) for item in value]
+        return value
+
+    def _query_fallback(self, query: Dict[str, Any]) -> Any:
+        """不使用辅助进程执行单个查询"""
+        op = query['op']
+        if op == 'exists':
+            return self.exists_many(query['paths'])
+        if op == 'stat':
+            return {path: self.stat(path) for path in query['paths']}
+        if op == 'listdir':
+            return self.listdir_attr(query['path'])
+        if op == 'glob':
+            return self.glob(query['pattern'])
+        if op == 'dirstat':
+            return self._dirstat_fallback(query['paths'])
+        if op == 'scan':
+            return self._scan_fallback(query['path'], int(query.get('depth', 1)))
+        if op == 'count':
+            return len(self.glob(query['pattern']))
+        if op == 'read':
+            return self.read_text(query['path'], max_bytes=query.get('max_bytes'))
+        if op == 'tail':
+            result = self.execute_command(f"tail -n {int(query.get('lines', 10))} {shlex.quote(query['path'])}")
+            if not result['success']:
+                raise IOError(result['error'].strip() or result['message'])
+            return result['output'].rstrip('\n')
+
+        # grep：-H 保证单个文件时也输出文件名，退出码1表示没有匹配
+        max_matches = query.get('max_matches')
+        option = f"-m {int(max_matches)} " if max_matches else ''
+        paths = ' '.join(shlex.quote(path) for path in query['paths'])
+        result = self.execute_command(f"grep -H -s {option}-E {shlex.quote(query['pattern'])} {paths}")
+        if result['exit_code'] not in (0, 1, 2):
+            raise IOError(result['error'].strip() or result['message'])
+        matches: Dict[str, List[str]] = {}
+        for line in result['output'].splitlines():
+            for path in query['paths']:
+                if line.startswith(f"{path}:"):
+                    matches.setdefault(path, []).append(line[len(path) + 1:])
+                    break
+        return matches
+
+    def _dirstat_fallback(self, remote_dirs: List[str]) -> Dict[str, Optional[List]]:
+        """用一条命令获取多个目录的修改时间和条目数（不使用辅助进程时的 dirstat 查询）"""
+        paths = ' '.join(shlex.quote(path) for path in remote_dirs)
+        command = (f"for d in {paths}; do printf '%s\\t%s\\t%s\\n' \"$d\" "
+                   f"\"$(find \"$d\" -maxdepth 0 -type d -printf '%T@' 2>/dev/null)\" \"$(ls -A \"$d\" 2>/dev/null | wc -l)\"; done")
+        exit_code, stdout, stderr = self._with_reconnect(lambda: self._exec_quiet(command, 60))
+        if exit_code != 0:
+            raise IOError(stderr.getvalue().strip() or '获取目录状态失败')
+        result: Dict[str, Optional[List]] = {path: None for path in remote_dirs}
+        for line in stdout.getvalue().splitlines():
+            parts = line.rsplit('\t', 2)
+            if len(parts) == 3 and parts[0] in result and parts[1]:
+                result[parts[0]] = [float(parts[1]), int(parts[2])]
+        return result
+
+    def _scan_fallback(self, remote_dir: str, depth: int) -> List[RemoteFileEntry]:
+        """用一条 find 命令遍历目录树（不使用辅助进程时的 scan 查询）"""
+        root = remote_dir.rstrip('/') or '/'
+        command = f"find {shlex.quote(root)} -mindepth 1 -maxdepth {depth} -printf '%p\\t%s\\t%T@\\t%y\\n'"
+        exit_code, stdout, stderr = self._with_reconnect(lambda: self._exec_quiet(command, 120))
+        lines = stdout.getvalue().splitlines()
+        # 遍历过程中有文件被删除时 find 也返回非零退出码，只有没有任何输出时才视为失败
+        if exit_code != 0 and not lines:
+            raise IOError(stderr.getvalue().strip() or f"无法遍历目录: {remote_dir}")
+        entries = []
+        for line in lines:
+            parts = line.rsplit('\t', 3)
+            if len(parts) != 4:
+                continue
+            path, size, mtime, kind = parts
+            entries.append(RemoteFileEntry(name=posixpath.basename(path), path=path, size=int(size),
+                                           mtime=float(int(float(mtime))), is_dir=kind == 'd'))
+        return sorted(entries, key=lambda entry: entry.path)
+
+    def _cached_query(self, key: Tuple, paths: List[str], query: Callable[[], Any]) -> Any:
+        """
+        执行只读文件系统查询，路径配置了缓存有效期时优先使用缓存
+
+        Args:
+            key: 缓存键
+            paths: 查询涉及的路径
+            query: 无参数的可调用对象，执行一次查询
+
+        Returns:
+            查询结果（缓存命中时为副本）
+        """
+        description = f"{key[0]} {' '.join(paths)}"
+        ttl = self.cache.ttl_for(paths)
+        if ttl > 0:
+            hit, cached = self.cache.get(key)
+            if hit:
+                with command_metrics.measure('sftp', description, path=self.pool.path_label) as sample:
+                    sample.update(round_trips=0, cached=True)
+                return copy.copy(cached)
+        with command_metrics.measure('sftp', description, path=self.pool.path_label):
+            value = self._with_reconnect(query)
+        self.cache.put(key, copy.copy(value), paths, ttl)
+        return value
+
+    def _ready(self) -> bool:
+        """是否已建立连接（可以执行远程操作）"""
+        return self.connected and self.ssh2 is not None
+
+    def _require_connection(self):
+        """文件系统查询前检查连接状态"""
+        if not self._ready():
+            raise ConnectionError('SSH连接未建立')
+
     def __enter__(self):
         """上下文管理器入口"""
         self.connect()